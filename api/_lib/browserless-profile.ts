@@ -0,0 +1,155 @@
+/**
+ * browserless-profile.ts
+ *
+ * Request-interception profile for the Browserless scrape sessions (LP Flex and the
+ * LoanNEX BQL flow). Both pages pull in analytics (Segment's /v1/t and /v1/m fire on
+ * every form interaction, see lp_data/), images, fonts and media that the scrape never
+ * looks at, and that traffic keeps `waitUntil: networkIdle` waiting and costs session
+ * bandwidth. The standard profile rejects it up front and navigates with
+ * domContentLoaded plus a wait for the element the next step needs instead.
+ *
+ *   BROWSERLESS_BLOCK=standard          block and wait for readiness (default)
+ *   BROWSERLESS_BLOCK=off               load everything and wait for networkIdle
+ *   BROWSERLESS_BLOCK_URLS=a,b          extra URL globs to reject
+ *
+ * The in-page scripts put TRANSFER_SUMMARY's result in diag.transfer, so a response's
+ * debug shows time-to-ready and bytes transferred under either profile.
+ *
+ * Rates come from the pricing response the page itself receives (LP's pricing/search,
+ * LN's quick-prices): RESPONSE_CAPTURE hooks fetch and XHR before the search is clicked
+ * and the script returns that JSON, every row and unformatted, instead of walking the
+ * results table. The table scrape stays as the fallback when nothing is captured.
+ *
+ *   BROWSERLESS_CAPTURE=network         return the captured response (default)
+ *   BROWSERLESS_CAPTURE=dom             scrape the rendered results table only
+ */
+
+export type BlockProfile = 'standard' | 'off'
+export type CaptureMode = 'network' | 'dom'
+
+const BLOCKED_TYPES = ['image', 'font', 'media']
+
+const ANALYTICS_URLS = [
+  '*api.segment.io*',
+  '*cdn.segment.com*',
+  '*google-analytics.com*',
+  '*googletagmanager.com*',
+  '*doubleclick.net*',
+  '*hotjar.com*',
+  '*fullstory.com*',
+  '*clarity.ms*',
+]
+
+export function blockProfile(): BlockProfile {
+  return String(process.env.BROWSERLESS_BLOCK || 'standard').toLowerCase() === 'off' ? 'off' : 'standard'
+}
+
+export function captureMode(): CaptureMode {
+  return String(process.env.BROWSERLESS_CAPTURE || 'network').toLowerCase() === 'dom' ? 'dom' : 'network'
+}
+
+function blockedUrls(): string[] {
+  const extra = (process.env.BROWSERLESS_BLOCK_URLS || '').split(',').map(s => s.trim()).filter(Boolean)
+  return [...ANALYTICS_URLS, ...extra]
+}
+
+// BQL steps that open url as `alias` and wait until the page is usable. Under the
+// standard profile a `${alias}Ready` step waits for readySelector (when given), and
+// its time plus the goto's is the time-to-ready.
+export function navigateSteps(alias: string, url: string, readySelector: string | null, profile = blockProfile()): string {
+  if (profile === 'off') return `${alias}: goto(url: ${JSON.stringify(url)}, waitUntil: networkIdle) { status time }`
+  const steps = [
+    `blockAssets: reject(type: [${BLOCKED_TYPES.join(', ')}], url: ${JSON.stringify(blockedUrls())}) { enabled time }`,
+    `${alias}: goto(url: ${JSON.stringify(url)}, waitUntil: domContentLoaded) { status time }`,
+  ]
+  if (readySelector) steps.push(`${alias}Ready: waitForSelector(selector: ${JSON.stringify(readySelector)}, timeout: 15000) { time }`)
+  return steps.join('\n  ')
+}
+
+// Close a browser kept open for reconnecting: a mutation on its reconnect endpoint that
+// ends without a reconnect step ends the session, instead of the browser idling until
+// its reconnect timeout. Best effort.
+export async function closeBrowser(browserQLEndpoint: string, token: string): Promise<void> {
+  const sep = browserQLEndpoint.includes('?') ? '&' : '?'
+  const resp = await fetch(`${browserQLEndpoint}${sep}token=${token}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ query: 'mutation CloseBrowser {\n  closed: evaluate(content: "true", timeout: 1000) { value }\n}' }),
+    signal: AbortSignal.timeout(5000),
+  }).catch(() => null)
+  await resp?.body?.cancel().catch(() => {})
+}
+
+// Milliseconds from navigation to ready, as Browserless reported the steps
+export function readyMs(data: any, alias: string): number | null {
+  const gotoMs = data?.[alias]?.time
+  if (typeof gotoMs !== 'number') return null
+  const waitMs = data?.[`${alias}Ready`]?.time
+  return gotoMs + (typeof waitMs === 'number' ? waitMs : 0)
+}
+
+// In-page function: requests and bytes the current document has transferred so far
+export const TRANSFER_SUMMARY = `function transferSummary() {
+    var entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+    var bytes = 0;
+    for (var i = 0; i < entries.length; i++) bytes += entries[i].transferSize || 0;
+    return { requests: entries.length, bytes: bytes };
+  }`
+
+// In-page functions: captureResponses(urlPart) starts recording the bodies of fetch and XHR
+// responses whose URL contains urlPart (hooked once per document, cleared on each call);
+// capturedJson(hook) is the first 2xx body that parses as JSON, or null; capturedWithin
+// waits up to ms for one
+export const RESPONSE_CAPTURE = `function captureResponses(urlPart) {
+    var hook = window.__pricingCapture;
+    if (!hook) {
+      hook = window.__pricingCapture = { urlPart: null, list: [], json: null };
+      var origFetch = window.fetch;
+      window.fetch = function(input) {
+        var url = String(typeof input === 'string' ? input : (input && input.url) || '');
+        var pending = origFetch.apply(this, arguments);
+        if (hook.urlPart && url.indexOf(hook.urlPart) >= 0) {
+          pending.then(function(res) {
+            return res.clone().text().then(function(body) { hook.list.push({ url: url, status: res.status, body: body }); });
+          }).catch(function() {});
+        }
+        return pending;
+      };
+      var origOpen = XMLHttpRequest.prototype.open;
+      XMLHttpRequest.prototype.open = function(method, url) {
+        var xhr = this;
+        var target = String(url);
+        if (hook.urlPart && target.indexOf(hook.urlPart) >= 0) {
+          xhr.addEventListener('load', function() {
+            var body = xhr.responseType === 'json' ? JSON.stringify(xhr.response)
+              : (xhr.responseType === '' || xhr.responseType === 'text') ? xhr.responseText : null;
+            hook.list.push({ url: target, status: xhr.status, body: body });
+          });
+        }
+        return origOpen.apply(this, arguments);
+      };
+    }
+    hook.urlPart = urlPart;
+    hook.list = [];
+    hook.json = null;
+    return hook;
+  }
+  function capturedJson(hook) {
+    if (hook.json) return hook.json;
+    for (var i = 0; i < hook.list.length; i++) {
+      var entry = hook.list[i];
+      if (entry.status < 200 || entry.status >= 300 || !entry.body) continue;
+      try { hook.json = JSON.parse(entry.body); return hook.json; } catch (e) {}
+    }
+    return null;
+  }
+  function capturedWithin(hook, ms) {
+    return new Promise(function(resolve) {
+      var started = Date.now();
+      (function check() {
+        var json = capturedJson(hook);
+        if (json || Date.now() - started >= ms) return resolve(json);
+        setTimeout(check, 50);
+      })();
+    });
+  }`
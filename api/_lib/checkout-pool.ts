@@ -0,0 +1,87 @@
+/**
+ * checkout-pool.ts
+ *
+ * The bookkeeping both Browserless pools share (lp-page-pool.ts for Flex pages,
+ * ln-session-pool.ts for LoanNEX sessions): entries are checked out exclusively, most
+ * recently used first; idle ones are dropped once `isExpired` says so; and the least
+ * recently used idle one is given up to make room. What an entry holds, when it expires,
+ * its stats and what happens to a dropped entry's browser stay with each pool.
+ */
+
+// A number from the environment, or fallback when it is unset or not a number
+export function envNumber(name: string, fallback: number): number {
+  const value = Number(process.env[name])
+  return process.env[name] && Number.isFinite(value) ? value : fallback
+}
+
+// Closes the browser behind a Browserless reconnect endpoint (browserless-profile.ts
+// closeBrowser with the token bound)
+export type BrowserCloser = (browserQLEndpoint: string) => Promise<void>
+
+export interface PoolEntry {
+  id: number
+  createdAt: number
+  lastUsedAt: number
+  uses: number
+  inUse: boolean
+}
+
+export class CheckoutPool<T extends PoolEntry> {
+  private readonly entries: T[] = []
+  private readonly isExpired: (entry: T, now: number) => boolean
+  private nextId = 1
+
+  constructor(isExpired: (entry: T, now: number) => boolean) {
+    this.isExpired = isExpired
+  }
+
+  get size(): number {
+    return this.entries.length
+  }
+
+  // Drop the idle entries past their expiry; returns how many went
+  dropExpired(now = Date.now()): number {
+    const expired = this.idle().filter(entry => this.isExpired(entry, now))
+    for (const entry of expired) this.remove(entry)
+    return expired.length
+  }
+
+  // Check out the most recently used idle entry
+  checkout(): T | null {
+    const entry = this.idle().sort((a, b) => b.lastUsedAt - a.lastUsedAt)[0]
+    if (!entry) return null
+    entry.inUse = true
+    return entry
+  }
+
+  // Hand a checked-out entry back after a use
+  checkin(entry: T, now = Date.now()): void {
+    entry.inUse = false
+    entry.lastUsedAt = now
+    entry.uses++
+  }
+
+  // The idle entry to give up when making room, if any
+  leastRecentlyUsed(): T | null {
+    return this.idle().sort((a, b) => a.lastUsedAt - b.lastUsedAt)[0] ?? null
+  }
+
+  add(fields: Omit<T, keyof PoolEntry>, now = Date.now()): T {
+    const entry = { ...fields, id: this.nextId++, createdAt: now, lastUsedAt: now, uses: 0, inUse: false } as T
+    this.entries.push(entry)
+    return entry
+  }
+
+  remove(entry: T): void {
+    const idx = this.entries.indexOf(entry)
+    if (idx >= 0) this.entries.splice(idx, 1)
+  }
+
+  clear(): void {
+    this.entries.length = 0
+  }
+
+  private idle(): T[] {
+    return this.entries.filter(entry => !entry.inUse)
+  }
+}
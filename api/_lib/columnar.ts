@@ -0,0 +1,93 @@
+/**
+ * columnar.ts
+ *
+ * ?encoding=columnar for MeridianLink pricing bodies (get-pricing and the ML event of
+ * /api/quote). Each program's rateOptions array is sent as one table of parallel
+ * columns, so field names go over the wire once per program rather than once per rate
+ * option, and repeated strings once per column:
+ *
+ *   "rateOptions": { "length": 40, "columns": {
+ *     "rate":        [6.5, 6.625, ...]                          numbers, null when missing
+ *     "description": { "dict": ["30 YR FIXED ..."], "codes": [0, 0, ...] }   strings
+ *     "bestPrice":   { "flags": [0, 1, ...] }                   booleans
+ *     "adjustments": [[...], [...]]                             anything else, as-is
+ *   } }
+ *
+ * Dictionary codes and flags are -1 where the row has no value. The payload gets
+ * encoding: 'columnar' next to success. ?fields= projection applies to the columns
+ * (programs.rateOptions.rate keeps the rate column). The client decodes a table with
+ * decodeColumnarRateOptions (src/lib/PricingLogic.ts).
+ */
+
+export type RateOptionEncoding = 'rows' | 'columnar'
+
+export interface ColumnarTable {
+  length: number
+  columns: Record<string, unknown>
+}
+
+export function resolveEncoding(requested?: unknown): RateOptionEncoding {
+  return String(requested || '').toLowerCase() === 'columnar' ? 'columnar' : 'rows'
+}
+
+export function isColumnarTable(value: any): value is ColumnarTable {
+  return !!value && !Array.isArray(value) && typeof value.length === 'number' && !!value.columns && typeof value.columns === 'object'
+}
+
+function encodeColumn(rows: any[], key: string): unknown {
+  let kind: string | undefined
+  for (const row of rows) {
+    const value = row?.[key]
+    if (value === undefined || value === null) continue
+    const type = typeof value === 'string' || typeof value === 'boolean' ? typeof value : 'value'
+    if (kind === undefined) kind = type
+    else if (kind !== type) return rows.map(r => r?.[key] ?? null)
+  }
+
+  if (kind === 'string') {
+    const dict: string[] = []
+    const codeOf = new Map<string, number>()
+    const codes = rows.map(r => {
+      const value = r?.[key]
+      if (value === undefined || value === null) return -1
+      let code = codeOf.get(value)
+      if (code === undefined) {
+        code = dict.length
+        dict.push(value)
+        codeOf.set(value, code)
+      }
+      return code
+    })
+    return { dict, codes }
+  }
+  if (kind === 'boolean') {
+    return { flags: rows.map(r => (r?.[key] === undefined || r?.[key] === null ? -1 : r[key] ? 1 : 0)) }
+  }
+  return rows.map(r => r?.[key] ?? null)
+}
+
+// Parallel columns for a list of row objects, in first-seen key order
+export function encodeColumns(rows: any[]): ColumnarTable {
+  const keys = new Set<string>()
+  for (const row of rows) {
+    if (row && typeof row === 'object') for (const key of Object.keys(row)) keys.add(key)
+  }
+  const columns: Record<string, unknown> = {}
+  for (const key of keys) columns[key] = encodeColumn(rows, key)
+  return { length: rows.length, columns }
+}
+
+// Encode every program's rateOptions of a { success, data } pricing payload; error
+// payloads and the rows encoding pass through
+export function encodeRateOptions(payload: any, encoding: RateOptionEncoding): any {
+  if (encoding !== 'columnar' || !Array.isArray(payload?.data?.programs)) return payload
+  return {
+    ...payload,
+    data: {
+      ...payload.data,
+      programs: payload.data.programs.map((p: any) =>
+        Array.isArray(p?.rateOptions) ? { ...p, rateOptions: encodeColumns(p.rateOptions) } : p),
+    },
+    encoding: 'columnar',
+  }
+}
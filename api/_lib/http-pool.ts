@@ -0,0 +1,147 @@
+/**
+ * http-pool.ts
+ *
+ * Keep-alive connection pooling for the MeridianLink SOAP and OAuth calls. Each upstream
+ * origin gets one http(s).Agent that lives as long as the warm lambda, so back-to-back
+ * requests reuse an open TCP/TLS connection instead of paying DNS, TCP and TLS again.
+ * The TLS session is also cached per agent, so a reconnect after the idle timeout resumes
+ * instead of running a full handshake.
+ *
+ *   MERIDIANLINK_KEEPALIVE=0            a fresh connection per request, for comparison
+ *   MERIDIANLINK_POOL_SIZE=16           max open sockets per origin
+ *   MERIDIANLINK_POOL_IDLE_MS=30000     close a pooled socket after this long unused
+ *
+ * pooledFetch() answers with a standard Response once the headers arrive, the body still
+ * streaming, and asks for gzip/deflate: the SOAP payload is large and compresses ~10x.
+ * poolStats counts requests, new and reused connections, and full and resumed TLS
+ * handshakes per origin.
+ */
+
+import { Agent as HttpAgent, request as httpRequest, type IncomingMessage } from 'node:http'
+import { Agent as HttpsAgent, request as httpsRequest } from 'node:https'
+import { Readable } from 'node:stream'
+import type { TLSSocket } from 'node:tls'
+import { createGunzip, createInflate } from 'node:zlib'
+
+export interface PoolStats {
+  requests: number
+  newSockets: number
+  reusedSockets: number
+  tlsHandshakes: number
+  tlsResumed: number
+  compressedResponses: number
+}
+
+export const poolStats: Record<string, PoolStats> = {}
+
+const agents = new Map<string, HttpAgent>()
+
+export function keepAliveEnabled(): boolean {
+  return process.env.MERIDIANLINK_KEEPALIVE !== '0'
+}
+
+function poolSettings() {
+  return {
+    maxSockets: Number(process.env.MERIDIANLINK_POOL_SIZE) || 16,
+    idleMs: Number(process.env.MERIDIANLINK_POOL_IDLE_MS) || 30000,
+  }
+}
+
+function statsFor(origin: string): PoolStats {
+  return (poolStats[origin] ||= { requests: 0, newSockets: 0, reusedSockets: 0, tlsHandshakes: 0, tlsResumed: 0, compressedResponses: 0 })
+}
+
+function agentFor(url: URL): HttpAgent {
+  const keepAlive = keepAliveEnabled()
+  const key = `${keepAlive ? 'pool' : 'close'} ${url.origin}`
+  let agent = agents.get(key)
+  if (!agent) {
+    const { maxSockets, idleMs } = poolSettings()
+    // timeout closes sockets left idle in the pool; requests carry their own deadline.
+    // Without keep-alive nothing is pooled and TLS sessions are not resumed either.
+    const options = { keepAlive, maxSockets, maxFreeSockets: maxSockets, timeout: idleMs, scheduling: 'lifo' as const }
+    agent = url.protocol === 'https:' ? new HttpsAgent({ ...options, maxCachedSessions: keepAlive ? 8 : 0 }) : new HttpAgent(options)
+    agents.set(key, agent)
+  }
+  return agent
+}
+
+// Drop every pooled socket (tests, or after changing the pool settings)
+export function resetPools(): void {
+  for (const agent of agents.values()) agent.destroy()
+  agents.clear()
+}
+
+// pipe() does not forward errors: a connection dropped mid-body, or the deadline firing
+// after the headers, would leave the decoder waiting forever. Either ends it with the
+// error fetch() would raise (the deadline's TimeoutError), and a decoder error frees
+// the socket.
+function decodedBody(res: IncomingMessage, signal?: AbortSignal): Readable {
+  const encoding = String(res.headers['content-encoding'] || '').toLowerCase()
+  const decoder = encoding === 'gzip' || encoding === 'x-gzip' ? createGunzip() : encoding === 'deflate' ? createInflate() : null
+  if (!decoder) return res
+  const fail = (err: Error) => decoder.destroy(signal?.aborted && signal.reason instanceof Error ? signal.reason : err)
+  res.once('error', fail)
+  res.once('close', () => {
+    if (!res.complete) fail(new Error('Connection closed before the response body was complete'))
+  })
+  decoder.once('error', () => res.destroy())
+  return res.pipe(decoder)
+}
+
+export interface PooledRequestInit {
+  method?: string
+  headers?: Record<string, string>
+  body?: string | URLSearchParams
+  signal?: AbortSignal
+}
+
+// fetch() over the origin's keep-alive agent
+export async function pooledFetch(target: string, init: PooledRequestInit = {}): Promise<Response> {
+  const body = init.body instanceof URLSearchParams ? init.body.toString() : init.body
+  const headers: Record<string, string> = { 'Accept-Encoding': 'gzip, deflate', ...init.headers }
+  const url = new URL(target)
+  const stats = statsFor(url.origin)
+  stats.requests++
+  if (init.body instanceof URLSearchParams && !headers['Content-Type']) headers['Content-Type'] = 'application/x-www-form-urlencoded'
+  if (body !== undefined) headers['Content-Length'] = String(Buffer.byteLength(body))
+
+  const send = url.protocol === 'https:' ? httpsRequest : httpRequest
+  return new Promise<Response>((resolve, reject) => {
+    const req = send(url, { method: init.method ?? 'GET', headers, agent: agentFor(url), signal: init.signal }, res => {
+      if (res.headers['content-encoding']) stats.compressedResponses++
+      const responseHeaders = new Headers()
+      for (const [name, value] of Object.entries(res.headers)) {
+        // The body handed on is already decoded
+        if (value === undefined || name === 'content-encoding' || name === 'content-length') continue
+        responseHeaders.set(name, Array.isArray(value) ? value.join(', ') : value)
+      }
+      const status = res.statusCode ?? 502
+      // A Response for these statuses may not have a body
+      if (status === 204 || status === 304) {
+        res.resume()
+        return resolve(new Response(null, { status, statusText: res.statusMessage, headers: responseHeaders }))
+      }
+      const stream = Readable.toWeb(decodedBody(res, init.signal)) as ReadableStream<Uint8Array>
+      resolve(new Response(stream, { status, statusText: res.statusMessage, headers: responseHeaders }))
+    })
+    req.on('socket', socket => {
+      if (req.reusedSocket) {
+        stats.reusedSockets++
+        return
+      }
+      stats.newSockets++
+      if (url.protocol === 'https:') {
+        socket.once('secureConnect', () => {
+          stats.tlsHandshakes++
+          if ((socket as TLSSocket).isSessionReused()) stats.tlsResumed++
+        })
+      }
+    })
+    req.on('error', err => {
+      // Match fetch: a deadline from AbortSignal.timeout() surfaces as its TimeoutError
+      reject(init.signal?.aborted && init.signal.reason instanceof Error ? init.signal.reason : err)
+    })
+    req.end(body)
+  })
+}
@@ -0,0 +1,289 @@
+/**
+ * lenderprice.ts
+ *
+ * Direct client for the LenderPrice PPE integration API behind the Flex UI
+ * (documented in lp_data/API BASE FULL DATA.txt):
+ *
+ *   GET  /rest/v1/lp-ppe-integration/public/pricing/lock-days?code=..&company=..
+ *   POST /rest/v1/lp-ppe-integration/public/pricing/search?company=..
+ *
+ * The search payload is built from the same mapped values the Flex scrape types into
+ * the form, and the grouped result tree (ROOT → program → rate → lender → leafs) is
+ * flattened into the row shape the scrape produces, so callers can switch freely.
+ *
+ * The purpose / occupancy / property type enums and the DSCRRATIO buckets below have
+ * not been checked against a captured Flex search request yet, which is why LP_MODE
+ * defaults to the scrape. A form value without a mapping is rejected rather than
+ * priced as some default scenario.
+ */
+
+import { RequestTiming } from './timing.js'
+
+export const LP_API_URL = process.env.LP_API_URL || 'https://api.digitallending.com'
+const PRICING_PATH = '/rest/v1/lp-ppe-integration/public/pricing'
+const LP_COMPANY = 'oaktree.digitallending.com'
+const LP_CODE = 'Oaktree'
+const LP_COMPANY_ID = '646e553bce8ad00001423634'
+
+// Subset of lp-pricing's mapFormValues output the payload is built from
+export interface LpFormValues {
+  fico: string
+  citizenship: string
+  docType: string
+  dscrRatio: string
+  units: string
+  attachmentType: string
+  zip: string
+  purchasePrice: string
+  loanAmount: string
+  waiveImpounds: boolean
+  interestOnly: boolean
+  selfEmployed: boolean
+  isDSCR: boolean
+  isInvestment: boolean
+  prepayTerm: string
+  prepayPlanType: string
+  isCrossCollateralized: boolean
+}
+
+export interface LpRateRow {
+  rate: number
+  price: number
+  payment: number
+  program: string
+  lender: string
+  costToBorrower: number
+  lenderFee: number
+  totalAdjustments: number
+}
+
+export interface LpSearchResult {
+  rateOptions: LpRateRow[]
+  eligibleQM: number
+  eligibleNonQM: number
+  programs: string[]
+  searchId: string | null
+}
+
+// ================= Value Mappings =================
+// The search API takes enum-style values where the Flex form shows display labels.
+// Not yet confirmed against a captured request (see above).
+
+const PURPOSE_MAP: Record<string, string> = {
+  purchase: 'Purchase', refinance: 'Refinance', cashout: 'CashOut',
+}
+const PROPERTY_USE_MAP: Record<string, string> = {
+  primary: 'PrimaryResidence', secondary: 'SecondHome', investment: 'Investment',
+}
+const PROPERTY_TYPE_MAP: Record<string, string> = {
+  sfr: 'SingleFamily', condo: 'Condo', townhouse: 'Townhouse',
+  '2unit': 'TwoToFourUnit', '3unit': 'TwoToFourUnit', '4unit': 'TwoToFourUnit', '5-9unit': 'MultiFamily',
+}
+const INCOME_DOC_MAP: Record<string, string> = {
+  'Investor/DSCR': 'DSCR',
+}
+
+// ================= Search Payload =================
+
+// The API enum for a form value; an unknown one throws, so the caller falls back to
+// the scrape instead of pricing the wrong scenario
+function mapped(map: Record<string, string>, value: unknown, field: string): string {
+  const result = map[String(value)]
+  if (!result) throw new Error(`No LenderPrice API mapping for ${field}: ${value === undefined || value === '' ? '(empty)' : String(value)}`)
+  return result
+}
+
+function dynamicProperty(fieldId: string, value: string) {
+  return [fieldId, { fieldId, value }] as const
+}
+
+export function buildSearchPayload(values: LpFormValues, formData: any, lockDays: number) {
+  const loanAmount = Number(values.loanAmount)
+  const purchasePrice = Number(values.purchasePrice)
+  const loanPurpose = mapped(PURPOSE_MAP, formData.loanPurpose, 'loanPurpose')
+  const loanYear = Number(formData.loanTerm) || 30
+  const dscr = values.isDSCR ? Number(values.dscrRatio) || 1.25 : 0
+
+  const dynamicProperties = [
+    dynamicProperty('Citizenship', values.citizenship),
+    dynamicProperty('IncomeDocType', INCOME_DOC_MAP[values.docType] || values.docType),
+    dynamicProperty('DSCRRATIO', values.isDSCR ? (dscr >= 1 ? 'DSCR>=1' : 'DSCR<1') : ''),
+    dynamicProperty('AddlOccupancyType', values.isInvestment
+      ? (formData.isShortTermRental ? 'Short_Term_Rental_Property' : 'Long_Term_Rental_Property')
+      : ''),
+    dynamicProperty('GLOBAL_BorrowerType', 'Individual'),
+    dynamicProperty('GLOBAL_GIFTFUNDPERCENT', '0'),
+    dynamicProperty('GLOBAL_MixedUse', ''),
+    dynamicProperty('GLOBAL_PartnershipLLC', ''),
+    dynamicProperty('OAKTREE_CROSSCOLLATERALIZED', String(values.isCrossCollateralized)),
+    dynamicProperty('FirstTimeInvestor', ''),
+    dynamicProperty('PrepayTerm', values.isInvestment ? values.prepayTerm : 'None'),
+    dynamicProperty('MORT30LATESLAST12M', '0'),
+    dynamicProperty('MORT60LATESLAST12M', '0'),
+    dynamicProperty('MORT90LATESLAST12M', '0'),
+    dynamicProperty('MORT120LATESLAST12M', '0'),
+  ]
+  // Plan type only exists once a prepay term is chosen (same as the Flex form)
+  if (values.isInvestment && values.prepayTerm !== 'None') {
+    dynamicProperties.push(dynamicProperty('PrepayPlanType', values.prepayPlanType))
+  }
+
+  return {
+    date: null,
+    companyId: LP_COMPANY_ID,
+    code: LP_CODE,
+    criteria: {
+      purchasePrice,
+      loanAmount,
+      loanYear,
+      loanPurpose,
+      loanType: 'Fixed',
+      mortgageTypes: ['Conventional'],
+      propertyUse: mapped(PROPERTY_USE_MAP, formData.occupancyType, 'occupancyType'),
+      fico: Number(values.fico),
+      ltv: purchasePrice > 0 ? Math.round((loanAmount / purchasePrice) * 10000) / 10000 : 0,
+      dscr,
+      selfEmployed: String(values.selfEmployed),
+      interestOnly: values.interestOnly,
+      escrowWaiver: values.waiveImpounds,
+      lenderFeeWaiver: false,
+      lienPriorityType: 'FirstLien',
+      compensationType: 'LenderCompPlan',
+      numberOfBorrower: '1',
+      pmiType: 'None',
+      downPaymentAmount: loanPurpose === 'Purchase' ? Math.max(0, purchasePrice - loanAmount) : 0,
+    },
+    property: {
+      address: {
+        zip: values.zip,
+        state: formData.propertyState || 'CA',
+        country: 'US',
+      },
+      propertyType: mapped(PROPERTY_TYPE_MAP, formData.propertyType, 'propertyType'),
+      numberOfUnit: Number(values.units) || 1,
+      attachmentType: values.attachmentType,
+    },
+    brokerCriteria: {},
+    rateRange: {},
+    accessCriteria: {},
+    filter: {},
+    miCriteria: {},
+    closingCost: {},
+    dynamicPropertiesMap: Object.fromEntries(dynamicProperties),
+    groupConfig: {
+      paths: [
+        { group: 'CriteriaFromLineResultKey', groupSort: 'LoanTypeAndTerm' },
+        { group: 'RateKey', groupSort: 'KeyAsc' },
+        { group: 'LenderKey', groupSort: 'KeyAsc' },
+      ],
+      leafSort: 'Point',
+      backendGrouping: true,
+    },
+    dayLocksCriteria: [lockDays],
+    termsCriteria: [loanYear],
+    loanPurposeCriteria: [loanPurpose],
+    loanTypeCriteria: ['Fixed'],
+    // Disqualified programs come back in their own tree that nothing here reads
+    showDisqualify: false,
+    showDisqualifyRules: false,
+    skipAdjustments: false,
+    maxListingPerRate: -1,
+    dynaToSmo: true,
+    disqualifyAsync: true,
+    fillLenderMap: true,
+  }
+}
+
+// ================= Result Tree =================
+
+function collectLeafs(node: any, out: any[]): any[] {
+  if (!node) return out
+  if (Array.isArray(node.leafs)) {
+    for (const leaf of node.leafs) out.push(leaf)
+  }
+  if (Array.isArray(node.childs)) {
+    for (const child of node.childs) collectLeafs(child, out)
+  }
+  return out
+}
+
+function leafToRow(leaf: any): LpRateRow {
+  const adjustedPoints = Number(leaf.adjustedPoints) || 0
+  return {
+    rate: Number(leaf.rate) || 0,
+    // Flex displays price as 100 - adjustedPoints
+    price: Math.round((100 - adjustedPoints) * 1000) / 1000,
+    payment: Number(leaf.monthlyPayment?.monthlyPI) || 0,
+    program: leaf.programName || leaf.productName || '',
+    lender: leaf.companyName || '',
+    costToBorrower: Number(leaf.finalClosingCost) || 0,
+    lenderFee: Number(leaf.totalLenderFees) || 0,
+    totalAdjustments: Number(leaf.adjustmentPoints) || 0,
+  }
+}
+
+export function parseSearchResponse(body: any): LpSearchResult {
+  const results = body?.results || {}
+  const qm = collectLeafs(results.qualifiedQMData, []).filter(l => !l.disqualified && !l.expired)
+  const nonQM = collectLeafs(results.qualifiedNonQMData, []).filter(l => !l.disqualified && !l.expired)
+
+  const rateOptions = qm.concat(nonQM)
+    .map(leafToRow)
+    .filter(r => r.rate > 0)
+    .sort((a, b) => a.rate - b.rate)
+
+  return {
+    rateOptions,
+    eligibleQM: qm.length,
+    eligibleNonQM: nonQM.length,
+    programs: Array.isArray(results.programs) ? results.programs : [],
+    searchId: body?.id || null,
+  }
+}
+
+// ================= HTTP =================
+
+// Lock-day options change rarely; cache them for the life of the warm lambda
+let cachedLockDays: { days: number[]; expiresAt: number } | null = null
+const LOCK_DAYS_TTL_MS = 60 * 60 * 1000
+
+export async function getLockDays(): Promise<number[]> {
+  if (cachedLockDays && Date.now() < cachedLockDays.expiresAt) return cachedLockDays.days
+
+  const url = `${LP_API_URL}${PRICING_PATH}/lock-days?code=${LP_CODE}&company=${LP_COMPANY}`
+  const response = await fetch(url, { signal: AbortSignal.timeout(5000) })
+  if (!response.ok) throw new Error(`LP lock-days failed: ${response.status}`)
+  const days = ((await response.json()) as unknown[]).map(Number).filter(d => d > 0)
+  cachedLockDays = { days, expiresAt: Date.now() + LOCK_DAYS_TTL_MS }
+  return days
+}
+
+export function clearLockDaysCache(): void {
+  cachedLockDays = null
+}
+
+// `lockDays` prices that lock period; without it, the default below
+export async function searchPricing(values: LpFormValues, formData: any, timeoutMs = 20000, timing = new RequestTiming('lenderprice'), requestedLockDays?: number): Promise<LpSearchResult & { lockDays: number }> {
+  // Prefer a 30-day lock (what the Flex form defaults to); fall back to the shortest offered
+  let lockDays = requestedLockDays ?? 30
+  if (requestedLockDays === undefined) {
+    try {
+      const days = await timing.measure('lp-lock-days', () => getLockDays())
+      if (days.length > 0 && !days.includes(30)) lockDays = Math.min(...days)
+    } catch (err) {
+      console.warn('[LP] lock-days lookup failed, assuming 30:', err instanceof Error ? err.message : err)
+    }
+  }
+
+  const payload = buildSearchPayload(values, formData, lockDays)
+  const response = await timing.measure('lp-network', () => fetch(`${LP_API_URL}${PRICING_PATH}/search?company=${LP_COMPANY}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'application/json' },
+    body: JSON.stringify(payload),
+    signal: AbortSignal.timeout(timeoutMs),
+  }))
+  if (!response.ok) throw new Error(`LP search failed: ${response.status}`)
+
+  const json = await timing.measure('lp-body', () => response.json())
+  return { ...timing.measure('lp-parse', () => parseSearchResponse(json)), lockDays }
+}
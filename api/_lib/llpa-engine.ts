@@ -0,0 +1,374 @@
+/**
+ * llpa-engine.ts
+ *
+ * In-process what-if re-pricing for MeridianLink. Every live QuickPricer response
+ * teaches the engine, per LLPA template (lLpTemplateId), which adjustment items applied
+ * at which FICO / LTV / loan-amount cell (the cell bounds are read from the item
+ * descriptions, e.g. "FICO 720-739 / LTV 70.01-75.00%"), and the latest parsed
+ * response per base scenario, i.e. the request minus those three inputs. When the same
+ * base scenario comes back with only FICO, LTV or loan amount changed, every rate
+ * option is re-priced from its template without a round trip:
+ *
+ *   points' = points - (LLPAs applied then) + (LLPAs of the new cells)
+ *
+ * A template whose new cell has not been seen yet, or whose rate adjustments would
+ * change, is left out. The result is indicative only; the live call still runs and
+ * replaces it. Categorical changes (occupancy, doc type, purpose, ...) are not
+ * re-priced. What was learned is dropped at the next rate-sheet publish
+ * (RATE_SHEET_PUBLISH_TIMES) or after LLPA_ENGINE_MAX_AGE_SECONDS.
+ *
+ *   LLPA_ENGINE=off                 disable learning and indicative re-pricing
+ *   LLPA_ENGINE_MAX_TEMPLATES       templates whose grid is kept (LRU, default 5000)
+ *   LLPA_ENGINE_MAX_SCENARIOS       base scenarios whose response is kept (LRU, default 50)
+ */
+
+import { adjustmentTemplates } from './quickpricer-parser.js'
+import { canonicalJson, nextRateSheetPublish } from './quote-cache.js'
+
+type Input = 'fico' | 'ltv' | 'loanAmount'
+type Dim = 'ficoLtv' | 'fico' | 'ltv' | 'loanAmount' | 'other'
+type Cell = [number, number]
+
+const INPUTS: Input[] = ['fico', 'ltv', 'loanAmount']
+const DIMS: Dim[] = ['ficoLtv', 'fico', 'ltv', 'loanAmount', 'other']
+// Inputs an adjustment dimension's cell depends on; 'other' items are categorical
+const DEPENDS: Record<Dim, Input[]> = { ficoLtv: ['fico', 'ltv'], fico: ['fico'], ltv: ['ltv'], loanAmount: ['loanAmount'], other: [] }
+const LABELS: Record<Input, RegExp> = { fico: /FICO|CREDIT SCORE/, ltv: /C?LTV/, loanAmount: /LOAN (?:AMOUNT|AMT|SIZE)/ }
+const RANGE = /^\s*:?\s*(?:(>=|≥|>|<=|≤|<)\s*\$?([\d,.]+)|\$?([\d,.]+)%?\s*(?:-|–|TO)\s*\$?([\d,.]+))/
+// Observations kept per template: one per distinct cell combination and base scenario
+const MAX_OBSERVATIONS = 96
+const KEY_EXCLUDED = new Set(['creditScore', 'fico', 'loanAmount', 'propertyValue', 'purchasePrice', 'ltv', 'cltv'])
+
+interface Observation {
+  // Base scenario it was priced for; 'other' items only carry over within it
+  baseKey: string
+  cells: Record<Input, Cell>
+  // Dimension of each of the template's adjustments, in MeridianLink's order
+  dims: Dim[]
+  items: Partial<Record<Dim, any[]>>
+  points: number
+  rateAdj: number
+}
+
+interface Snapshot {
+  inputs: Record<Input, number>
+  // Parsed programs as MeridianLink returned them, options copied, adjustments shared
+  programs: any[]
+  // Per program, per rate option: the option's template ID (null when not templated)
+  templateIds: (string | null)[][]
+  observations: Map<string, Observation>
+}
+
+export interface WhatIf {
+  // Parse-result shaped: run it through the same response shaping as a live result
+  result: { programs: any[]; totalPrograms: number }
+  indicative: {
+    basis: { creditScore: number; ltv: number; loanAmount: number }
+    programs: number
+    skippedPrograms: number
+    repriceMs: number
+  }
+}
+
+function settings() {
+  return {
+    enabled: (process.env.LLPA_ENGINE || '').toLowerCase() !== 'off',
+    maxTemplates: Number(process.env.LLPA_ENGINE_MAX_TEMPLATES) || 5000,
+    maxScenarios: Number(process.env.LLPA_ENGINE_MAX_SCENARIOS) || 50,
+    maxAgeMs: (Number(process.env.LLPA_ENGINE_MAX_AGE_SECONDS) || 3600) * 1000,
+  }
+}
+
+// Map order is recency: re-set on use, evict from the front
+const grids = new Map<string, Observation[]>()
+const snapshots = new Map<string, Snapshot>()
+let expiresAt = 0
+
+export const llpaEngineStats = {
+  learned: 0,
+  whatIfs: 0,
+  repriced: 0,
+  skippedTemplates: 0,
+}
+
+export function clearLlpaEngine(): void {
+  grids.clear()
+  snapshots.clear()
+  expiresAt = 0
+}
+
+// Everything learned belongs to the rate sheet it was priced on
+function checkExpiry(maxAgeMs: number): void {
+  const now = Date.now()
+  if (expiresAt && now < expiresAt) return
+  if (expiresAt) clearLlpaEngine()
+  expiresAt = Math.min(now + maxAgeMs, nextRateSheetPublish(now) ?? Infinity)
+}
+
+function touch<T>(map: Map<string, T>, key: string, value: T, max: number): void {
+  map.delete(key)
+  map.set(key, value)
+  while (map.size > max) map.delete(map.keys().next().value as string)
+}
+
+// ================= Scenario =================
+
+// Same defaults buildLOXmlFormat prices with; LTV to the 2 decimals grids are cut at
+function scenarioInputs(formData: any): Record<Input, number> {
+  const loanAmount = Number(formData.loanAmount) || 400000
+  const propertyValue = Number(formData.propertyValue) || 500000
+  return {
+    fico: Number(formData.creditScore) || 0,
+    ltv: Math.round((loanAmount / propertyValue) * 10000) / 100,
+    loanAmount,
+  }
+}
+
+function baseKey(formData: any): string {
+  const rest: Record<string, unknown> = {}
+  for (const key of Object.keys(formData)) if (!KEY_EXCLUDED.has(key)) rest[key] = formData[key]
+  return canonicalJson(rest)
+}
+
+// ================= Learning =================
+
+function classify(description: string): Dim {
+  const d = description.toUpperCase()
+  const fico = LABELS.fico.test(d)
+  const ltv = /\bC?LTV\b/.test(d)
+  if (fico && ltv) return 'ficoLtv'
+  if (fico) return 'fico'
+  if (ltv) return 'ltv'
+  return LABELS.loanAmount.test(d) ? 'loanAmount' : 'other'
+}
+
+const num = (s: string) => parseFloat(s.replace(/,/g, ''))
+
+// "FICO 720-739", "FICO >= 800", "LTV <= 50.00%", "LOAN AMOUNT $400,000 - $999,999"
+function readCell(description: string, input: Input): Cell | null {
+  const d = description.toUpperCase()
+  const label = LABELS[input].exec(d)
+  if (!label) return null
+  const m = RANGE.exec(d.slice(label.index + label[0].length))
+  if (!m) return null
+  if (m[1]) return m[1].startsWith('>') || m[1] === '≥' ? [num(m[2]), Infinity] : [-Infinity, num(m[2])]
+  return [num(m[3]), num(m[4])]
+}
+
+const inCell = (cell: Cell, value: number) => value >= cell[0] && value <= cell[1]
+
+function observe(adjustments: any[], inputs: Record<Input, number>, key: string): Observation {
+  // An input no item describes is only known at its exact value
+  const cells = { fico: [inputs.fico, inputs.fico], ltv: [inputs.ltv, inputs.ltv], loanAmount: [inputs.loanAmount, inputs.loanAmount] } as Record<Input, Cell>
+  const items: Partial<Record<Dim, any[]>> = {}
+  const dims: Dim[] = []
+  let points = 0
+  let rateAdj = 0
+  for (const adj of adjustments) {
+    const dim = classify(adj.description || '')
+    dims.push(dim)
+    ;(items[dim] ||= []).push(adj)
+    points += adj.amount || 0
+    rateAdj += adj.rateAdj || 0
+    for (const input of DEPENDS[dim]) {
+      const cell = readCell(adj.description, input)
+      if (cell && inCell(cell, inputs[input])) cells[input] = cell
+    }
+  }
+  return { baseKey: key, cells, dims, items, points, rateAdj }
+}
+
+function remember(templateId: string, observation: Observation, maxTemplates: number): void {
+  const sameCells = (o: Observation) => o.baseKey === observation.baseKey &&
+    INPUTS.every(i => o.cells[i][0] === observation.cells[i][0] && o.cells[i][1] === observation.cells[i][1])
+  const grid = (grids.get(templateId) || []).filter(o => !sameCells(o))
+  grid.push(observation)
+  if (grid.length > MAX_OBSERVATIONS) grid.shift()
+  touch(grids, templateId, grid, maxTemplates)
+}
+
+/**
+ * Learn from a freshly parsed QuickPricer result, before the response shaping
+ * filters it. Cheap: references the parsed adjustment arrays, copies rate options.
+ */
+export function learnPricing(formData: any, result: any): void {
+  const { enabled, maxTemplates, maxScenarios, maxAgeMs } = settings()
+  if (!enabled || !result?.programs?.length) return
+  checkExpiry(maxAgeMs)
+
+  const inputs = scenarioInputs(formData)
+  const key = baseKey(formData)
+  const templates = adjustmentTemplates(result)
+  const ids = new Map<any[], string>()
+  const observations = new Map<string, Observation>()
+  for (const [id, adjustments] of Object.entries(templates)) {
+    ids.set(adjustments, id)
+    const observation = observe(adjustments, inputs, key)
+    observations.set(id, observation)
+    remember(id, observation, maxTemplates)
+  }
+
+  touch(snapshots, key, {
+    inputs,
+    programs: result.programs.map((p: any) => ({ ...p, rateOptions: (p.rateOptions || []).map((o: any) => ({ ...o })) })),
+    templateIds: result.programs.map((p: any) => (p.rateOptions || []).map((o: any) => ids.get(o.adjustments) ?? null)),
+    observations,
+  }, maxScenarios)
+  llpaEngineStats.learned++
+}
+
+// ================= Re-pricing =================
+
+// Observation whose cell holds the what-if inputs this dimension depends on; among
+// those, the one closest to the what-if on the other inputs, most recent first
+function pick(grid: Observation[], dim: Dim, inputs: Record<Input, number>, key: string): Observation | null {
+  let best: Observation | null = null
+  let bestScore = -1
+  for (let i = grid.length - 1; i >= 0; i--) {
+    const o = grid[i]
+    if (!DEPENDS[dim].every(input => inCell(o.cells[input], inputs[input]))) continue
+    const score = INPUTS.filter(input => inCell(o.cells[input], inputs[input])).length + (o.baseKey === key ? 1 : 0)
+    if (score > bestScore) {
+      best = o
+      bestScore = score
+    }
+  }
+  return best
+}
+
+function samePricing(grid: Observation[], inputs: Record<Input, number>, key: string): Observation | undefined {
+  return grid.findLast(o => o.baseKey === key && INPUTS.every(input => inCell(o.cells[input], inputs[input])))
+}
+
+// New adjustment items for a template at the what-if cells and the point delta they bring
+function repriceTemplate(id: string, base: Observation, inputs: Record<Input, number>, key: string): { adjustments: any[]; delta: number } | null {
+  const grid = grids.get(id)
+  if (!grid) return null
+  const sources = new Map<Dim, Observation>()
+  for (const dim of DIMS) {
+    // Categorical items stay as this scenario had them, unless it was priced at these
+    // very cells before (some categorical LLPAs are themselves tiered by LTV)
+    const source = dim === 'other' ? samePricing(grid, inputs, key) ?? base : pick(grid, dim, inputs, key)
+    if (!source) return null
+    sources.set(dim, source)
+  }
+
+  // Walk the template in MeridianLink's order: categorical items stay in place, each
+  // cell dimension's new items go where its old ones were, ones new to it go last
+  const adjustments: any[] = []
+  const placed = new Set<Dim>()
+  const seen: Partial<Record<Dim, number>> = {}
+  for (const dim of base.dims) {
+    const index = seen[dim] = (seen[dim] ?? -1) + 1
+    if (dim === 'other') adjustments.push(base.items.other![index])
+    else if (!placed.has(dim)) adjustments.push(...(sources.get(dim)!.items[dim] || []))
+    placed.add(dim)
+  }
+  for (const dim of DIMS) if (!placed.has(dim)) adjustments.push(...(sources.get(dim)!.items[dim] || []))
+  let points = 0
+  let rateAdj = 0
+  for (const adj of adjustments) {
+    points += adj.amount || 0
+    rateAdj += adj.rateAdj || 0
+  }
+  // A rate adjustment moves the whole ladder; leave that to MeridianLink
+  if (Math.abs(rateAdj - base.rateAdj) > 1e-9) return null
+  return { adjustments, delta: points - base.points }
+}
+
+function payment(amount: number, rate: number, term: number): number {
+  const r = rate / 1200
+  const monthly = r > 0 ? (amount * r) / (1 - Math.pow(1 + r, -term)) : amount / term
+  return Math.round(monthly * 100) / 100
+}
+
+/**
+ * Re-price a scenario from the response learned for its base scenario, when only FICO,
+ * LTV or loan amount differ. Null when there is nothing to re-price from, nothing
+ * changed, or no program could be re-priced.
+ */
+export function repriceWhatIf(formData: any): WhatIf | null {
+  const { enabled, maxAgeMs } = settings()
+  if (!enabled) return null
+  checkExpiry(maxAgeMs)
+  const started = performance.now()
+
+  const key = baseKey(formData)
+  const snapshot = snapshots.get(key)
+  if (!snapshot) return null
+  const inputs = scenarioInputs(formData)
+  if (INPUTS.every(i => inputs[i] === snapshot.inputs[i])) return null
+  llpaEngineStats.whatIfs++
+
+  const repriced = new Map<string, { adjustments: any[]; delta: number } | null>()
+  const programs: any[] = []
+  let skippedPrograms = 0
+  snapshot.programs.forEach((program, p) => {
+    const templateIds = snapshot.templateIds[p]
+    const rateOptions: any[] = []
+    for (let r = 0; r < program.rateOptions.length; r++) {
+      const id = templateIds[r]
+      const base = id ? snapshot.observations.get(id) : undefined
+      if (!id || !base) break
+      if (!repriced.has(id)) {
+        const next = repriceTemplate(id, base, inputs, key)
+        if (!next) llpaEngineStats.skippedTemplates++
+        repriced.set(id, next)
+      }
+      const next = repriced.get(id)
+      if (!next) break
+      const option = program.rateOptions[r]
+      rateOptions.push({
+        ...option,
+        points: Math.round((option.points + next.delta) * 1000) / 1000,
+        payment: inputs.loanAmount === snapshot.inputs.loanAmount ? option.payment : payment(inputs.loanAmount, option.rate, program.term),
+        adjustments: next.adjustments,
+      })
+    }
+    // All of a program's rate options or none of it
+    if (rateOptions.length === 0 || rateOptions.length !== program.rateOptions.length) {
+      skippedPrograms++
+      return
+    }
+
+    // Best price: the option priced closest to par
+    let best = 0
+    rateOptions.forEach((o, i) => {
+      o.bestPrice = false
+      if (Math.abs(o.points) < Math.abs(rateOptions[best].points)) best = i
+    })
+    const top = rateOptions[best]
+    top.bestPrice = true
+    programs.push({
+      ...program,
+      rate: top.rate,
+      apr: top.apr,
+      points: top.points,
+      payment: top.payment,
+      description: top.description,
+      investorName: top.investor,
+      totalClosingCost: top.totalClosingCost,
+      cashToClose: top.cashToClose,
+      rateOptions,
+    })
+  })
+  if (programs.length === 0) return null
+
+  programs.sort((a, b) => {
+    const aEligible = a.status === 'Eligible' ? 0 : 1
+    const bEligible = b.status === 'Eligible' ? 0 : 1
+    if (aEligible !== bEligible) return aEligible - bEligible
+    return a.rate - b.rate
+  })
+  llpaEngineStats.repriced++
+
+  return {
+    result: { programs, totalPrograms: programs.length },
+    indicative: {
+      basis: { creditScore: snapshot.inputs.fico, ltv: snapshot.inputs.ltv, loanAmount: snapshot.inputs.loanAmount },
+      programs: programs.length,
+      skippedPrograms,
+      repriceMs: Math.round((performance.now() - started) * 100) / 100,
+    },
+  }
+}
@@ -0,0 +1,928 @@
+/**
+ * ln-pricing.ts
+ *
+ * LoanNEX pricing shared by api/get-ln-pricing.ts and the unified quote endpoint
+ * (api/quote.ts): the nex-app quick-prices API (loannex.ts) with the Browserless
+ * login/fill/scrape flow as fallback, warm sessions from ln-session-pool.ts.
+ * priceLoanNex resolves to the same { success, data | error } body get-ln-pricing has
+ * always returned.
+ */
+
+import { blockProfile, captureMode, closeBrowser, navigateSteps, readyMs, RESPONSE_CAPTURE, TRANSFER_SUMMARY, type CaptureMode } from './browserless-profile.js'
+import { getQuickPrices, mapQuickPriceRows } from './loannex.js'
+import { acquireSession, addSession, evictSession, releaseSession, sessionReconnectMs, type LnBrowserSession, type SessionCloser } from './ln-session-pool.js'
+import { quoteCacheKey } from './quote-cache.js'
+import { singleFlight, type FlightOptions } from './single-flight.js'
+import { RequestTiming } from './timing.js'
+
+const BROWSERLESS_URL = process.env.BROWSERLESS_URL || 'https://production-sfo.browserless.io/chromium/bql'
+
+// ================= Field Mapping =================
+function mapFormToLN(body: any): Record<string, string> {
+  const purposeMap: Record<string, string> = {
+    purchase: 'Purchase', refinance: 'Rate/Term Refinance', cashout: 'Cash-Out Refinance',
+  }
+  const occupancyMap: Record<string, string> = {
+    primary: 'Primary', secondary: 'Second Home', investment: 'Investment',
+  }
+  const propertyMap: Record<string, string> = {
+    sfr: 'SFR', condo: 'Condo', townhouse: 'Townhouse',
+    '2unit': '2 Unit', '3unit': '3 Unit', '4unit': '4 Unit', '5-9unit': '5+ Unit',
+  }
+  const docMap: Record<string, string> = {
+    fullDoc: 'Full Doc', dscr: 'DSCR', bankStatement: 'Bank Statement',
+    assetDepletion: 'Asset Depletion', voe: 'VOE', noRatio: 'No Ratio',
+  }
+  const citizenMap: Record<string, string> = {
+    usCitizen: 'US Citizen', permanentResident: 'Permanent Resident', foreignNational: 'Foreign National',
+  }
+
+  const loanAmount = String(body.loanAmount || '450000').replace(/,/g, '')
+  const propertyValue = String(body.propertyValue || '600000').replace(/,/g, '')
+  const creditScore = String(body.creditScore || '740')
+
+  const isDSCR = body.documentationType === 'dscr'
+  const isInvestment = body.occupancyType === 'investment'
+  const loanTypeMap: Record<string, string> = {
+    nonqm: 'First Lien', conventional: 'First Lien', fha: 'First Lien', va: 'First Lien',
+  }
+
+  // Prefer numeric dscrValue; fall back to extracting from dscrRatio range string
+  const dscrNum = body.dscrValue || (body.dscrRatio ? parseFloat(String(body.dscrRatio).replace(/[><=]/g, '').split('-')[0]) : 1.250)
+  const dscrVal = isDSCR ? String(dscrNum || '1.250') : ''
+  const rentalVal = isDSCR ? String(body.grossRent || body.grossRentalIncome || '5000') : ''
+  const ppVal = isInvestment ? '5 Year' : 'None'
+  const finProps = isInvestment ? '1' : ''
+
+  return {
+    'Loan Type': loanTypeMap[body.loanType] || 'Non-QM',
+    'Purpose': purposeMap[body.loanPurpose] || 'Purchase',
+    'Occupancy': occupancyMap[body.occupancyType] || 'Investment',
+    'Property Type': propertyMap[body.propertyType] || 'SFR',
+    'Income Doc': docMap[body.documentationType] || 'DSCR',
+    'Citizenship': citizenMap[body.citizenship] || 'US Citizen',
+    'State': body.propertyState || 'CA',
+    'County': body.propertyCounty || body.county || 'Los Angeles',
+    'Appraised Value': propertyValue,
+    'Purchase Price': body.loanPurpose === 'purchase' ? propertyValue : '',
+    'First Lien Amount': loanAmount,
+    'FICO': creditScore,
+    'DTI': String(body.dti || ''),
+    'Escrows': body.impoundType === 'noescrow' || body.impoundType === '3' ? 'No' : 'Yes',
+    // DSCR/Investment fields — include label variants
+    'DSCR': dscrVal, 'DSCR Ratio': dscrVal, 'DSCR %': dscrVal,
+    'Mo. Rental Income': rentalVal, 'Monthly Rental Income': rentalVal, 'Gross Rental Income': rentalVal,
+    'Prepay Penalty': ppVal, 'Prepayment Penalty': ppVal,
+    'Months Reserves': '12', 'Reserves': '12',
+    '# of Financed Properties': finProps, 'Number of Financed Properties': finProps, 'Financed Properties': finProps,
+  }
+}
+
+// ================= Fill form + Get Price + Scrape =================
+function buildFillAndScrapeScript(fieldMap: Record<string, string>, email: string, password: string, isRetry: boolean = false, capture: CaptureMode = captureMode()): string {
+  const mapJson = JSON.stringify(fieldMap)
+  return `(async function() {
+  function sleep(ms) { return new Promise(r => setTimeout(r, ms)); }
+  var t0 = Date.now();
+  var diag = { steps: [], fills: [], timings: {} };
+  // Per-step elapsed ms since the script started
+  function mark(step) { diag.timings[step] = Date.now() - t0; }
+  ${TRANSFER_SUMMARY}
+  ${RESPONSE_CAPTURE}
+  var fieldMap = ${mapJson};
+  var isRetry = ${isRetry};
+
+  diag.steps.push('url: ' + window.location.href);
+  diag.steps.push('mode: ' + (isRetry ? 'retry' : 'initial'));
+
+  var formReady = false;
+
+  if (!isRetry) {
+  // Initial: handle Angular login + Lock Desk redirect
+  for (var w = 0; w < 6; w++) {
+    await sleep(1000);
+    var usernameField = document.getElementById('username');
+    var passwordField = document.getElementById('password');
+    var allInputs = document.querySelectorAll('input:not([type=hidden])');
+
+    if (usernameField && passwordField) {
+      diag.steps.push('angular_login_at: ' + ((w+1)) + 's');
+      // Do Angular login
+      function setLoginInput(el, val) {
+        el.focus(); el.value = '';
+        el.dispatchEvent(new Event('focus', {bubbles: true}));
+        var setter = Object.getOwnPropertyDescriptor(window.HTMLInputElement.prototype, 'value').set;
+        if (setter) setter.call(el, val);
+        el.dispatchEvent(new Event('input', {bubbles: true}));
+        el.dispatchEvent(new Event('change', {bubbles: true}));
+        el.dispatchEvent(new Event('blur', {bubbles: true}));
+      }
+      setLoginInput(usernameField, '${email}');
+      await sleep(300);
+      setLoginInput(passwordField, '${password}');
+      await sleep(300);
+      var signInBtn = document.querySelector('button.login-button') || document.querySelector('button');
+      if (signInBtn) { signInBtn.click(); diag.steps.push('login_clicked'); }
+
+      // Wait for app to load after login
+      await sleep(2000);
+      mark('login');
+      diag.steps.push('post_login_url: ' + window.location.href);
+
+      // Check if we landed on Quick Pricer or elsewhere
+      var bodyText = (document.body.innerText || '');
+      var hasQuickPricer = bodyText.indexOf('Get Price') >= 0;
+      diag.steps.push('has_get_price: ' + hasQuickPricer);
+
+      if (!hasQuickPricer) {
+        // On Lock Desk — full page navigation for proper Angular form init
+        diag.steps.push('on_lock_desk_hard_nav_to_qp');
+        setTimeout(function() { window.location.href = '/nex-app'; }, 200);
+        return JSON.stringify({ success: true, needsNextStep: true, rates: [], diag: diag });
+      }
+      formReady = true;
+      break;
+    }
+
+    if (allInputs.length > 10) {
+      diag.steps.push('form_at: ' + ((w+1)) + 's, fields: ' + allInputs.length);
+      formReady = true;
+      break;
+    }
+  }
+  } else {
+    // Retry: wait for properly initialized QP form after hard navigation
+    for (var rw = 0; rw < 8; rw++) {
+      await sleep(1000);
+      // Landed on a login form instead: the pooled session has expired
+      if (document.getElementById('username') || document.getElementById('UserName')) {
+        diag.steps.push('session_expired_at: ' + ((rw+1)) + 's');
+        return JSON.stringify({ success: false, error: 'session_expired', rates: [], diag: diag });
+      }
+      var retryInputs = document.querySelectorAll('input:not([type=hidden])');
+      if (retryInputs.length > 10) {
+        var retryText = (document.body.innerText || '');
+        if (retryText.indexOf('Get Price') >= 0) {
+          diag.steps.push('retry_form_at: ' + ((rw+1)) + 's, fields: ' + retryInputs.length);
+          formReady = true;
+          break;
+        }
+      }
+    }
+  }
+
+  if (!formReady) {
+    diag.steps.push('form_not_loaded');
+    diag.bodyPreview = (document.body.innerText || '').substring(0, 1000);
+    diag.inputCount = document.querySelectorAll('input').length;
+    return JSON.stringify({ success: false, error: 'form_not_loaded', rates: [], diag: diag });
+  }
+  mark('form_ready');
+
+  // Find field input by label text — walk DOM to find associated PrimeNG component
+  function findFieldInput(labelText) {
+    // Strategy: find text node matching label, then walk up to find container with input/dropdown
+    var walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT, null, false);
+    var node;
+    while (node = walker.nextNode()) {
+      if (node.textContent.trim() !== labelText) continue;
+      var labelEl = node.parentElement;
+      if (!labelEl) continue;
+
+      // Walk up DOM levels looking for a container that has an input or dropdown
+      var levels = [labelEl, labelEl.parentElement, labelEl.parentElement && labelEl.parentElement.parentElement];
+      for (var lvl = 0; lvl < levels.length; lvl++) {
+        var container = levels[lvl];
+        if (!container) continue;
+
+        // Look for PrimeNG dropdown/select
+        var pDropdown = container.querySelector('p-dropdown, .p-dropdown, p-select, .p-select');
+        if (pDropdown) return { el: pDropdown, type: 'dropdown', container: container };
+
+        // Look for PrimeNG input number
+        var pInputNum = container.querySelector('p-inputnumber, .p-inputnumber');
+        if (pInputNum) {
+          var innerInput = pInputNum.querySelector('input');
+          return { el: innerInput || pInputNum, type: 'number', container: container };
+        }
+
+        // Look for regular input
+        var input = container.querySelector('input:not([type=hidden]):not([type=checkbox])');
+        if (input) return { el: input, type: 'input', container: container };
+      }
+
+      // Last resort: check next siblings of the label element
+      var sib = labelEl.nextElementSibling;
+      for (var s = 0; s < 3 && sib; s++) {
+        var pDrop = sib.querySelector ? sib.querySelector('p-dropdown, .p-dropdown, p-select, .p-select') : null;
+        if (pDrop) return { el: pDrop, type: 'dropdown', container: sib };
+        var pNum = sib.querySelector ? sib.querySelector('p-inputnumber, .p-inputnumber, input:not([type=hidden])') : null;
+        if (pNum) {
+          var iInput = pNum.querySelector ? pNum.querySelector('input') || pNum : pNum;
+          return { el: iInput, type: pNum.tagName === 'INPUT' ? 'input' : 'number', container: sib };
+        }
+        sib = sib.nextElementSibling;
+      }
+      break; // Only process first match
+    }
+    return null;
+  }
+
+  // Set PrimeNG Autocomplete value by typing + keyboard selection
+  async function setDropdown(labelText, optionText) {
+    var field = findFieldInput(labelText);
+    if (!field) { diag.fills.push(labelText + ': NOT_FOUND'); return false; }
+
+    var input = field.el;
+    if (input.tagName !== 'INPUT') {
+      input = field.el.querySelector ? field.el.querySelector('input') || field.el : field.el;
+    }
+
+    // Focus and clear
+    input.focus();
+    input.dispatchEvent(new Event('focus', {bubbles: true}));
+    await sleep(100);
+
+    // Select all text and delete it
+    input.select();
+    input.dispatchEvent(new KeyboardEvent('keydown', { key: 'a', ctrlKey: true, bubbles: true }));
+    await sleep(50);
+
+    // Clear via setter + input event
+    var setter = Object.getOwnPropertyDescriptor(window.HTMLInputElement.prototype, 'value').set;
+    if (setter) setter.call(input, '');
+    input.dispatchEvent(new Event('input', {bubbles: true}));
+    await sleep(200);
+
+    // Type the search text to trigger autocomplete suggestions
+    var searchText = optionText.length > 3 ? optionText.substring(0, 3) : optionText;
+    if (setter) setter.call(input, searchText);
+    input.dispatchEvent(new Event('input', {bubbles: true}));
+    await sleep(600);
+
+    // Find THIS input's specific autocomplete panel using aria-controls
+    function findMyPanel() {
+      // Method 1: use aria-controls/aria-owns link
+      var panelId = input.getAttribute('aria-controls') || input.getAttribute('aria-owns');
+      if (panelId) {
+        var linked = document.getElementById(panelId);
+        if (linked && linked.offsetHeight > 0) return linked;
+      }
+      // Method 2: find P-POPOVER inside same nex-app-field, check if it has visible content
+      var nexField = input.closest('.nex-app-field');
+      if (nexField) {
+        var popover = nexField.querySelector('p-popover');
+        if (popover) {
+          // PrimeNG popover renders content at body level, linked by ng-tns class
+          var ngClass = '';
+          var classes = (popover.className || '').split(/\s+/);
+          for (var ci2 = 0; ci2 < classes.length; ci2++) {
+            if (classes[ci2].indexOf('ng-tns-') === 0) { ngClass = classes[ci2]; break; }
+          }
+          if (ngClass) {
+            // Find visible overlay with same ng-tns class at body level
+            var overlays = document.querySelectorAll('.' + ngClass + '[role=listbox], .' + ngClass + ' [role=listbox], .' + ngClass + ' ul');
+            for (var ovi = 0; ovi < overlays.length; ovi++) {
+              if (overlays[ovi].offsetHeight > 0) return overlays[ovi];
+            }
+          }
+        }
+      }
+      // Method 3: find the most recently visible panel (last resort)
+      var allPanels = document.querySelectorAll('[role=listbox]');
+      for (var api = allPanels.length - 1; api >= 0; api--) {
+        if (allPanels[api].offsetHeight > 0 && allPanels[api].offsetWidth > 0) return allPanels[api];
+      }
+      return null;
+    }
+
+    var panel = findMyPanel();
+
+    if (!panel) {
+      // Type full text and try again
+      if (setter) setter.call(input, optionText);
+      input.dispatchEvent(new Event('input', {bubbles: true}));
+      await sleep(600);
+      panel = findMyPanel();
+    }
+
+    if (!panel) {
+      // Try ArrowDown to open
+      input.dispatchEvent(new KeyboardEvent('keydown', { key: 'ArrowDown', bubbles: true, cancelable: true }));
+      await sleep(400);
+      panel = findMyPanel();
+    }
+
+    if (panel) {
+      // Find matching item and navigate to it with keyboard
+      var items = panel.querySelectorAll('li, [class*=autocomplete-item], [class*=option], [role=option]');
+      var targetIdx = -1;
+      for (var oi = 0; oi < items.length; oi++) {
+        var itemText = (items[oi].textContent || '').trim();
+        if (itemText === optionText || itemText.indexOf(optionText) >= 0) {
+          targetIdx = oi;
+          break;
+        }
+      }
+
+      if (targetIdx === -1) {
+        // Case-insensitive search
+        var lower = optionText.toLowerCase();
+        for (var oi2 = 0; oi2 < items.length; oi2++) {
+          if ((items[oi2].textContent || '').trim().toLowerCase().indexOf(lower) >= 0) {
+            targetIdx = oi2;
+            break;
+          }
+        }
+      }
+
+      if (targetIdx >= 0) {
+        var targetItem = items[targetIdx];
+
+        // Method 1: Click the suggestion item directly
+        targetItem.dispatchEvent(new MouseEvent('mousedown', { bubbles: true, cancelable: true, view: window }));
+        await sleep(50);
+        targetItem.dispatchEvent(new MouseEvent('mouseup', { bubbles: true, cancelable: true, view: window }));
+        targetItem.dispatchEvent(new MouseEvent('click', { bubbles: true, cancelable: true, view: window }));
+        await sleep(300);
+
+        var afterVal = (input.value || '').trim();
+        if (afterVal.length > searchText.length || afterVal.toLowerCase().indexOf(optionText.substring(0, 3).toLowerCase()) >= 0) {
+          input.dispatchEvent(new Event('blur', {bubbles: true}));
+          await sleep(100);
+          diag.fills.push(labelText + ': ' + optionText + ' (click, val=' + afterVal + ')');
+          return true;
+        }
+
+        // Method 2: Try keyboard ArrowDown + Enter as fallback
+        input.focus();
+        if (setter) setter.call(input, searchText);
+        input.dispatchEvent(new Event('input', {bubbles: true}));
+        await sleep(600);
+        panel = findMyPanel();
+        if (panel) {
+          for (var ad = 0; ad <= targetIdx; ad++) {
+            input.dispatchEvent(new KeyboardEvent('keydown', { key: 'ArrowDown', bubbles: true, cancelable: true }));
+            await sleep(50);
+          }
+          await sleep(100);
+          input.dispatchEvent(new KeyboardEvent('keydown', { key: 'Enter', bubbles: true, cancelable: true }));
+          await sleep(200);
+        }
+
+        var afterVal2 = (input.value || '').trim();
+        input.dispatchEvent(new KeyboardEvent('keydown', { key: 'Escape', bubbles: true }));
+        input.dispatchEvent(new Event('blur', {bubbles: true}));
+        await sleep(100);
+        diag.fills.push(labelText + ': ' + optionText + ' (kbd, val=' + afterVal2 + ')');
+        return true;
+      } else {
+        var optTexts = [];
+        for (var x = 0; x < items.length && x < 10; x++) optTexts.push((items[x].textContent || '').trim());
+        diag.fills.push(labelText + ': NO_MATCH(' + optionText + ') avail=[' + optTexts.join(',') + ']');
+      }
+    } else {
+      diag.fills.push(labelText + ': NO_PANEL');
+    }
+
+    // Close any open panels before moving to next field
+    input.dispatchEvent(new KeyboardEvent('keydown', { key: 'Escape', bubbles: true }));
+    await sleep(100);
+    // Last resort: set value directly and blur
+    if (setter) setter.call(input, optionText);
+    input.dispatchEvent(new Event('input', {bubbles: true}));
+    input.dispatchEvent(new Event('change', {bubbles: true}));
+    input.dispatchEvent(new Event('blur', {bubbles: true}));
+    await sleep(100);
+    return false;
+  }
+
+  // Set numeric input value
+  async function setNumeric(labelText, val) {
+    if (!val || val === '0') return;
+    var field = findFieldInput(labelText);
+    if (!field) { diag.fills.push(labelText + ': NOT_FOUND'); return false; }
+    var input = field.el;
+    if (input.tagName !== 'INPUT') {
+      input = field.el.querySelector ? field.el.querySelector('input') || field.el : field.el;
+    }
+    if (!input || input.tagName !== 'INPUT') { diag.fills.push(labelText + ': NO_INPUT_EL'); return false; }
+    input.focus();
+    input.value = '';
+    var setter = Object.getOwnPropertyDescriptor(window.HTMLInputElement.prototype, 'value').set;
+    if (setter) setter.call(input, val);
+    input.dispatchEvent(new Event('input', {bubbles: true}));
+    input.dispatchEvent(new Event('change', {bubbles: true}));
+    input.dispatchEvent(new Event('blur', {bubbles: true}));
+    diag.fills.push(labelText + ': ' + val);
+    await sleep(150);
+    return true;
+  }
+
+  // Fill dropdown fields (order matters — Income Doc triggers dynamic fields)
+  var dropdowns = ['Loan Type', 'Purpose', 'Occupancy', 'Property Type', 'Income Doc'];
+  for (var di = 0; di < dropdowns.length; di++) {
+    var key = dropdowns[di];
+    if (fieldMap[key]) {
+      await setDropdown(key, fieldMap[key]);
+      await sleep(200);
+    }
+  }
+
+  // Wait for Angular to re-render dynamic fields based on Income Doc selection
+  await sleep(1500);
+
+  // Fill remaining dropdowns (includes DSCR-specific fields that appeared after Income Doc selection)
+  var dropdowns2 = ['Citizenship', 'State', 'County', 'Escrows', 'Prepay Penalty'];
+  for (var di2 = 0; di2 < dropdowns2.length; di2++) {
+    var key2 = dropdowns2[di2];
+    if (fieldMap[key2]) {
+      await setDropdown(key2, fieldMap[key2]);
+      await sleep(200);
+    }
+  }
+
+  // Fill numeric fields (includes DSCR-specific fields discovered after Income Doc selection)
+  var numerics = ['Appraised Value', 'Purchase Price', 'First Lien Amount', 'FICO', 'DTI',
+    'Months Reserves', 'DSCR', 'Mo. Rental Income', '# of Financed Properties'];
+  for (var ni = 0; ni < numerics.length; ni++) {
+    var nkey = numerics[ni];
+    if (fieldMap[nkey]) {
+      await setNumeric(nkey, fieldMap[nkey]);
+    }
+  }
+
+  mark('form_filled');
+  diag.steps.push('form_filled');
+
+  // In network capture mode, record the quick-prices response Get Price triggers
+  var capture = ${capture === 'network' ? "captureResponses('quick-prices')" : 'null'};
+
+  // Click "Get Price" button
+  var getPriceBtn = document.querySelector('button.quick-price-button') ||
+    document.querySelector('[class*=quick-price]') ||
+    null;
+  if (!getPriceBtn) {
+    var allBtns = document.querySelectorAll('button');
+    for (var bi = 0; bi < allBtns.length; bi++) {
+      if ((allBtns[bi].textContent || '').trim() === 'Get Price') { getPriceBtn = allBtns[bi]; break; }
+    }
+  }
+  if (getPriceBtn) {
+    getPriceBtn.click();
+    mark('get_price_clicked');
+    diag.steps.push('clicked_get_price');
+  } else {
+    diag.steps.push('no_get_price_button');
+    return JSON.stringify({ success: false, error: 'no_get_price_button', diag: diag });
+  }
+
+  // Wait for results table to appear
+  var resultsFound = false;
+  for (var attempt = 0; attempt < 10; attempt++) {
+    // A captured response ends the wait as soon as it lands
+    if (capture ? await capturedWithin(capture, 1500) : await sleep(1500)) break;
+    // Check for standard HTML table OR PrimeNG table OR any data grid
+    var tables = document.querySelectorAll('table, p-table, .p-datatable');
+    for (var ti = 0; ti < tables.length; ti++) {
+      var rows = tables[ti].querySelectorAll('tr');
+      if (rows.length > 2) {
+        diag.steps.push('results_at: ' + ((attempt+1)*1.5) + 's, rows: ' + rows.length + ', tag: ' + tables[ti].tagName);
+        resultsFound = true;
+        break;
+      }
+    }
+    if (resultsFound) break;
+    // Check for loading spinners (still waiting)
+    var spinners = document.querySelectorAll('.p-progress-spinner, .loading, [class*=spinner], [class*=loading]');
+    if (spinners.length > 0 && attempt < 9) continue;
+    // Check for "no results" or error text
+    var body = (document.body.innerText || '');
+    if (body.indexOf('No results') >= 0 || body.indexOf('no eligible') >= 0 || body.indexOf('No prices') >= 0 || body.indexOf('No programs') >= 0) {
+      diag.steps.push('no_results_text_at: ' + ((attempt+1)*1.5) + 's');
+      break;
+    }
+    // Check for any new content after Get Price (investor names, rate numbers)
+    if (body.match(/\d+\.\d{3}%/) || body.indexOf('Investor') >= 0) {
+      diag.steps.push('rate_text_detected_at: ' + ((attempt+1)*1.5) + 's');
+      resultsFound = true;
+      break;
+    }
+  }
+
+  mark('results');
+
+  // The quick-prices response itself: every row, unformatted. The table is the fallback.
+  var captured = capture && (capturedJson(capture) || await capturedWithin(capture, 1500));
+  if (captured) {
+    mark('captured');
+    diag.steps.push('captured_response');
+    diag.transfer = transferSummary();
+    return JSON.stringify({ success: true, captured: captured, diag: diag });
+  }
+  if (capture) diag.steps.push('no_captured_response');
+  if (!resultsFound) {
+    diag.steps.push('no_results_table');
+    // Capture page text AFTER "Get Price" to see what appeared
+    var fullText = (document.body.innerText || '');
+    var gpIdx = fullText.indexOf('Get Price');
+    diag.afterGetPrice = gpIdx >= 0 ? fullText.substring(gpIdx, gpIdx + 800) : fullText.substring(0, 1500);
+    return JSON.stringify({ success: true, rates: [], diag: diag });
+  }
+
+  await sleep(500); // settle
+
+  // Scrape the results table
+  var rates = [];
+  var tables = document.querySelectorAll('table, p-table, .p-datatable');
+  for (var ti2 = 0; ti2 < tables.length; ti2++) {
+    var trs = tables[ti2].querySelectorAll('tr');
+    if (trs.length < 2) continue;
+    var ths = trs[0].querySelectorAll('th, td');
+    var headers = [];
+    for (var h = 0; h < ths.length; h++) headers.push((ths[h].textContent || '').trim());
+    diag.headers = headers;
+
+    for (var ri = 1; ri < trs.length && ri < 50; ri++) {
+      var tds = trs[ri].querySelectorAll('td');
+      if (tds.length < 3) continue;
+      var row = {};
+      for (var ci = 0; ci < tds.length && ci < headers.length; ci++) {
+        row[headers[ci] || 'col' + ci] = (tds[ci].textContent || '').trim();
+      }
+      rates.push(row);
+    }
+    if (rates.length > 0) break;
+  }
+
+  mark('scraped');
+  diag.steps.push('scraped: ' + rates.length + ' rows');
+  diag.transfer = transferSummary();
+  return JSON.stringify({ success: true, rates: rates, diag: diag });
+})()`
+}
+
+// ================= Scraped Rows → Rate Options =================
+// Header names vary (e.g. "Rate  Lock Period 1", "Price 2") — use keyword matching
+function mapScrapedRows(rates: any[]) {
+  const findCol = (row: any, keywords: string[]): string => {
+    for (const k of Object.keys(row)) {
+      const kl = k.toLowerCase()
+      if (keywords.some(kw => kl.includes(kw))) return row[k] || ''
+    }
+    return ''
+  }
+  return rates.map((row: any) => {
+    const rateField = findCol(row, ['rate'])
+    const rateMatch = rateField.match(/([\d.]+)%/)
+    const lockMatch = rateField.match(/(\d+)\s*Days/)
+
+    const priceField = findCol(row, ['price'])
+    const priceMatch = priceField.match(/([\d.]+)/)
+    const costMatch = priceField.match(/\$([\d,.]+)/)
+
+    const product = findCol(row, ['product'])
+    const investorField = findCol(row, ['investor', 'lender'])
+    const pmtField = findCol(row, ['pmt', 'payment'])
+    const pmtMatch = pmtField.match(/\$([\d,.]+)/)
+
+    // Clean double spaces from collapsed newlines in scraped text
+    const cleanText = (s: string) => s.replace(/\s{2,}/g, ' ').trim()
+
+    return {
+      rate: rateMatch ? parseFloat(rateMatch[1]) : 0,
+      price: priceMatch ? parseFloat(priceMatch[1]) : 0,
+      cost: costMatch ? parseFloat(costMatch[1].replace(/,/g, '')) : 0,
+      lockPeriod: lockMatch ? parseInt(lockMatch[1]) : 30,
+      program: cleanText(product),
+      investor: cleanText(investorField),
+      payment: pmtMatch ? parseFloat(pmtMatch[1].replace(/,/g, '')) : 0,
+    }
+  }).filter((r: any) => r.rate > 0)
+}
+
+// ================= Provider Modes =================
+// LN_MODE=bql  — Browserless login/fill/scrape only (default)
+// LN_MODE=api  — log in to the nex-app API once per warm lambda and call quick-prices
+//               directly, falling back to the Browserless flow on failure. Opt-in until
+//               the API contract is checked against a captured nex-app session
+export function lnMode(requested?: unknown): 'api' | 'bql' {
+  return String(requested || process.env.LN_MODE || 'bql').toLowerCase() === 'api' ? 'api' : 'bql'
+}
+
+async function priceViaApi(fieldMap: Record<string, string>, timing: RequestTiming) {
+  const started = Date.now()
+  const result = await getQuickPrices(fieldMap, undefined, timing)
+  return {
+    success: true,
+    data: {
+      provider: 'api',
+      rateOptions: result.rateOptions,
+      totalRates: result.rateOptions.length,
+      rawRows: result.rawRows,
+      diag: { quickPriceId: result.quickPriceId, exceptionBuyers: result.exceptionBuyers, elapsedMs: Date.now() - started },
+    },
+  }
+}
+
+// ================= Browserless Sessions =================
+// A cold request logs in and resolves the nex-app tokenKey URL; the pool keeps that URL
+// (and, with LN_SESSION_RECONNECT_SECONDS, the open browser) so warm requests skip
+// loginPage/login/waitForNav/navToIframe and go straight to the Quick Pricer form.
+
+const safeParseValue = (val: any) => {
+  if (!val) return null
+  try { return typeof val === 'string' ? JSON.parse(val) : val } catch { return null }
+}
+
+function postBql(endpoint: string, browserlessToken: string, query: string, timeoutMs = 58000): Promise<Response> {
+  const sep = endpoint.includes('?') ? '&' : '?'
+  return fetch(`${endpoint}${sep}token=${browserlessToken}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ query }),
+    signal: AbortSignal.timeout(timeoutMs),
+  })
+}
+
+// Keep the browser open for the next request when reconnects are enabled
+function keepAliveStep(): string {
+  const reconnectMs = sessionReconnectMs()
+  return reconnectMs > 0 ? `\n  keep: reconnect(timeout: ${reconnectMs}) { browserQLEndpoint }` : ''
+}
+
+const HEALTH_SCRIPT = "JSON.stringify({ ok: !document.getElementById('username') && !document.getElementById('UserName') && document.querySelectorAll('input:not([type=hidden])').length > 10 })"
+
+// Health check for an idle reconnect endpoint: still on an authenticated Quick Pricer form?
+async function probeSession(endpoint: string, browserlessToken: string): Promise<string | null> {
+  const query = `mutation SessionHealth {
+  check: evaluate(content: ${JSON.stringify(HEALTH_SCRIPT)}, timeout: 5000) { value }
+  keep: reconnect(timeout: ${sessionReconnectMs()}) { browserQLEndpoint }
+}`
+  const resp = await postBql(endpoint, browserlessToken, query, 10000)
+  if (!resp.ok) return null
+  const result = await resp.json()
+  return safeParseValue(result.data?.check?.value)?.ok ? result.data?.keep?.browserQLEndpoint || null : null
+}
+
+// How long a cold login's browser stays open for the Lock Desk retry round trip
+const RETRY_RECONNECT_MS = 20000
+
+// Second pass after a Lock Desk landing: reconnect to the browser the first left on
+// its way to /nex-app, give the hard navigation a moment to start, then fill and scrape
+async function retryOnSession(endpoint: string, retryScript: string, browserlessToken: string): Promise<{ data: any; endpoint: string | null }> {
+  const query = `mutation RetryPrice {
+  settle: waitForTimeout(time: 1000) { time }
+  retryPrice: evaluate(content: ${JSON.stringify(retryScript)}, timeout: 30000) { value }${keepAliveStep()}
+}`
+  const resp = await postBql(endpoint, browserlessToken, query)
+  if (!resp.ok) return { data: null, endpoint: null }
+  const result = await resp.json()
+  return { data: safeParseValue(result.data?.retryPrice?.value), endpoint: result.data?.keep?.browserQLEndpoint || null }
+}
+
+// Warm path: open the pooled tokenKey URL (in the kept browser when there is one) and fill/scrape
+async function priceWarm(session: LnBrowserSession, fieldMap: Record<string, string>, browserlessToken: string, loannexUser: string, loannexPassword: string, timing: RequestTiming) {
+  const retryScript = buildFillAndScrapeScript(fieldMap, loannexUser, loannexPassword, true)
+  const query = `mutation WarmPrice {
+  ${navigateSteps('qp', session.iframeUrl, null)}
+  price: evaluate(content: ${JSON.stringify(retryScript)}, timeout: 30000) { value }${keepAliveStep()}
+}`
+
+  let reconnected = false
+  let resp: Response | null = null
+  const kept = session.browserQLEndpoint
+  if (kept) {
+    resp = await timing.measure('bql', () => postBql(kept, browserlessToken, query).catch(() => null))
+    reconnected = !!resp?.ok
+  }
+  // Reconnect endpoint gone: the tokenKey URL still works from a new browser
+  if (!resp?.ok) resp = await timing.measure('bql', () => postBql(BROWSERLESS_URL, browserlessToken, query))
+  if (!resp.ok) return { data: null, endpoint: null, reconnected, readyMs: null, error: `Browserless: ${resp.status}` }
+
+  const ok = resp
+  const result = await timing.measure('bql', () => ok.json())
+  if (typeof result.data?.qp?.time === 'number') timing.add('goto', result.data.qp.time)
+  const data = safeParseValue(result.data?.price?.value)
+  timing.addMarks('page', data?.diag?.timings)
+  // The kept endpoint comes back on a failed pass too, so the caller can close it
+  const endpoint: string | null = result.data?.keep?.browserQLEndpoint || null
+  if (!data?.success) return { data: null, endpoint, reconnected, readyMs: null, error: data?.error || 'no data from pricing step' }
+  return { data, endpoint, reconnected, readyMs: readyMs(result.data, 'qp'), error: undefined }
+}
+
+// Rows from the captured quick-prices response when the page returned it (every row,
+// mapped as the direct API path does), else from the scraped table
+function bqlResponse(resultData: any, fallbackReason: string | undefined, session: Record<string, any>, timing: RequestTiming) {
+  const rates = resultData.rates || []
+  const rateOptions = resultData.captured
+    ? timing.measure('parse', () => mapQuickPriceRows(resultData.captured))
+    : timing.measure('parse', () => mapScrapedRows(rates))
+  return {
+    success: true,
+    data: {
+      provider: 'bql',
+      capture: resultData.captured ? 'network' : 'dom',
+      rateOptions,
+      totalRates: rateOptions.length,
+      rawRows: resultData.captured ? rateOptions.length : rates.length,
+      diag: resultData.diag,
+      session,
+      fallbackReason,
+    },
+  }
+}
+
+// Timed as 'session' (pool checkout and health probe, pooling or closing kept browsers),
+// 'bql' (Browserless round trips), 'retry' (the Lock Desk second pass, when needed), 'goto'
+// and 'ready' (as Browserless reports them) and the fill script's own steps from
+// diag.timings: page.login, page.form_ready, page.form_filled, page.results (Get Price to
+// the first rows), page.scraped
+async function priceViaBrowserless(fieldMap: Record<string, string>, browserlessToken: string, loannexUser: string, loannexPassword: string, timing: RequestTiming, fallbackReason?: string): Promise<any> {
+  let expiredReason: string | undefined
+  const close: SessionCloser = endpoint => closeBrowser(endpoint, browserlessToken)
+  const session = await timing.measure('session', () => acquireSession(endpoint => probeSession(endpoint, browserlessToken)))
+  if (session) {
+    const started = Date.now()
+    const warm = await priceWarm(session, fieldMap, browserlessToken, loannexUser, loannexPassword, timing)
+      .catch(err => ({ data: null, endpoint: null, reconnected: false, readyMs: null, error: err instanceof Error ? err.message : 'warm session error' }))
+    if (warm.data) {
+      releaseSession(session, warm.endpoint)
+      return bqlResponse(warm.data, fallbackReason, {
+        id: session.id, warm: true, uses: session.uses, reconnected: warm.reconnected, blocking: blockProfile(), readyMs: warm.readyMs, elapsedMs: Date.now() - started,
+      }, timing)
+    }
+    // Expired or unhealthy: drop it (closing any browser it kept) and log in from scratch below
+    evictSession(session)
+    if (warm.endpoint) await timing.measure('session', () => close(warm.endpoint!))
+    expiredReason = warm.error
+    console.warn(`[LN] Pooled session ${session.id} unusable (${warm.error}); logging in again`)
+  }
+
+  const started = Date.now()
+  const fillScript = buildFillAndScrapeScript(fieldMap, loannexUser, loannexPassword, false)
+  const retryScript = buildFillAndScrapeScript(fieldMap, loannexUser, loannexPassword, true)
+
+  // Wrapper login script (fills web.loannex.com form)
+  const loginScript = `(async function() {
+  function sleep(ms) { return new Promise(r => setTimeout(r, ms)); }
+  await sleep(1000);
+  var u = document.getElementById('UserName');
+  var p = document.getElementById('Password');
+  var b = document.getElementById('btnSubmit');
+  if (!u || !p) return JSON.stringify({ ok: false, error: 'no_form' });
+  function si(el, val) {
+    el.focus();
+    var s = Object.getOwnPropertyDescriptor(window.HTMLInputElement.prototype, 'value').set;
+    s.call(el, val);
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+  }
+  si(u, '${loannexUser}');
+  await sleep(150);
+  si(p, '${loannexPassword}');
+  await sleep(150);
+  if (b) setTimeout(function() { b.click(); }, 100);
+  return JSON.stringify({ ok: true });
+})()`
+
+  // Navigate to iframe URL (extracts tokenKey URL from wrapper page)
+  const navScript = `(async function() {
+  function sleep(ms) { return new Promise(r => setTimeout(r, ms)); }
+  await sleep(1500);
+  var iframes = document.getElementsByTagName('iframe');
+  for (var i = 0; i < iframes.length; i++) {
+    if (iframes[i].src && iframes[i].src.indexOf('nex-app') >= 0) {
+      window.location.href = iframes[i].src;
+      return JSON.stringify({ ok: true, src: iframes[i].src });
+    }
+  }
+  if (iframes.length > 0 && iframes[0].src) {
+    window.location.href = iframes[0].src;
+    return JSON.stringify({ ok: true, src: iframes[0].src });
+  }
+  return JSON.stringify({ ok: false, error: 'no_iframe', iframes: iframes.length });
+})()`
+
+  // FillAndPrice: wrapper login → wait → nav to iframe → fill/scrape, keeping the browser.
+  // Steps 3-4 error from navigation (expected). The fill/scrape returns needsNextStep when
+  // it lands on Lock Desk and hard-navigates to /nex-app; only then does a second round
+  // trip reconnect and run the retry pass on the freshly initialized form. The browser is
+  // kept at least RETRY_RECONNECT_MS for that retry; whichever browser is left at the end
+  // is closed unless the session pool keeps it.
+  const bqlQuery = `mutation FillAndPrice {
+  ${navigateSteps('loginPage', 'https://web.loannex.com/', '#UserName')}
+  login: evaluate(content: ${JSON.stringify(loginScript)}, timeout: 6000) { value }
+  waitForNav: evaluate(content: "new Promise(r => setTimeout(r, 3000)).then(() => JSON.stringify({ok:true}))", timeout: 5000) { value }
+  navToIframe: evaluate(content: ${JSON.stringify(navScript)}, timeout: 8000) { value }
+  price: evaluate(content: ${JSON.stringify(fillScript)}, timeout: 30000) { value }
+  keep: reconnect(timeout: ${Math.max(sessionReconnectMs(), RETRY_RECONNECT_MS)}) { browserQLEndpoint }
+}`
+
+  const bqlResp = await timing.measure('bql', () => postBql(BROWSERLESS_URL, browserlessToken, bqlQuery))
+
+  if (!bqlResp.ok) {
+    const errText = await bqlResp.text()
+    return { success: false, error: `Browserless: ${bqlResp.status}`, debug: errText.substring(0, 300) }
+  }
+
+  const bqlResult = await timing.measure('bql', () => bqlResp.json())
+  if (typeof bqlResult.data?.loginPage?.time === 'number') timing.add('goto', bqlResult.data.loginPage.time)
+  if (typeof bqlResult.data?.loginPageReady?.time === 'number') timing.add('ready', bqlResult.data.loginPageReady.time)
+
+  if (bqlResult.errors && !bqlResult.data) {
+    return { success: false, error: 'BQL error', bqlErrors: (bqlResult.errors || []).map((e: any) => e.message).slice(0, 5) }
+  }
+
+  // Parse results
+  const priceData = safeParseValue(bqlResult.data?.price?.value)
+  let endpoint: string | null = bqlResult.data?.keep?.browserQLEndpoint || null
+
+  // Retry on the same browser only if the first pass hit Lock Desk (needsNextStep) or errored
+  let retryData: any = null
+  const needsRetry = !priceData || !!priceData.needsNextStep
+  if (needsRetry && endpoint) {
+    const retry = await timing.measure('retry', () => retryOnSession(endpoint as string, retryScript, browserlessToken))
+      .catch(() => ({ data: null, endpoint: null }))
+    retryData = retry.data
+    endpoint = retry.endpoint
+  }
+  const resultData = needsRetry ? retryData : priceData
+
+  if (!resultData) {
+    if (endpoint) await timing.measure('session', () => close(endpoint!))
+    return {
+      success: false,
+      error: 'No data from pricing step',
+      debug: {
+        bqlErrors: (bqlResult.errors || []).map((e: any) => ({ msg: e.message?.substring(0, 100), path: e.path })).slice(0, 5),
+        hasData: !!bqlResult.data,
+        dataKeys: bqlResult.data ? Object.keys(bqlResult.data) : [],
+        priceNeedsRetry: priceData?.needsNextStep || false,
+        retryAvailable: !!retryData,
+      }
+    }
+  }
+
+  timing.addMarks('page', resultData.diag?.timings)
+
+  // Pool the logged-in session (and, with reconnects on, its browser) for the next request
+  const nav = safeParseValue(bqlResult.data?.navToIframe?.value)
+  const pooled = resultData.success !== false && nav?.src
+    ? await timing.measure('session', () => addSession(nav.src, sessionReconnectMs() > 0 ? endpoint : null, close))
+    : null
+  // Neither the retry nor the pool will reconnect to it: close it now instead of letting
+  // it hold a Browserless slot until the reconnect timeout
+  if (endpoint && pooled?.browserQLEndpoint !== endpoint) await timing.measure('session', () => close(endpoint!))
+
+  return bqlResponse(resultData, fallbackReason, {
+    id: pooled?.id ?? null, warm: false, expiredReason, retried: needsRetry, blocking: blockProfile(), readyMs: readyMs(bqlResult.data, 'loginPage'), elapsedMs: Date.now() - started,
+  }, timing)
+}
+
+// ================= Pricing =================
+// Identical scenarios in flight share one pricing run (single-flight.ts); `flight` sets
+// how long a follower waits for it
+export async function priceLoanNex(body: any, mode: 'api' | 'bql' = lnMode(), flight: FlightOptions = {}): Promise<any> {
+  const browserlessToken = process.env.BROWSERLESS_TOKEN || ''
+  if (mode === 'bql' && !browserlessToken) return { success: false, error: 'Browserless not configured' }
+
+  const loannexUser = process.env.LOANNEX_USER || ''
+  const loannexPassword = process.env.LOANNEX_PASSWORD || ''
+  if (!loannexUser || !loannexPassword) return { success: false, error: 'Credentials not configured' }
+
+  try {
+    const timing = flight.timing ?? new RequestTiming('loannex')
+    return await singleFlight('ln', quoteCacheKey('loannex', mode, body || {}), () => runLoanNex(body, mode, browserlessToken, loannexUser, loannexPassword, timing), flight)
+  } catch (error) {
+    // Only a follower's own timeout gets here; runLoanNex reports its errors
+    return { success: false, error: error instanceof Error ? error.message : 'Pricing unavailable' }
+  }
+}
+
+async function runLoanNex(body: any, mode: 'api' | 'bql', browserlessToken: string, loannexUser: string, loannexPassword: string, timing: RequestTiming): Promise<any> {
+  try {
+    const fieldMap = timing.measure('map', () => mapFormToLN(body || {}))
+
+    let fallbackReason: string | undefined
+    if (mode === 'api') {
+      try {
+        const result = await priceViaApi(fieldMap, timing)
+        if (result.data.totalRates > 0 || !browserlessToken) return result
+        fallbackReason = 'api returned no rates'
+      } catch (err) {
+        fallbackReason = err instanceof Error ? err.message : 'api error'
+        if (!browserlessToken) throw err
+      }
+      console.warn(`[LN] Direct API unusable (${fallbackReason}); falling back to Browserless flow`)
+    }
+
+    return await priceViaBrowserless(fieldMap, browserlessToken, loannexUser, loannexPassword, timing, fallbackReason)
+  } catch (error) {
+    console.error('LN pricing error:', error)
+    return {
+      success: false,
+      error: error instanceof Error ? error.message : 'Pricing unavailable',
+    }
+  }
+}
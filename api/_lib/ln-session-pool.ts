@@ -0,0 +1,147 @@
+/**
+ * ln-session-pool.ts
+ *
+ * Bounded pool of authenticated LoanNEX browser sessions for the Browserless flow in
+ * api/_lib/ln-pricing.ts. A cold request logs in to web.loannex.com and resolves the
+ * nex-app iframe URL (which carries the tokenKey); that URL, and the Browserless
+ * reconnect endpoint of the still-open browser when one was requested, are kept here
+ * so warm requests can go straight to the Quick Pricer form.
+ *
+ *   LN_SESSION_POOL_SIZE            max sessions kept per warm lambda (default 2, 0 disables)
+ *   LN_SESSION_TTL_SECONDS          drop a session this long after login (default 1200)
+ *   LN_SESSION_IDLE_SECONDS         drop a session unused for this long (default 600)
+ *   LN_SESSION_HEALTHCHECK_SECONDS  probe a reconnect endpoint idle longer than this
+ *                                   before reusing it (default 60)
+ *   LN_SESSION_RECONNECT_SECONDS    keep the browser open for reconnects this long
+ *                                   (default 0: only the tokenKey URL is pooled)
+ *
+ * Sessions are checked out exclusively; a failed or expired session is evicted and the
+ * caller falls back to a full login. A kept browser the pool drops to make room is closed
+ * through the caller's SessionCloser rather than left open until its reconnect timeout.
+ * Checkout, expiry and LRU bookkeeping is checkout-pool.ts, shared with lp-page-pool.ts.
+ */
+
+import { CheckoutPool, envNumber, type BrowserCloser, type PoolEntry } from './checkout-pool.js'
+
+export type SessionCloser = BrowserCloser
+
+export interface LnBrowserSession extends PoolEntry {
+  iframeUrl: string
+  // Browserless reconnect endpoint for the browser left on the nex-app page, if any
+  browserQLEndpoint: string | null
+  endpointExpiresAt: number
+}
+
+function settings() {
+  return {
+    maxSize: envNumber('LN_SESSION_POOL_SIZE', 2),
+    ttlMs: envNumber('LN_SESSION_TTL_SECONDS', 1200) * 1000,
+    idleMs: envNumber('LN_SESSION_IDLE_SECONDS', 600) * 1000,
+    healthCheckMs: envNumber('LN_SESSION_HEALTHCHECK_SECONDS', 60) * 1000,
+    reconnectMs: envNumber('LN_SESSION_RECONNECT_SECONDS', 0) * 1000,
+  }
+}
+
+const sessions = new CheckoutPool<LnBrowserSession>(isExpired)
+
+export const lnSessionStats = {
+  created: 0,
+  reused: 0,
+  expired: 0,
+  evicted: 0,
+  healthChecks: 0,
+  healthFailures: 0,
+  closed: 0,
+}
+
+export function isSessionPoolEnabled(): boolean {
+  return settings().maxSize > 0
+}
+
+export function sessionReconnectMs(): number {
+  return settings().reconnectMs
+}
+
+function isExpired(session: LnBrowserSession, now: number): boolean {
+  const { ttlMs, idleMs } = settings()
+  return now - session.createdAt > ttlMs || now - session.lastUsedAt > idleMs
+}
+
+/**
+ * Check out the most recently used idle session, dropping expired ones on the way.
+ * `probe` health-checks a reconnect endpoint that has sat idle past the interval and
+ * returns the endpoint to use next (Browserless hands out a fresh one per reconnect);
+ * a failed probe keeps the session but forgets the endpoint, since the tokenKey URL
+ * still works from a new browser.
+ */
+export async function acquireSession(probe?: (endpoint: string) => Promise<string | null>): Promise<LnBrowserSession | null> {
+  if (!isSessionPoolEnabled()) return null
+  const { healthCheckMs, reconnectMs } = settings()
+  const now = Date.now()
+
+  lnSessionStats.expired += sessions.dropExpired(now)
+  const session = sessions.checkout()
+  if (!session) return null
+
+  if (session.browserQLEndpoint && session.endpointExpiresAt <= now) {
+    session.browserQLEndpoint = null
+  } else if (session.browserQLEndpoint && probe && now - session.lastUsedAt >= healthCheckMs) {
+    lnSessionStats.healthChecks++
+    const endpoint = await probe(session.browserQLEndpoint).catch(() => null)
+    if (!endpoint) lnSessionStats.healthFailures++
+    session.browserQLEndpoint = endpoint
+    session.endpointExpiresAt = endpoint ? Date.now() + reconnectMs : 0
+  }
+
+  lnSessionStats.reused++
+  return session
+}
+
+// Return a session after a successful warm request, with the endpoint it handed back
+export function releaseSession(session: LnBrowserSession, browserQLEndpoint?: string | null): void {
+  const now = Date.now()
+  sessions.checkin(session, now)
+  if (browserQLEndpoint !== undefined) {
+    session.browserQLEndpoint = browserQLEndpoint
+    session.endpointExpiresAt = browserQLEndpoint ? now + settings().reconnectMs : 0
+  }
+}
+
+// Drop a session whose warm request failed or landed on the login page
+export function evictSession(session: LnBrowserSession): void {
+  sessions.remove(session)
+  lnSessionStats.evicted++
+}
+
+// Pool the tokenKey URL (and reconnect endpoint) a cold login produced. Returns null when
+// the pool is off or full of checked-out sessions; the caller still owns the endpoint then.
+export async function addSession(iframeUrl: string, browserQLEndpoint: string | null = null, close?: SessionCloser): Promise<LnBrowserSession | null> {
+  const { maxSize, reconnectMs } = settings()
+  if (maxSize <= 0 || !iframeUrl) return null
+
+  // Make room by dropping the least recently used idle session, and its browser
+  while (sessions.size >= maxSize) {
+    const idle = sessions.leastRecentlyUsed()
+    if (!idle) return null
+    sessions.remove(idle)
+    lnSessionStats.evicted++
+    if (idle.browserQLEndpoint && idle.endpointExpiresAt > Date.now() && close) {
+      lnSessionStats.closed++
+      await close(idle.browserQLEndpoint)
+    }
+  }
+
+  const now = Date.now()
+  const endpointExpiresAt = browserQLEndpoint ? now + reconnectMs : 0
+  const session = sessions.add({ iframeUrl, browserQLEndpoint, endpointExpiresAt }, now)
+  lnSessionStats.created++
+  return session
+}
+
+export function clearSessionPool(): void {
+  sessions.clear()
+}
+
+export function sessionPoolSize(): number {
+  return sessions.size
+}
@@ -0,0 +1,268 @@
+/**
+ * loannex.ts
+ *
+ * Native HTTP client for the LoanNEX (nex-app) pricing API the Quick Pricer page calls
+ * when "Get Price" is clicked (see loanex_api_calling results_2.5.txt):
+ *
+ *   GET  /users/{userId}/exception-buyers
+ *   POST /loans/apps/{userId}/quick-prices   → 201 with the priced rows
+ *
+ * One login per warm lambda: the session token is cached until shortly before it
+ * expires and dropped on a 401 so the next call re-authenticates. Quick-price rows are
+ * mapped into the same rateOptions shape the Browserless scrape's findCol mapping
+ * produces ({ rate, price, cost, lockPeriod, program, investor, payment }).
+ *
+ * The login path and body, the quick-prices field names and the row key heuristics are
+ * inferred from the page, not yet checked against a captured nex-app session, so
+ * LN_MODE defaults to the Browserless flow. A failed login is remembered for
+ * LOANNEX_LOGIN_BACKOFF_SECONDS (default 300) so a bad configuration costs one
+ * login attempt per window rather than one per quote.
+ */
+
+import { RequestTiming } from './timing.js'
+
+export const LOANNEX_API_URL = process.env.LOANNEX_API_URL || 'https://nexapi.loannex.com'
+const LOGIN_PATH = process.env.LOANNEX_LOGIN_PATH || '/auth/login'
+
+export interface LnRateOption {
+  rate: number
+  price: number
+  cost: number
+  lockPeriod: number
+  program: string
+  investor: string
+  payment: number
+}
+
+export interface LnQuickPriceResult {
+  rateOptions: LnRateOption[]
+  rawRows: number
+  exceptionBuyers: number
+  quickPriceId: string | null
+}
+
+// ================= Session =================
+interface LnSession {
+  token: string
+  userId: string
+  expiresAt: number
+}
+
+let cachedSession: LnSession | null = null
+// Sessions without an expiry in the login response are reused for this long
+const DEFAULT_SESSION_MS = 30 * 60 * 1000
+
+// The last failed login, answered again without a request until `until`
+let loginFailure: { message: string; until: number } | null = null
+
+function loginBackoffMs(): number {
+  const seconds = Number(process.env.LOANNEX_LOGIN_BACKOFF_SECONDS)
+  return (process.env.LOANNEX_LOGIN_BACKOFF_SECONDS && Number.isFinite(seconds) ? seconds : 300) * 1000
+}
+
+export const loannexStats = { logins: 0, sessionReuses: 0, unauthorizedRetries: 0, loginFailures: 0, loginBackoffs: 0 }
+
+function decodeJwtExpiry(token: string): number | null {
+  const payload = token.split('.')[1]
+  if (!payload) return null
+  try {
+    const claims = JSON.parse(Buffer.from(payload, 'base64url').toString('utf8'))
+    return typeof claims.exp === 'number' ? claims.exp * 1000 : null
+  } catch {
+    return null
+  }
+}
+
+async function login(): Promise<LnSession> {
+  const user = process.env.LOANNEX_USER || ''
+  const password = process.env.LOANNEX_PASSWORD || ''
+  if (!user || !password) throw new Error('LoanNEX credentials not configured')
+
+  const response = await fetch(`${LOANNEX_API_URL}${LOGIN_PATH}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'application/json' },
+    body: JSON.stringify({ userName: user, email: user, password }),
+    signal: AbortSignal.timeout(10000),
+  })
+  if (!response.ok) throw new Error(`LoanNEX login failed: HTTP ${response.status}`)
+
+  const data: any = await response.json()
+  const token = data.token || data.accessToken || data.access_token || data.jwt
+  if (!token) throw new Error('LoanNEX login returned no token')
+  const userId = process.env.LOANNEX_USER_ID || data.userId || data.user?.id || data.id
+  if (!userId) throw new Error('LoanNEX login returned no user id (set LOANNEX_USER_ID)')
+
+  const expiresIn = Number(data.expiresIn || data.expires_in) || 0
+  const expiresAt = expiresIn > 0
+    ? Date.now() + expiresIn * 1000
+    : decodeJwtExpiry(token) || Date.now() + DEFAULT_SESSION_MS
+
+  loannexStats.logins++
+  // Refresh a minute early so a request never starts with a token about to lapse
+  return { token, userId, expiresAt: expiresAt - 60 * 1000 }
+}
+
+async function getSession(): Promise<LnSession> {
+  if (cachedSession && cachedSession.expiresAt > Date.now()) {
+    loannexStats.sessionReuses++
+    return cachedSession
+  }
+  if (loginFailure && loginFailure.until > Date.now()) {
+    loannexStats.loginBackoffs++
+    throw new Error(`${loginFailure.message} (not retried for ${Math.ceil((loginFailure.until - Date.now()) / 1000)}s)`)
+  }
+  try {
+    cachedSession = await login()
+  } catch (err) {
+    loannexStats.loginFailures++
+    const message = err instanceof Error ? err.message : 'LoanNEX login failed'
+    loginFailure = { message, until: Date.now() + loginBackoffMs() }
+    throw err
+  }
+  loginFailure = null
+  return cachedSession
+}
+
+export function clearLoannexSession(): void {
+  cachedSession = null
+  cachedExceptionBuyers = null
+  loginFailure = null
+}
+
+async function authorizedFetch(path: (session: LnSession) => string, init: RequestInit = {}): Promise<Response> {
+  for (let attempt = 0; ; attempt++) {
+    const session = await getSession()
+    const response = await fetch(`${LOANNEX_API_URL}${path(session)}`, {
+      ...init,
+      headers: { ...(init.headers as Record<string, string>), Authorization: `Bearer ${session.token}`, Accept: 'application/json' },
+    })
+    // Token revoked or expired server-side: log in again once
+    if (response.status === 401 && attempt === 0) {
+      loannexStats.unauthorizedRetries++
+      cachedSession = null
+      continue
+    }
+    return response
+  }
+}
+
+// ================= Quick Prices =================
+
+// Exception buyers rarely change; reuse them for an hour per warm lambda
+let cachedExceptionBuyers: { buyers: any[]; expiresAt: number } | null = null
+const EXCEPTION_BUYERS_TTL_MS = 60 * 60 * 1000
+
+async function getExceptionBuyers(): Promise<any[]> {
+  if (cachedExceptionBuyers && cachedExceptionBuyers.expiresAt > Date.now()) return cachedExceptionBuyers.buyers
+
+  const response = await authorizedFetch(s => `/users/${s.userId}/exception-buyers`, { signal: AbortSignal.timeout(8000) })
+  if (!response.ok) throw new Error(`LoanNEX exception-buyers failed: HTTP ${response.status}`)
+  const data: any = await response.json()
+  const buyers = Array.isArray(data) ? data : data.items || data.exceptionBuyers || []
+  cachedExceptionBuyers = { buyers, expiresAt: Date.now() + EXCEPTION_BUYERS_TTL_MS }
+  return buyers
+}
+
+const toNumber = (value: string) => {
+  const n = Number(String(value).replace(/,/g, ''))
+  return Number.isFinite(n) && value !== '' ? n : null
+}
+
+// Quick Pricer form labels (mapFormToLN) → quick-prices request fields
+export function buildQuickPriceRequest(fieldMap: Record<string, string>, exceptionBuyers: any[]) {
+  return {
+    loanType: fieldMap['Loan Type'],
+    purpose: fieldMap['Purpose'],
+    occupancy: fieldMap['Occupancy'],
+    propertyType: fieldMap['Property Type'],
+    incomeDoc: fieldMap['Income Doc'],
+    citizenship: fieldMap['Citizenship'],
+    state: fieldMap['State'],
+    county: fieldMap['County'],
+    appraisedValue: toNumber(fieldMap['Appraised Value']),
+    purchasePrice: toNumber(fieldMap['Purchase Price']),
+    firstLienAmount: toNumber(fieldMap['First Lien Amount']),
+    fico: toNumber(fieldMap['FICO']),
+    dti: toNumber(fieldMap['DTI']),
+    escrows: fieldMap['Escrows'] === 'Yes',
+    dscr: toNumber(fieldMap['DSCR']),
+    monthlyRentalIncome: toNumber(fieldMap['Mo. Rental Income']),
+    prepayPenalty: fieldMap['Prepay Penalty'],
+    monthsReserves: toNumber(fieldMap['Months Reserves']),
+    financedProperties: toNumber(fieldMap['# of Financed Properties']),
+    exceptionBuyerIds: exceptionBuyers.map(b => b?.id ?? b?.buyerId ?? b).filter(id => typeof id === 'string' || typeof id === 'number'),
+  }
+}
+
+// Case-insensitive key lookup over a list of candidate names (the JSON counterpart of findCol)
+function pick(row: Record<string, any>, names: string[]): any {
+  const keys = Object.keys(row)
+  for (const name of names) {
+    const key = keys.find(k => k.toLowerCase() === name)
+    if (key !== undefined && row[key] !== null && row[key] !== undefined && row[key] !== '') return row[key]
+  }
+  return undefined
+}
+
+const RATE_KEYS = ['noterate', 'rate', 'interestrate']
+
+// Rows may come back flat or grouped (investor → product → rates); walk the tree and
+// carry investor/product names down from the enclosing groups
+function collectRows(node: any, context: Record<string, any>, out: Record<string, any>[]): void {
+  if (Array.isArray(node)) {
+    for (const item of node) collectRows(item, context, out)
+    return
+  }
+  if (!node || typeof node !== 'object') return
+
+  const scope = { ...context }
+  for (const [key, value] of Object.entries(node)) {
+    if (value === null || typeof value !== 'object') scope[key] = value
+  }
+  // A node with its own rate is a row (its arrays are adjustments etc., not more rows)
+  if (pick(node, RATE_KEYS) !== undefined) {
+    out.push(scope)
+    return
+  }
+  for (const value of Object.values(node)) {
+    if (Array.isArray(value)) collectRows(value, scope, out)
+  }
+}
+
+export function mapQuickPriceRows(body: any): LnRateOption[] {
+  const rows: Record<string, any>[] = []
+  collectRows(body?.quickPrices ?? body?.prices ?? body?.results ?? body?.items ?? body, {}, rows)
+
+  return rows.map(row => ({
+    rate: Number(pick(row, RATE_KEYS)) || 0,
+    price: Number(pick(row, ['price', 'finalprice', 'netprice', 'baseprice'])) || 0,
+    cost: Number(pick(row, ['cost', 'costamount', 'pricedollars', 'dollaramount'])) || 0,
+    lockPeriod: Number(pick(row, ['lockperiod', 'lockdays', 'lockterm'])) || 30,
+    program: String(pick(row, ['productname', 'product', 'programname', 'program']) ?? '').replace(/\s{2,}/g, ' ').trim(),
+    investor: String(pick(row, ['investorname', 'investor', 'buyername', 'buyer', 'lender']) ?? '').replace(/\s{2,}/g, ' ').trim(),
+    payment: Number(pick(row, ['payment', 'principalandinterest', 'monthlypayment', 'pi'])) || 0,
+  })).filter(r => r.rate > 0)
+}
+
+// Timed as ln-buyers (which also logs in on a cold lambda), ln-network, ln-body, ln-parse
+export async function getQuickPrices(fieldMap: Record<string, string>, timeoutMs = 20000, timing = new RequestTiming('loannex')): Promise<LnQuickPriceResult> {
+  const exceptionBuyers = await timing.measure('ln-buyers', () => getExceptionBuyers())
+  const request = buildQuickPriceRequest(fieldMap, exceptionBuyers)
+
+  const response = await timing.measure('ln-network', () => authorizedFetch(s => `/loans/apps/${s.userId}/quick-prices`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(request),
+    signal: AbortSignal.timeout(timeoutMs),
+  }))
+  if (!response.ok) throw new Error(`LoanNEX quick-prices failed: HTTP ${response.status}`)
+
+  const body: any = await timing.measure('ln-body', () => response.json())
+  const rateOptions = timing.measure('ln-parse', () => mapQuickPriceRows(body))
+  return {
+    rateOptions,
+    rawRows: rateOptions.length,
+    exceptionBuyers: exceptionBuyers.length,
+    quickPriceId: body?.id ?? null,
+  }
+}
@@ -0,0 +1,173 @@
+/**
+ * lp-page-pool.ts
+ *
+ * Bounded pool of already-loaded LenderPrice Flex pages for the Browserless scrape in
+ * api/_lib/lp-pricing.ts. A cold scrape navigates to FLEX_URL, waits for the Angular
+ * app to boot and clears the cookie banner before it can fill the form; with the pool
+ * on it also asks Browserless to keep that browser open, and the next scrape reconnects
+ * to it, remounts just the pricing route to reset the form and prices straight away.
+ *
+ *   LP_PAGE_POOL_SIZE             max pages kept per warm lambda (default 0: off)
+ *   LP_PAGE_RECONNECT_SECONDS     how long Browserless keeps an idle page open (default 120)
+ *   LP_PAGE_MAX_USES              recycle a page after this many quotes (default 25)
+ *   LP_PAGE_HEALTHCHECK_SECONDS   probe a page idle longer than this before reusing it
+ *                                 (default 45)
+ *
+ * Pages are checked out exclusively. Browserless hands out a new reconnect endpoint on
+ * every reconnect, so each use returns the one to use next; a page whose reconnect,
+ * reset or scrape fails is dropped and the caller scrapes cold.
+ *
+ * A kept browser counts against the Browserless concurrency quota until its reconnect
+ * timeout, so a cold scrape only asks to keep its page after claimSlot() has reserved
+ * room for it, and every page the pool lets go of while it is still open (recycled,
+ * or dropped to make room) is closed through the caller's PageCloser. Checkout, expiry
+ * and LRU bookkeeping is checkout-pool.ts, shared with ln-session-pool.ts.
+ */
+
+import { CheckoutPool, envNumber, type BrowserCloser, type PoolEntry } from './checkout-pool.js'
+
+export interface LpFlexPage extends PoolEntry {
+  // Browserless reconnect endpoint for the browser left on the Flex pricing page
+  browserQLEndpoint: string
+  expiresAt: number
+}
+
+function settings() {
+  return {
+    maxSize: envNumber('LP_PAGE_POOL_SIZE', 0),
+    reconnectMs: envNumber('LP_PAGE_RECONNECT_SECONDS', 120) * 1000,
+    maxUses: envNumber('LP_PAGE_MAX_USES', 25),
+    healthCheckMs: envNumber('LP_PAGE_HEALTHCHECK_SECONDS', 45) * 1000,
+  }
+}
+
+export type PageCloser = BrowserCloser
+
+const pages = new CheckoutPool<LpFlexPage>((page, now) => page.expiresAt <= now)
+// Cold scrapes in flight that will add their page
+let reserved = 0
+
+export const lpPageStats = {
+  created: 0,
+  reused: 0,
+  recycled: 0,
+  expired: 0,
+  evicted: 0,
+  closed: 0,
+  healthChecks: 0,
+  healthFailures: 0,
+}
+
+export function isPagePoolEnabled(): boolean {
+  return settings().maxSize > 0
+}
+
+export function pageReconnectMs(): number {
+  return settings().reconnectMs
+}
+
+/**
+ * Check out the most recently used idle page, dropping expired ones on the way.
+ * `probe` checks a page that has sat idle past the interval is still on the Flex form
+ * and returns the endpoint to use next; a failed probe drops the page.
+ */
+export async function acquirePage(probe?: (endpoint: string) => Promise<string | null>): Promise<LpFlexPage | null> {
+  if (!isPagePoolEnabled()) return null
+  const { healthCheckMs, reconnectMs } = settings()
+
+  for (;;) {
+    const now = Date.now()
+    lpPageStats.expired += pages.dropExpired(now)
+    const page = pages.checkout()
+    if (!page) return null
+
+    if (probe && now - page.lastUsedAt >= healthCheckMs) {
+      lpPageStats.healthChecks++
+      const endpoint = await probe(page.browserQLEndpoint).catch(() => null)
+      if (!endpoint) {
+        lpPageStats.healthFailures++
+        evictPage(page)
+        continue
+      }
+      page.browserQLEndpoint = endpoint
+      page.expiresAt = Date.now() + reconnectMs
+    }
+
+    lpPageStats.reused++
+    return page
+  }
+}
+
+function closeBrowser(browserQLEndpoint: string, close: PageCloser): Promise<void> {
+  lpPageStats.closed++
+  return close(browserQLEndpoint).catch(() => {})
+}
+
+// Return a page after a successful warm scrape with the endpoint it handed back;
+// a page without one, or at its use limit, is recycled (and its browser closed)
+export async function releasePage(page: LpFlexPage, browserQLEndpoint: string | null, close: PageCloser): Promise<void> {
+  const now = Date.now()
+  pages.checkin(page, now)
+  if (!browserQLEndpoint || page.uses >= settings().maxUses) {
+    pages.remove(page)
+    lpPageStats.recycled++
+    if (browserQLEndpoint) await closeBrowser(browserQLEndpoint, close)
+    return
+  }
+  page.browserQLEndpoint = browserQLEndpoint
+  page.expiresAt = now + settings().reconnectMs
+}
+
+// Drop a page whose reconnect, reset or scrape failed. Its stored endpoint was used up
+// by that attempt, so closing whatever browser the attempt left open is the caller's
+export function evictPage(page: LpFlexPage): void {
+  pages.remove(page)
+  lpPageStats.evicted++
+}
+
+// Reserve room for the page a cold scrape is about to open; only then should the scrape
+// ask Browserless to keep it. Every successful claim is settled by addPage().
+export function claimSlot(): boolean {
+  if (pages.size + reserved >= settings().maxSize) return false
+  reserved++
+  return true
+}
+
+// Settle a claimed slot: pool the page the cold scrape left open, or pass null when it
+// left none (or it should not be reused) to give the slot back
+export async function addPage(browserQLEndpoint: string | null, close: PageCloser): Promise<LpFlexPage | null> {
+  reserved = Math.max(0, reserved - 1)
+  const { maxSize, reconnectMs } = settings()
+  if (!browserQLEndpoint) return null
+  if (maxSize <= 0) {
+    await closeBrowser(browserQLEndpoint, close)
+    return null
+  }
+
+  // Make room by dropping the least recently used idle page (LP_PAGE_POOL_SIZE was
+  // lowered under a claimed slot), or close this one when every page is busy
+  while (pages.size >= maxSize) {
+    const idle = pages.leastRecentlyUsed()
+    if (!idle) {
+      await closeBrowser(browserQLEndpoint, close)
+      return null
+    }
+    pages.remove(idle)
+    lpPageStats.evicted++
+    await closeBrowser(idle.browserQLEndpoint, close)
+  }
+
+  const now = Date.now()
+  const page = pages.add({ browserQLEndpoint, expiresAt: now + reconnectMs }, now)
+  lpPageStats.created++
+  return page
+}
+
+export function clearPagePool(): void {
+  pages.clear()
+  reserved = 0
+}
+
+export function pagePoolSize(): number {
+  return pages.size
+}
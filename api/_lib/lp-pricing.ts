@@ -0,0 +1,1032 @@
+/**
+ * lp-pricing.ts
+ *
+ * LenderPrice (Oaktree Flex) pricing shared by api/get-lp-pricing.ts and the unified
+ * quote endpoint (api/quote.ts): the pricing/search JSON API (lenderprice.ts) with the
+ * Browserless scrape of the Flex UI as fallback. priceLenderPrice resolves to the same
+ * { success, data | error } body get-lp-pricing has always returned, plus data.variants
+ * when the request lists lock period / prepay variants (see Variants below).
+ */
+
+import { blockProfile, captureMode, closeBrowser, navigateSteps, readyMs, RESPONSE_CAPTURE, TRANSFER_SUMMARY, type CaptureMode } from './browserless-profile.js'
+import { parseSearchResponse, searchPricing } from './lenderprice.js'
+import { acquirePage, addPage, claimSlot, evictPage, isPagePoolEnabled, pageReconnectMs, releasePage, type LpFlexPage, type PageCloser } from './lp-page-pool.js'
+import { quoteCacheKey } from './quote-cache.js'
+import { singleFlight, type FlightOptions } from './single-flight.js'
+import { RequestTiming } from './timing.js'
+
+const BROWSERLESS_URL = process.env.BROWSERLESS_URL || 'https://production-sfo.browserless.io/chromium/bql'
+const FLEX_URL = 'https://flex.digitallending.com/#/pricing?code=Oaktree&company=oaktree.digitallending.com'
+
+// ================= Flex Form Field IDs =================
+const FIELD_IDS = {
+  fico: '63d2274bf262ed03e49abc6c',
+  citizenship: '63fd2c4bd2d5c7d168d741b8',
+  docType: '686fb4aab753b53d04cea8c9',
+  dscrRatio: '63bda202870841ff37dcffc2',
+  occupancy: '61a97be92f993cf968556c19',
+  propertyType: '613fe3ebb0d5f45e0b719775',
+  units: '61a97b912f993cf968556c14',
+  attachmentType: '61a97b4e2f993cf968556c10',
+  zip: '613fe802b0d5f45e0b71985b',
+  state: '613fe2d8b0d5f45e0b719766',
+  loanPurpose: '625cf17a81b3b41288722d24',
+  purchasePrice: '63fd2badd2d5c7d168d7404b',
+  loanAmount: '625cf3e881b3b41288722d60',
+  waiveImpounds: '63ac9dfb44b1dfb7238cbd36',
+  interestOnly: '6471198a1808b2759c7290f3',
+  selfEmployed: '6219b8a850cbb98496384300',
+  // Dynamic fields (appear after DSCR/Investment selection)
+  prepayTerm: '691667834a1a0960d1e67588',
+  prepayPlanType: '691667af4a1a0960d1e67596',
+  shortTermRental: '688a8c972c7c7a45f870c4e5',
+  firstTimeInvestor: '64062719bcd1bf2ef39bb120',
+  crossCollateralized: '697b9d8d942d1b374b520aa6',
+}
+
+// ================= Form Value Mappings =================
+function mapFormValues(formData: any) {
+  const occupancyMap: Record<string, string> = {
+    primary: 'Primary Residence', secondary: 'Second Home', investment: 'Investment',
+  }
+  const propTypeMap: Record<string, string> = {
+    sfr: 'Single Family Residence', condo: 'Condo', townhouse: 'Townhouse',
+    '2unit': '2-4 Units', '3unit': '2-4 Units', '4unit': '2-4 Units', '5-9unit': 'MultiFamily 5-8 Units',
+  }
+  const purposeMap: Record<string, string> = {
+    purchase: 'Purchase', refinance: 'Refinance', cashout: 'Cashout Refinance',
+  }
+  const citizenMap: Record<string, string> = {
+    usCitizen: 'US Citizen', permanentResident: 'Permanent Resident',
+    nonPermanentResident: 'Non-Permanent Resident', foreignNational: 'Foreign National', itin: 'ITIN',
+  }
+  const docTypeMap: Record<string, string> = {
+    fullDoc: 'Full Doc', dscr: 'Investor/DSCR',
+    bankStatement: '24 Mo Personal Bank Statements', bankStatement12: '12 Mo Personal Bank Statements',
+    bankStatement24: '24 Mo Personal Bank Statements', assetDepletion: 'Asset Utilization',
+    assetUtilization: 'Asset Utilization', voe: 'WVOE', noRatio: 'Full Doc',
+  }
+  const stateMap: Record<string, string> = {
+    AL: 'Alabama', AK: 'Alaska', AZ: 'Arizona', AR: 'Arkansas', CA: 'California',
+    CO: 'Colorado', CT: 'Connecticut', DE: 'Delaware', FL: 'Florida', GA: 'Georgia',
+    HI: 'Hawaii', ID: 'Idaho', IL: 'Illinois', IN: 'Indiana', IA: 'Iowa',
+    KS: 'Kansas', KY: 'Kentucky', LA: 'Louisiana', ME: 'Maine', MD: 'Maryland',
+    MA: 'Massachusetts', MI: 'Michigan', MN: 'Minnesota', MS: 'Mississippi', MO: 'Missouri',
+    MT: 'Montana', NE: 'Nebraska', NV: 'Nevada', NH: 'New Hampshire', NJ: 'New Jersey',
+    NM: 'New Mexico', NY: 'New York', NC: 'North Carolina', ND: 'North Dakota', OH: 'Ohio',
+    OK: 'Oklahoma', OR: 'Oregon', PA: 'Pennsylvania', RI: 'Rhode Island', SC: 'South Carolina',
+    SD: 'South Dakota', TN: 'Tennessee', TX: 'Texas', UT: 'Utah', VT: 'Vermont',
+    VA: 'Virginia', WA: 'Washington', WV: 'West Virginia', WI: 'Wisconsin', WY: 'Wyoming',
+    DC: 'District of Columbia',
+  }
+
+  const isDSCR = formData.documentationType === 'dscr'
+
+  // Map prepay period: form sends "60mo","48mo","36mo","24mo","12mo","0mo"
+  // Flex pricer expects: "None","12 Months","24 Months","36 Months","48 Months","60 Months"
+  const prepayMap: Record<string, string> = {
+    '60mo': '60 Months', '48mo': '48 Months', '36mo': '36 Months',
+    '24mo': '24 Months', '12mo': '12 Months', '0mo': 'None',
+  }
+  // Map prepay type (plan): form sends "5pct","declining","6mointerest"
+  // Flex pricer expects: "N/A","5% Fixed","Declining","6 Months Interest","1% (MI and OH only)","2% Fixed (RI Only)"
+  const prepayTypeMap: Record<string, string> = {
+    '5pct': '5% Fixed', 'declining': 'Declining', '6mointerest': '6 Months Interest',
+  }
+
+  return {
+    fico: String(Number(formData.creditScore) || 740),
+    citizenship: citizenMap[formData.citizenship] || 'US Citizen',
+    docType: docTypeMap[formData.documentationType] || 'Full Doc',
+    dscrRatio: isDSCR ? String(Number(formData.dscrValue) || 1.25) : '',
+    occupancy: occupancyMap[formData.occupancyType] || 'Primary Residence',
+    propertyType: propTypeMap[formData.propertyType] || 'Single Family Residence',
+    units: formData.propertyType === '5-9unit' ? '5' : formData.propertyType?.startsWith('2') ? '2' : formData.propertyType?.startsWith('3') ? '3' : formData.propertyType?.startsWith('4') ? '4' : '1',
+    attachmentType: formData.structureType === 'attached' ? 'Attached' : 'Detached',
+    zip: formData.propertyZip || '90210',
+    state: stateMap[formData.propertyState] || 'California',
+    loanPurpose: purposeMap[formData.loanPurpose] || 'Purchase',
+    purchasePrice: String(Number(formData.propertyValue) || 800000),
+    loanAmount: String(Number(formData.loanAmount) || 600000),
+    waiveImpounds: formData.impoundType === 'noescrow',
+    interestOnly: formData.paymentType === 'io',
+    selfEmployed: !!formData.isSelfEmployed,
+    isDSCR,
+    isInvestment: formData.occupancyType === 'investment',
+    prepayTerm: prepayMap[formData.prepayPeriod] || 'None',
+    prepayPlanType: prepayTypeMap[formData.prepayType] || '5% Fixed',
+    isCrossCollateralized: !!formData.isCrossCollateralized,
+  }
+}
+
+// ================= In-page Helpers =================
+// Shared by the full scrape script and the variant re-search script. Both expect diag
+// and t0 in scope.
+
+// What a step keeps back from the scrape deadline for reading its rows (capture wait,
+// row settle) and returning them
+const EXTRACT_RESERVE_MS = 3000
+
+// Result rows of the current search: rows on screen before a variant's re-search are
+// marked data-stale, so waiting and extraction only see the new ones
+const FRESH_ROWS_SELECTOR = 'tr:not([data-stale])'
+
+const PAGE_HELPERS = `  var FRESH_ROWS = ${JSON.stringify(FRESH_ROWS_SELECTOR)};
+  ${RESPONSE_CAPTURE}
+  // At most ms, cut short so the step still returns before the scrape's deadline
+  // (window.__lpDeadline, set by the first step of the mutation)
+  function within(ms) {
+    var left = (window.__lpDeadline || Infinity) - ${EXTRACT_RESERVE_MS} - Date.now();
+    return Math.max(0, Math.min(ms, left));
+  }
+  // Resolve with check()'s value as soon as it is truthy (re-checked on every DOM
+  // mutation), or with null after timeoutMs
+  function waitFor(check, timeoutMs) {
+    return new Promise(function(resolve) {
+      var first = check();
+      if (first) return resolve(first);
+      var done = false;
+      var observer = new MutationObserver(function() {
+        if (done) return;
+        var hit = check();
+        if (hit) finish(hit);
+      });
+      var timer = setTimeout(function() { finish(null); }, Math.max(0, timeoutMs));
+      function finish(value) {
+        done = true;
+        observer.disconnect();
+        clearTimeout(timer);
+        resolve(value);
+      }
+      observer.observe(document.documentElement, { childList: true, subtree: true, attributes: true, characterData: true });
+    });
+  }
+  // Resolve once the DOM has gone quietMs without a mutation (at most maxMs)
+  function settle(quietMs, maxMs) {
+    return new Promise(function(resolve) {
+      var quiet = setTimeout(finish, quietMs);
+      var cap = setTimeout(finish, maxMs);
+      var observer = new MutationObserver(function() {
+        clearTimeout(quiet);
+        quiet = setTimeout(finish, quietMs);
+      });
+      function finish() {
+        observer.disconnect();
+        clearTimeout(quiet);
+        clearTimeout(cap);
+        resolve();
+      }
+      observer.observe(document.documentElement, { childList: true, subtree: true, attributes: true, characterData: true });
+    });
+  }
+  // A dynamic field is ready once it exists (and, for selects, offers the value)
+  function waitForField(id, val, timeoutMs) {
+    return waitFor(function() {
+      var el = document.getElementById(id);
+      if (!el) return null;
+      if (el.tagName !== 'SELECT') return el;
+      for (var o = 0; o < el.options.length; o++) { if (el.options[o].value === val) return el; }
+      return null;
+    }, timeoutMs);
+  }
+
+  function setVal(id, val) {
+    var el = document.getElementById(id);
+    if (!el) { diag.fieldResults[id] = 'NOT_FOUND'; return; }
+    diag.fieldResults[id] = { tag: el.tagName, found: true };
+    var s = el.tagName === 'SELECT'
+      ? Object.getOwnPropertyDescriptor(window.HTMLSelectElement.prototype, 'value').set
+      : Object.getOwnPropertyDescriptor(window.HTMLInputElement.prototype, 'value').set;
+    s.call(el, val);
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+  }
+  function setCheckbox(id, checked) {
+    var el = document.getElementById(id);
+    if (el && el.checked !== checked) { el.click(); }
+    diag.fieldResults[id] = el ? 'checkbox_set' : 'NOT_FOUND';
+  }
+  // The lock period select has no stable id: find it by its label and pick the option
+  // for days. Returns false when there is no such select or option.
+  function setLockDays(days) {
+    var selects = document.querySelectorAll('select');
+    for (var i = 0; i < selects.length; i++) {
+      var sel = selects[i];
+      var label = sel.previousElementSibling ? (sel.previousElementSibling.textContent || '') : '';
+      if (!label && sel.parentElement) label = (sel.parentElement.querySelector('label') || {}).textContent || '';
+      if (!/lock/i.test(label)) continue;
+      for (var o = 0; o < sel.options.length; o++) {
+        var opt = sel.options[o];
+        if (parseInt(opt.text, 10) !== days && parseInt(opt.value, 10) !== days) continue;
+        Object.getOwnPropertyDescriptor(window.HTMLSelectElement.prototype, 'value').set.call(sel, opt.value);
+        sel.dispatchEvent(new Event('input', {bubbles: true}));
+        sel.dispatchEvent(new Event('change', {bubbles: true}));
+        diag.lockDays = { id: sel.id, label: label.trim().substring(0, 40), value: opt.value };
+        return true;
+      }
+    }
+    diag.lockDays = 'NOT_FOUND';
+    return false;
+  }
+`
+
+// Click Search, wait for the result rows and extract them: the script's return value.
+// In network capture mode the pricing/search response is returned instead when it arrives.
+function searchAndExtract(capture: CaptureMode): string {
+  return `  // Click Search once the form has finished reacting and the button is enabled
+  await settle(50, 1000);
+  var searchBtn = await waitFor(function() {
+    var btn = document.querySelector('button.btn-primary');
+    return btn && !btn.disabled ? btn : null;
+  }, within(3000)) || document.querySelector('button.btn-primary');
+  mark('search_ready');
+  var allBtns = document.querySelectorAll('button');
+  diag.steps.push('buttons_found: ' + allBtns.length);
+  diag.steps.push('search_btn: ' + (searchBtn ? searchBtn.textContent.trim() : 'NOT_FOUND'));
+  if (!searchBtn) return JSON.stringify({ error: 'no search button', diag: diag });
+  var capture = ${capture === 'network' ? "captureResponses('pricing/search')" : 'null'};
+  searchBtn.click();
+  var clickedAt = Date.now();
+  mark('search_clicked');
+  diag.steps.push('search_clicked');
+
+  // Wait for result rows (or a "No results" message), within the 30s evaluate budget
+  // and the scrape's deadline
+  var outcome = await waitFor(function() {
+    if (capture && capturedJson(capture)) return 'captured';
+    if (document.querySelectorAll(FRESH_ROWS).length > 0) return 'rows';
+    var bodySnap = (document.body.innerText || '');
+    if (bodySnap.indexOf('No results') >= 0 || bodySnap.indexOf('No eligible') >= 0) return 'no_results';
+    return null;
+  }, within(27000 - (Date.now() - t0)));
+
+  // The search response itself: every row, unformatted. The table below is the fallback.
+  var captured = capture && (capturedJson(capture) || await capturedWithin(capture, 1500));
+  if (captured) {
+    mark('results');
+    mark('captured');
+    diag.steps.push('captured_response_at: ' + (Date.now() - clickedAt) + 'ms');
+    diag.transfer = transferSummary();
+    return JSON.stringify({ captured: captured, diag: diag });
+  }
+  if (capture) diag.steps.push('no_captured_response');
+  var foundTable = outcome === 'rows';
+  mark('results');
+  if (foundTable) {
+    diag.steps.push('results_found_at: ' + (Date.now() - clickedAt) + 'ms (' + document.querySelectorAll(FRESH_ROWS).length + ' rows)');
+  } else if (outcome === 'no_results') {
+    diag.steps.push('no_results_text_at: ' + (Date.now() - clickedAt) + 'ms');
+  }
+
+  if (!foundTable) {
+    diag.steps.push('no_table_after_' + (Date.now() - clickedAt) + 'ms');
+    // Capture more page state for debugging
+    var pageText2 = (document.body.innerText || '');
+    diag.steps.push('final_page: ' + pageText2.substring(0, 400));
+    // Look for error/validation messages
+    var errEls = document.querySelectorAll('.error, .alert, .warning, .validation, [class*=error], [class*=alert], [class*=invalid], .text-danger, .has-error');
+    var errs = [];
+    for (var ei = 0; ei < errEls.length; ei++) {
+      var errText = (errEls[ei].textContent || '').trim();
+      if (errText) errs.push(errText.substring(0, 100));
+    }
+    if (errs.length > 0) diag.steps.push('errors_found: ' + JSON.stringify(errs));
+    // Check for loading spinners still visible
+    var spinners = document.querySelectorAll('.spinner, .loading, [class*=spinner], [class*=loading], .fa-spin');
+    diag.steps.push('spinners_visible: ' + spinners.length);
+    // Capture form validation state
+    var invalidInputs = document.querySelectorAll('input:invalid, select:invalid, .ng-invalid');
+    diag.steps.push('invalid_inputs: ' + invalidInputs.length);
+    // Capture full body text (more context)
+    diag.fullPageText = pageText2.substring(0, 2000);
+  }
+
+  // Let the remaining rows finish rendering after the first ones appear
+  if (foundTable) await settle(150, 1500);
+  mark('rows_settled');
+
+  var allRows = document.querySelectorAll(FRESH_ROWS);
+  diag.steps.push('total_tr_elements: ' + allRows.length);
+  var allTables = document.querySelectorAll('table');
+  diag.steps.push('total_tables: ' + allTables.length);
+
+  // Extract rate data from table
+  function getData(cell) {
+    var div = cell.querySelector('[data]');
+    return div ? div.getAttribute('data') : (cell.textContent || '').trim();
+  }
+
+  // Capture table headers for column discovery
+  var thEls = document.querySelectorAll('th');
+  var colHeaders = [];
+  for (var hi = 0; hi < thEls.length; hi++) {
+    colHeaders.push((thEls[hi].textContent || '').trim());
+  }
+  diag.colHeaders = colHeaders;
+
+  var rows = document.querySelectorAll(FRESH_ROWS);
+  var rates = [];
+  var debugRows = [];
+  for (var i = 0; i < rows.length && i < 50; i++) {
+    var cells = rows[i].querySelectorAll('td');
+    if (cells.length < 5) continue;
+    var rateText = (cells[0].textContent || '').trim();
+    // Dump all cells for first data row
+    if (debugRows.length === 0) {
+      var allCells = [];
+      for (var ci = 0; ci < cells.length; ci++) {
+        allCells.push({ idx: ci, text: (cells[ci].textContent || '').trim().substring(0, 50), data: getData(cells[ci]) });
+      }
+      debugRows.push({ cellCount: cells.length, allCells: allCells });
+    } else if (debugRows.length < 3) {
+      debugRows.push({ cellCount: cells.length, cell0: rateText.substring(0, 30) });
+    }
+    var rateMatch = rateText.match(/([\\d.]+)\\s*%/);
+    if (!rateMatch) continue;
+    rates.push({
+      rate: parseFloat(rateMatch[1]),
+      lender: (cells[1] ? (cells[1].textContent || '').trim() : ''),
+      price: getData(cells[2]),
+      payment: getData(cells[3]),
+      costToBorrower: getData(cells[4]),
+      lenderFee: getData(cells[6]),
+      program: (cells[7] ? (cells[7].textContent || '').trim() : ''),
+      priceAdj: getData(cells[9])
+    });
+  }
+
+  diag.debugRows = debugRows;
+
+  // Get eligible counts
+  var pageText = document.body.innerText || '';
+  var qmMatch = pageText.match(/Eligible QM \\((\\d+)\\)/);
+  var nonQmMatch = pageText.match(/Eligible Non-Traditional \\((\\d+)\\)/);
+
+  mark('extracted');
+  diag.transfer = transferSummary();
+  return JSON.stringify({
+    rateCount: rates.length,
+    eligibleQM: qmMatch ? parseInt(qmMatch[1]) : 0,
+    eligibleNonQM: nonQmMatch ? parseInt(nonQmMatch[1]) : 0,
+    rates: rates,
+    diag: diag
+  });
+`
+}
+
+// ================= Build BQL Evaluate Script =================
+// `reuse` is for a Flex page kept open from an earlier scrape (lp-page-pool.ts): the
+// script first remounts the pricing route, which resets the form and drops the previous
+// quote's rows, instead of the caller navigating to FLEX_URL again. `lockDays` sets the
+// lock period select, for a request that asks for variants. The script starts the
+// scrape's deadline: SCRAPE_BUDGET_MS from the start of the mutation, which for a cold
+// page is when its navigation started.
+function buildEvaluateScript(values: ReturnType<typeof mapFormValues>, reuse = false, lockDays: number | null = null, capture: CaptureMode = captureMode()): string {
+  // Build setVal calls for each field
+  const fieldSets: string[] = [
+    `setVal('${FIELD_IDS.fico}', '${values.fico}');`,
+    `setVal('${FIELD_IDS.citizenship}', '${values.citizenship}');`,
+    `setVal('${FIELD_IDS.docType}', '${values.docType}');`,
+    `setVal('${FIELD_IDS.occupancy}', '${values.occupancy}');`,
+    `await settle(50, 300);`,
+    `setVal('${FIELD_IDS.propertyType}', '${values.propertyType}');`,
+    `setVal('${FIELD_IDS.units}', '${values.units}');`,
+    `setVal('${FIELD_IDS.attachmentType}', '${values.attachmentType}');`,
+    `setVal('${FIELD_IDS.zip}', '${values.zip}');`,
+    `setVal('${FIELD_IDS.state}', '${values.state}');`,
+    `setVal('${FIELD_IDS.loanPurpose}', '${values.loanPurpose}');`,
+    `await settle(50, 300);`,
+    `setVal('${FIELD_IDS.purchasePrice}', '${values.purchasePrice}');`,
+    `setVal('${FIELD_IDS.loanAmount}', '${values.loanAmount}');`,
+  ]
+
+  if (values.isDSCR && values.dscrRatio) {
+    fieldSets.push(`setVal('${FIELD_IDS.dscrRatio}', '${values.dscrRatio}');`)
+  }
+
+  fieldSets.push(...prepayFieldSets(values), ...lockDaysStep(lockDays))
+
+  // Handle checkboxes
+  const checkboxSets: string[] = []
+  if (values.waiveImpounds) {
+    checkboxSets.push(`setCheckbox('${FIELD_IDS.waiveImpounds}', true);`)
+  }
+  if (values.interestOnly) {
+    checkboxSets.push(`setCheckbox('${FIELD_IDS.interestOnly}', true);`)
+  }
+  if (values.selfEmployed) {
+    checkboxSets.push(`setCheckbox('${FIELD_IDS.selfEmployed}', true);`)
+  }
+  if (values.isCrossCollateralized) {
+    checkboxSets.push(`setCheckbox('${FIELD_IDS.crossCollateralized}', true);`)
+  }
+
+  return `(async function() {
+  var t0 = Date.now();
+  window.__lpDeadline = t0${reuse ? '' : ' - performance.now()'} + ${scrapeBudgetMs()};
+  var diag = { steps: [], fieldResults: {}, timings: {} };
+  // Per-step elapsed ms since the script started
+  function mark(step) { diag.timings[step] = Date.now() - t0; }
+  ${TRANSFER_SUMMARY}
+
+${PAGE_HELPERS}
+
+  diag.steps.push('page_url: ' + window.location.href);
+  diag.steps.push('title: ' + document.title);
+${reuse ? resetRouteBlock() : ''}
+  // Wait for the Flex form to render instead of a fixed delay
+  var formReady = await waitFor(function() {
+    return document.getElementById('${FIELD_IDS.fico}') && document.querySelector('button.btn-primary');
+  }, 8000);
+  mark('form_ready');
+  if (!formReady) diag.steps.push('form_not_ready_after_8s');
+
+  // Hide cookie banner (do NOT click - clicking <A> can trigger navigation)
+  document.cookie = 'cookieconsent_status=allow; path=/; max-age=31536000';
+  var banners = document.querySelectorAll('.cc-window, [class*=cookie-consent], [class*=cookie-banner]');
+  for (var bi = 0; bi < banners.length; bi++) {
+    banners[bi].remove();
+    diag.steps.push('cookie_banner_removed');
+  }
+
+  // Check if page loaded
+  var bodyText = (document.body.innerText || '').substring(0, 500);
+  diag.steps.push('body_preview: ' + bodyText.substring(0, 200));
+
+  // Discover ALL form fields (selects + inputs with labels)
+  var allSelects = document.querySelectorAll('select');
+  var allInputs = document.querySelectorAll('input');
+  var formFields = [];
+  for (var si = 0; si < allSelects.length; si++) {
+    var sel = allSelects[si];
+    var label = sel.previousElementSibling ? (sel.previousElementSibling.textContent || '').trim() : '';
+    if (!label) { var par = sel.parentElement; label = par ? (par.querySelector('label') || {}).textContent || '' : ''; }
+    var selOpts = [];
+    for (var so = 0; so < sel.options.length && so < 15; so++) { selOpts.push(sel.options[so].text); }
+    formFields.push({ tag: 'SELECT', id: sel.id, label: label.substring(0, 40), value: sel.value, options: selOpts });
+  }
+  for (var ii = 0; ii < allInputs.length; ii++) {
+    var inp = allInputs[ii];
+    if (inp.type === 'hidden') continue;
+    var ilabel = inp.previousElementSibling ? (inp.previousElementSibling.textContent || '').trim() : '';
+    if (!ilabel) { var ipar = inp.parentElement; ilabel = ipar ? (ipar.querySelector('label') || {}).textContent || '' : ''; }
+    formFields.push({ tag: 'INPUT', id: inp.id, type: inp.type, label: ilabel.substring(0, 40), value: (inp.value || '').substring(0, 30) });
+  }
+  diag.formFields = formFields;
+
+  // Capture doc type SELECT options before filling
+  var docTypeEl = document.getElementById('${FIELD_IDS.docType}');
+  if (docTypeEl && docTypeEl.tagName === 'SELECT') {
+    var opts = [];
+    for (var oi = 0; oi < docTypeEl.options.length; oi++) {
+      opts.push(docTypeEl.options[oi].text);
+    }
+    diag.docTypeOptions = opts;
+  }
+
+  ${fieldSets.join('\n  ')}
+  ${checkboxSets.join('\n  ')}
+
+  // Verify the docType was set correctly
+  if (docTypeEl) {
+    diag.steps.push('docType_after_set: ' + docTypeEl.value + ' | selectedText: ' + (docTypeEl.selectedOptions ? docTypeEl.selectedOptions[0]?.text : 'N/A'));
+  }
+
+  mark('fields_set');
+  diag.steps.push('fields_set');
+
+  // Second field discovery AFTER setting form values (prepay fields may appear dynamically)
+  var allSelects2 = document.querySelectorAll('select');
+  var allInputs2 = document.querySelectorAll('input');
+  var formFieldsAfter = [];
+  for (var si2 = 0; si2 < allSelects2.length; si2++) {
+    var sel2 = allSelects2[si2];
+    var lbl2 = sel2.previousElementSibling ? (sel2.previousElementSibling.textContent || '').trim() : '';
+    if (!lbl2) { var par2 = sel2.parentElement; lbl2 = par2 ? (par2.querySelector('label') || {}).textContent || '' : ''; }
+    var opts2 = [];
+    for (var so2 = 0; so2 < sel2.options.length && so2 < 15; so2++) { opts2.push(sel2.options[so2].text); }
+    formFieldsAfter.push({ tag: 'SELECT', id: sel2.id, label: lbl2.substring(0, 40), value: sel2.value, options: opts2 });
+  }
+  for (var ii2 = 0; ii2 < allInputs2.length; ii2++) {
+    var inp2 = allInputs2[ii2];
+    if (inp2.type === 'hidden') continue;
+    var ilbl2 = inp2.previousElementSibling ? (inp2.previousElementSibling.textContent || '').trim() : '';
+    if (!ilbl2) { var ipar2 = inp2.parentElement; ilbl2 = ipar2 ? (ipar2.querySelector('label') || {}).textContent || '' : ''; }
+    formFieldsAfter.push({ tag: 'INPUT', id: inp2.id, type: inp2.type, label: ilbl2.substring(0, 40), value: (inp2.value || '').substring(0, 30) });
+  }
+  diag.formFieldsAfter = formFieldsAfter;
+  diag.steps.push('post_fill_fields: ' + formFieldsAfter.length + ' (before: ' + formFields.length + ')');
+
+${searchAndExtract(capture)}})()`
+}
+
+// Prepay term (dynamic field — appears after setting Investment occupancy)
+// Set once the DOM has rendered it with the option we want
+function prepayFieldSets(values: ReturnType<typeof mapFormValues>): string[] {
+  if (!values.isInvestment) return []
+  const sets = [
+    `await waitForField('${FIELD_IDS.prepayTerm}', '${values.prepayTerm}', within(3000));`,
+    `setVal('${FIELD_IDS.prepayTerm}', '${values.prepayTerm}');`,
+  ]
+  // Prepay plan type (dynamic — appears after setting prepayTerm to non-None value)
+  if (values.prepayTerm !== 'None') {
+    sets.push(`await waitForField('${FIELD_IDS.prepayPlanType}', '${values.prepayPlanType}', within(3000));`)
+    sets.push(`setVal('${FIELD_IDS.prepayPlanType}', '${values.prepayPlanType}');`)
+  }
+  return sets
+}
+
+// The form starts on a 30-day lock, so only another period needs the select to exist
+function lockDaysStep(lockDays: number | null): string[] {
+  if (lockDays === null) return []
+  return [`if (!setLockDays(${lockDays}) && ${lockDays} !== 30) return JSON.stringify({ error: 'lock_field_not_found', diag: diag });`]
+}
+
+// A further variant on the page the previous evaluate step left with results: mark the
+// rows on screen stale, change only the lock period and prepay fields, search again.
+// With less than minMs (a measured re-search) left before the deadline it does not start.
+function buildVariantScript(values: ReturnType<typeof mapFormValues>, lockDays: number | null, minMs: number, capture: CaptureMode = captureMode()): string {
+  return `(async function() {
+  var t0 = Date.now();
+  var diag = { steps: [], fieldResults: {}, timings: {} };
+  function mark(step) { diag.timings[step] = Date.now() - t0; }
+  ${TRANSFER_SUMMARY}
+
+${PAGE_HELPERS}
+  if (within(${minMs}) < ${minMs}) return JSON.stringify({ error: 'scrape_budget_exhausted', diag: diag });
+  if (!document.getElementById('${FIELD_IDS.fico}')) return JSON.stringify({ error: 'form_gone', diag: diag });
+  var shown = document.querySelectorAll('tr');
+  for (var ri = 0; ri < shown.length; ri++) shown[ri].setAttribute('data-stale', '1');
+
+  ${[...lockDaysStep(lockDays), ...prepayFieldSets(values)].join('\n  ')}
+  mark('fields_set');
+
+${searchAndExtract(capture)}})()`
+}
+
+// Leave the pricing route and come back to it: Angular tears the component down and
+// mounts a fresh, empty form. A page that does not come back clean is not reused.
+function resetRouteBlock(): string {
+  const pricingRoute = new URL(FLEX_URL).hash
+  return `
+  var leftRoute = window.location.hash;
+  window.location.hash = '#/';
+  await waitFor(function() { return !document.getElementById('${FIELD_IDS.fico}'); }, 2000);
+  window.location.hash = ${JSON.stringify(pricingRoute)};
+  var resetDone = await waitFor(function() {
+    return document.getElementById('${FIELD_IDS.fico}') && document.querySelector('button.btn-primary') && document.querySelectorAll('tr').length === 0;
+  }, 5000);
+  mark('reset');
+  diag.steps.push('reset_from: ' + leftRoute);
+  if (!resetDone) return JSON.stringify({ error: 'page_reset_failed', diag: diag });
+`
+}
+
+// ================= Parse Scraped Results =================
+function parseScrapedRates(rawRates: any[]): any[] {
+  return rawRates
+    .filter((r: any) => r.rate > 0 && r.price)
+    .map((r: any) => {
+      const priceStr = String(r.price).replace(/[^0-9.-]/g, '')
+      const paymentStr = String(r.payment).replace(/[^0-9.-]/g, '')
+      const adjStr = String(r.priceAdj).replace(/[^0-9.-]/g, '')
+      const costStr = String(r.costToBorrower || '').replace(/[^0-9.-]/g, '')
+      const feeStr = String(r.lenderFee || '').replace(/[^0-9.-]/g, '')
+      return {
+        rate: r.rate,
+        price: parseFloat(priceStr) || 0,
+        payment: parseFloat(paymentStr) || 0,
+        program: r.program || '',
+        lender: r.lender || '',
+        costToBorrower: parseFloat(costStr) || 0,
+        lenderFee: parseFloat(feeStr) || 0,
+        totalAdjustments: parseFloat(adjStr) || 0,
+      }
+    })
+    .sort((a: any, b: any) => a.rate - b.rate)
+}
+
+// ================= Variants =================
+// Brokers compare lock periods (lock-days offers 30 and 45) and prepay terms for the same
+// deal. A request may list them:
+//   { ...formData, variants: [{ lockDays: 30, prepayPeriod: '36mo' }, { lockDays: 45, prepayPeriod: '60mo' }] }
+// The scrape fills the form once and, for each further variant, changes only the lock and
+// prepay fields and searches again in the same page; the API path runs one search each.
+// Results come back under data.variants keyed "45d/60mo/5pct".
+//
+// All steps share one deadline, SCRAPE_BUDGET_MS into the mutation, so the mutation
+// returns before its round trip times out: a variant with too little time left comes
+// back with error 'scrape_budget_exhausted' next to the ones already priced. Requests
+// listing more variants than the measured step times fit in the budget are refused
+// (LP_MAX_VARIANTS overrides the cap).
+//   LP_SCRAPE_TIMEOUT_MS  Browserless round trip for a scrape mutation (default 50000,
+//                         inside the function's 60s)
+
+interface LpVariant {
+  key: string
+  lockDays: number
+  prepayPeriod: string
+  prepayType: string
+  values: ReturnType<typeof mapFormValues>
+}
+
+// Kept back from the round trip for the browser launch, the keep step and the response
+const SCRAPE_RESERVE_MS = 6000
+
+function scrapeTimeoutMs(): number {
+  const value = Number(process.env.LP_SCRAPE_TIMEOUT_MS)
+  return process.env.LP_SCRAPE_TIMEOUT_MS && Number.isFinite(value) ? value : 50000
+}
+
+function scrapeBudgetMs(): number {
+  return Math.max(0, scrapeTimeoutMs() - SCRAPE_RESERVE_MS)
+}
+
+// Running means (over the last 10) of this instance's scrapes: the mutation up to the
+// first variant's rows, and one further variant's re-search (its pageMs). The seeds are
+// deliberately slow and give way to the first measurement.
+const SCRAPE_WINDOW = 10
+const scrapeTimes = { firstMs: 20000, variantMs: 5000, firstSamples: 0, variantSamples: 0 }
+
+function recordScrapeTimes(runMs: number, run: ScrapeRun, variants: LpVariant[]): void {
+  const extra = variants.slice(1)
+    .map((_, i) => variantScraped(run, i + 1))
+    .filter(scraped => scraped?.captured || scraped?.rates)
+    .map(stepPageMs)
+    .filter((ms): ms is number => typeof ms === 'number')
+  const extraMs = extra.reduce((sum, ms) => sum + ms, 0)
+  scrapeTimes.firstSamples = Math.min(scrapeTimes.firstSamples + 1, SCRAPE_WINDOW)
+  scrapeTimes.firstMs += (runMs - extraMs - scrapeTimes.firstMs) / scrapeTimes.firstSamples
+  for (const ms of extra) {
+    scrapeTimes.variantSamples = Math.min(scrapeTimes.variantSamples + 1, SCRAPE_WINDOW)
+    scrapeTimes.variantMs += (ms - scrapeTimes.variantMs) / scrapeTimes.variantSamples
+  }
+}
+
+// LP_MAX_VARIANTS, else the first variant plus as many re-searches as the measured times
+// fit in the scrape budget
+function maxVariants(): number {
+  const value = Number(process.env.LP_MAX_VARIANTS)
+  if (process.env.LP_MAX_VARIANTS && Number.isFinite(value)) return value
+  return 1 + Math.max(0, Math.floor((scrapeBudgetMs() - scrapeTimes.firstMs) / scrapeTimes.variantMs))
+}
+
+// The request's variants in order, duplicates dropped; empty for a single quote
+function parseVariants(formData: any): LpVariant[] {
+  if (!Array.isArray(formData?.variants)) return []
+  const variants = new Map<string, LpVariant>()
+  for (const v of formData.variants) {
+    const lockDays = Number(v?.lockDays) > 0 ? Math.round(Number(v.lockDays)) : 30
+    const prepayPeriod = String(v?.prepayPeriod ?? formData.prepayPeriod ?? '0mo')
+    const prepayType = String(v?.prepayType ?? formData.prepayType ?? '5pct')
+    const key = `${lockDays}d/${prepayPeriod}/${prepayType}`
+    if (!variants.has(key)) {
+      variants.set(key, { key, lockDays, prepayPeriod, prepayType, values: mapFormValues({ ...formData, prepayPeriod, prepayType }) })
+    }
+  }
+  return [...variants.values()]
+}
+
+function variantResult(variant: LpVariant, result: { rateOptions: any[]; eligibleQM?: number; eligibleNonQM?: number }, extra: Record<string, unknown> = {}) {
+  return {
+    lockDays: variant.lockDays,
+    prepayPeriod: variant.prepayPeriod,
+    prepayType: variant.prepayType,
+    rateOptions: result.rateOptions,
+    totalRates: result.rateOptions.length,
+    eligibleQM: result.eligibleQM || 0,
+    eligibleNonQM: result.eligibleNonQM || 0,
+    ...extra,
+  }
+}
+
+// ================= Provider Modes =================
+// LP_MODE=bql  — Browserless scrape of the Flex UI only (default)
+// LP_MODE=api  — call the pricing/search JSON API directly, falling back to the scrape
+//               when it fails, comes back empty or a form value has no API mapping.
+//               Opt-in until the payload enums are checked against a captured request
+export function lpMode(requested?: unknown): 'api' | 'bql' {
+  return String(requested || process.env.LP_MODE || 'bql').toLowerCase() === 'api' ? 'api' : 'bql'
+}
+
+async function priceViaApi(values: ReturnType<typeof mapFormValues>, formData: any, timing: RequestTiming, variants: LpVariant[] = []) {
+  const started = Date.now()
+  if (variants.length > 0) return priceVariantsViaApi(formData, timing, variants, started)
+  const result = await searchPricing(values, formData, undefined, timing)
+  return {
+    source: 'lenderprice',
+    provider: 'api',
+    rateOptions: result.rateOptions,
+    totalRates: result.rateOptions.length,
+    eligibleQM: result.eligibleQM,
+    eligibleNonQM: result.eligibleNonQM,
+    debug: {
+      mappedValues: values,
+      searchId: result.searchId,
+      lockDays: result.lockDays,
+      programs: result.programs,
+      elapsedMs: Date.now() - started,
+    },
+  }
+}
+
+// One search per variant, side by side; the first variant's rows are also the top level
+async function priceVariantsViaApi(formData: any, timing: RequestTiming, variants: LpVariant[], started: number) {
+  const results = await Promise.all(variants.map(async v => {
+    const searchStarted = Date.now()
+    const result = await searchPricing(v.values, formData, undefined, timing, v.lockDays)
+    return { result, elapsedMs: Date.now() - searchStarted }
+  }))
+  const [first] = results
+  return {
+    source: 'lenderprice',
+    provider: 'api',
+    rateOptions: first.result.rateOptions,
+    totalRates: first.result.rateOptions.length,
+    eligibleQM: first.result.eligibleQM,
+    eligibleNonQM: first.result.eligibleNonQM,
+    variants: Object.fromEntries(variants.map((v, i) => [v.key, variantResult(v, results[i].result, { elapsedMs: results[i].elapsedMs })])),
+    debug: {
+      mappedValues: variants[0].values,
+      searchIds: results.map(r => r.result.searchId),
+      programs: first.result.programs,
+      elapsedMs: Date.now() - started,
+    },
+  }
+}
+
+// ================= Flex Pages =================
+// With LP_PAGE_POOL_SIZE set, a cold scrape keeps its browser open on the Flex page and
+// the next scrape reconnects to it (lp-page-pool.ts), skipping navigation, the Angular
+// boot and the cookie banner.
+
+const safeParseValue = (val: any) => {
+  if (!val) return null
+  try { return typeof val === 'string' ? JSON.parse(val) : val } catch { return null }
+}
+
+function postBql(endpoint: string, browserlessToken: string, query: string, timeoutMs = scrapeTimeoutMs()): Promise<Response> {
+  const sep = endpoint.includes('?') ? '&' : '?'
+  return fetch(`${endpoint}${sep}token=${browserlessToken}`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ query }),
+    signal: AbortSignal.timeout(timeoutMs),
+  })
+}
+
+// Keep the browser on the Flex page for the next scrape: warm pages always go back to
+// the pool, a cold one only when claimSlot() found room for it
+function keepPageStep(keep: boolean): string {
+  return keep ? `\n  keep: reconnect(timeout: ${pageReconnectMs()}) { browserQLEndpoint }` : ''
+}
+
+const PAGE_HEALTH_SCRIPT = `JSON.stringify({ ok: !!document.getElementById('${FIELD_IDS.fico}') && !!document.querySelector('button.btn-primary') })`
+
+// Health check for an idle pooled page: still showing the Flex pricing form?
+async function probePage(endpoint: string, browserlessToken: string): Promise<string | null> {
+  const query = `mutation PageHealth {
+  check: evaluate(content: ${JSON.stringify(PAGE_HEALTH_SCRIPT)}, timeout: 5000) { value }
+  keep: reconnect(timeout: ${pageReconnectMs()}) { browserQLEndpoint }
+}`
+  const resp = await postBql(endpoint, browserlessToken, query, 10000)
+  if (!resp.ok) return null
+  const result = await resp.json()
+  const next: string | null = result.data?.keep?.browserQLEndpoint || null
+  if (safeParseValue(result.data?.check?.value)?.ok) return next
+  // Off the Flex form: the pool drops it, so do not leave the browser open either
+  if (next) await closeBrowser(next, browserlessToken)
+  return null
+}
+
+interface ScrapeRun {
+  scraped: any
+  data: any
+  endpoint: string | null
+  error?: string
+  debug?: Record<string, unknown>
+}
+
+// One scrape mutation: the evaluate script's result and the endpoint of the browser it
+// kept open, if any (also on a failed scrape, so the caller can close it)
+async function runScrape(endpoint: string, browserlessToken: string, query: string, timing: RequestTiming): Promise<ScrapeRun> {
+  const bqlResp = await timing.measure('bql', () => postBql(endpoint, browserlessToken, query))
+  if (!bqlResp.ok) return { scraped: null, data: null, endpoint: null, error: `Browserless: ${bqlResp.status}`, debug: { bqlStatus: bqlResp.status } }
+
+  const bqlResult = await timing.measure('bql', () => bqlResp.json())
+  const data = bqlResult.data
+  const kept: string | null = data?.keep?.browserQLEndpoint || null
+  if (typeof data?.goto?.time === 'number') timing.add('goto', data.goto.time)
+  if (typeof data?.gotoReady?.time === 'number') timing.add('ready', data.gotoReady.time)
+  if (bqlResult.errors) return { scraped: null, data, endpoint: kept, error: 'BQL error', debug: { bqlErrors: bqlResult.errors } }
+
+  const scraped = safeParseValue(data?.results?.value)
+  if (!scraped) return { scraped: null, data, endpoint: kept, error: 'no evaluate value', debug: { noEvalValue: true } }
+  timing.addMarks('page', scraped.diag?.timings)
+  if (scraped.error) return { scraped: null, data, endpoint: kept, error: scraped.error, debug: { scrapeError: scraped.error } }
+
+  return { scraped, data, endpoint: kept }
+}
+
+// Evaluate steps for the variants after the first, each re-searching the page the step
+// before it left
+function variantSteps(variants: LpVariant[]): string {
+  const minMs = Math.round(scrapeTimes.variantMs)
+  return variants.slice(1)
+    .map((v, i) => `\n  variant${i + 1}: evaluate(content: ${JSON.stringify(buildVariantScript(v.values, v.lockDays, minMs))}, timeout: 30000) { value }`)
+    .join('')
+}
+
+function variantScraped(run: ScrapeRun, index: number): any {
+  return index === 0 ? run.scraped : safeParseValue(run.data?.[`variant${index}`]?.value)
+}
+
+// A step's time in the page, to its rows (captured or extracted)
+function stepPageMs(scraped: any): number | null {
+  return scraped?.diag?.timings?.captured ?? scraped?.diag?.timings?.extracted ?? null
+}
+
+// Did every variant step come back with rows (captured or scraped)?
+function allVariantsScraped(run: ScrapeRun, variants: LpVariant[]): boolean {
+  return variants.every((_, i) => {
+    const scraped = variantScraped(run, i)
+    return !!(scraped?.captured || scraped?.rates)
+  })
+}
+
+// Timed as 'pages' (pool checkout and health probe), 'bql' (Browserless round trips),
+// 'goto' and 'ready' (as Browserless reports them) and the evaluate script's own steps
+// from diag.timings: page.reset (warm pages), page.form_ready, page.fields_set (the
+// fill), page.results (search click to the first row), page.extracted... Further
+// variants' re-searches add up under variant.fields_set, variant.results...
+async function priceViaBrowserless(values: ReturnType<typeof mapFormValues>, browserlessToken: string, timing: RequestTiming, fallbackReason?: string, variants: LpVariant[] = []) {
+  // With variants, the first one fills the whole form
+  const first = variants[0]
+  if (first) values = first.values
+  const lockDays = first?.lockDays ?? null
+  const profile = blockProfile()
+  const started = Date.now()
+  const empty = (debug: Record<string, unknown>) => ({
+    source: 'lenderprice', provider: 'bql', rateOptions: [], totalRates: 0, debug: { ...debug, fallbackReason, blocking: profile },
+  })
+
+  let pageError: string | undefined
+  const close: PageCloser = endpoint => closeBrowser(endpoint, browserlessToken)
+  const pooled = await timing.measure('pages', () => acquirePage(endpoint => probePage(endpoint, browserlessToken)))
+  if (pooled) {
+    const warmQuery = `mutation WarmScrape {
+  results: evaluate(content: ${JSON.stringify(buildEvaluateScript(values, true, lockDays))}, timeout: 30000) { value }${variantSteps(variants)}${keepPageStep(true)}
+}`
+    const warmStarted = Date.now()
+    const warm = await runScrape(pooled.browserQLEndpoint, browserlessToken, warmQuery, timing)
+      .catch(err => ({ scraped: null, data: null, endpoint: null, error: err instanceof Error ? err.message : 'warm page error' } as ScrapeRun))
+    if (warm.scraped) recordScrapeTimes(Date.now() - warmStarted, warm, variants)
+    if (warm.scraped && allVariantsScraped(warm, variants)) {
+      await timing.measure('pages', () => releasePage(pooled, warm.endpoint, close))
+      return scrapeResponse(values, warm, fallbackReason, profile, pageInfo(pooled, true, started), timing, variants)
+    }
+    // Gone, did not reset cleanly, or a failed variant left it in any state: drop it
+    // and close the browser it kept
+    evictPage(pooled)
+    if (warm.endpoint) await timing.measure('pages', () => close(warm.endpoint!))
+    if (warm.scraped) return scrapeResponse(values, warm, fallbackReason, profile, pageInfo(pooled, true, started), timing, variants)
+    pageError = warm.error
+    console.warn(`[LP] Pooled Flex page ${pooled.id} unusable (${warm.error}); loading it cold`)
+  }
+
+  // Only ask Browserless to keep this browser when the pool has room for it
+  const claimed = isPagePoolEnabled() && claimSlot()
+  const coldQuery = `mutation ScrapeRates {
+  ${navigateSteps('goto', FLEX_URL, `[id="${FIELD_IDS.fico}"]`, profile)}
+  results: evaluate(content: ${JSON.stringify(buildEvaluateScript(values, false, lockDays))}, timeout: 30000) { value }${variantSteps(variants)}${keepPageStep(claimed)}
+}`
+  const coldStarted = Date.now()
+  const cold = await runScrape(BROWSERLESS_URL, browserlessToken, coldQuery, timing)
+    .catch(err => {
+      if (claimed) void addPage(null, close)
+      throw err
+    })
+  if (cold.scraped) recordScrapeTimes(Date.now() - coldStarted, cold, variants)
+  // Pool the page only when every step succeeded; otherwise give the slot back and close it
+  const reusable = !!cold.scraped && allVariantsScraped(cold, variants)
+  const page = claimed ? await timing.measure('pages', () => addPage(reusable ? cold.endpoint : null, close)) : null
+  if (!reusable && cold.endpoint) await timing.measure('pages', () => close(cold.endpoint!))
+  if (!cold.scraped) return empty({ ...cold.debug, pageError })
+
+  return scrapeResponse(values, cold, fallbackReason, profile, { ...pageInfo(page, false, started), pageError }, timing, variants)
+}
+
+function pageInfo(page: LpFlexPage | null, warm: boolean, started: number) {
+  return { id: page?.id ?? null, warm, uses: page?.uses ?? 0, elapsedMs: Date.now() - started }
+}
+
+// Each variant's rows. pageMs is its time in the page: for the first, filling the whole
+// form and searching; for each further one only the re-search, which is what it costs on
+// top of the first instead of a separate session (navigation, readyMs, plus a full fill).
+function scrapedVariants(run: ScrapeRun, variants: LpVariant[], timing: RequestTiming) {
+  return Object.fromEntries(variants.map((v, i) => {
+    const scraped = variantScraped(run, i)
+    if (i > 0) timing.addMarks('variant', scraped?.diag?.timings)
+    const pageMs = stepPageMs(scraped)
+    if (!scraped?.captured && !scraped?.rates) return [v.key, variantResult(v, { rateOptions: [] }, { pageMs, error: scraped?.error || 'no evaluate value' })]
+    const rows = scrapedRates(scraped, timing)
+    return [v.key, variantResult(v, rows, { pageMs, capture: rows.capture })]
+  }))
+}
+
+// One step's rows: from the captured pricing/search response when the page returned it
+// (every row, parsed as the direct API path does), else from the results table cells
+function scrapedRates(scraped: any, timing: RequestTiming) {
+  if (scraped.captured) {
+    const result = timing.measure('parse', () => parseSearchResponse(scraped.captured))
+    return { rateOptions: result.rateOptions, eligibleQM: result.eligibleQM, eligibleNonQM: result.eligibleNonQM, capture: 'network' }
+  }
+  const rateOptions = timing.measure('parse', () => parseScrapedRates(scraped.rates || []))
+  return { rateOptions, eligibleQM: scraped.eligibleQM || 0, eligibleNonQM: scraped.eligibleNonQM || 0, capture: 'dom' }
+}
+
+function scrapeResponse(values: ReturnType<typeof mapFormValues>, run: ScrapeRun, fallbackReason: string | undefined, profile: string, page: Record<string, unknown>, timing: RequestTiming, variants: LpVariant[] = []) {
+  const { scraped } = run
+  const { rateOptions, eligibleQM, eligibleNonQM, capture } = scrapedRates(scraped, timing)
+  const byVariant = variants.length > 0 ? scrapedVariants(run, variants, timing) : undefined
+
+  return {
+    source: 'lenderprice',
+    provider: 'bql',
+    rateOptions,
+    totalRates: rateOptions.length,
+    eligibleQM,
+    eligibleNonQM,
+    variants: byVariant,
+    debug: {
+      mappedValues: values,
+      fallbackReason,
+      // Where the rows came from: the captured search response, or the table
+      capture,
+      rawRateCount: scraped.rateCount,
+      rawRatesLength: (scraped.rates || []).length,
+      firstRawRate: (scraped.rates || [])[0] || null,
+      parsedCount: rateOptions.length,
+      // Interception profile, navigation-to-ready ms and diag.transfer's bytes
+      blocking: profile,
+      readyMs: readyMs(run.data, 'goto'),
+      page,
+      diag: scraped.diag || null,
+    },
+  }
+}
+
+// ================= Pricing =================
+// Identical scenarios in flight share one pricing run (single-flight.ts); `flight` sets
+// how long a follower waits for it
+export async function priceLenderPrice(formData: any, mode: 'api' | 'bql' = lpMode(), flight: FlightOptions = {}): Promise<any> {
+  const browserlessToken = process.env.BROWSERLESS_TOKEN || ''
+  if (mode === 'bql' && !browserlessToken) {
+    return { success: false, error: 'LP pricing not configured' }
+  }
+
+  try {
+    const timing = flight.timing ?? new RequestTiming('lenderprice')
+    return await singleFlight('lp', quoteCacheKey('lenderprice', mode, formData), () => runLenderPrice(formData, mode, browserlessToken, timing), flight)
+  } catch (error) {
+    // Only a follower's own timeout gets here; runLenderPrice reports its errors
+    return { success: false, error: error instanceof Error ? error.message : 'LP pricing unavailable' }
+  }
+}
+
+async function runLenderPrice(formData: any, mode: 'api' | 'bql', browserlessToken: string, timing: RequestTiming): Promise<any> {
+  try {
+    const values = timing.measure('map', () => mapFormValues(formData))
+    const variants = timing.measure('map', () => parseVariants(formData))
+    if (variants.length > maxVariants()) {
+      return { success: false, error: `Too many variants: ${variants.length} (max ${maxVariants()})` }
+    }
+    console.log('[LP] Mapped values:', JSON.stringify(values))
+    console.log('[LP] Raw form data keys:', Object.keys(formData).join(', '))
+
+    let fallbackReason: string | undefined
+    if (mode === 'api') {
+      try {
+        const data = await priceViaApi(values, formData, timing, variants)
+        const found = 'variants' in data ? Object.values(data.variants).some(v => v.totalRates > 0) : data.totalRates > 0
+        if (found || !browserlessToken) {
+          return { success: true, data }
+        }
+        fallbackReason = 'api returned no rates'
+      } catch (err) {
+        fallbackReason = err instanceof Error ? err.message : 'api error'
+        if (!browserlessToken) throw err
+      }
+      console.warn(`[LP] Direct API unusable (${fallbackReason}); falling back to Browserless scrape`)
+    }
+
+    const data = await priceViaBrowserless(values, browserlessToken, timing, fallbackReason, variants)
+    return { success: true, data }
+  } catch (error) {
+    console.error('LP pricing error:', error)
+    return {
+      success: false,
+      error: error instanceof Error ? error.message : 'LP pricing unavailable',
+    }
+  }
+}
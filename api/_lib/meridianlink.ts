@@ -0,0 +1,728 @@
+/**
+ * meridianlink.ts
+ *
+ * MeridianLink QuickPricer pricing shared by api/get-pricing.ts and the batch endpoint
+ * (api/get-pricing-batch.ts): OAuth client-credentials token, LOXml/SOAP request
+ * building, RunQuickPricerV2 and the response shaping the UI consumes. priceScenario
+ * returns the serialized response body so a quote-cache hit is served byte-for-byte.
+ */
+
+import { createHash } from 'node:crypto'
+import { performance } from 'node:perf_hooks'
+import { encodeRateOptions, type RateOptionEncoding } from './columnar.js'
+import { pooledFetch } from './http-pool.js'
+import { adjustmentTemplates, extractQuickPricerResult, parseSOAPResponse } from './quickpricer-parser.js'
+import { learnPricing, repriceWhatIf } from './llpa-engine.js'
+import { getCachedQuote, putCachedQuote, quoteCacheKey } from './quote-cache.js'
+import { classifyRateOptions, textClassifier } from './rate-classification.js'
+import { getRedisClient } from './redis.js'
+import { singleFlight, type FlightRole } from './single-flight.js'
+import { RequestTiming } from './timing.js'
+import { shapeMeridianLink, type AdjustmentFormat, type Verbosity } from './verbosity.js'
+
+// Overridable so the replay harness (scripts/replay-quickpricer.ts) can point at local stand-ins
+export const PRICER_URL = process.env.MERIDIANLINK_PRICER_URL || 'https://webservices.mortgage.meridianlink.com/los/webservice/QuickPricer.asmx'
+export const OAUTH_URL = process.env.MERIDIANLINK_OAUTH_URL || 'https://secure.mortgage.meridianlink.com/oauth/token'
+
+// ================= OAuth Token =================
+// One token per warm lambda, refreshed single-flight: concurrent callers on a cold
+// lambda (or at expiry) share one client_credentials POST instead of each sending their
+// own. Once a token is within MERIDIANLINK_TOKEN_REFRESH_AHEAD_SECONDS of expiry it is
+// still served while a replacement is fetched in the background, so steady traffic
+// never waits on OAuth. With MERIDIANLINK_TOKEN_REDIS_URL set, tokens are also kept in
+// that Redis-protocol store (or any TokenStore passed to setSharedTokenStore()) so a
+// fresh lambda starts with the token another one already fetched.
+
+export interface TokenStore {
+  get(key: string): Promise<string | null>
+  set(key: string, value: string, ttlMs: number): Promise<void>
+}
+
+interface CachedToken {
+  token: string
+  // Hard expiry (the provider's expires_in less a safety margin) and when to start renewing
+  expiresAt: number
+  refreshAt: number
+}
+
+// Never send a token this close to the provider's expiry
+const TOKEN_EXPIRY_MARGIN_MS = 60 * 1000
+
+let cachedToken: CachedToken | null = null
+let inflightToken: Promise<CachedToken> | null = null
+let sharedTokenStore: TokenStore | null | undefined
+
+export const oauthStats = {
+  cacheHits: 0,
+  sharedHits: 0,
+  fetches: 0,
+  coalesced: 0,
+  backgroundRefreshes: 0,
+  failures: 0,
+  sharedErrors: 0,
+}
+
+function tokenSettings() {
+  const ahead = process.env.MERIDIANLINK_TOKEN_REFRESH_AHEAD_SECONDS
+  return {
+    refreshAheadMs: (ahead === undefined || ahead === '' ? 240 : Number(ahead)) * 1000,
+    redisUrl: process.env.MERIDIANLINK_TOKEN_REDIS_URL || '',
+    sharedTimeoutMs: Number(process.env.MERIDIANLINK_TOKEN_SHARED_TIMEOUT_MS) || 150,
+  }
+}
+
+function oauthCredentials() {
+  return {
+    clientId: process.env.MERIDIANLINK_CLIENT_ID || process.env.CLIENT_ID || '',
+    clientSecret: process.env.MERIDIANLINK_CLIENT_SECRET || process.env.CLIENT_SECRET || '',
+  }
+}
+
+export function setSharedTokenStore(store: TokenStore | null): void {
+  sharedTokenStore = store
+}
+
+function sharedTokens(): TokenStore | null {
+  if (sharedTokenStore !== undefined) return sharedTokenStore
+  const { redisUrl } = tokenSettings()
+  if (!redisUrl) return null
+  const client = getRedisClient(redisUrl)
+  return {
+    async get(key) {
+      const value = await client.get(key)
+      return typeof value === 'string' ? value : null
+    },
+    async set(key, value, ttlMs) {
+      await client.set(key, value, ttlMs)
+    },
+  }
+}
+
+// Keyed per client id (hashed) so two MeridianLink accounts sharing a store never mix tokens
+function sharedTokenKey(clientId: string): string {
+  return `oauth:meridianlink:${createHash('sha256').update(`${OAUTH_URL} ${clientId}`).digest('hex').slice(0, 32)}`
+}
+
+function withTimeout<T>(promise: Promise<T>, ms: number): Promise<T> {
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => reject(new Error(`shared token store timed out after ${ms}ms`)), ms)
+    promise.then(
+      value => { clearTimeout(timer); resolve(value) },
+      err => { clearTimeout(timer); reject(err) },
+    )
+  })
+}
+
+async function readSharedToken(store: TokenStore, key: string): Promise<CachedToken | null> {
+  try {
+    const value = await withTimeout(store.get(key), tokenSettings().sharedTimeoutMs)
+    const entry = value ? JSON.parse(value) : null
+    if (entry?.token && entry.expiresAt > Date.now()) return entry
+  } catch (err) {
+    oauthStats.sharedErrors++
+    console.warn('Shared OAuth token read failed:', err instanceof Error ? err.message : err)
+  }
+  return null
+}
+
+async function writeSharedToken(store: TokenStore, key: string, entry: CachedToken): Promise<void> {
+  try {
+    await withTimeout(store.set(key, JSON.stringify(entry), entry.expiresAt - Date.now()), tokenSettings().sharedTimeoutMs * 4)
+  } catch (err) {
+    oauthStats.sharedErrors++
+    console.warn('Shared OAuth token write failed:', err instanceof Error ? err.message : err)
+  }
+}
+
+async function requestToken(): Promise<CachedToken> {
+  const { clientId, clientSecret } = oauthCredentials()
+
+  const response = await pooledFetch(OAUTH_URL, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+    body: new URLSearchParams({
+      grant_type: 'client_credentials',
+      client_id: clientId,
+      client_secret: clientSecret,
+    }),
+    signal: AbortSignal.timeout(10000),
+  })
+
+  if (!response.ok) {
+    throw new Error(`OAuth token request failed: HTTP ${response.status}`)
+  }
+
+  const data = await response.json()
+  oauthStats.fetches++
+  const now = Date.now()
+  const expiresAt = now + data.expires_in * 1000 - TOKEN_EXPIRY_MARGIN_MS
+  return {
+    token: data.access_token,
+    expiresAt,
+    // Short-lived tokens renew at half-life at the earliest, not on every request
+    refreshAt: Math.max(expiresAt - tokenSettings().refreshAheadMs, now + (expiresAt - now) / 2),
+  }
+}
+
+// Single-flight: every caller that arrives while a refresh is running gets the same promise.
+// A fresher token in the shared store (another lambda already renewed) is taken instead
+// of fetching a new one.
+function refreshToken(): Promise<CachedToken> {
+  if (inflightToken) {
+    oauthStats.coalesced++
+    return inflightToken
+  }
+  inflightToken = (async () => {
+    const store = sharedTokens()
+    const key = sharedTokenKey(oauthCredentials().clientId)
+    if (store) {
+      const shared = await readSharedToken(store, key)
+      if (shared && shared.refreshAt > Date.now()) {
+        oauthStats.sharedHits++
+        cachedToken = shared
+        return shared
+      }
+    }
+    const fresh = await requestToken()
+    cachedToken = fresh
+    if (store) await writeSharedToken(store, key, fresh)
+    return fresh
+  })()
+    .catch(err => {
+      oauthStats.failures++
+      throw err
+    })
+    .finally(() => { inflightToken = null })
+  return inflightToken
+}
+
+export async function getOAuthToken(): Promise<string> {
+  const now = Date.now()
+  if (cachedToken && cachedToken.expiresAt > now) {
+    oauthStats.cacheHits++
+    if (cachedToken.refreshAt <= now && !inflightToken) {
+      // Still valid: serve it and renew in the background; a failed renewal is retried
+      // by the next request (and blocks only once the token has actually expired)
+      oauthStats.backgroundRefreshes++
+      refreshToken().catch(err => console.warn('Background OAuth refresh failed:', err instanceof Error ? err.message : err))
+    }
+    return cachedToken.token
+  }
+  return (await refreshToken()).token
+}
+
+export function clearOAuthToken(): void {
+  cachedToken = null
+}
+
+// ================= ENUM MAPPING FUNCTIONS =================
+function mapLoanPurpose(purpose: string): number {
+  // MeridianLink sLPurposeTPe: 1=Purchase, 2=Refinance (all types)
+  // This lender's Non-QM config uses code 2 for both rate/term and cash-out refinance.
+  // Cash-out vs rate/term adjustments are stripped client-side based on user selection.
+  const map: Record<string, number> = { purchase: 1, refinance: 2, cashout: 2 }
+  return map[purpose] || 1
+}
+
+function mapOccupancy(occupancy: string): number {
+  const map: Record<string, number> = { primary: 0, secondary: 1, investment: 2 }
+  return map[occupancy] ?? 0
+}
+
+function mapPropertyType(type: string): number {
+  const map: Record<string, number> = { sfr: 1, condo: 2, townhouse: 3, '2unit': 4, '3unit': 5, '4unit': 6, '5-9unit': 7 }
+  return map[type] || 1
+}
+
+function mapIncomeDocType(documentationType: string): number {
+  const map: Record<string, number> = {
+    fullDoc: 1,
+    altDoc: 2,
+    bankStatement: 3,
+    bankStatement12: 3,
+    bankStatement24: 3,
+    bankStatementOther: 3,
+    taxReturns1Yr: 2,
+    assetDepletion: 4,
+    assetUtilization: 4,
+    dscr: 5,
+    voe: 6,
+    noRatio: 7,
+  }
+  return map[documentationType] || 1
+}
+
+function mapProdDocType(documentationType: string): number {
+  // sProdDocT dropdown values from MeridianLink QuickPricer
+  const map: Record<string, number> = {
+    fullDoc: 0,
+    altDoc: 0,
+    bankStatement: 13,
+    bankStatement12: 13,
+    bankStatement24: 14,
+    bankStatementOther: 17,
+    taxReturns1Yr: 18,
+    assetDepletion: 19,
+    assetUtilization: 19,
+    dscr: 20,
+    voe: 22,
+    noRatio: 21,
+  }
+  return map[documentationType] ?? 0
+}
+
+function mapCitizenship(citizenship: string): number {
+  const map: Record<string, number> = {
+    usCitizen: 0,
+    permanentResident: 1,
+    nonPermanentResident: 2,
+    foreignNational: 3,
+    itin: 4,
+  }
+  return map[citizenship] ?? 0
+}
+
+function mapDSCRRatio(dscrRatio: string): number {
+  const map: Record<string, number> = {
+    '>=1.250': 1,
+    '1.150-1.249': 2,
+    '1.00-1.149': 3,
+    '0.750-0.999': 4,
+    '0.500-0.749': 5,
+    'noRatio': 6,
+  }
+  return map[dscrRatio || '1.00-1.149'] || 3
+}
+
+function escapeXml(unsafe: string): string {
+  if (!unsafe) return ''
+  return String(unsafe).replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;').replace(/'/g, '&apos;')
+}
+
+export function normalizeFormData(data: any): any {
+  const norm = { ...data }
+  if (data.fico && !data.creditScore) norm.creditScore = data.fico
+  if (data.zipCode && !data.propertyZip) norm.propertyZip = data.zipCode
+  if (data.state && !data.propertyState) norm.propertyState = data.state
+  if (data.purchasePrice && !data.propertyValue) norm.propertyValue = data.purchasePrice
+
+  if (data.occupancy) {
+    const occ = data.occupancy.toLowerCase()
+    if (occ.includes('primary')) norm.occupancyType = 'primary'
+    else if (occ.includes('second')) norm.occupancyType = 'secondary'
+    else if (occ.includes('invest')) norm.occupancyType = 'investment'
+  }
+
+  if (data.propertyType) {
+    const prop = data.propertyType.toLowerCase()
+    if (prop.includes('single')) norm.propertyType = 'sfr'
+    else if (prop.includes('condo')) norm.propertyType = 'condo'
+    else if (prop.includes('town')) norm.propertyType = 'townhouse'
+    else if (prop.includes('2-4')) norm.propertyType = '2unit'
+    else if (prop.includes('5-9') || prop.includes('5+')) norm.propertyType = '5-9unit'
+  }
+
+  if (data.loanPurpose) {
+    const purp = data.loanPurpose.toLowerCase()
+    if (purp.includes('purchase')) norm.loanPurpose = 'purchase'
+    else if (purp.includes('refi')) norm.loanPurpose = 'refinance'
+    else if (purp.includes('cash')) norm.loanPurpose = 'cashout'
+  }
+
+  if (data.incomeDocType) {
+    const doc = data.incomeDocType.toLowerCase()
+    if (doc.includes('full')) norm.documentationType = 'fullDoc'
+    else if (doc.includes('dscr') || doc.includes('investor')) norm.documentationType = 'dscr'
+    else if (doc.includes('bank')) norm.documentationType = 'bankStatement'
+    else if (doc.includes('asset')) norm.documentationType = 'assetUtilization'
+    else if (doc.includes('voe')) norm.documentationType = 'voe'
+    else if (doc.includes('1099')) norm.documentationType = 'altDoc'
+    else if (doc.includes('no ratio') || doc.includes('noratio')) norm.documentationType = 'noRatio'
+  }
+
+  return norm
+}
+
+function buildLOXmlFormat(formData: any): string {
+  const loanAmount = Number(formData.loanAmount) || 400000
+  const propertyValue = Number(formData.propertyValue) || 500000
+  const downPaymentPct = ((propertyValue - loanAmount) / propertyValue) * 100
+  const docType = formData.documentationType || 'fullDoc'
+  const loanType = formData.loanType || 'nonqm'
+  const isDSCR = docType === 'dscr' || loanType === 'dscr'
+  const amort = formData.amortization || 'fixed'
+  const isARM = amort.startsWith('arm')
+  const isInterestOnly = formData.paymentType === 'io'
+  const lockDays = parseInt(formData.lockPeriod) || 30
+
+  // PPP (Prepayment Penalty) is ONLY for Investment properties
+  const isInvestment = formData.occupancyType === 'investment'
+  const includePPP = isInvestment // Only include PPP programs for Investment
+
+  return `<LOXmlFormat version="1.0">
+  <loan>
+    <field id="sSpZip">${escapeXml(formData.propertyZip || '')}</field>
+    <field id="sSpStatePe">${escapeXml(formData.propertyState || 'CA')}</field>
+    <field id="sSpCounty">${escapeXml(formData.propertyCounty || '')}</field>
+    <field id="sOccTPe">${isDSCR ? 2 : mapOccupancy(formData.occupancyType || 'primary')}</field>
+    <field id="sProdSpT">${mapPropertyType(formData.propertyType || 'sfr')}</field>
+    <field id="sProdIsSpInRuralArea">${formData.isRuralProperty || false}</field>
+    <field id="sProdIsNonwarrantableProj">${formData.isNonWarrantableProject || false}</field>
+    <field id="sLPurposeTPe">${mapLoanPurpose(formData.loanPurpose || 'purchase')}</field>
+    <field id="IsPurchaseLoanPanel">false</field>
+    <field id="sHouseValPe">${propertyValue}</field>
+    ${(formData.loanPurpose || 'purchase') === 'purchase' ? `<field id="sSalePricePe">${propertyValue}</field>` : ''}
+    <field id="sDownPmtPcPe">${downPaymentPct.toFixed(2)}</field>
+    <field id="sLAmtCalcPe">${loanAmount}</field>
+    <field id="sTotalRenovationCosts">0</field>
+    <field id="sProdImpoundT">${formData.impoundType === 'noescrow' ? 3 : 0}</field>
+    <field id="sProdRLckdDays">${lockDays}</field>
+    <field id="sCreditScoreEstimatePe">${formData.creditScore || 740}</field>
+    <field id="aBTotalScoreIsFthbQP">${formData.isFTHB || false}</field>
+    <field id="sCitizenshipResidencyT">${mapCitizenship(formData.citizenship || 'usCitizen')}</field>
+    <field id="aBTotalScoreIsITIN">${(formData.citizenship === 'itin' || formData.hasITIN) ? true : false}</field>
+    <field id="sIncomeDocumentationType">${mapIncomeDocType(isDSCR ? 'dscr' : docType)}</field>
+    <field id="sProdDocT">${mapProdDocType(isDSCR ? 'dscr' : docType)}</field>
+    ${isDSCR ? `<field id="aDSCR %">${mapDSCRRatio(formData.dscrRatio)}</field>` : ''}
+    ${isDSCR ? `<field id="aOccupancyRate">100</field>` : ''}
+    ${!isDSCR ? `<field id="sPrimAppTotNonspIPe">200000</field>` : ''}
+    <field id="sAppTotLiqAsset">5000000</field>
+    <field id="sProdFilterPrepayNone">true</field>
+    <field id="sProdFilterPrepayHasPPP">${includePPP}</field>
+    <field id="sProdFilterInclNoPPP">true</field>
+    <field id="sProdFilterInclPPP">${includePPP}</field>
+    <field id="sProdFilterPPP0">${includePPP}</field>
+    <field id="sProdIncludeNormalProc">true</field>
+    <field id="sProdFilterProdNonQM">true</field>
+    <field id="sProdFilterDue30Yrs">true</field>
+    <field id="sProdFilterDue40Yrs">true</field>
+    <field id="sProdFilterFinMethFixed">${!isARM}</field>
+    <field id="sProdFilterFinMethOther">${isARM}</field>
+    <field id="sProdFilterPmtTPI">${!isInterestOnly}</field>
+    <field id="sProdFilterPmtTIOnly">${isInterestOnly}</field>
+  </loan>
+</LOXmlFormat>`
+}
+
+// Quote cache key: the LOXml actually sent to MeridianLink plus the request fields the
+// response shaping in the handler reads (filters, LTV/payment math, debugSentValues)
+// and the verbosity / adjustment format / encoding the body was shaped for
+export function pricingCacheKey(formData: any, verbosity: Verbosity = 'debug', adjustments: AdjustmentFormat = 'inline', encoding: RateOptionEncoding = 'rows'): string {
+  return quoteCacheKey('meridianlink', buildLOXmlFormat(formData), {
+    verbosity,
+    adjustments,
+    encoding,
+    occupancyType: formData.occupancyType,
+    documentationType: formData.documentationType,
+    loanType: formData.loanType,
+    loanPurpose: formData.loanPurpose,
+    loanAmount: formData.loanAmount,
+    propertyValue: formData.propertyValue,
+    dscrRatio: formData.dscrRatio,
+    dscrValue: formData.dscrValue,
+    impoundType: formData.impoundType,
+    isNonWarrantableProject: formData.isNonWarrantableProject,
+  })
+}
+
+function buildSOAPRequest(authTicket: string, formData: any): string {
+  const loXml = buildLOXmlFormat(formData)
+
+  return `<?xml version="1.0" encoding="utf-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" xmlns:los="http://www.lendersoffice.com/los/webservices/">
+  <soap:Body>
+    <los:RunQuickPricerV2>
+      <los:authorizationTicket>${escapeXml(authTicket)}</los:authorizationTicket>
+      <los:xmlInput>${escapeXml(loXml)}</los:xmlInput>
+    </los:RunQuickPricerV2>
+  </soap:Body>
+</soap:Envelope>`
+}
+
+// ================= Pricing =================
+export interface PricingOptions {
+  // OAuth token fetched by the caller (e.g. once for a whole batch)
+  token?: string
+  timeoutMs?: number
+  bypassCache?: boolean
+  // How much of the response to build (see verbosity.ts); the full body by default
+  verbosity?: Verbosity
+  // 'table': adjustments once per LLPA template in data.adjustmentTable, referenced by
+  // each rate option's adjustmentsRef, instead of repeated per rate option
+  adjustments?: AdjustmentFormat
+  // 'columnar': each program's rate options as parallel columns (see columnar.ts)
+  encoding?: RateOptionEncoding
+  // Called before the MeridianLink round trip with an indicative body when the LLPA
+  // engine can re-price this scenario from one already priced (see llpa-engine.ts)
+  onIndicative?: (body: string) => void
+  // Stage timings of the caller's request (see timing.ts)
+  timing?: RequestTiming
+}
+
+export interface PricingOutcome {
+  // Serialized JSON response, success or { success: false, error }
+  body: string
+  cache: 'HIT' | 'MISS'
+  ageSeconds: number
+  // Quote-cache write for a fresh quote; await it after the response has gone out
+  stored: Promise<void> | null
+  // Answered by an identical scenario already in flight (see single-flight.ts)
+  coalesced?: boolean
+}
+
+const uncached = (payload: unknown, verbosity: Verbosity): PricingOutcome =>
+  ({ body: JSON.stringify(shapeMeridianLink(payload, verbosity)), cache: 'MISS', ageSeconds: 0, stored: null })
+
+function documentationKind(formData: any): { isDSCRRequest: boolean; isBankStmtRequest: boolean } {
+  const docType = formData.documentationType || 'fullDoc'
+  const loanType = formData.loanType || 'nonqm'
+  return {
+    isDSCRRequest: docType === 'dscr' || loanType === 'dscr',
+    isBankStmtRequest: ['bankStatement', 'bankStatement12', 'bankStatement24', 'bankStatementOther'].includes(docType),
+  }
+}
+
+// The parser's globalAdjustments repeat every AdjustmentsTable template after the
+// standalone adjustment items; the table format already carries the templates
+function globalAdjustments(result: any, format: AdjustmentFormat, keep: (adj: any) => boolean): any[] | undefined {
+  if (!result.globalAdjustments) return result.globalAdjustments
+  if (format === 'inline') return result.globalAdjustments.filter(keep)
+  const templated = new Set(Object.values(adjustmentTemplates(result)).flat())
+  const standalone = result.globalAdjustments.filter((adj: any) => !templated.has(adj) && keep(adj))
+  return standalone.length > 0 ? standalone : undefined
+}
+
+export async function priceScenario(input: any, options: PricingOptions = {}): Promise<PricingOutcome> {
+  const formData = normalizeFormData(input)
+  const verbosity = options.verbosity ?? 'debug'
+  const adjustmentFormat = options.adjustments ?? 'inline'
+  const encoding = options.encoding ?? 'rows'
+  const timing = options.timing ?? new RequestTiming('meridianlink')
+
+  // Sanitize: strip DSCR-specific fields when doc type is NOT DSCR
+  if (!documentationKind(formData).isDSCRRequest) {
+    delete formData.dscrRatio
+    delete formData.grossRent
+    delete formData.presentHousingExpense
+    delete formData.dscrEntityType
+  }
+
+  // Same scenario priced recently (and no rate sheet published since): serve it from cache
+  const cacheKey = pricingCacheKey(formData, verbosity, adjustmentFormat, encoding)
+  const cached = options.bypassCache ? null : await timing.measure('cache-read', () => getCachedQuote(cacheKey))
+  if (cached) return { body: cached.body, cache: 'HIT', ageSeconds: cached.ageSeconds, stored: null }
+
+  if (options.onIndicative) {
+    const payload = timing.measure('indicative', () => {
+      const whatIf = repriceWhatIf(formData)
+      return whatIf && pricingPayload(formData, whatIf.result, verbosity, adjustmentFormat, encoding, undefined, whatIf.indicative)
+    })
+    if (payload?.success) options.onIndicative(payload.body)
+  }
+
+  // An identical scenario already going to MeridianLink answers this one too. The
+  // follower waits no longer than its own timeout and leaves the cache write to the leader.
+  const timeoutMs = options.timeoutMs ?? 25000
+  let role = 'leader' as FlightRole
+  const outcome = await singleFlight('ml', cacheKey, () => quotePricer(formData, cacheKey, options.token, timeoutMs, verbosity, adjustmentFormat, encoding, timing), {
+    timeoutMs,
+    timing,
+    onJoin: joined => { role = joined },
+  })
+  return role === 'follower' ? { ...outcome, stored: null, coalesced: true } : outcome
+}
+
+// One RunQuickPricerV2 round trip for a cache miss, shaped and written to the quote cache
+async function quotePricer(formData: any, cacheKey: string, token: string | undefined, timeoutMs: number, verbosity: Verbosity, adjustmentFormat: AdjustmentFormat, encoding: RateOptionEncoding, timing: RequestTiming): Promise<PricingOutcome> {
+  const oauthToken = token || await timing.measure('oauth', () => getOAuthToken())
+  const authTicket = `Bearer ${oauthToken}`
+
+  const soapRequest = timing.measure('soap-build', () => buildSOAPRequest(authTicket, formData))
+
+  // ml-network runs to the response headers, ml-body reads (and gunzips) the SOAP body.
+  // Both go over the origin's keep-alive pool (see http-pool.ts).
+  const response = await timing.measure('ml-network', () => pooledFetch(PRICER_URL, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'text/xml; charset=utf-8',
+      'SOAPAction': 'http://www.lendersoffice.com/los/webservices/RunQuickPricerV2',
+    },
+    body: soapRequest,
+    signal: AbortSignal.timeout(timeoutMs),
+  }))
+
+  const responseText = await timing.measure('ml-body', () => response.text())
+
+  if (!response.ok) {
+    return uncached({ success: false, error: `MeridianLink returned HTTP ${response.status}` }, verbosity)
+  }
+
+  if (responseText.includes('status=&quot;Error&quot;') || responseText.includes('status="Error"')) {
+    // Handle both regular XML and double-escaped XML (MeridianLink returns double-escaped)
+    const errorMatch = responseText.match(/Error[>"']>([^<]+)</) || responseText.match(/Error&gt;([^&]+)&lt;/)
+    const mlError = errorMatch?.[1] || 'Unknown pricing error'
+    return uncached({ success: false, error: mlError }, verbosity)
+  }
+
+  const resultXml = timing.measure('extract', () => extractQuickPricerResult(responseText))
+
+  // The single-pass parser decodes the double-escaped payload as it goes
+  const result = timing.measure('parse', () => parseSOAPResponse(resultXml))
+
+  // Teach the LLPA engine before the response shaping filters the result in place
+  timing.measure('llpa-learn', () => learnPricing(formData, result))
+  const { success, body } = pricingPayload(formData, result, verbosity, adjustmentFormat, encoding, timing)
+  return { body, cache: 'MISS', ageSeconds: 0, stored: success ? putCachedQuote(cacheKey, body) : null }
+}
+
+// Response body for a parsed QuickPricer result: eligible programs for the scenario,
+// adjustments filtered (and tabled) and rate options encoded per the request, best
+// program up top. `indicative` marks a body re-priced in-process by the LLPA engine
+// rather than by MeridianLink. Timed as 'filter' (eligibility, adjustments, classification)
+// and 'serialize' (shaping, encoding and JSON.stringify).
+function pricingPayload(formData: any, result: any, verbosity: Verbosity, adjustmentFormat: AdjustmentFormat, encoding: RateOptionEncoding, timing?: RequestTiming, indicative?: unknown): { success: boolean; body: string } {
+  const filterStarted = performance.now()
+  const { isDSCRRequest, isBankStmtRequest } = documentationKind(formData)
+  // Every description is classified once (rate-classification.ts) for all the filters below
+  const classOf = textClassifier()
+  const unpriced = (payload: unknown) => ({ success: false, body: JSON.stringify(shapeMeridianLink(payload, verbosity)) })
+
+  // Filter programs: include Eligible OR programs with Available rate options
+  let eligiblePrograms = result.programs.filter((p: any) => {
+    if (p.status === 'Eligible') return true
+    // Also include programs that have rate options marked Available
+    if (p.rateOptions && p.rateOptions.some((ro: any) => ro.status === 'Available')) return true
+    return false
+  })
+
+  // For Primary/Secondary: filter out PPP programs (PPP is Investment only)
+  // BUT allow "0MO PPP" / "0 YR PPP" which means NO prepayment penalty
+  const isInvestment = formData.occupancyType === 'investment'
+  if (!isInvestment) {
+    // Filter out DSCR programs for Primary/Secondary - DSCR is Investment only
+    eligiblePrograms = eligiblePrograms.filter((p: any) => !classOf(p.programName || p.name).isDSCR && !classOf(p.description).isDSCR)
+
+    // Actual PPP only: 0MO / 0 YR PPP means no penalty
+    eligiblePrograms = eligiblePrograms.filter((p: any) => {
+      // Check program name
+      if (classOf(p.programName).hasPPP || classOf(p.name).hasPPP) return false
+      // Check description
+      if (classOf(p.description).hasPPP) return false
+      // Also filter rate options to remove any with actual PPP in descriptions
+      if (p.rateOptions) {
+        p.rateOptions = p.rateOptions.filter((ro: any) => !classOf(ro.description).hasPPP)
+      }
+      return p.rateOptions && p.rateOptions.length > 0
+    })
+  }
+
+  // Strip irrelevant adjustments — do NOT rewrite descriptions.
+  // MeridianLink returns correct adjustment amounts for the DSCR ratio sent.
+  // Descriptions and amounts are passed through as-is from the API.
+  const keepAdjustment = (adj: any): boolean => {
+    const cls = classOf(adj.description)
+    // Strip DSCR adjustments when doc type is NOT DSCR
+    if (!isDSCRRequest && cls.isDSCR) return false
+    // Strip BANK STMT adjustments when doc type is NOT bank statement
+    if (!isBankStmtRequest && cls.isBankStatement) return false
+    // Strip CASHOUT adjustments when loan purpose is rate/term refi
+    if (formData.loanPurpose === 'refinance' && cls.isCashout) return false
+    return true
+  }
+
+  // Rate options on the same LLPA template share the parser's array; filter each array
+  // once so they keep sharing the result, and for the table format reference it by ID
+  const templateIds = new Map<any[], string>(Object.entries(adjustmentTemplates(result)).map(([id, adjustments]) => [adjustments, id]))
+  const filtered = new Map<any[], { id: string; adjustments: any[] }>()
+  const adjustmentTable: Record<string, any[]> = {}
+  eligiblePrograms.forEach((p: any) => {
+    if (!p.rateOptions) return
+    p.rateOptions.forEach((ro: any) => {
+      if (!ro.adjustments) return
+      let entry = filtered.get(ro.adjustments)
+      if (!entry) {
+        // Adjustments nested in the RateOption itself have no template ID
+        entry = { id: templateIds.get(ro.adjustments) ?? `rate-${filtered.size + 1}`, adjustments: ro.adjustments.filter(keepAdjustment) }
+        filtered.set(ro.adjustments, entry)
+      }
+      if (adjustmentFormat === 'table') {
+        adjustmentTable[entry.id] = entry.adjustments
+        delete ro.adjustments
+        ro.adjustmentsRef = entry.id
+      } else {
+        ro.adjustments = entry.adjustments
+      }
+    })
+  })
+
+  if (eligiblePrograms.length === 0) {
+    return unpriced({
+      success: false,
+      error: 'No programs found. Please adjust your scenario.',
+      allPrograms: result.programs.map((p: any) => ({
+        programName: p.programName,
+        status: p.status,
+        rateOptionsCount: p.rateOptions?.length || 0,
+        sampleRateDesc: p.rateOptions?.[0]?.description || 'N/A',
+      })),
+      debug: {
+        isInvestment,
+        occupancyType: formData.occupancyType,
+        eligibleCount: result.programs.filter((p: any) => p.status === 'Eligible').length,
+        debugXmlSample: result.debugXmlSample,
+      }
+    })
+  }
+
+  const pppIndex = classifyRateOptions(eligiblePrograms, classOf)
+
+  const loanAmount = Number(formData.loanAmount) || 400000
+  const topProgram = eligiblePrograms[0]
+  const rate = topProgram.rate
+  const monthlyPayment = rate > 0
+    ? (loanAmount * (rate / 1200)) / (1 - Math.pow(1 + (rate / 1200), -(topProgram.term || 360)))
+    : 0
+  const ltvRatio = (loanAmount / (Number(formData.propertyValue) || 500000)) * 100
+
+  // Debug: capture what was sent to MeridianLink
+  const dscrCodeSent = isDSCRRequest ? mapDSCRRatio(formData.dscrRatio) : null
+  const escrowWaived = formData.impoundType === 'noescrow'
+
+  const serializeStarted = performance.now()
+  timing?.add('filter', serializeStarted - filterStarted)
+  const body = JSON.stringify(encodeRateOptions(shapeMeridianLink({
+    success: true,
+    data: {
+      rate: topProgram.rate,
+      apr: topProgram.apr,
+      monthlyPayment: Math.round(monthlyPayment),
+      points: topProgram.points,
+      closingCosts: topProgram.totalClosingCost || '',
+      ltvRatio,
+      programName: topProgram.programName,
+      investorName: topProgram.investorName || '',
+      programs: eligiblePrograms,
+      adjustmentTable: adjustmentFormat === 'table' ? adjustmentTable : undefined,
+      pppIndex,
+      totalPrograms: eligiblePrograms.length,
+      source: 'meridianlink',
+      debugSentValues: {
+        dscrRatio: formData.dscrRatio || null,
+        dscrCode: dscrCodeSent,
+        dscrValue: formData.dscrValue || null,
+        impoundType: formData.impoundType,
+        escrowWaived: escrowWaived,
+        loanPurpose: formData.loanPurpose,
+        occupancyType: formData.occupancyType,
+        documentationType: formData.documentationType,
+        isNonWarrantable: formData.isNonWarrantableProject || false,
+      },
+      globalAdjustments: globalAdjustments(result, adjustmentFormat, keepAdjustment),
+      debugXmlSample: result.debugXmlSample,
+      debugAdjustmentsSection: result.debugAdjustmentsSection,
+      indicative,
+    },
+  }, verbosity), encoding))
+  timing?.add('serialize', performance.now() - serializeStarted)
+  return { success: true, body }
+}
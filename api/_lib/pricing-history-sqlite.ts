@@ -0,0 +1,52 @@
+/**
+ * pricing-history-sqlite.ts
+ *
+ * Server-side persistence for the pricing history (PricingMemoryStore in
+ * src/lib/PricingLogic.ts) in a SQLite file via node:sqlite. Entries are rows keyed by
+ * id, ordered by insertion, so a store attached to the same file reloads its most
+ * recent entries. Writes are synchronous statements; callers already queue them.
+ */
+
+import { DatabaseSync } from 'node:sqlite'
+import type { PricingHistoryBackend, PricingMemoryEntry } from '../../src/lib/PricingLogic.js'
+
+export function sqliteHistoryBackend(path: string = process.env.PRICING_HISTORY_SQLITE_PATH || ':memory:'): PricingHistoryBackend {
+  const db = new DatabaseSync(path)
+  db.exec(`
+    PRAGMA journal_mode = WAL;
+    PRAGMA synchronous = NORMAL;
+    CREATE TABLE IF NOT EXISTS pricing_history (
+      seq INTEGER PRIMARY KEY AUTOINCREMENT,
+      id TEXT NOT NULL UNIQUE,
+      entry TEXT NOT NULL
+    );
+  `)
+  const insert = db.prepare('INSERT OR REPLACE INTO pricing_history (id, entry) VALUES (?, ?)')
+  const remove = db.prepare('DELETE FROM pricing_history WHERE id = ?')
+  const recent = db.prepare('SELECT entry FROM (SELECT seq, entry FROM pricing_history ORDER BY seq DESC LIMIT ?) ORDER BY seq')
+
+  return {
+    async load(limit: number): Promise<PricingMemoryEntry[]> {
+      return recent.all(limit).map((row: any) => {
+        const entry = JSON.parse(row.entry)
+        return { ...entry, timestamp: new Date(entry.timestamp) }
+      })
+    },
+    async put(entry: PricingMemoryEntry): Promise<void> {
+      insert.run(entry.id, JSON.stringify(entry))
+    },
+    async delete(ids: string[]): Promise<void> {
+      db.exec('BEGIN')
+      try {
+        for (const id of ids) remove.run(id)
+        db.exec('COMMIT')
+      } catch (error) {
+        db.exec('ROLLBACK')
+        throw error
+      }
+    },
+    async clear(): Promise<void> {
+      db.exec('DELETE FROM pricing_history')
+    },
+  }
+}
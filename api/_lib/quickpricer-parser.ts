@@ -0,0 +1,512 @@
+/**
+ * quickpricer-parser.ts
+ *
+ * Parsers for the RunQuickPricerV2Result payload returned by MeridianLink.
+ * The payload arrives double-escaped inside the SOAP envelope, so a tag opens with
+ * `&amp;lt;`, attribute quotes are `&amp;quot;` and so on.
+ *
+ * parseSOAPResponse walks the escaped string once. Tags are located by their escaped
+ * form, only the attribute text that is actually read gets decoded, and programs,
+ * rate options and the AdjustmentsTable template map are assembled as their closing
+ * tags go by. Its JSON output is byte-identical to parseSOAPResponseRegex, the
+ * original unescape-then-regex implementation, which lives on as the reference in
+ * scripts/lib/quickpricer-regex.ts.
+ */
+
+// ============================================================================
+// ENTITY DECODING
+// ============================================================================
+
+// Decoding once per position is equivalent to running unescapeXml twice: the second
+// pass can only see an entity whose '&' came from an `&amp;` in the first.
+function decodeEntityAt(xml: string, pos: number): [string, number] | null {
+  if (xml.startsWith('&amp;', pos)) {
+    if (xml.startsWith('quot;', pos + 5)) return ['"', 10]
+    if (xml.startsWith('amp;', pos + 5)) return ['&', 9]
+    if (xml.startsWith('lt;', pos + 5)) return ['<', 8]
+    if (xml.startsWith('gt;', pos + 5)) return ['>', 8]
+    if (xml.startsWith('apos;', pos + 5)) return ["'", 10]
+    return ['&', 5]
+  }
+  if (xml.startsWith('&quot;', pos)) return ['"', 6]
+  if (xml.startsWith('&lt;', pos)) return ['<', 4]
+  if (xml.startsWith('&gt;', pos)) return ['>', 4]
+  if (xml.startsWith('&apos;', pos)) return ["'", 6]
+  return null
+}
+
+// A decoded '<', '>' or '"' can be literal, escaped once or escaped twice
+const LT_RE = /<|&(?:amp;)?lt;/g
+const GT_RE = />|&(?:amp;)?gt;/g
+const QUOTE_RE = /"|&(?:amp;)?quot;/g
+
+function decodeRange(xml: string, from: number, to: number): string {
+  let amp = xml.indexOf('&', from)
+  if (amp === -1 || amp >= to) return xml.slice(from, to)
+  // Attribute text is normally escaped quotes and nothing else
+  const quoted = xml.slice(from, to).replaceAll('&amp;quot;', '"')
+  if (quoted.indexOf('&') === -1) return quoted
+  let out = ''
+  let last = from
+  while (amp !== -1 && amp < to) {
+    const entity = decodeEntityAt(xml, amp)
+    if (entity && amp + entity[1] <= to) {
+      out += xml.slice(last, amp) + entity[0]
+      last = amp + entity[1]
+      amp = xml.indexOf('&', last)
+    } else {
+      amp = xml.indexOf('&', amp + 1)
+    }
+  }
+  return out + xml.slice(last, to)
+}
+
+// First `length` decoded characters of [from, to). An entity is at most 10 chars wide.
+function decodePrefix(xml: string, from: number, to: number, length: number): string {
+  return decodeRange(xml, from, Math.min(to, from + length * 10)).substring(0, length)
+}
+
+function findDecoded(re: RegExp, xml: string, from: number): { index: number; length: number } | null {
+  re.lastIndex = from
+  const match = re.exec(xml)
+  return match ? { index: match.index, length: match[0].length } : null
+}
+
+function decodedLengthAt(xml: string, pos: number, char: '>' | '"'): number {
+  const entity = char === '>' ? 'gt;' : 'quot;'
+  if (xml.charCodeAt(pos) === char.charCodeAt(0)) return 1
+  if (xml.startsWith('&' + entity, pos)) return entity.length + 1
+  if (xml.startsWith('&amp;' + entity, pos)) return entity.length + 5
+  return 0
+}
+
+function unescapeHtmlEntities(text: string): string {
+  if (!text) return ''
+  return text.replace(/&gt;/g, '>').replace(/&lt;/g, '<').replace(/&quot;/g, '"').replace(/&apos;/g, "'").replace(/&amp;/g, '&')
+}
+
+// Same matching rules as the original per-call RegExp, compiled once per attribute name
+const attrPatterns = new Map<string, RegExp>()
+
+function getAttr(tag: string, attr: string): string {
+  let pattern = attrPatterns.get(attr)
+  if (!pattern) {
+    pattern = new RegExp(`${attr}="([^"]*)"`, 'i')
+    attrPatterns.set(attr, pattern)
+  }
+  const match = tag.match(pattern)
+  return match ? match[1] : ''
+}
+
+// ============================================================================
+// TOKENIZER
+// ============================================================================
+
+const Tag = {
+  Program: 1,
+  ProgramClose: 2,
+  RateOption: 3,
+  RateOptionClose: 4,
+  Adjustment: 5,
+  AdjustmentClose: 6,
+  AdjustmentItem: 7,
+  PricingAdjustment: 8,
+  AdjustmentsTable: 9,
+  AdjustmentsTableClose: 10,
+} as const
+type Tag = typeof Tag[keyof typeof Tag]
+
+// Opening tags need whitespace after the name; closing tags need '>' right after it
+const TAG_NAMES: [Tag, string, boolean][] = [
+  [Tag.AdjustmentsTableClose, '/adjustmentstable', false],
+  [Tag.AdjustmentClose, '/adjustment', false],
+  [Tag.RateOptionClose, '/rateoption', false],
+  [Tag.ProgramClose, '/program', false],
+  [Tag.AdjustmentsTable, 'adjustmentstable', false],
+  [Tag.AdjustmentItem, 'adjustmentitem', true],
+  [Tag.Adjustment, 'adjustment', true],
+  [Tag.PricingAdjustment, 'pricingadjustment', true],
+  [Tag.RateOption, 'rateoption', true],
+  [Tag.Program, 'program', true],
+]
+
+interface TagEvent {
+  tag: Tag
+  start: number   // offset of the escaped '<'
+  nameEnd: number // offset just past the tag name
+  gt: number      // offset of the first escaped '>' after the name, -1 if none
+  gtEnd: number
+}
+
+// Matches JS RegExp \s
+function isSpace(c: number): boolean {
+  return c === 32 || (c >= 9 && c <= 13) || c === 0xa0 || c === 0x1680 || (c >= 0x2000 && c <= 0x200a)
+    || c === 0x2028 || c === 0x2029 || c === 0x202f || c === 0x205f || c === 0x3000 || c === 0xfeff
+}
+
+// ASCII-only case folding, same as a non-unicode /i RegExp
+function startsWithIgnoreCase(xml: string, pos: number, lower: string): boolean {
+  for (let i = 0; i < lower.length; i++) {
+    const c = xml.charCodeAt(pos + i)
+    const t = lower.charCodeAt(i)
+    if (c !== t && !(t >= 97 && t <= 122 && c === t - 32)) return false
+  }
+  return true
+}
+
+function readTag(xml: string, nameStart: number): { tag: Tag; nameEnd: number; closeLength: number } | null {
+  const first = xml.charCodeAt(nameStart) | 0x20
+  if (first !== 0x2f && first !== 0x61 && first !== 0x70 && first !== 0x72) return null // '/', a, p, r
+  for (const [tag, name, isOpen] of TAG_NAMES) {
+    if (!startsWithIgnoreCase(xml, nameStart, name)) continue
+    const nameEnd = nameStart + name.length
+    if (isOpen) {
+      if (isSpace(xml.charCodeAt(nameEnd))) return { tag, nameEnd, closeLength: 0 }
+    } else {
+      const closeLength = decodedLengthAt(xml, nameEnd, '>')
+      if (closeLength) return { tag, nameEnd, closeLength }
+    }
+  }
+  return null
+}
+
+// Index of the first `</Tag>` event at or after `from` whose start is >= minStart
+function nextClose(events: TagEvent[], closes: Int32Array, from: number, minStart: number): number {
+  let j = from < closes.length ? closes[from] : -1
+  while (j !== -1 && events[j].start < minStart) j = j + 1 < closes.length ? closes[j + 1] : -1
+  return j
+}
+
+function indexCloses(events: TagEvent[], tag: Tag): Int32Array {
+  const closes = new Int32Array(events.length)
+  let next = -1
+  for (let i = events.length - 1; i >= 0; i--) {
+    if (events[i].tag === tag) next = i
+    closes[i] = next
+  }
+  return closes
+}
+
+// ============================================================================
+// PARSER
+// ============================================================================
+
+// AdjustmentsTable templates of each parse result, by template ID. Rate options share
+// their template's array; kept off the result so its JSON stays as it was.
+const templatesByResult = new WeakMap<object, Record<string, any[]>>()
+
+export function adjustmentTemplates(result: any): Record<string, any[]> {
+  return (result && templatesByResult.get(result)) || {}
+}
+
+export function parseSOAPResponse(xml: string): any {
+  const programs: any[] = []
+  let debugXmlSample = ''
+  let debugAdjustmentsSection = 'No AdjustmentsTable found'
+
+  // Standalone <Adjustment>/<PricingAdjustment> items anywhere in the document,
+  // followed by every AdjustmentsTable template item (same order as before)
+  const itemAdjustments: any[] = []
+  const tableAdjustments: any[] = []
+  const adjustmentsByTemplateId: Record<string, any[]> = {}
+
+  // Template lookups wait until the whole document (and its AdjustmentsTable) is read
+  const pendingRateOptions: { option: any; templateId: string; legacy: any[] }[] = []
+
+  // First escaped '>' at or after pos; memoized because nested tags share it
+  let gtFrom = -1
+  let gtAt = -1
+  let gtLength = 0
+  const gtAfter = (pos: number): number => {
+    if (gtFrom === -1 || pos < gtFrom || (gtAt !== -1 && pos > gtAt)) {
+      const found = findDecoded(GT_RE, xml, pos)
+      gtFrom = pos
+      gtAt = found ? found.index : -1
+      gtLength = found ? found.length : 0
+    }
+    return gtAt
+  }
+
+  // ---- AdjustmentsTable ----
+  const readTable = (events: TagEvent[], tableStart: number, contentStart: number, contentEnd: number, tableEnd: number) => {
+    debugAdjustmentsSection = decodePrefix(xml, tableStart, tableEnd, 3000)
+    const closes = indexCloses(events, Tag.AdjustmentClose)
+    let last = contentStart
+
+    for (let i = 0; i < events.length; i++) {
+      const block = events[i]
+      if (block.tag !== Tag.Adjustment || block.start < last) continue
+
+      // <Adjustment\s+lLpTemplateId="([^"]+)"[^>]*>
+      let pos = block.nameEnd
+      while (isSpace(xml.charCodeAt(pos))) pos++
+      if (!startsWithIgnoreCase(xml, pos, 'llptemplateid=')) continue
+      pos += 14
+      const openQuote = decodedLengthAt(xml, pos, '"')
+      if (!openQuote) continue
+      const idStart = pos + openQuote
+      const closeQuote = findDecoded(QUOTE_RE, xml, idStart)
+      if (!closeQuote || closeQuote.index === idStart || closeQuote.index >= contentEnd) continue
+      const afterQuote = closeQuote.index + closeQuote.length
+      let gt = block.gt
+      let gtEnd = block.gtEnd
+      if (gt !== -1 && afterQuote > gt) {
+        const found = findDecoded(GT_RE, xml, afterQuote)
+        gt = found ? found.index : -1
+        gtEnd = found ? found.index + found.length : -1
+      }
+      if (gt === -1 || gt >= contentEnd) continue
+
+      const j = nextClose(events, closes, i + 1, gtEnd)
+      if (j === -1) continue
+      const bodyEnd = events[j].start
+      const templateId = decodeRange(xml, idStart, closeQuote.index)
+      const templateAdjustments: any[] = []
+
+      let itemLast = gtEnd
+      for (let k = i + 1; k < j; k++) {
+        const item = events[k]
+        if (item.tag !== Tag.AdjustmentItem || item.start < itemLast) continue
+        if (item.gt === -1 || item.gt >= bodyEnd || item.gt <= item.nameEnd + 1) continue
+        itemLast = item.gtEnd
+        const adjAttrs = decodeRange(xml, item.nameEnd + 1, item.gt)
+        const desc = getAttr(adjAttrs, 'Description')
+        // Skip hidden adjustments (like Price Group)
+        if (getAttr(adjAttrs, 'IsHidden') === 'True') continue
+
+        // Point is in MeridianLink price convention (positive = better for borrower);
+        // negate to LLPA convention (positive = cost). Rate is negated for consistency.
+        const pointStr = getAttr(adjAttrs, 'Point') || '0'
+        const priceAdj = -(parseFloat(pointStr.replace('%', '')) || 0)
+        const rateStr = getAttr(adjAttrs, 'Rate') || '0'
+        const rateAdj = -(parseFloat(rateStr.replace('%', '')) || 0)
+
+        if (desc) {
+          templateAdjustments.push({
+            description: unescapeHtmlEntities(desc),
+            amount: priceAdj,
+            rateAdj: rateAdj,
+          })
+        }
+      }
+
+      adjustmentsByTemplateId[templateId] = templateAdjustments
+      tableAdjustments.push(...templateAdjustments)
+      last = events[j].gtEnd
+    }
+  }
+
+  // ---- Program ----
+  const readProgram = (open: TagEvent, events: TagEvent[], bodyEnd: number) => {
+    const bodyStart = open.gtEnd
+    if (!debugXmlSample && bodyEnd > bodyStart) {
+      debugXmlSample = decodePrefix(xml, bodyStart, bodyEnd, 2000)
+    }
+
+    const progAttrs = decodeRange(xml, open.nameEnd + 1, open.gt)
+    const programName = getAttr(progAttrs, 'Name')
+    const status = getAttr(progAttrs, 'Status')
+    const term = getAttr(progAttrs, 'Term')
+    const finMethod = getAttr(progAttrs, 'FinMethT')
+    const loanType = getAttr(progAttrs, 'LoanType')
+    const parRate = getAttr(progAttrs, 'ParRate')
+    const parPoints = getAttr(progAttrs, 'ParPoints')
+    const investor = getAttr(progAttrs, 'ProductType')
+    const lockDays = getAttr(progAttrs, 'sProdRLckdDays')
+
+    // Every <Adjustment> in the program body, including ones nested in RateOptions
+    const programAdjustments: any[] = []
+    let adjLast = bodyStart
+    for (const adj of events) {
+      if (adj.tag !== Tag.Adjustment || adj.start < adjLast || adj.gt === -1 || adj.gt >= bodyEnd) continue
+      adjLast = adj.gtEnd
+      const adjAttrs = decodeRange(xml, adj.nameEnd + 1, adj.gt)
+      programAdjustments.push({
+        description: getAttr(adjAttrs, 'Description') || getAttr(adjAttrs, 'Name') || getAttr(adjAttrs, 'Desc'),
+        amount: -(parseFloat(getAttr(adjAttrs, 'Amount')) || parseFloat(getAttr(adjAttrs, 'Price')) || parseFloat(getAttr(adjAttrs, 'PriceAdj')) || 0),
+        rateAdj: -(parseFloat(getAttr(adjAttrs, 'RateAdj')) || parseFloat(getAttr(adjAttrs, 'Rate')) || 0),
+      })
+    }
+
+    // <RateOption .../> or <RateOption ...>...</RateOption>. Like the original regex, the
+    // paired form wins whenever a later </RateOption> exists, even after a self-closing tag.
+    const rateOptions: any[] = []
+    const closes = indexCloses(events, Tag.RateOptionClose)
+    let rateLast = bodyStart
+    for (let i = 0; i < events.length; i++) {
+      const rate = events[i]
+      if (rate.tag !== Tag.RateOption || rate.start < rateLast || rate.gt === -1 || rate.gt >= bodyEnd) continue
+
+      let rAttrs: string
+      const legacy: any[] = []
+      const j = nextClose(events, closes, i + 1, rate.gtEnd)
+      if (j !== -1) {
+        rAttrs = decodeRange(xml, rate.nameEnd + 1, rate.gt)
+        const rateBodyEnd = events[j].start
+        let legacyLast = rate.gtEnd
+        for (let k = i + 1; k < j; k++) {
+          const adj = events[k]
+          if (adj.tag !== Tag.Adjustment || adj.start < legacyLast || adj.gt === -1 || adj.gt >= rateBodyEnd) continue
+          legacyLast = adj.gtEnd
+          const adjAttrs = decodeRange(xml, adj.nameEnd + 1, adj.gt)
+          legacy.push({
+            description: unescapeHtmlEntities(getAttr(adjAttrs, 'Description') || getAttr(adjAttrs, 'Name')),
+            amount: -(parseFloat(getAttr(adjAttrs, 'Amount')) || parseFloat(getAttr(adjAttrs, 'Price')) || 0),
+            rateAdj: -(parseFloat(getAttr(adjAttrs, 'RateAdj')) || parseFloat(getAttr(adjAttrs, 'Rate')) || 0),
+          })
+        }
+        rateLast = events[j].gtEnd
+      } else if (xml.charCodeAt(rate.gt - 1) === 0x2f && rate.gt - 1 > rate.nameEnd) {
+        rAttrs = decodeRange(xml, rate.nameEnd + 1, rate.gt - 1)
+        rateLast = rate.gtEnd
+      } else {
+        continue
+      }
+
+      const option = {
+        rate: parseFloat(getAttr(rAttrs, 'Rate')) || 0,
+        points: parseFloat(getAttr(rAttrs, 'Point')) || 0,
+        apr: parseFloat(getAttr(rAttrs, 'APR')) || 0,
+        payment: parseFloat(getAttr(rAttrs, 'Payment').replace(/,/g, '')) || 0,
+        description: getAttr(rAttrs, 'Description'),
+        investor: getAttr(rAttrs, 'lLpInvestorNm'),
+        status: getAttr(rAttrs, 'Status'),
+        bestPrice: getAttr(rAttrs, 'BestPrice') === 'True',
+        totalClosingCost: parseFloat(getAttr(rAttrs, 'TotalClosingCost')) || 0,
+        cashToClose: parseFloat(getAttr(rAttrs, 'CashToClose')) || 0,
+        adjustments: undefined as any,
+      }
+      rateOptions.push(option)
+      pendingRateOptions.push({ option, templateId: getAttr(rAttrs, 'lLpTemplateId'), legacy })
+    }
+
+    const bestOption = rateOptions.find(r => r.bestPrice)
+      || rateOptions.find(r => r.status === 'Available')
+      || rateOptions[0]
+
+    if (programName && bestOption) {
+      programs.push({
+        name: programName,
+        programName,
+        status,
+        term: parseInt(term) || 360,
+        finMethod,
+        loanType,
+        parRate: parseFloat(parRate) || 0,
+        parPoints: parseFloat(parPoints) || 0,
+        investor,
+        lockDays: parseInt(lockDays) || 30,
+        rate: bestOption.rate,
+        apr: bestOption.apr,
+        points: bestOption.points,
+        payment: bestOption.payment,
+        description: bestOption.description,
+        investorName: bestOption.investor,
+        totalClosingCost: bestOption.totalClosingCost,
+        cashToClose: bestOption.cashToClose,
+        rateOptions,
+        adjustments: programAdjustments.length > 0 ? programAdjustments : undefined,
+      })
+    }
+  }
+
+  // ---- Single pass over the escaped document ----
+  let itemLast = 0
+  let tableState: 'none' | 'open' | 'done' = 'none'
+  let tableStart = 0
+  let tableContentStart = 0
+  let tableEvents: TagEvent[] = []
+  let program: TagEvent | null = null
+  let programEvents: TagEvent[] = []
+
+  LT_RE.lastIndex = 0
+  let lt: RegExpExecArray | null
+  while ((lt = LT_RE.exec(xml)) !== null) {
+    const info = readTag(xml, lt.index + lt[0].length)
+    if (!info) continue
+
+    const { tag, nameEnd, closeLength } = info
+    let gt = nameEnd
+    let gtEnd = nameEnd + closeLength
+    if (!closeLength) {
+      gt = gtAfter(nameEnd)
+      gtEnd = gt === -1 ? -1 : gt + gtLength
+    }
+    const event: TagEvent = { tag, start: lt.index, nameEnd, gt, gtEnd }
+
+    // <Adjustment\s+([^>]+)\/?>|<PricingAdjustment\s+([^>]+)\/?> over the whole document
+    if ((tag === Tag.Adjustment || tag === Tag.PricingAdjustment) && event.start >= itemLast && gt > nameEnd + 1) {
+      itemLast = gtEnd
+      const adjAttrs = decodeRange(xml, nameEnd + 1, gt)
+      // Skip if this is just a template reference
+      if (!(adjAttrs.includes('lLpTemplateId') && !adjAttrs.includes('Description') && !adjAttrs.includes('sAdjDescription'))) {
+        itemAdjustments.push({
+          description: getAttr(adjAttrs, 'sAdjDescription') || getAttr(adjAttrs, 'Description') || getAttr(adjAttrs, 'Name'),
+          amount: -(parseFloat(getAttr(adjAttrs, 'dAdjPriceAdj')) || parseFloat(getAttr(adjAttrs, 'Amount')) || parseFloat(getAttr(adjAttrs, 'Price')) || 0),
+          rateAdj: -(parseFloat(getAttr(adjAttrs, 'dAdjRateAdj')) || parseFloat(getAttr(adjAttrs, 'RateAdj')) || 0),
+        })
+      }
+    }
+
+    // First <AdjustmentsTable> through the first </AdjustmentsTable> after it
+    if (tableState === 'none' && tag === Tag.AdjustmentsTable) {
+      tableState = 'open'
+      tableStart = event.start
+      tableContentStart = gtEnd
+    } else if (tableState === 'open') {
+      if (tag === Tag.AdjustmentsTableClose) {
+        tableState = 'done'
+        readTable(tableEvents, tableStart, tableContentStart, event.start, gtEnd)
+        tableEvents = []
+      } else if (tag === Tag.Adjustment || tag === Tag.AdjustmentClose || tag === Tag.AdjustmentItem) {
+        tableEvents.push(event)
+      }
+    }
+
+    // <Program\s([^>]+)> through the first </Program> after it
+    if (!program) {
+      if (tag === Tag.Program && gt > nameEnd + 1) {
+        program = event
+        programEvents = []
+      }
+    } else if (event.start >= program.gtEnd) {
+      if (tag === Tag.ProgramClose) {
+        readProgram(program, programEvents, event.start)
+        program = null
+      } else if (tag === Tag.RateOption || tag === Tag.RateOptionClose || tag === Tag.Adjustment) {
+        programEvents.push(event)
+      }
+    }
+  }
+
+  for (const { option, templateId, legacy } of pendingRateOptions) {
+    // Look up adjustments from AdjustmentsTable by template ID, else the ones nested in the RateOption
+    let adjustments: any = templateId ? adjustmentsByTemplateId[templateId] : undefined
+    if (!adjustments || adjustments.length === 0) adjustments = legacy
+    option.adjustments = adjustments && adjustments.length > 0 ? adjustments : undefined
+  }
+
+  programs.sort((a, b) => {
+    const aEligible = a.status === 'Eligible' ? 0 : 1
+    const bEligible = b.status === 'Eligible' ? 0 : 1
+    if (aEligible !== bEligible) return aEligible - bEligible
+    return a.rate - b.rate
+  })
+
+  const globalAdjustments = itemAdjustments.concat(tableAdjustments)
+  const result = {
+    programs,
+    totalPrograms: programs.length,
+    globalAdjustments: globalAdjustments.length > 0 ? globalAdjustments : undefined,
+    debugXmlSample,
+    debugAdjustmentsSection,
+  }
+  templatesByResult.set(result, adjustmentsByTemplateId)
+  return result
+}
+
+// Pull the (double-escaped) RunQuickPricerV2Result payload out of the SOAP envelope
+export function extractQuickPricerResult(responseText: string): string {
+  const resultMatch = responseText.match(/<RunQuickPricerV2Result>([\s\S]*?)<\/RunQuickPricerV2Result>/)
+  return resultMatch ? resultMatch[1] : responseText
+}
@@ -0,0 +1,260 @@
+/**
+ * quote-cache.ts
+ *
+ * Two-tier cache for finished pricing responses, keyed on the canonical scenario.
+ *
+ *   memory  bounded LRU living in the warm lambda (QUOTE_CACHE_MAX_ENTRIES / _MAX_MB)
+ *   shared  optional Redis-protocol store shared by every lambda (QUOTE_CACHE_REDIS_URL),
+ *           or any QuoteCacheStore passed to setSharedQuoteStore()
+ *
+ * Entries live for QUOTE_CACHE_TTL_SECONDS but never past the next rate-sheet publish
+ * (RATE_SHEET_PUBLISH_TIMES, e.g. "07:30,10:00,13:30", in RATE_SHEET_TIMEZONE), so a
+ * quote is never served from a sheet that has since been replaced.
+ * QUOTE_CACHE_TTL_SECONDS=0 turns caching off.
+ */
+
+import { createHash } from 'node:crypto'
+import { getRedisClient } from './redis.js'
+
+export interface QuoteCacheStore {
+  get(key: string): Promise<string | null>
+  set(key: string, value: string, ttlMs: number): Promise<void>
+}
+
+export interface CachedQuote {
+  body: string
+  storedAt: number
+  expiresAt: number
+}
+
+export interface QuoteCacheHit extends CachedQuote {
+  tier: 'memory' | 'shared'
+  ageSeconds: number
+}
+
+function settings() {
+  const ttl = process.env.QUOTE_CACHE_TTL_SECONDS
+  return {
+    ttlMs: (ttl === undefined || ttl === '' ? 600 : Number(ttl)) * 1000,
+    maxEntries: Number(process.env.QUOTE_CACHE_MAX_ENTRIES) || 200,
+    maxChars: (Number(process.env.QUOTE_CACHE_MAX_MB) || 64) * 1024 * 1024,
+    sharedTimeoutMs: Number(process.env.QUOTE_CACHE_SHARED_TIMEOUT_MS) || 150,
+    redisUrl: process.env.QUOTE_CACHE_REDIS_URL || '',
+    publishTimes: process.env.RATE_SHEET_PUBLISH_TIMES || '',
+    timeZone: process.env.RATE_SHEET_TIMEZONE || 'America/New_York',
+  }
+}
+
+// ================= Keys =================
+
+// JSON with sorted keys and undefined/empty values dropped, so field order and
+// absent-vs-empty differences in the request body don't split the cache
+export function canonicalJson(value: unknown): string {
+  if (value === null || typeof value !== 'object') return JSON.stringify(value) ?? 'null'
+  if (Array.isArray(value)) return `[${value.map(canonicalJson).join(',')}]`
+  const entries = Object.keys(value as Record<string, unknown>)
+    .filter(k => {
+      const v = (value as Record<string, unknown>)[k]
+      return v !== undefined && v !== '' && typeof v !== 'function'
+    })
+    .sort()
+    .map(k => `${JSON.stringify(k)}:${canonicalJson((value as Record<string, unknown>)[k])}`)
+  return `{${entries.join(',')}}`
+}
+
+export function quoteCacheKey(namespace: string, ...parts: unknown[]): string {
+  return `quote:${namespace}:${createHash('sha256').update(canonicalJson(parts)).digest('hex')}`
+}
+
+// ================= Rate-sheet schedule =================
+
+// Offset of `timeZone` from UTC at `at`, in ms (wall clock minus UTC)
+function zoneOffsetMs(at: number, timeZone: string): number {
+  const parts = new Intl.DateTimeFormat('en-US', {
+    timeZone, hourCycle: 'h23', year: 'numeric', month: 'numeric', day: 'numeric',
+    hour: 'numeric', minute: 'numeric', second: 'numeric',
+  }).formatToParts(new Date(at))
+  const get = (type: string) => Number(parts.find(p => p.type === type)?.value)
+  const wall = Date.UTC(get('year'), get('month') - 1, get('day'), get('hour'), get('minute'), get('second'))
+  return wall - Math.floor(at / 1000) * 1000
+}
+
+// Next scheduled rate-sheet publish after `now`, or null when no schedule is configured.
+// Uses today's UTC offset for the whole search, so it can be an hour off on DST change days.
+export function nextRateSheetPublish(now: number = Date.now()): number | null {
+  const { publishTimes, timeZone } = settings()
+  const times = publishTimes.split(',')
+    .map(t => t.trim().match(/^(\d{1,2}):(\d{2})$/))
+    .filter((m): m is RegExpMatchArray => m !== null)
+    .map(m => Number(m[1]) * 60 + Number(m[2]))
+  if (times.length === 0) return null
+
+  const offset = zoneOffsetMs(now, timeZone)
+  const wallNow = new Date(now + offset)
+  let next: number | null = null
+  for (let day = 0; day <= 1 && next === null; day++) {
+    for (const minutes of times) {
+      const wall = Date.UTC(wallNow.getUTCFullYear(), wallNow.getUTCMonth(), wallNow.getUTCDate() + day, 0, minutes)
+      const at = wall - offset
+      if (at > now && (next === null || at < next)) next = at
+    }
+  }
+  return next
+}
+
+function expiryFor(now: number, ttlMs: number): number {
+  const publish = nextRateSheetPublish(now)
+  return publish === null ? now + ttlMs : Math.min(now + ttlMs, publish)
+}
+
+// ================= Memory tier (LRU) =================
+
+const memory = new Map<string, CachedQuote>()
+let memoryChars = 0
+
+export const quoteCacheStats = {
+  memoryHits: 0,
+  sharedHits: 0,
+  misses: 0,
+  writes: 0,
+  evictions: 0,
+  sharedErrors: 0,
+}
+
+function memoryDelete(key: string): void {
+  const entry = memory.get(key)
+  if (!entry) return
+  memory.delete(key)
+  memoryChars -= entry.body.length
+}
+
+function memorySet(key: string, entry: CachedQuote): void {
+  const { maxEntries, maxChars } = settings()
+  if (entry.body.length > maxChars) return
+  memoryDelete(key)
+  memory.set(key, entry)
+  memoryChars += entry.body.length
+  // Map iteration order is insertion order, so the first key is the least recently used
+  while (memory.size > maxEntries || memoryChars > maxChars) {
+    const oldest = memory.keys().next().value as string
+    memoryDelete(oldest)
+    quoteCacheStats.evictions++
+  }
+}
+
+export function clearQuoteCache(): void {
+  memory.clear()
+  memoryChars = 0
+}
+
+// ================= Shared tier =================
+
+let sharedStore: QuoteCacheStore | null | undefined
+
+export function setSharedQuoteStore(store: QuoteCacheStore | null): void {
+  sharedStore = store
+}
+
+function redisStore(url: string): QuoteCacheStore {
+  const client = getRedisClient(url)
+  return {
+    async get(key) {
+      const value = await client.get(key)
+      return typeof value === 'string' ? value : null
+    },
+    async set(key, value, ttlMs) {
+      await client.set(key, value, ttlMs)
+    },
+  }
+}
+
+function shared(): QuoteCacheStore | null {
+  if (sharedStore !== undefined) return sharedStore
+  const { redisUrl } = settings()
+  return redisUrl ? redisStore(redisUrl) : null
+}
+
+function withTimeout<T>(promise: Promise<T>, ms: number): Promise<T> {
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => reject(new Error(`shared quote cache timed out after ${ms}ms`)), ms)
+    promise.then(
+      value => { clearTimeout(timer); resolve(value) },
+      err => { clearTimeout(timer); reject(err) },
+    )
+  })
+}
+
+// Shared entries are stored as "<storedAt> <expiresAt>\n<body>" so the (large) body
+// is never re-escaped into an envelope
+function encodeShared(entry: CachedQuote): string {
+  return `${entry.storedAt} ${entry.expiresAt}\n${entry.body}`
+}
+
+function decodeShared(value: string): CachedQuote | null {
+  const newline = value.indexOf('\n')
+  if (newline === -1) return null
+  const [storedAt, expiresAt] = value.slice(0, newline).split(' ').map(Number)
+  if (!storedAt || !expiresAt) return null
+  return { storedAt, expiresAt, body: value.slice(newline + 1) }
+}
+
+// ================= Public API =================
+
+export function isQuoteCacheEnabled(): boolean {
+  return settings().ttlMs > 0
+}
+
+export async function getCachedQuote(key: string): Promise<QuoteCacheHit | null> {
+  if (!isQuoteCacheEnabled()) return null
+  const now = Date.now()
+
+  const local = memory.get(key)
+  if (local) {
+    memoryDelete(key)
+    // Re-inserting moves the entry to the most-recently-used end
+    if (local.expiresAt > now) {
+      memorySet(key, local)
+      quoteCacheStats.memoryHits++
+      return { ...local, tier: 'memory', ageSeconds: Math.floor((now - local.storedAt) / 1000) }
+    }
+  }
+
+  const store = shared()
+  if (store) {
+    try {
+      const value = await withTimeout(store.get(key), settings().sharedTimeoutMs)
+      const entry = value ? decodeShared(value) : null
+      if (entry && entry.expiresAt > now) {
+        memorySet(key, entry)
+        quoteCacheStats.sharedHits++
+        return { ...entry, tier: 'shared', ageSeconds: Math.floor((now - entry.storedAt) / 1000) }
+      }
+    } catch (err) {
+      quoteCacheStats.sharedErrors++
+      console.warn('Shared quote cache read failed:', err instanceof Error ? err.message : err)
+    }
+  }
+
+  quoteCacheStats.misses++
+  return null
+}
+
+export async function putCachedQuote(key: string, body: string): Promise<void> {
+  const { ttlMs, sharedTimeoutMs } = settings()
+  if (ttlMs <= 0) return
+  const now = Date.now()
+  const entry: CachedQuote = { body, storedAt: now, expiresAt: expiryFor(now, ttlMs) }
+  if (entry.expiresAt <= now) return
+
+  memorySet(key, entry)
+  quoteCacheStats.writes++
+
+  const store = shared()
+  if (!store) return
+  try {
+    await withTimeout(store.set(key, encodeShared(entry), entry.expiresAt - now), sharedTimeoutMs * 4)
+  } catch (err) {
+    quoteCacheStats.sharedErrors++
+    console.warn('Shared quote cache write failed:', err instanceof Error ? err.message : err)
+  }
+}
@@ -0,0 +1,86 @@
+/**
+ * rate-classification.ts
+ *
+ * One classification pass over the program, rate-option and adjustment descriptions of
+ * a QuickPricer result. Each distinct description is scanned once; the server filters
+ * in meridianlink.ts read the flags, and every rate option gets typed fields the client
+ * reads instead of re-scanning strings:
+ *
+ *   price            100 - points
+ *   pppMonths        prepayment penalty term named ("5 YR PPP" = 60, "0MO PPP" = 0)
+ *   hasPPP           carries a prepayment penalty (any PPP but 0MO / 0 YR)
+ *   isDSCR, isBankStatement, isCashout
+ *
+ * Flags are only written when set, so responses don't grow by a key per false flag.
+ * pppIndex lists, per PPP term (months, or 'none'), the programs with a rate option on
+ * it, in response order, so target pricing is a lookup rather than a scan.
+ */
+
+export interface TextClass {
+  pppMonths?: number
+  hasPPP: boolean
+  isDSCR: boolean
+  isBankStatement: boolean
+  isCashout: boolean
+}
+
+export type PPPIndex = Record<string, number[]>
+
+const PPP_TERM = /(\d+)\s*(YR|MO)S?\s*PPP/
+
+function classifyText(text: string): TextClass {
+  const upper = text.toUpperCase()
+  const term = PPP_TERM.exec(upper)
+  // 0MO PPP or 0 YR PPP means NO prepayment penalty - these are OK for all property types
+  const noPenalty = upper.includes('0MO PPP') || upper.includes('0 YR PPP') || upper.includes('0YR PPP')
+  return {
+    pppMonths: term ? Number(term[1]) * (term[2] === 'YR' ? 12 : 1) : undefined,
+    hasPPP: !noPenalty && (upper.includes(' PPP') || upper.includes('YR PPP') || /\d\s*YR\s*PPP/.test(upper)),
+    isDSCR: upper.includes('DSCR'),
+    isBankStatement: upper.includes('BANK ST'),
+    isCashout: upper.includes('CASHOUT'),
+  }
+}
+
+/**
+ * Classifier memoized by description for one result: programs share their name across
+ * every rate option and templates share adjustment descriptions
+ */
+export function textClassifier(): (text: string | undefined) => TextClass {
+  const classes = new Map<string, TextClass>()
+  return (text = '') => {
+    let cls = classes.get(text)
+    if (!cls) {
+      cls = classifyText(text)
+      classes.set(text, cls)
+    }
+    return cls
+  }
+}
+
+/**
+ * Write the typed fields onto every rate option (classified by its description, else
+ * its program's name, as the UI labels it) and return the PPP-term index
+ */
+export function classifyRateOptions(programs: any[], classOf: (text: string | undefined) => TextClass = textClassifier()): PPPIndex {
+  const index: PPPIndex = {}
+  programs.forEach((program, p) => {
+    let last: string | undefined
+    for (const ro of program.rateOptions || []) {
+      const cls = classOf(ro.description || program.programName || program.name)
+      ro.price = Math.round((100 - (Number(ro.points) || 0)) * 1000) / 1000
+      if (cls.pppMonths !== undefined) ro.pppMonths = cls.pppMonths
+      if (cls.hasPPP) ro.hasPPP = true
+      if (cls.isDSCR) ro.isDSCR = true
+      if (cls.isBankStatement) ro.isBankStatement = true
+      if (cls.isCashout) ro.isCashout = true
+
+      const term = cls.pppMonths === undefined ? 'none' : String(cls.pppMonths)
+      if (term === last) continue
+      last = term
+      const programs = (index[term] ||= [])
+      if (programs[programs.length - 1] !== p) programs.push(p)
+    }
+  })
+  return index
+}
@@ -0,0 +1,237 @@
+/**
+ * redis.ts
+ *
+ * Minimal RESP2 client for the shared cache tiers. Speaks plain Redis protocol over
+ * node:net (redis://) or node:tls (rediss://), so it works against Redis, Valkey,
+ * Upstash's Redis endpoint or scripts/stubs/redis.ts without adding a dependency.
+ *
+ * One connection per warm lambda, opened lazily. Commands are pipelined and replies
+ * are matched in order; a command that times out drops the connection (replies
+ * would otherwise be misaligned) and the next command reconnects.
+ */
+
+import net from 'node:net'
+import tls from 'node:tls'
+
+export type RedisReply = string | number | null | RedisReply[]
+
+export interface RedisClientOptions {
+  connectTimeoutMs?: number
+  commandTimeoutMs?: number
+}
+
+interface PendingCommand {
+  resolve: (reply: RedisReply) => void
+  reject: (error: Error) => void
+  timer: ReturnType<typeof setTimeout> | null
+}
+
+function encodeCommand(args: (string | number)[]): Buffer {
+  const parts: Buffer[] = [Buffer.from(`*${args.length}\r\n`)]
+  for (const arg of args) {
+    const value = Buffer.from(String(arg), 'utf8')
+    parts.push(Buffer.from(`$${value.length}\r\n`), value, Buffer.from('\r\n'))
+  }
+  return Buffer.concat(parts)
+}
+
+// Bytes needed before a partial bulk reply at the start of `buf` can parse (0 = unknown)
+function bytesNeeded(buf: Buffer): number {
+  if (buf[0] !== 0x24) return 0 // '$'
+  const lineEnd = buf.indexOf('\r\n')
+  return lineEnd === -1 ? 0 : lineEnd + 2 + Number(buf.toString('utf8', 1, lineEnd)) + 2
+}
+
+// Parse one reply starting at `offset`; null when the buffer doesn't hold all of it yet
+function parseReply(buf: Buffer, offset: number): { value: RedisReply | Error; next: number } | null {
+  const lineEnd = buf.indexOf('\r\n', offset)
+  if (lineEnd === -1) return null
+  const type = String.fromCharCode(buf[offset])
+  const line = buf.toString('utf8', offset + 1, lineEnd)
+
+  switch (type) {
+    case '+':
+      return { value: line, next: lineEnd + 2 }
+    case '-':
+      return { value: new Error(line), next: lineEnd + 2 }
+    case ':':
+      return { value: Number(line), next: lineEnd + 2 }
+    case '$': {
+      const length = Number(line)
+      if (length < 0) return { value: null, next: lineEnd + 2 }
+      const end = lineEnd + 2 + length
+      if (buf.length < end + 2) return null
+      return { value: buf.toString('utf8', lineEnd + 2, end), next: end + 2 }
+    }
+    case '*': {
+      const count = Number(line)
+      if (count < 0) return { value: null, next: lineEnd + 2 }
+      const items: RedisReply[] = []
+      let next = lineEnd + 2
+      for (let i = 0; i < count; i++) {
+        const item = parseReply(buf, next)
+        if (!item) return null
+        items.push(item.value instanceof Error ? null : item.value)
+        next = item.next
+      }
+      return { value: items, next }
+    }
+    default:
+      return { value: new Error(`Unexpected RESP type "${type}"`), next: buf.length }
+  }
+}
+
+export class RedisClient {
+  private readonly url: URL
+  private readonly connectTimeoutMs: number
+  private readonly commandTimeoutMs: number
+  private socket: net.Socket | null = null
+  private connecting: Promise<net.Socket> | null = null
+  // Incoming bytes are kept as chunks and only joined once a full reply can be parsed,
+  // so a multi-MB cached quote isn't re-copied on every socket read
+  private chunks: Buffer[] = []
+  private buffered = 0
+  private needed = 0
+  private pending: PendingCommand[] = []
+
+  constructor(url: string, options: RedisClientOptions = {}) {
+    this.url = new URL(url)
+    this.connectTimeoutMs = options.connectTimeoutMs ?? 1000
+    this.commandTimeoutMs = options.commandTimeoutMs ?? 1000
+  }
+
+  async command(...args: (string | number)[]): Promise<RedisReply> {
+    const socket = await this.connect()
+    return this.send(socket, args)
+  }
+
+  get(key: string): Promise<RedisReply> {
+    return this.command('GET', key)
+  }
+
+  // SET with a millisecond TTL; `onlyIfAbsent` maps to NX (returns null when the key exists)
+  set(key: string, value: string, ttlMs?: number, onlyIfAbsent = false): Promise<RedisReply> {
+    const args: (string | number)[] = ['SET', key, value]
+    if (ttlMs && ttlMs > 0) args.push('PX', Math.ceil(ttlMs))
+    if (onlyIfAbsent) args.push('NX')
+    return this.command(...args)
+  }
+
+  del(key: string): Promise<RedisReply> {
+    return this.command('DEL', key)
+  }
+
+  close(): void {
+    this.teardown(new Error('Redis connection closed'))
+  }
+
+  private send(socket: net.Socket, args: (string | number)[]): Promise<RedisReply> {
+    return new Promise((resolve, reject) => {
+      const entry: PendingCommand = { resolve, reject, timer: null }
+      entry.timer = setTimeout(() => {
+        this.teardown(new Error(`Redis ${args[0]} timed out after ${this.commandTimeoutMs}ms`))
+      }, this.commandTimeoutMs)
+      this.pending.push(entry)
+      socket.write(encodeCommand(args))
+    })
+  }
+
+  private connect(): Promise<net.Socket> {
+    if (this.socket) return Promise.resolve(this.socket)
+    if (this.connecting) return this.connecting
+
+    this.connecting = new Promise<net.Socket>((resolve, reject) => {
+      const port = Number(this.url.port) || 6379
+      const host = this.url.hostname
+      const secure = this.url.protocol === 'rediss:'
+      const socket = secure
+        ? tls.connect({ host, port, servername: host })
+        : net.connect({ host, port })
+
+      const timer = setTimeout(() => {
+        socket.destroy()
+        reject(new Error(`Redis connect to ${host}:${port} timed out`))
+      }, this.connectTimeoutMs)
+
+      socket.once(secure ? 'secureConnect' : 'connect', () => {
+        clearTimeout(timer)
+        socket.setNoDelay(true)
+        socket.unref()
+        this.socket = socket
+        this.resetBuffer()
+
+        // AUTH / SELECT are pipelined ahead of the first real command
+        const password = decodeURIComponent(this.url.password)
+        const username = decodeURIComponent(this.url.username)
+        if (password) this.send(socket, username ? ['AUTH', username, password] : ['AUTH', password]).catch(() => {})
+        const db = Number(this.url.pathname.slice(1))
+        if (db) this.send(socket, ['SELECT', db]).catch(() => {})
+        resolve(socket)
+      })
+      socket.on('data', chunk => this.onData(chunk))
+      socket.on('error', err => {
+        clearTimeout(timer)
+        reject(err)
+        this.teardown(err)
+      })
+      socket.on('close', () => this.teardown(new Error('Redis connection closed')))
+    }).finally(() => { this.connecting = null })
+
+    return this.connecting
+  }
+
+  private onData(chunk: Buffer): void {
+    this.chunks.push(chunk)
+    this.buffered += chunk.length
+    if (this.buffered < this.needed) return
+
+    const buf = this.chunks.length === 1 ? this.chunks[0] : Buffer.concat(this.chunks, this.buffered)
+    let offset = 0
+    while (offset < buf.length && this.pending.length > 0) {
+      const reply = parseReply(buf, offset)
+      if (!reply) break
+      offset = reply.next
+      const entry = this.pending.shift() as PendingCommand
+      if (entry.timer) clearTimeout(entry.timer)
+      if (reply.value instanceof Error) entry.reject(reply.value)
+      else entry.resolve(reply.value)
+    }
+
+    const rest = buf.subarray(offset)
+    this.chunks = rest.length ? [rest] : []
+    this.buffered = rest.length
+    this.needed = rest.length ? bytesNeeded(rest) : 0
+  }
+
+  private resetBuffer(): void {
+    this.chunks = []
+    this.buffered = 0
+    this.needed = 0
+  }
+
+  private teardown(error: Error): void {
+    const pending = this.pending
+    this.pending = []
+    for (const entry of pending) {
+      if (entry.timer) clearTimeout(entry.timer)
+      entry.reject(error)
+    }
+    if (this.socket) {
+      this.socket.destroy()
+      this.socket = null
+    }
+    this.resetBuffer()
+  }
+}
+
+// Clients are shared per URL so every cache in a warm lambda reuses one connection
+const clients = new Map<string, RedisClient>()
+
+export function getRedisClient(url: string): RedisClient {
+  let client = clients.get(url)
+  if (!client) {
+    client = new RedisClient(url)
+    clients.set(url, client)
+  }
+  return client
+}
@@ -0,0 +1,87 @@
+/**
+ * single-flight.ts
+ *
+ * Coalescing of identical in-flight pricing scenarios. Double-clicks on Get Price,
+ * several broker tabs and UI retries put the same scenario in flight two or three times;
+ * for LP and LN each copy would otherwise be its own 20-50s Browserless session. The
+ * first caller for a key (the leader) runs the pricing; callers arriving while it runs
+ * (followers) attach to the leader's promise and get the same result.
+ *
+ * A follower waits at most its own timeoutMs and then rejects with a TimeoutError, as
+ * the leader's own fetch would; the leader is never cancelled, so it still answers its
+ * caller and any later followers. Results are shared, not copied: callers must not
+ * mutate them (the verbosity shapers copy what they change).
+ *
+ * Flights are per process (one function instance, or serve-local), keyed on the
+ * canonical scenario the caller builds. coalesceStats counts leaders, followers and
+ * follower timeouts per provider. The leader's stages are timed by the run itself.
+ */
+
+import type { RequestTiming } from './timing.js'
+
+export type FlightRole = 'leader' | 'follower'
+
+export interface FlightOptions {
+  // Longest a follower waits for the leader before giving up on its own
+  timeoutMs?: number
+  // Called with the caller's role once it has joined a flight
+  onJoin?: (role: FlightRole) => void
+  // The caller's request timing: a follower's wait is recorded as its 'coalesced' stage
+  timing?: RequestTiming
+}
+
+export interface FlightStats {
+  leaders: number
+  followers: number
+  followerTimeouts: number
+  inflight: number
+}
+
+export const coalesceStats: Record<string, FlightStats> = {}
+
+const flights = new Map<string, Promise<unknown>>()
+
+function statsFor(namespace: string): FlightStats {
+  return (coalesceStats[namespace] ||= { leaders: 0, followers: 0, followerTimeouts: 0, inflight: 0 })
+}
+
+export function coalesceTimeoutMs(): number {
+  return Number(process.env.PRICING_COALESCE_TIMEOUT_MS) || 55000
+}
+
+function followerTimeout(ms: number): Error {
+  const error = new Error(`Timed out after ${ms}ms waiting for an identical pricing request`)
+  error.name = 'TimeoutError'
+  return error
+}
+
+export function singleFlight<T>(namespace: string, key: string, run: () => Promise<T>, options: FlightOptions = {}): Promise<T> {
+  const stats = statsFor(namespace)
+  const flightKey = `${namespace}:${key}`
+  const inflight = flights.get(flightKey) as Promise<T> | undefined
+
+  if (inflight) {
+    stats.followers++
+    options.onJoin?.('follower')
+    const ms = options.timeoutMs ?? coalesceTimeoutMs()
+    let timer: ReturnType<typeof setTimeout> | undefined
+    const deadline = new Promise<never>((_, reject) => {
+      timer = setTimeout(() => {
+        stats.followerTimeouts++
+        reject(followerTimeout(ms))
+      }, ms)
+    })
+    const wait = Promise.race([inflight, deadline]).finally(() => clearTimeout(timer))
+    return options.timing ? options.timing.measure('coalesced', () => wait) : wait
+  }
+
+  stats.leaders++
+  stats.inflight++
+  options.onJoin?.('leader')
+  const flight = (async () => run())().finally(() => {
+    stats.inflight--
+    flights.delete(flightKey)
+  })
+  flights.set(flightKey, flight)
+  return flight
+}
@@ -0,0 +1,70 @@
+/**
+ * timing.ts
+ *
+ * Per-stage request timing. A handler records where its time went (OAuth, the provider
+ * round trip, parsing, filtering, serialization, the Browserless steps...) in one
+ * RequestTiming, sends it as a Server-Timing header and logs it as one JSON line:
+ *
+ *   {"timing":"get-pricing","totalMs":812.4,"stages":{"oauth":0.1,"ml-network":790.2,...},"status":200}
+ *
+ * scripts/timing-report.py aggregates those lines into per-stage percentiles. A stage
+ * recorded more than once (e.g. per batch item) accumulates. Browserless in-page scripts
+ * report their own step timestamps in diag.timings; addMarks turns them into stages.
+ */
+
+import { performance } from 'node:perf_hooks'
+
+const round = (ms: number) => Math.round(ms * 10) / 10
+
+export class RequestTiming {
+  readonly route: string
+  private readonly started = performance.now()
+  private readonly stages = new Map<string, number>()
+
+  constructor(route: string) {
+    this.route = route
+  }
+
+  add(stage: string, ms: number): void {
+    this.stages.set(stage, (this.stages.get(stage) ?? 0) + ms)
+  }
+
+  // Time fn (sync or async) as `stage`
+  measure<T>(stage: string, fn: () => T): T {
+    const start = performance.now()
+    const result = fn()
+    if (result instanceof Promise) return result.finally(() => this.add(stage, performance.now() - start)) as T
+    this.add(stage, performance.now() - start)
+    return result
+  }
+
+  // In-page step timestamps (ms since the script started, by step) as consecutive
+  // stages, each named after the step it ends with: prefix.form_ready, prefix.fields_set...
+  addMarks(prefix: string, marks: Record<string, number> | null | undefined): void {
+    if (!marks) return
+    let last = 0
+    for (const [step, at] of Object.entries(marks).sort((a, b) => a[1] - b[1])) {
+      if (typeof at !== 'number') continue
+      this.add(`${prefix}.${step}`, at - last)
+      last = at
+    }
+  }
+
+  get totalMs(): number {
+    return performance.now() - this.started
+  }
+
+  toJSON(): Record<string, number> {
+    return Object.fromEntries([...this.stages].map(([stage, ms]) => [stage, round(ms)]))
+  }
+
+  // Server-Timing header value, stages in the order they were first recorded
+  serverTiming(): string {
+    return [...[...this.stages].map(([stage, ms]) => `${stage};dur=${round(ms)}`), `total;dur=${round(this.totalMs)}`].join(', ')
+  }
+
+  // One structured line per request for the log aggregator
+  log(fields: Record<string, unknown> = {}): void {
+    console.log(JSON.stringify({ timing: this.route, totalMs: round(this.totalMs), stages: this.toJSON(), ...fields }))
+  }
+}
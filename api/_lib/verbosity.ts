@@ -0,0 +1,225 @@
+/**
+ * verbosity.ts
+ *
+ * Response shaping for the pricing endpoints. ?verbosity= picks how much of a provider
+ * result goes over the wire:
+ *
+ *   minimal   only what the UI renders (default in production)
+ *   standard  everything except debug payloads: raw XML samples, sent-value echoes,
+ *             DOM field inventories, page text and sample rows
+ *   debug     the full result (default elsewhere)
+ *
+ * PRICING_VERBOSITY overrides the default. ?fields=rate,programs.rateOptions.rate further
+ * projects `data` to the listed dotted paths (arrays are walked element-wise), and
+ * sendJson() gzip/brotli-compresses large bodies for clients that accept it.
+ *
+ * ?adjustments=table moves MeridianLink's per-rate-option adjustment arrays into one
+ * data.adjustmentTable keyed by LLPA template ID; rate options carry adjustmentsRef
+ * instead. The default (inline) keeps the original shape.
+ *
+ * ?encoding=columnar sends each program's rate options as parallel columns (see
+ * columnar.ts); projection reaches through to the columns.
+ */
+
+import { promisify } from 'node:util'
+import { brotliCompress, gzip, constants as zlibConstants } from 'node:zlib'
+import type { VercelRequest, VercelResponse } from '@vercel/node'
+import { isColumnarTable } from './columnar.js'
+import type { RequestTiming } from './timing.js'
+
+export type Verbosity = 'minimal' | 'standard' | 'debug'
+
+const VERBOSITIES: Verbosity[] = ['minimal', 'standard', 'debug']
+
+const brotli = promisify(brotliCompress)
+const gzipAsync = promisify(gzip)
+
+// Bodies below this many bytes are sent as-is (PRICING_COMPRESS_MIN_BYTES, 0 disables)
+function compressMinBytes(): number {
+  const value = process.env.PRICING_COMPRESS_MIN_BYTES
+  return value === undefined || value === '' ? 1024 : Number(value)
+}
+
+export function resolveVerbosity(requested?: unknown): Verbosity {
+  const value = String(requested || process.env.PRICING_VERBOSITY || '').toLowerCase()
+  if ((VERBOSITIES as string[]).includes(value)) return value as Verbosity
+  return process.env.VERCEL_ENV === 'production' ? 'minimal' : 'debug'
+}
+
+export type AdjustmentFormat = 'inline' | 'table'
+
+export function resolveAdjustmentFormat(requested?: unknown): AdjustmentFormat {
+  return String(requested || '').toLowerCase() === 'table' ? 'table' : 'inline'
+}
+
+// ================= Projection =================
+
+type FieldTree = { [key: string]: FieldTree | true }
+
+export function parseFields(value: unknown): string[] | null {
+  if (value === undefined || value === null || value === '') return null
+  const fields = String(value).split(',').map(f => f.trim()).filter(Boolean)
+  return fields.length > 0 ? fields : null
+}
+
+function fieldTree(fields: string[]): FieldTree {
+  const tree: FieldTree = {}
+  for (const field of fields) {
+    let node = tree
+    const parts = field.split('.')
+    parts.forEach((part, i) => {
+      if (node[part] === true) return
+      if (i === parts.length - 1) node[part] = true
+      else node = (node[part] ||= {}) as FieldTree
+    })
+  }
+  return tree
+}
+
+function applyTree(value: any, tree: FieldTree): any {
+  if (Array.isArray(value)) return value.map(v => applyTree(v, tree))
+  // Columnar rate options: the tree names columns, as it would name each row's fields
+  if (isColumnarTable(value)) return { length: value.length, columns: applyTree(value.columns, tree) }
+  if (!value || typeof value !== 'object') return value
+  const out: Record<string, unknown> = {}
+  for (const [key, sub] of Object.entries(tree)) {
+    if (!(key in value)) continue
+    out[key] = sub === true ? value[key] : applyTree(value[key], sub)
+  }
+  return out
+}
+
+// Project `data` of a { success, data } payload; error payloads pass through
+export function projectFields(payload: any, fields: string[] | null): any {
+  if (!fields || !payload?.data) return payload
+  return { ...payload, data: applyTree(payload.data, fieldTree(fields)) }
+}
+
+const pick = (value: any, keys: string[]): any => {
+  if (!value || typeof value !== 'object') return value
+  const out: Record<string, unknown> = {}
+  for (const key of keys) if (value[key] !== undefined) out[key] = value[key]
+  return out
+}
+
+const omit = (value: any, keys: string[]): any => {
+  if (!value || typeof value !== 'object') return value
+  const out = { ...value }
+  for (const key of keys) delete out[key]
+  return out
+}
+
+// ================= Provider shapes =================
+
+// Fields of get-pricing's data the UI (sanitizePricingResult) and batch summaries read
+const ML_MINIMAL = fieldTree([
+  'rate', 'apr', 'monthlyPayment', 'points', 'closingCosts', 'ltvRatio', 'programName', 'investorName',
+  'totalPrograms', 'source', 'apiError', 'filterApplied',
+  'programs.name', 'programs.parRate', 'programs.parPoints',
+  'programs.rateOptions.rate', 'programs.rateOptions.points', 'programs.rateOptions.apr',
+  'programs.rateOptions.description', 'programs.rateOptions.payment',
+  'programs.rateOptions.adjustments.description', 'programs.rateOptions.adjustments.amount',
+  'programs.rateOptions.adjustments.rateAdj', 'programs.rateOptions.adjustmentsRef',
+  'programs.rateOptions.price', 'programs.rateOptions.pppMonths', 'programs.rateOptions.hasPPP',
+  'programs.rateOptions.isDSCR', 'programs.rateOptions.isBankStatement', 'programs.rateOptions.isCashout',
+  'adjustmentTable', 'pppIndex', 'indicative',
+])
+
+export function shapeMeridianLink(payload: any, verbosity: Verbosity): any {
+  if (verbosity === 'debug' || !payload || typeof payload !== 'object') return payload
+  if (!payload.data) return omit(payload, verbosity === 'minimal' ? ['debug', 'allPrograms'] : ['debug'])
+  const data = verbosity === 'minimal'
+    ? applyTree(payload.data, ML_MINIMAL)
+    : omit(payload.data, ['debugSentValues', 'debugXmlSample', 'debugAdjustmentsSection'])
+  return { ...payload, data }
+}
+
+const LP_MINIMAL_RATE = ['rate', 'price', 'payment', 'program', 'lender', 'totalAdjustments', 'lockPeriod']
+const LP_DEBUG_ONLY = ['formFields', 'formFieldsAfter', 'fullPageText', 'debugRows', 'docTypeOptions', 'fieldResults']
+
+export function shapeLenderPrice(payload: any, verbosity: Verbosity): any {
+  if (verbosity === 'debug' || !payload?.data) return payload
+  const data = payload.data
+  if (verbosity === 'minimal') {
+    return {
+      ...payload,
+      data: {
+        ...pick(data, ['source', 'provider', 'totalRates', 'eligibleQM', 'eligibleNonQM']),
+        rateOptions: (data.rateOptions || []).map((r: any) => pick(r, LP_MINIMAL_RATE)),
+        ...(data.variants && {
+          variants: Object.fromEntries(Object.entries(data.variants).map(([key, v]: [string, any]) => [key, {
+            ...pick(v, ['lockDays', 'prepayPeriod', 'prepayType', 'totalRates', 'error']),
+            rateOptions: (v.rateOptions || []).map((r: any) => pick(r, LP_MINIMAL_RATE)),
+          }])),
+        }),
+      },
+    }
+  }
+  const debug = data.debug && omit(data.debug, ['firstRawRate', 'programs'])
+  if (debug?.diag) debug.diag = omit(debug.diag, LP_DEBUG_ONLY)
+  return { ...payload, data: { ...data, debug } }
+}
+
+const LN_MINIMAL_RATE = ['rate', 'price', 'payment', 'program', 'investor', 'lockPeriod']
+
+export function shapeLoanNex(payload: any, verbosity: Verbosity): any {
+  if (verbosity === 'debug' || !payload?.data) return payload
+  const data = payload.data
+  if (verbosity === 'minimal') {
+    return {
+      ...payload,
+      data: {
+        ...pick(data, ['provider', 'totalRates', 'fallbackReason']),
+        rateOptions: (data.rateOptions || []).map((r: any) => pick(r, LN_MINIMAL_RATE)),
+      },
+    }
+  }
+  return { ...payload, data: { ...data, diag: data.diag && omit(data.diag, ['bodyPreview', 'afterGetPrice']) } }
+}
+
+// ================= Transfer =================
+
+// The encoding to answer with: of brotli and gzip, the one the client ranks highest
+// (brotli on a tie), never one it refuses with q=0. An encoding it does not list takes
+// the q of `*`, if that is listed.
+export function negotiateEncoding(acceptEncoding: string): 'br' | 'gzip' | null {
+  const ranks = new Map<string, number>()
+  for (const entry of acceptEncoding.toLowerCase().split(',')) {
+    const [name, ...params] = entry.split(';').map(part => part.trim())
+    if (!name) continue
+    const q = params.find(param => param.startsWith('q='))
+    const value = q === undefined ? 1 : Number(q.slice(2))
+    ranks.set(name, Number.isFinite(value) ? value : 0)
+  }
+  const rank = (name: string) => ranks.get(name) ?? ranks.get('*') ?? 0
+  const br = rank('br')
+  const gzip = rank('gzip')
+  if (br <= 0 && gzip <= 0) return null
+  return br >= gzip ? 'br' : 'gzip'
+}
+
+// Send a serialized JSON body, brotli- or gzip-compressed when it is large enough and
+// the client accepts it. With the request's timing, compression is timed and the stages
+// so far go out as the Server-Timing header. The encoding headers are only set once the
+// compressed body exists, so a caller answering a compression failure sends plain JSON.
+export async function sendJson(req: VercelRequest, res: VercelResponse, body: string, status = 200, timing?: RequestTiming): Promise<void> {
+  res.setHeader('Content-Type', 'application/json; charset=utf-8')
+  const send = (payload: string | Buffer) => {
+    if (timing) res.setHeader('Server-Timing', timing.serverTiming())
+    res.status(status).send(payload)
+  }
+  const minBytes = compressMinBytes()
+  const encoding = negotiateEncoding(String(req.headers['accept-encoding'] || ''))
+  if (minBytes <= 0 || Buffer.byteLength(body) < minBytes || !encoding) {
+    send(body)
+    return
+  }
+  const compress = (fn: () => Promise<Buffer>) => (timing ? timing.measure('compress', fn) : fn())
+  const compressed = encoding === 'br'
+    // Quality 4: most of brotli's gain at a fraction of the default's CPU
+    ? await compress(() => brotli(body, { params: { [zlibConstants.BROTLI_PARAM_QUALITY]: 4 } }))
+    : await compress(() => gzipAsync(body, { level: 6 }))
+  res.setHeader('Vary', 'Accept-Encoding')
+  res.setHeader('Content-Encoding', encoding)
+  send(compressed)
+}
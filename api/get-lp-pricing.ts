@@ -1,407 +1,7 @@
 import type { VercelRequest, VercelResponse } from '@vercel/node'
-
-const BROWSERLESS_URL = 'https://production-sfo.browserless.io/chromium/bql'
-const FLEX_URL = 'https://flex.digitallending.com/#/pricing?code=Oaktree&company=oaktree.digitallending.com'
-
-// ================= Flex Form Field IDs =================
-const FIELD_IDS = {
-  fico: '63d2274bf262ed03e49abc6c',
-  citizenship: '63fd2c4bd2d5c7d168d741b8',
-  docType: '686fb4aab753b53d04cea8c9',
-  dscrRatio: '63bda202870841ff37dcffc2',
-  occupancy: '61a97be92f993cf968556c19',
-  propertyType: '613fe3ebb0d5f45e0b719775',
-  units: '61a97b912f993cf968556c14',
-  attachmentType: '61a97b4e2f993cf968556c10',
-  zip: '613fe802b0d5f45e0b71985b',
-  state: '613fe2d8b0d5f45e0b719766',
-  loanPurpose: '625cf17a81b3b41288722d24',
-  purchasePrice: '63fd2badd2d5c7d168d7404b',
-  loanAmount: '625cf3e881b3b41288722d60',
-  waiveImpounds: '63ac9dfb44b1dfb7238cbd36',
-  interestOnly: '6471198a1808b2759c7290f3',
-  selfEmployed: '6219b8a850cbb98496384300',
-  // Dynamic fields (appear after DSCR/Investment selection)
-  prepayTerm: '691667834a1a0960d1e67588',
-  prepayPlanType: '691667af4a1a0960d1e67596',
-  shortTermRental: '688a8c972c7c7a45f870c4e5',
-  firstTimeInvestor: '64062719bcd1bf2ef39bb120',
-  crossCollateralized: '697b9d8d942d1b374b520aa6',
-}
-
-// ================= Form Value Mappings =================
-function mapFormValues(formData: any) {
-  const occupancyMap: Record<string, string> = {
-    primary: 'Primary Residence', secondary: 'Second Home', investment: 'Investment',
-  }
-  const propTypeMap: Record<string, string> = {
-    sfr: 'Single Family Residence', condo: 'Condo', townhouse: 'Townhouse',
-    '2unit': '2-4 Units', '3unit': '2-4 Units', '4unit': '2-4 Units', '5-9unit': 'MultiFamily 5-8 Units',
-  }
-  const purposeMap: Record<string, string> = {
-    purchase: 'Purchase', refinance: 'Refinance', cashout: 'Cashout Refinance',
-  }
-  const citizenMap: Record<string, string> = {
-    usCitizen: 'US Citizen', permanentResident: 'Permanent Resident',
-    nonPermanentResident: 'Non-Permanent Resident', foreignNational: 'Foreign National', itin: 'ITIN',
-  }
-  const docTypeMap: Record<string, string> = {
-    fullDoc: 'Full Doc', dscr: 'Investor/DSCR',
-    bankStatement: '24 Mo Personal Bank Statements', bankStatement12: '12 Mo Personal Bank Statements',
-    bankStatement24: '24 Mo Personal Bank Statements', assetDepletion: 'Asset Utilization',
-    assetUtilization: 'Asset Utilization', voe: 'WVOE', noRatio: 'Full Doc',
-  }
-  const stateMap: Record<string, string> = {
-    AL: 'Alabama', AK: 'Alaska', AZ: 'Arizona', AR: 'Arkansas', CA: 'California',
-    CO: 'Colorado', CT: 'Connecticut', DE: 'Delaware', FL: 'Florida', GA: 'Georgia',
-    HI: 'Hawaii', ID: 'Idaho', IL: 'Illinois', IN: 'Indiana', IA: 'Iowa',
-    KS: 'Kansas', KY: 'Kentucky', LA: 'Louisiana', ME: 'Maine', MD: 'Maryland',
-    MA: 'Massachusetts', MI: 'Michigan', MN: 'Minnesota', MS: 'Mississippi', MO: 'Missouri',
-    MT: 'Montana', NE: 'Nebraska', NV: 'Nevada', NH: 'New Hampshire', NJ: 'New Jersey',
-    NM: 'New Mexico', NY: 'New York', NC: 'North Carolina', ND: 'North Dakota', OH: 'Ohio',
-    OK: 'Oklahoma', OR: 'Oregon', PA: 'Pennsylvania', RI: 'Rhode Island', SC: 'South Carolina',
-    SD: 'South Dakota', TN: 'Tennessee', TX: 'Texas', UT: 'Utah', VT: 'Vermont',
-    VA: 'Virginia', WA: 'Washington', WV: 'West Virginia', WI: 'Wisconsin', WY: 'Wyoming',
-    DC: 'District of Columbia',
-  }
-
-  const isDSCR = formData.documentationType === 'dscr'
-
-  // Map prepay period: form sends "60mo","48mo","36mo","24mo","12mo","0mo"
-  // Flex pricer expects: "None","12 Months","24 Months","36 Months","48 Months","60 Months"
-  const prepayMap: Record<string, string> = {
-    '60mo': '60 Months', '48mo': '48 Months', '36mo': '36 Months',
-    '24mo': '24 Months', '12mo': '12 Months', '0mo': 'None',
-  }
-  // Map prepay type (plan): form sends "5pct","declining","6mointerest"
-  // Flex pricer expects: "N/A","5% Fixed","Declining","6 Months Interest","1% (MI and OH only)","2% Fixed (RI Only)"
-  const prepayTypeMap: Record<string, string> = {
-    '5pct': '5% Fixed', 'declining': 'Declining', '6mointerest': '6 Months Interest',
-  }
-
-  return {
-    fico: String(Number(formData.creditScore) || 740),
-    citizenship: citizenMap[formData.citizenship] || 'US Citizen',
-    docType: docTypeMap[formData.documentationType] || 'Full Doc',
-    dscrRatio: isDSCR ? String(Number(formData.dscrValue) || 1.25) : '',
-    occupancy: occupancyMap[formData.occupancyType] || 'Primary Residence',
-    propertyType: propTypeMap[formData.propertyType] || 'Single Family Residence',
-    units: formData.propertyType === '5-9unit' ? '5' : formData.propertyType?.startsWith('2') ? '2' : formData.propertyType?.startsWith('3') ? '3' : formData.propertyType?.startsWith('4') ? '4' : '1',
-    attachmentType: formData.structureType === 'attached' ? 'Attached' : 'Detached',
-    zip: formData.propertyZip || '90210',
-    state: stateMap[formData.propertyState] || 'California',
-    loanPurpose: purposeMap[formData.loanPurpose] || 'Purchase',
-    purchasePrice: String(Number(formData.propertyValue) || 800000),
-    loanAmount: String(Number(formData.loanAmount) || 600000),
-    waiveImpounds: formData.impoundType === 'noescrow',
-    interestOnly: formData.paymentType === 'io',
-    selfEmployed: !!formData.isSelfEmployed,
-    isDSCR,
-    isInvestment: formData.occupancyType === 'investment',
-    prepayTerm: prepayMap[formData.prepayPeriod] || 'None',
-    prepayPlanType: prepayTypeMap[formData.prepayType] || '5% Fixed',
-    isCrossCollateralized: !!formData.isCrossCollateralized,
-  }
-}
-
-// ================= Build BQL Evaluate Script =================
-function buildEvaluateScript(values: ReturnType<typeof mapFormValues>): string {
-  // Build setVal calls for each field
-  const fieldSets: string[] = [
-    `setVal('${FIELD_IDS.fico}', '${values.fico}');`,
-    `setVal('${FIELD_IDS.citizenship}', '${values.citizenship}');`,
-    `setVal('${FIELD_IDS.docType}', '${values.docType}');`,
-    `setVal('${FIELD_IDS.occupancy}', '${values.occupancy}');`,
-    `await sleep(300);`,
-    `setVal('${FIELD_IDS.propertyType}', '${values.propertyType}');`,
-    `setVal('${FIELD_IDS.units}', '${values.units}');`,
-    `setVal('${FIELD_IDS.attachmentType}', '${values.attachmentType}');`,
-    `setVal('${FIELD_IDS.zip}', '${values.zip}');`,
-    `setVal('${FIELD_IDS.state}', '${values.state}');`,
-    `setVal('${FIELD_IDS.loanPurpose}', '${values.loanPurpose}');`,
-    `await sleep(300);`,
-    `setVal('${FIELD_IDS.purchasePrice}', '${values.purchasePrice}');`,
-    `setVal('${FIELD_IDS.loanAmount}', '${values.loanAmount}');`,
-  ]
-
-  if (values.isDSCR && values.dscrRatio) {
-    fieldSets.push(`setVal('${FIELD_IDS.dscrRatio}', '${values.dscrRatio}');`)
-  }
-
-  // Prepay term (dynamic field — appears after setting Investment occupancy)
-  // Set after a sleep so the DOM has time to render dynamic fields
-  if (values.isInvestment) {
-    fieldSets.push(`await sleep(500);`)
-    fieldSets.push(`setVal('${FIELD_IDS.prepayTerm}', '${values.prepayTerm}');`)
-    // Prepay plan type (dynamic — appears after setting prepayTerm to non-None value)
-    if (values.prepayTerm !== 'None') {
-      fieldSets.push(`await sleep(500);`)
-      fieldSets.push(`setVal('${FIELD_IDS.prepayPlanType}', '${values.prepayPlanType}');`)
-    }
-  }
-
-  // Handle checkboxes
-  const checkboxSets: string[] = []
-  if (values.waiveImpounds) {
-    checkboxSets.push(`setCheckbox('${FIELD_IDS.waiveImpounds}', true);`)
-  }
-  if (values.interestOnly) {
-    checkboxSets.push(`setCheckbox('${FIELD_IDS.interestOnly}', true);`)
-  }
-  if (values.selfEmployed) {
-    checkboxSets.push(`setCheckbox('${FIELD_IDS.selfEmployed}', true);`)
-  }
-  if (values.isCrossCollateralized) {
-    checkboxSets.push(`setCheckbox('${FIELD_IDS.crossCollateralized}', true);`)
-  }
-
-  return `(async function() {
-  function sleep(ms) { return new Promise(r => setTimeout(r, ms)); }
-  var diag = { steps: [], fieldResults: {} };
-
-  function setVal(id, val) {
-    var el = document.getElementById(id);
-    if (!el) { diag.fieldResults[id] = 'NOT_FOUND'; return; }
-    diag.fieldResults[id] = { tag: el.tagName, found: true };
-    var s = el.tagName === 'SELECT'
-      ? Object.getOwnPropertyDescriptor(window.HTMLSelectElement.prototype, 'value').set
-      : Object.getOwnPropertyDescriptor(window.HTMLInputElement.prototype, 'value').set;
-    s.call(el, val);
-    el.dispatchEvent(new Event('input', {bubbles: true}));
-    el.dispatchEvent(new Event('change', {bubbles: true}));
-  }
-  function setCheckbox(id, checked) {
-    var el = document.getElementById(id);
-    if (el && el.checked !== checked) { el.click(); }
-    diag.fieldResults[id] = el ? 'checkbox_set' : 'NOT_FOUND';
-  }
-
-  diag.steps.push('page_url: ' + window.location.href);
-  diag.steps.push('title: ' + document.title);
-
-  await sleep(2000);
-
-  // Hide cookie banner (do NOT click - clicking <A> can trigger navigation)
-  document.cookie = 'cookieconsent_status=allow; path=/; max-age=31536000';
-  var banners = document.querySelectorAll('.cc-window, [class*=cookie-consent], [class*=cookie-banner]');
-  for (var bi = 0; bi < banners.length; bi++) {
-    banners[bi].remove();
-    diag.steps.push('cookie_banner_removed');
-  }
-  await sleep(1000);
-
-  // Check if page loaded
-  var bodyText = (document.body.innerText || '').substring(0, 500);
-  diag.steps.push('body_preview: ' + bodyText.substring(0, 200));
-
-  // Discover ALL form fields (selects + inputs with labels)
-  var allSelects = document.querySelectorAll('select');
-  var allInputs = document.querySelectorAll('input');
-  var formFields = [];
-  for (var si = 0; si < allSelects.length; si++) {
-    var sel = allSelects[si];
-    var label = sel.previousElementSibling ? (sel.previousElementSibling.textContent || '').trim() : '';
-    if (!label) { var par = sel.parentElement; label = par ? (par.querySelector('label') || {}).textContent || '' : ''; }
-    var selOpts = [];
-    for (var so = 0; so < sel.options.length && so < 15; so++) { selOpts.push(sel.options[so].text); }
-    formFields.push({ tag: 'SELECT', id: sel.id, label: label.substring(0, 40), value: sel.value, options: selOpts });
-  }
-  for (var ii = 0; ii < allInputs.length; ii++) {
-    var inp = allInputs[ii];
-    if (inp.type === 'hidden') continue;
-    var ilabel = inp.previousElementSibling ? (inp.previousElementSibling.textContent || '').trim() : '';
-    if (!ilabel) { var ipar = inp.parentElement; ilabel = ipar ? (ipar.querySelector('label') || {}).textContent || '' : ''; }
-    formFields.push({ tag: 'INPUT', id: inp.id, type: inp.type, label: ilabel.substring(0, 40), value: (inp.value || '').substring(0, 30) });
-  }
-  diag.formFields = formFields;
-
-  // Capture doc type SELECT options before filling
-  var docTypeEl = document.getElementById('${FIELD_IDS.docType}');
-  if (docTypeEl && docTypeEl.tagName === 'SELECT') {
-    var opts = [];
-    for (var oi = 0; oi < docTypeEl.options.length; oi++) {
-      opts.push(docTypeEl.options[oi].text);
-    }
-    diag.docTypeOptions = opts;
-  }
-
-  ${fieldSets.join('\\n  ')}
-  ${checkboxSets.join('\\n  ')}
-
-  // Verify the docType was set correctly
-  if (docTypeEl) {
-    diag.steps.push('docType_after_set: ' + docTypeEl.value + ' | selectedText: ' + (docTypeEl.selectedOptions ? docTypeEl.selectedOptions[0]?.text : 'N/A'));
-  }
-
-  await sleep(1000);
-  diag.steps.push('fields_set');
-
-  // Second field discovery AFTER setting form values (prepay fields may appear dynamically)
-  var allSelects2 = document.querySelectorAll('select');
-  var allInputs2 = document.querySelectorAll('input');
-  var formFieldsAfter = [];
-  for (var si2 = 0; si2 < allSelects2.length; si2++) {
-    var sel2 = allSelects2[si2];
-    var lbl2 = sel2.previousElementSibling ? (sel2.previousElementSibling.textContent || '').trim() : '';
-    if (!lbl2) { var par2 = sel2.parentElement; lbl2 = par2 ? (par2.querySelector('label') || {}).textContent || '' : ''; }
-    var opts2 = [];
-    for (var so2 = 0; so2 < sel2.options.length && so2 < 15; so2++) { opts2.push(sel2.options[so2].text); }
-    formFieldsAfter.push({ tag: 'SELECT', id: sel2.id, label: lbl2.substring(0, 40), value: sel2.value, options: opts2 });
-  }
-  for (var ii2 = 0; ii2 < allInputs2.length; ii2++) {
-    var inp2 = allInputs2[ii2];
-    if (inp2.type === 'hidden') continue;
-    var ilbl2 = inp2.previousElementSibling ? (inp2.previousElementSibling.textContent || '').trim() : '';
-    if (!ilbl2) { var ipar2 = inp2.parentElement; ilbl2 = ipar2 ? (ipar2.querySelector('label') || {}).textContent || '' : ''; }
-    formFieldsAfter.push({ tag: 'INPUT', id: inp2.id, type: inp2.type, label: ilbl2.substring(0, 40), value: (inp2.value || '').substring(0, 30) });
-  }
-  diag.formFieldsAfter = formFieldsAfter;
-  diag.steps.push('post_fill_fields: ' + formFieldsAfter.length + ' (before: ' + formFields.length + ')');
-
-  // Click Search
-  var searchBtn = document.querySelector('button.btn-primary');
-  var allBtns = document.querySelectorAll('button');
-  diag.steps.push('buttons_found: ' + allBtns.length);
-  diag.steps.push('search_btn: ' + (searchBtn ? searchBtn.textContent.trim() : 'NOT_FOUND'));
-  if (!searchBtn) return JSON.stringify({ error: 'no search button', diag: diag });
-  searchBtn.click();
-  diag.steps.push('search_clicked');
-
-  // Poll for results table (check every 2s, up to 20s)
-  var foundTable = false;
-  for (var attempt = 0; attempt < 10; attempt++) {
-    await sleep(2000);
-    var checkTables = document.querySelectorAll('table');
-    var checkRows = document.querySelectorAll('tr');
-    if (checkRows.length > 0) {
-      diag.steps.push('results_found_at: ' + ((attempt + 1) * 2) + 's (' + checkRows.length + ' rows)');
-      foundTable = true;
-      break;
-    }
-    // Also check for loading spinner or "No results" text
-    var bodySnap = (document.body.innerText || '');
-    if (bodySnap.indexOf('No results') >= 0 || bodySnap.indexOf('No eligible') >= 0) {
-      diag.steps.push('no_results_text_at: ' + ((attempt + 1) * 2) + 's');
-      break;
-    }
-  }
-
-  if (!foundTable) {
-    diag.steps.push('no_table_after_20s');
-    // Capture more page state for debugging
-    var pageText2 = (document.body.innerText || '');
-    diag.steps.push('final_page: ' + pageText2.substring(0, 400));
-    // Look for error/validation messages
-    var errEls = document.querySelectorAll('.error, .alert, .warning, .validation, [class*=error], [class*=alert], [class*=invalid], .text-danger, .has-error');
-    var errs = [];
-    for (var ei = 0; ei < errEls.length; ei++) {
-      var errText = (errEls[ei].textContent || '').trim();
-      if (errText) errs.push(errText.substring(0, 100));
-    }
-    if (errs.length > 0) diag.steps.push('errors_found: ' + JSON.stringify(errs));
-    // Check for loading spinners still visible
-    var spinners = document.querySelectorAll('.spinner, .loading, [class*=spinner], [class*=loading], .fa-spin');
-    diag.steps.push('spinners_visible: ' + spinners.length);
-    // Capture form validation state
-    var invalidInputs = document.querySelectorAll('input:invalid, select:invalid, .ng-invalid');
-    diag.steps.push('invalid_inputs: ' + invalidInputs.length);
-    // Capture full body text (more context)
-    diag.fullPageText = pageText2.substring(0, 2000);
-  }
-
-  // Extra settle time after table appears
-  if (foundTable) await sleep(1000);
-
-  var allRows = document.querySelectorAll('tr');
-  diag.steps.push('total_tr_elements: ' + allRows.length);
-  var allTables = document.querySelectorAll('table');
-  diag.steps.push('total_tables: ' + allTables.length);
-
-  // Extract rate data from table
-  function getData(cell) {
-    var div = cell.querySelector('[data]');
-    return div ? div.getAttribute('data') : (cell.textContent || '').trim();
-  }
-
-  // Capture table headers for column discovery
-  var thEls = document.querySelectorAll('th');
-  var colHeaders = [];
-  for (var hi = 0; hi < thEls.length; hi++) {
-    colHeaders.push((thEls[hi].textContent || '').trim());
-  }
-  diag.colHeaders = colHeaders;
-
-  var rows = document.querySelectorAll('tr');
-  var rates = [];
-  var debugRows = [];
-  for (var i = 0; i < rows.length && i < 50; i++) {
-    var cells = rows[i].querySelectorAll('td');
-    if (cells.length < 5) continue;
-    var rateText = (cells[0].textContent || '').trim();
-    // Dump all cells for first data row
-    if (debugRows.length === 0) {
-      var allCells = [];
-      for (var ci = 0; ci < cells.length; ci++) {
-        allCells.push({ idx: ci, text: (cells[ci].textContent || '').trim().substring(0, 50), data: getData(cells[ci]) });
-      }
-      debugRows.push({ cellCount: cells.length, allCells: allCells });
-    } else if (debugRows.length < 3) {
-      debugRows.push({ cellCount: cells.length, cell0: rateText.substring(0, 30) });
-    }
-    var rateMatch = rateText.match(/([\\d.]+)\\s*%/);
-    if (!rateMatch) continue;
-    rates.push({
-      rate: parseFloat(rateMatch[1]),
-      lender: (cells[1] ? (cells[1].textContent || '').trim() : ''),
-      price: getData(cells[2]),
-      payment: getData(cells[3]),
-      costToBorrower: getData(cells[4]),
-      lenderFee: getData(cells[6]),
-      program: (cells[7] ? (cells[7].textContent || '').trim() : ''),
-      priceAdj: getData(cells[9])
-    });
-  }
-
-  diag.debugRows = debugRows;
-
-  // Get eligible counts
-  var pageText = document.body.innerText || '';
-  var qmMatch = pageText.match(/Eligible QM \\((\\d+)\\)/);
-  var nonQmMatch = pageText.match(/Eligible Non-Traditional \\((\\d+)\\)/);
-
-  return JSON.stringify({
-    rateCount: rates.length,
-    eligibleQM: qmMatch ? parseInt(qmMatch[1]) : 0,
-    eligibleNonQM: nonQmMatch ? parseInt(nonQmMatch[1]) : 0,
-    rates: rates,
-    diag: diag
-  });
-})()`
-}
-
-// ================= Parse Scraped Results =================
-function parseScrapedRates(rawRates: any[]): any[] {
-  return rawRates
-    .filter((r: any) => r.rate > 0 && r.price)
-    .map((r: any) => {
-      const priceStr = String(r.price).replace(/[^0-9.-]/g, '')
-      const paymentStr = String(r.payment).replace(/[^0-9.-]/g, '')
-      const adjStr = String(r.priceAdj).replace(/[^0-9.-]/g, '')
-      const costStr = String(r.costToBorrower || '').replace(/[^0-9.-]/g, '')
-      const feeStr = String(r.lenderFee || '').replace(/[^0-9.-]/g, '')
-      return {
-        rate: r.rate,
-        price: parseFloat(priceStr) || 0,
-        payment: parseFloat(paymentStr) || 0,
-        program: r.program || '',
-        lender: r.lender || '',
-        costToBorrower: parseFloat(costStr) || 0,
-        lenderFee: parseFloat(feeStr) || 0,
-        totalAdjustments: parseFloat(adjStr) || 0,
-      }
-    })
-    .sort((a: any, b: any) => a.rate - b.rate)
-}
+import { lpMode, priceLenderPrice } from './_lib/lp-pricing.js'
+import { RequestTiming } from './_lib/timing.js'
+import { parseFields, projectFields, resolveVerbosity, sendJson, shapeLenderPrice } from './_lib/verbosity.js'
 
 // Vercel hobby plan: extend timeout to 60s (BQL scrape takes ~20s)
 export const config = { maxDuration: 60 }
@@ -412,92 +12,23 @@ export default async function handler(req: VercelRequest, res: VercelResponse) {
   res.setHeader('Access-Control-Allow-Methods', 'POST, OPTIONS')
   res.setHeader('Access-Control-Allow-Headers', 'Content-Type')
   res.setHeader('Cache-Control', 'no-store')
+  res.setHeader('Access-Control-Expose-Headers', 'X-Coalesced, Server-Timing')
 
   if (req.method === 'OPTIONS') return res.status(200).end()
   if (req.method !== 'POST') return res.status(405).json({ success: false, error: 'Method not allowed' })
 
-  const browserlessToken = process.env.BROWSERLESS_TOKEN
-  if (!browserlessToken) {
-    return res.json({ success: false, error: 'LP pricing not configured' })
-  }
-
-  try {
-    const formData = req.body
-    const values = mapFormValues(formData)
-    console.log('[LP] Mapped values:', JSON.stringify(values))
-    console.log('[LP] Raw form data keys:', Object.keys(formData).join(', '))
-    const evalScript = buildEvaluateScript(values)
-
-    const bqlQuery = `mutation ScrapeRates {
-  goto(url: "${FLEX_URL}", waitUntil: networkIdle) { status time }
-  results: evaluate(content: ${JSON.stringify(evalScript)}, timeout: 30000) { value }
-}`
-
-    const bqlResp = await fetch(`${BROWSERLESS_URL}?token=${browserlessToken}`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ query: bqlQuery }),
-      signal: AbortSignal.timeout(50000),
-    })
-
-    if (!bqlResp.ok) {
-      return res.json({
-        success: true,
-        data: { source: 'lenderprice', rateOptions: [], totalRates: 0, debug: { bqlStatus: bqlResp.status } },
-      })
-    }
-
-    const bqlResult = await bqlResp.json()
-
-    if (bqlResult.errors) {
-      return res.json({
-        success: true,
-        data: { source: 'lenderprice', rateOptions: [], totalRates: 0, debug: { bqlErrors: bqlResult.errors } },
-      })
-    }
-
-    const evalValue = bqlResult.data?.results?.value
-    if (!evalValue) {
-      return res.json({
-        success: true,
-        data: { source: 'lenderprice', rateOptions: [], totalRates: 0, debug: { noEvalValue: true } },
-      })
-    }
-
-    const scraped = typeof evalValue === 'string' ? JSON.parse(evalValue) : evalValue
-
-    if (scraped.error) {
-      return res.json({
-        success: true,
-        data: { source: 'lenderprice', rateOptions: [], totalRates: 0, debug: { scrapeError: scraped.error } },
-      })
-    }
-
-    const rateOptions = parseScrapedRates(scraped.rates || [])
-
-    return res.json({
-      success: true,
-      data: {
-        source: 'lenderprice',
-        rateOptions,
-        totalRates: rateOptions.length,
-        eligibleQM: scraped.eligibleQM || 0,
-        eligibleNonQM: scraped.eligibleNonQM || 0,
-        debug: {
-          mappedValues: values,
-          rawRateCount: scraped.rateCount,
-          rawRatesLength: (scraped.rates || []).length,
-          firstRawRate: (scraped.rates || [])[0] || null,
-          parsedCount: rateOptions.length,
-          diag: scraped.diag || null,
-        },
-      },
-    })
-  } catch (error) {
-    console.error('LP pricing error:', error)
-    return res.json({
-      success: false,
-      error: error instanceof Error ? error.message : 'LP pricing unavailable',
-    })
-  }
+  // Stage timings go out as Server-Timing and one JSON log line (see _lib/timing.ts)
+  const timing = new RequestTiming('get-lp-pricing')
+  // A request that joined an identical scenario already in flight is marked X-Coalesced
+  let coalesced = false
+  const pricing = await priceLenderPrice(req.body, lpMode(req.query?.mode), {
+    timing,
+    onJoin: role => {
+      coalesced = role === 'follower'
+      if (coalesced) res.setHeader('X-Coalesced', 'follower')
+    },
+  })
+  const body = timing.measure('serialize', () => JSON.stringify(projectFields(shapeLenderPrice(pricing, resolveVerbosity(req.query?.verbosity)), parseFields(req.query?.fields))))
+  await sendJson(req, res, body, 200, timing)
+  timing.log({ status: 200, success: pricing.success !== false, coalesced })
 }
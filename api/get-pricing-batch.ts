@@ -0,0 +1,195 @@
+import type { VercelRequest, VercelResponse } from '@vercel/node'
+import { getOAuthToken, priceScenario, type PricingOptions } from './_lib/meridianlink.js'
+import { resolveAdjustmentFormat, resolveVerbosity, sendJson } from './_lib/verbosity.js'
+
+// Batch/grid pricing for rate-sheet previews: one OAuth token for the whole batch,
+// RunQuickPricerV2 fanned out under a concurrency limit, results streamed as NDJSON
+// in completion order. A failed or timed-out scenario is reported on its own line and
+// does not stop the rest.
+//
+// POST body:
+//   { base?: {...formData}, scenarios: [{...overrides}, ...] }
+//   { base?: {...formData}, grid: { creditScore: [700, 740], ltv: [70, 80], dscrRatio: [...] } }
+//   optional: concurrency, timeoutMs, detail: 'summary' | 'full'
+// detail=full items carry get-pricing's data at ?verbosity= and ?adjustments= (see
+// _lib/verbosity.ts).
+// ?stream=false returns one JSON document with results in input order instead.
+//
+// The whole batch runs inside MERIDIANLINK_BATCH_BUDGET_MS (default 55000, a few
+// seconds under maxDuration): no scenario starts after it, one in flight is cut off at
+// it, and the ones never started are reported as skipped, so the summary line and the
+// quote-cache writes always make it out before the function is killed.
+
+const MAX_SCENARIOS = Number(process.env.MERIDIANLINK_BATCH_MAX) || 500
+const DEFAULT_CONCURRENCY = Number(process.env.MERIDIANLINK_BATCH_CONCURRENCY) || 8
+const MAX_CONCURRENCY = 32
+const DEFAULT_ITEM_TIMEOUT_MS = 25000
+
+export const config = { maxDuration: 60 }
+
+function batchBudgetMs(): number {
+  return Number(process.env.MERIDIANLINK_BATCH_BUDGET_MS) || (config.maxDuration - 5) * 1000
+}
+
+// ================= Scenario Expansion =================
+// Grid axes are form fields; `ltv` sets loanAmount from the base property value
+function expandGrid(base: any, grid: Record<string, unknown[]>): any[] {
+  let scenarios: any[] = [{ ...base }]
+  for (const [field, values] of Object.entries(grid)) {
+    if (!Array.isArray(values) || values.length === 0) throw new Error(`grid.${field} must be a non-empty array`)
+    scenarios = scenarios.flatMap(s => values.map(value => {
+      if (field !== 'ltv') return { ...s, [field]: value }
+      const propertyValue = Number(s.propertyValue || s.purchasePrice) || 500000
+      return { ...s, ltv: value, loanAmount: String(Math.round(propertyValue * Number(value) / 100)) }
+    }))
+    if (scenarios.length > MAX_SCENARIOS) break
+  }
+  return scenarios
+}
+
+function expandScenarios(body: any): any[] {
+  const base = body.base || {}
+  if (Array.isArray(body.scenarios)) return body.scenarios.map((s: any) => ({ ...base, ...s }))
+  if (body.grid && typeof body.grid === 'object') return expandGrid(base, body.grid)
+  throw new Error('Provide scenarios (array) or grid (field → values)')
+}
+
+// ================= Pricing =================
+interface BatchItem {
+  index: number
+  // Grid batches: this item's value on each axis
+  point?: Record<string, unknown>
+  success: boolean
+  ms: number
+  cache?: 'HIT' | 'MISS'
+  timedOut?: boolean
+  // Not started: the batch ran out of time first
+  skipped?: boolean
+  error?: string
+  data?: any
+}
+
+// Fields a grid preview needs; detail=full returns the whole get-pricing data object
+function summarize(data: any) {
+  return {
+    rate: data.rate,
+    apr: data.apr,
+    points: data.points,
+    monthlyPayment: data.monthlyPayment,
+    ltvRatio: data.ltvRatio,
+    programName: data.programName,
+    investorName: data.investorName,
+    totalPrograms: data.totalPrograms,
+  }
+}
+
+async function priceItem(index: number, scenario: any, token: string, timeoutMs: number, full: boolean, shape: Pick<PricingOptions, 'verbosity' | 'adjustments'>, bypassCache: boolean, stored: Promise<void>[]): Promise<BatchItem> {
+  const started = Date.now()
+  try {
+    const outcome = await priceScenario(scenario, { token, timeoutMs, bypassCache, ...shape })
+    if (outcome.stored) stored.push(outcome.stored)
+    const parsed = JSON.parse(outcome.body)
+    const ms = Date.now() - started
+    if (!parsed.success) return { index, success: false, ms, cache: outcome.cache, error: parsed.error }
+    return { index, success: true, ms, cache: outcome.cache, data: full ? parsed.data : summarize(parsed.data) }
+  } catch (error) {
+    const timedOut = error instanceof Error && (error.name === 'TimeoutError' || error.name === 'AbortError')
+    return {
+      index,
+      success: false,
+      ms: Date.now() - started,
+      timedOut,
+      error: timedOut ? `Timed out after ${timeoutMs}ms` : error instanceof Error ? error.message : 'Failed to get pricing',
+    }
+  }
+}
+
+// Run worker(0..count-1) with at most `limit` in flight
+async function runPool(count: number, limit: number, worker: (index: number) => Promise<void>): Promise<void> {
+  let next = 0
+  const lanes = Array.from({ length: Math.min(limit, count) }, async () => {
+    while (next < count) await worker(next++)
+  })
+  await Promise.all(lanes)
+}
+
+// ================= Main Handler =================
+export default async function handler(req: VercelRequest, res: VercelResponse) {
+  const deadline = Date.now() + batchBudgetMs()
+  res.setHeader('Access-Control-Allow-Origin', '*')
+  res.setHeader('Access-Control-Allow-Methods', 'POST, OPTIONS')
+  res.setHeader('Access-Control-Allow-Headers', 'Content-Type, Cache-Control')
+  res.setHeader('Cache-Control', 'no-store')
+
+  if (req.method === 'OPTIONS') return res.status(200).end()
+  if (req.method !== 'POST') return res.status(405).json({ success: false, error: 'Method not allowed' })
+
+  const body = req.body || {}
+  let scenarios: any[]
+  try {
+    scenarios = expandScenarios(body)
+  } catch (error) {
+    return res.status(400).json({ success: false, error: error instanceof Error ? error.message : 'Invalid batch' })
+  }
+  if (scenarios.length === 0) return res.status(400).json({ success: false, error: 'Batch is empty' })
+  if (scenarios.length > MAX_SCENARIOS) {
+    return res.status(400).json({ success: false, error: `Batch has ${scenarios.length} scenarios (max ${MAX_SCENARIOS})` })
+  }
+
+  const concurrency = Math.max(1, Math.min(MAX_CONCURRENCY, Number(body.concurrency) || DEFAULT_CONCURRENCY))
+  const timeoutMs = Math.max(1000, Number(body.timeoutMs) || DEFAULT_ITEM_TIMEOUT_MS)
+  const full = body.detail === 'full'
+  // Summaries only read top-level fields, which the minimal body has
+  const shape = full
+    ? { verbosity: resolveVerbosity(req.query?.verbosity), adjustments: resolveAdjustmentFormat(req.query?.adjustments) }
+    : { verbosity: 'minimal' as const }
+  const bypassCache = String(req.headers['cache-control'] || '').includes('no-cache')
+  const stream = String(req.query?.stream ?? 'true') !== 'false'
+
+  const started = Date.now()
+  let token: string
+  try {
+    token = await getOAuthToken()
+  } catch (error) {
+    console.error('Batch OAuth error:', error)
+    return res.status(500).json({ success: false, error: error instanceof Error ? error.message : 'OAuth failed' })
+  }
+
+  if (stream) {
+    res.setHeader('Content-Type', 'application/x-ndjson; charset=utf-8')
+    res.status(200)
+  }
+
+  const axes = body.grid && !Array.isArray(body.scenarios) ? Object.keys(body.grid) : []
+  const results: BatchItem[] = new Array(scenarios.length)
+  const stored: Promise<void>[] = []
+  await runPool(scenarios.length, concurrency, async index => {
+    const remainingMs = deadline - Date.now()
+    const item: BatchItem = remainingMs > 0
+      ? await priceItem(index, scenarios[index], token, Math.min(timeoutMs, remainingMs), full, shape, bypassCache, stored)
+      : { index, success: false, ms: 0, skipped: true, error: 'Skipped: batch time budget reached' }
+    if (axes.length > 0) item.point = Object.fromEntries(axes.map(axis => [axis, scenarios[index][axis]]))
+    results[index] = item
+    if (stream) res.write(JSON.stringify(item) + '\n')
+  })
+
+  const wallMs = Date.now() - started
+  // Sum of per-scenario latencies: what the same scenarios cost as serial calls
+  const serialMs = results.reduce((sum, r) => sum + r.ms, 0)
+  const summary = {
+    total: results.length,
+    succeeded: results.filter(r => r.success).length,
+    failed: results.filter(r => !r.success).length,
+    timedOut: results.filter(r => r.timedOut).length,
+    skipped: results.filter(r => r.skipped).length,
+    cacheHits: results.filter(r => r.cache === 'HIT').length,
+    concurrency,
+    wallMs,
+    serialMs,
+    speedup: wallMs > 0 ? Math.round((serialMs / wallMs) * 100) / 100 : null,
+  }
+
+  if (stream) res.end(JSON.stringify({ done: true, summary }) + '\n')
+  else await sendJson(req, res, JSON.stringify({ success: true, results, summary }))
+  await Promise.all(stored)
+}
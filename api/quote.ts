@@ -0,0 +1,195 @@
+import type { VercelRequest, VercelResponse } from '@vercel/node'
+import { resolveEncoding, type RateOptionEncoding } from './_lib/columnar.js'
+import { priceScenario } from './_lib/meridianlink.js'
+import { lpMode, priceLenderPrice } from './_lib/lp-pricing.js'
+import { lnMode, priceLoanNex } from './_lib/ln-pricing.js'
+import { parseFields, projectFields, resolveAdjustmentFormat, resolveVerbosity, shapeLenderPrice, shapeLoanNex, type AdjustmentFormat, type Verbosity } from './_lib/verbosity.js'
+
+// Unified quote: the scenario is posted once, MeridianLink, LenderPrice and LoanNEX are
+// started together server-side, and each provider's result is streamed the moment it
+// lands, so the UI can render ML (~2s) while the LP/LN browser flows keep running.
+//
+// POST body: the same form data get-pricing / get-lp-pricing / get-ln-pricing take.
+// Query:
+//   providers=ml,lp,ln   which providers to run (default all three)
+//   lpMode, lnMode       api | bql, as ?mode= on the single-provider endpoints
+//   verbosity, fields    response shaping, as on the single-provider endpoints
+//   adjustments=table    ML adjustments as one table by template ID (as on get-pricing)
+//   encoding=columnar    ML rate options as parallel columns (as on get-pricing)
+//   format=sse           Server-Sent Events instead of NDJSON (also chosen by
+//                        Accept: text/event-stream)
+//
+// Every provider produces exactly one event carrying its usual { success, data | error }
+// body plus provider, ms (and cache for ML, coalesced: true when it joined an identical
+// scenario already in flight); a final { done, summary } event closes the stream. A
+// provider still running at QUOTE_PROVIDER_TIMEOUT_MS is reported as timed out.
+// When only FICO, LTV or loan amount changed since a scenario ML priced, ML first sends
+// an event with indicative: true, re-priced in-process from the learned LLPAs
+// (_lib/llpa-engine.ts); its regular event follows and replaces it.
+
+const PROVIDERS = ['ml', 'lp', 'ln'] as const
+type Provider = typeof PROVIDERS[number]
+
+const PROVIDER_TIMEOUT_MS = Number(process.env.QUOTE_PROVIDER_TIMEOUT_MS) || 55000
+
+export const config = { maxDuration: 60 }
+
+interface ProviderOutcome {
+  provider: Provider
+  success: boolean
+  ms: number
+  timedOut?: boolean
+  cache?: 'HIT' | 'MISS'
+  // Joined an identical scenario already in flight (see _lib/single-flight.ts)
+  coalesced?: boolean
+  indicativeMs?: number
+  // Serialized event, written as-is
+  line: string
+}
+
+// ================= Providers =================
+function parseProviders(value: unknown): Provider[] {
+  if (value === undefined || value === '') return [...PROVIDERS]
+  const requested = String(value).split(',').map(p => p.trim().toLowerCase())
+  const unknown = requested.filter(p => !(PROVIDERS as readonly string[]).includes(p))
+  if (unknown.length > 0) throw new Error(`Unknown provider(s): ${unknown.join(', ')} (use ${PROVIDERS.join(', ')})`)
+  return PROVIDERS.filter(p => requested.includes(p))
+}
+
+function withDeadline<T>(promise: Promise<T>, ms: number): Promise<T | 'timeout'> {
+  let timer: ReturnType<typeof setTimeout> | undefined
+  const deadline = new Promise<'timeout'>(resolve => { timer = setTimeout(() => resolve('timeout'), ms) })
+  return Promise.race([promise, deadline]).finally(() => clearTimeout(timer))
+}
+
+interface QuoteOptions {
+  bypassCache: boolean
+  verbosity: Verbosity
+  adjustments: AdjustmentFormat
+  encoding: RateOptionEncoding
+  fields: string[] | null
+}
+
+// Splice a serialized body in after the event head rather than parsing and re-serializing it
+function eventLine(head: Record<string, unknown>, body: string, fields: string[] | null): string {
+  const shaped = fields ? JSON.stringify(projectFields(JSON.parse(body), fields)) : body
+  return `${JSON.stringify(head).slice(0, -1)},${shaped.slice(1)}`
+}
+
+async function runProvider(provider: Provider, formData: any, req: VercelRequest, options: QuoteOptions, stored: Promise<void>[], emit: (line: string) => void): Promise<ProviderOutcome> {
+  const started = Date.now()
+  const failed = (error: string, timedOut = false): ProviderOutcome => ({
+    provider,
+    success: false,
+    ms: Date.now() - started,
+    timedOut: timedOut || undefined,
+    line: JSON.stringify({ provider, ms: Date.now() - started, success: false, timedOut: timedOut || undefined, error }),
+  })
+
+  try {
+    if (provider === 'ml') {
+      let indicativeMs: number | undefined
+      const outcome = await priceScenario(formData, {
+        bypassCache: options.bypassCache,
+        timeoutMs: PROVIDER_TIMEOUT_MS,
+        verbosity: options.verbosity,
+        adjustments: options.adjustments,
+        encoding: options.encoding,
+        onIndicative: body => {
+          indicativeMs = Date.now() - started
+          emit(eventLine({ provider, ms: indicativeMs, indicative: true }, body, options.fields))
+        },
+      })
+      if (outcome.stored) stored.push(outcome.stored)
+      const ms = Date.now() - started
+      return {
+        provider,
+        success: outcome.body.startsWith('{"success":true'),
+        ms,
+        cache: outcome.cache,
+        coalesced: outcome.coalesced,
+        indicativeMs,
+        line: eventLine({ provider, ms, cache: outcome.cache, coalesced: outcome.coalesced }, outcome.body, options.fields),
+      }
+    }
+
+    let coalesced: true | undefined
+    const flight = { timeoutMs: PROVIDER_TIMEOUT_MS, onJoin: (role: string) => { if (role === 'follower') coalesced = true } }
+    const pricing = provider === 'lp'
+      ? priceLenderPrice(formData, lpMode(req.query?.lpMode), flight)
+      : priceLoanNex(formData, lnMode(req.query?.lnMode), flight)
+    const result = await withDeadline(pricing, PROVIDER_TIMEOUT_MS)
+    if (result === 'timeout') return failed(`Timed out after ${PROVIDER_TIMEOUT_MS}ms`, true)
+    const ms = Date.now() - started
+    const shaped = projectFields(provider === 'lp' ? shapeLenderPrice(result, options.verbosity) : shapeLoanNex(result, options.verbosity), options.fields)
+    return { provider, success: result.success === true, ms, coalesced, line: JSON.stringify({ provider, ms, coalesced, ...shaped }) }
+  } catch (error) {
+    if (error instanceof Error && (error.name === 'TimeoutError' || error.name === 'AbortError')) {
+      return failed(`Timed out after ${PROVIDER_TIMEOUT_MS}ms`, true)
+    }
+    console.error(`[quote] ${provider} error:`, error)
+    return failed(error instanceof Error ? error.message : 'Pricing unavailable')
+  }
+}
+
+// ================= Main Handler =================
+export default async function handler(req: VercelRequest, res: VercelResponse) {
+  res.setHeader('Access-Control-Allow-Origin', '*')
+  res.setHeader('Access-Control-Allow-Methods', 'POST, OPTIONS')
+  res.setHeader('Access-Control-Allow-Headers', 'Content-Type, Cache-Control')
+  res.setHeader('Cache-Control', 'no-store')
+
+  if (req.method === 'OPTIONS') return res.status(200).end()
+  if (req.method !== 'POST') return res.status(405).json({ success: false, error: 'Method not allowed' })
+
+  let providers: Provider[]
+  try {
+    providers = parseProviders(req.query?.providers)
+  } catch (error) {
+    return res.status(400).json({ success: false, error: error instanceof Error ? error.message : 'Invalid providers' })
+  }
+  if (providers.length === 0) return res.status(400).json({ success: false, error: 'No providers requested' })
+
+  const formData = req.body || {}
+  const options: QuoteOptions = {
+    bypassCache: String(req.headers['cache-control'] || '').includes('no-cache'),
+    verbosity: resolveVerbosity(req.query?.verbosity),
+    adjustments: resolveAdjustmentFormat(req.query?.adjustments),
+    encoding: resolveEncoding(req.query?.encoding),
+    fields: parseFields(req.query?.fields),
+  }
+  const sse = req.query?.format === 'sse' || String(req.headers.accept || '').includes('text/event-stream')
+
+  res.setHeader('Content-Type', sse ? 'text/event-stream; charset=utf-8' : 'application/x-ndjson; charset=utf-8')
+  // Keep proxies from buffering the stream
+  res.setHeader('X-Accel-Buffering', 'no')
+  res.status(200)
+  const frame = (event: 'quote' | 'done', line: string) => (sse ? `event: ${event}\ndata: ${line}\n\n` : `${line}\n`)
+  if (sse) res.write(': started\n\n')
+
+  const started = Date.now()
+  const stored: Promise<void>[] = []
+  const outcomes = await Promise.all(providers.map(provider =>
+    runProvider(provider, formData, req, options, stored, line => res.write(frame('quote', line))).then(outcome => {
+      res.write(frame('quote', outcome.line))
+      return outcome
+    }),
+  ))
+
+  const summary = {
+    providers: Object.fromEntries(outcomes.map(o => [o.provider, {
+      success: o.success,
+      ms: o.ms,
+      ...(o.cache ? { cache: o.cache } : {}),
+      ...(o.coalesced ? { coalesced: true } : {}),
+      ...(o.indicativeMs !== undefined ? { indicativeMs: o.indicativeMs } : {}),
+      ...(o.timedOut ? { timedOut: true } : {}),
+    }])),
+    succeeded: outcomes.filter(o => o.success).length,
+    failed: outcomes.filter(o => !o.success).length,
+    firstResultMs: Math.min(...outcomes.map(o => o.ms)),
+    wallMs: Date.now() - started,
+  }
+  res.end(frame('done', JSON.stringify({ done: true, summary })))
+  await Promise.all(stored)
+}
@@ -0,0 +1,250 @@
+/**
+ * bench-classification.ts
+ *
+ * Benchmark of the rate-option classification pass (api/_lib/rate-classification.ts)
+ * and the indexed target pricing (getTargetPricing in src/lib/PricingLogic.ts) on the
+ * large QuickPricer fixtures, against the previous string scans kept below as the
+ * reference: the server's per-description uppercase/includes filters, and the client's
+ * two nested passes over every rate option.
+ *
+ * The server row times the old filters against the classifier-backed filters plus the
+ * classification stage itself, which is new work done once per response; the target
+ * rows are per call, and the client calls it on every render.
+ *
+ * Checks that the classifier keeps and drops exactly what the old filters did, and that
+ * the indexed target pricing picks the same option as the old one for Primary/Secondary
+ * and for every Investment PPP term the reference can match (1-5 years; "0 YR PPP" never
+ * matched a "0MO PPP" description before, so that term is not compared).
+ *
+ * Usage:
+ *   npm run bench:classify -- [--only large-dscr-investment,xl-dscr-cashout] [--iterations 200] [--json report.json]
+ */
+
+import { writeFileSync } from 'node:fs'
+import { performance } from 'node:perf_hooks'
+import { buildFixture, FIXTURE_SPECS } from './fixtures/quickpricer.ts'
+import { extractQuickPricerResult, parseSOAPResponse } from '../api/_lib/quickpricer-parser.ts'
+import { classifyRateOptions, textClassifier } from '../api/_lib/rate-classification.ts'
+import {
+  getPPPPattern,
+  getTargetPricing,
+  hasPPPInName,
+  isPPPAllowed,
+  resolveAdjustments,
+  type Program,
+  type TargetPricingOption,
+} from '../src/lib/PricingLogic.ts'
+import { argValue } from './lib/cli.ts'
+
+const DEFAULT_FIXTURES = ['large-dscr-investment', 'xl-dscr-cashout']
+const TERMS = ['1year', '2year', '3year', '4year', '5year']
+
+interface FixtureReport {
+  fixture: string
+  programs: number
+  rateOptions: number
+  serverUs: { reference: number; classified: number }
+  targetUs: { reference: number; indexed: number; unindexed: number }
+  checks: Record<string, boolean>
+}
+
+// ============================================================================
+// REFERENCE: the previous string scans
+// ============================================================================
+
+function referenceHasPPP(text: string): boolean {
+  if (!text) return false
+  const upper = text.toUpperCase()
+  if (upper.includes('0MO PPP') || upper.includes('0 YR PPP') || upper.includes('0YR PPP')) return false
+  return upper.includes(' PPP') || upper.includes('YR PPP') || /\d\s*YR\s*PPP/i.test(upper)
+}
+
+// The Primary/Secondary program and rate-option filters plus keepAdjustment, as kept
+// counts (nothing is mutated, so every iteration sees the same result)
+function referenceServerPass(programs: any[]) {
+  let keptPrograms = 0
+  let keptOptions = 0
+  let keptAdjustments = 0
+  const seen = new Set<any[]>()
+  for (const p of programs) {
+    const name = ((p.programName || p.name || '') + ' ' + (p.description || '')).toUpperCase()
+    if (name.includes('DSCR')) continue
+    if (referenceHasPPP(p.programName) || referenceHasPPP(p.name) || referenceHasPPP(p.description)) continue
+    const options = (p.rateOptions || []).filter((ro: any) => !referenceHasPPP(ro.description))
+    if (options.length === 0) continue
+    keptPrograms++
+    keptOptions += options.length
+    for (const ro of options) {
+      if (!ro.adjustments || seen.has(ro.adjustments)) continue
+      seen.add(ro.adjustments)
+      keptAdjustments += ro.adjustments.filter((adj: any) => {
+        const desc = (adj.description || '').toUpperCase()
+        return !desc.includes('DSCR') && !desc.includes('BANK ST') && !desc.includes('CASHOUT')
+      }).length
+    }
+  }
+  return { keptPrograms, keptOptions, keptAdjustments }
+}
+
+function classifiedServerPass(programs: any[]) {
+  const classOf = textClassifier()
+  let keptPrograms = 0
+  let keptOptions = 0
+  let keptAdjustments = 0
+  const seen = new Set<any[]>()
+  for (const p of programs) {
+    if (classOf(p.programName || p.name).isDSCR || classOf(p.description).isDSCR) continue
+    if (classOf(p.programName).hasPPP || classOf(p.name).hasPPP || classOf(p.description).hasPPP) continue
+    const options = (p.rateOptions || []).filter((ro: any) => !classOf(ro.description).hasPPP)
+    if (options.length === 0) continue
+    keptPrograms++
+    keptOptions += options.length
+    for (const ro of options) {
+      if (!ro.adjustments || seen.has(ro.adjustments)) continue
+      seen.add(ro.adjustments)
+      keptAdjustments += ro.adjustments.filter((adj: any) => {
+        const cls = classOf(adj.description)
+        return !cls.isDSCR && !cls.isBankStatement && !cls.isCashout
+      }).length
+    }
+  }
+  classifyRateOptions(programs, classOf)
+  return { keptPrograms, keptOptions, keptAdjustments }
+}
+
+// getTargetPricing before the classification fields and the PPP-term index
+function referenceTargetPricing(programs: Program[], occupancyType: string, prepayPeriod: string): TargetPricingOption | null {
+  const pppAllowed = isPPPAllowed(occupancyType)
+  const selectedPPP = pppAllowed ? getPPPPattern(prepayPeriod) : ''
+  let targetOption: TargetPricingOption | null = null
+  let closestDistance = Infinity
+
+  const pass = (matchTerm: boolean) => programs.forEach(program => {
+    if (!program || !Array.isArray(program.rateOptions)) return
+    const programName = program.name || 'Unknown'
+    program.rateOptions.forEach(opt => {
+      if (!opt) return
+      const desc = (opt.description || programName).toUpperCase()
+      if (!pppAllowed && hasPPPInName(desc)) return
+      if (pppAllowed && matchTerm) {
+        const matchesPPP = desc.includes(selectedPPP.toUpperCase()) ||
+                          desc.includes(selectedPPP.replace(' YR ', 'YR ').toUpperCase())
+        if (!matchesPPP) return
+      }
+      const points = Number(opt.points) || 0
+      const price = 100 - points
+      if (price >= 99.0 && price <= 101.0) {
+        const distance = Math.abs(price - 100)
+        if (distance < closestDistance) {
+          closestDistance = distance
+          targetOption = {
+            rate: Number(opt.rate) || 0,
+            points,
+            apr: Number(opt.apr) || 0,
+            price,
+            payment: Number(opt.payment) || 0,
+            programName: opt.description || programName,
+            adjustments: resolveAdjustments(opt),
+          }
+        }
+      }
+    })
+  })
+
+  pass(true)
+  if (!targetOption) pass(false)
+  return targetOption
+}
+
+// ============================================================================
+// BENCH
+// ============================================================================
+
+// Microseconds per call, over `count` calls
+function perCall(count: number, fn: (i: number) => void): number {
+  const start = performance.now()
+  for (let i = 0; i < count; i++) fn(i)
+  return Math.round(((performance.now() - start) * 1000 / count) * 100) / 100
+}
+
+// The client's view of a response: programs by name with their rate options
+function clientPrograms(programs: any[]): Program[] {
+  return programs.map(p => ({
+    name: p.programName || p.name || 'Unknown Program',
+    rateOptions: p.rateOptions.map((ro: any) => ({ ...ro, description: ro.description || '' })),
+  }))
+}
+
+function benchFixture(name: string, iterations: number): FixtureReport {
+  const spec = FIXTURE_SPECS.find(s => s.name === name)
+  if (!spec) throw new Error(`Unknown fixture ${name}`)
+  const programs = parseSOAPResponse(extractQuickPricerResult(buildFixture(spec).soap)).programs
+  const rateOptions = programs.reduce((sum: number, p: any) => sum + (p.rateOptions?.length || 0), 0)
+
+  const checks: Record<string, boolean> = {}
+  checks['server filters match'] = JSON.stringify(referenceServerPass(programs)) === JSON.stringify(classifiedServerPass(programs))
+  const serverUs = {
+    reference: perCall(iterations, () => referenceServerPass(programs)),
+    classified: perCall(iterations, () => classifiedServerPass(programs)),
+  }
+
+  // Response as the API sends it (classified, with its index), and as an older API did
+  const classified = clientPrograms(programs)
+  const pppIndex = classifyRateOptions(classified)
+  const plain = clientPrograms(programs).map(p => ({
+    ...p,
+    rateOptions: p.rateOptions.map(({ price: _price, pppMonths: _months, hasPPP: _hasPPP, isDSCR: _dscr, isBankStatement: _bank, isCashout: _cashout, ...ro }: any) => ro),
+  }))
+
+  const cases: [string, string][] = [['primary', '3year'], ...TERMS.map(term => ['investment', term] as [string, string])]
+  checks['target pricing matches'] = cases.every(([occupancy, term]) => {
+    const expected = JSON.stringify(referenceTargetPricing(plain, occupancy, term))
+    return expected === JSON.stringify(getTargetPricing(classified, occupancy, term, undefined, pppIndex)) &&
+      expected === JSON.stringify(getTargetPricing(structuredClone(plain), occupancy, term))
+  })
+  checks['target found'] = cases.every(([occupancy, term]) => getTargetPricing(classified, occupancy, term, undefined, pppIndex) !== null)
+
+  const targetUs = {
+    reference: perCall(iterations, i => { const [o, t] = cases[i % cases.length]; referenceTargetPricing(plain, o, t) }),
+    indexed: perCall(iterations, i => { const [o, t] = cases[i % cases.length]; getTargetPricing(classified, o, t, undefined, pppIndex) }),
+    // No index in the response: built (and the options classified) on every call
+    unindexed: perCall(iterations, i => { const [o, t] = cases[i % cases.length]; getTargetPricing(plain, o, t) }),
+  }
+
+  return { fixture: name, programs: programs.length, rateOptions, serverUs, targetUs, checks }
+}
+
+function main(): void {
+  const only = argValue('--only')?.split(',') ?? DEFAULT_FIXTURES
+  const iterations = Number(argValue('--iterations')) || 200
+  const jsonOut = argValue('--json')
+
+  const reports = only.map(name => benchFixture(name, iterations))
+
+  const speedup = (reference: number, t: number) => `${(reference / Math.max(t, 0.01)).toFixed(1)}x`
+  console.log('\nRate-option classification and target pricing (us per call)')
+  console.log('='.repeat(112))
+  console.log(['fixture'.padEnd(24), 'options'.padStart(8), 'stage'.padEnd(16), 'scan us'.padStart(11), 'new us'.padStart(11), 'speedup'.padStart(9)].join(' '))
+  for (const r of reports) {
+    const rows: [string, number, number][] = [
+      ['server pass', r.serverUs.reference, r.serverUs.classified],
+      ['target indexed', r.targetUs.reference, r.targetUs.indexed],
+      ['target no index', r.targetUs.reference, r.targetUs.unindexed],
+    ]
+    for (const [stage, reference, t] of rows) {
+      console.log([r.fixture.padEnd(24), String(r.rateOptions).padStart(8), stage.padEnd(16), reference.toFixed(2).padStart(11), t.toFixed(2).padStart(11), speedup(reference, t).padStart(9)].join(' '))
+    }
+  }
+  console.log('')
+  for (const name of Object.keys(reports[0]?.checks || {})) {
+    console.log(`${name.padEnd(24)} ${reports.map(r => `${r.fixture}: ${r.checks[name] ? 'ok' : 'DIFF'}`).join('  ')}`)
+  }
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ iterations, reports }, null, 2) + '\n')
+
+  const failed = reports.flatMap(r => Object.entries(r.checks).filter(([, ok]) => !ok).map(([name]) => `${name} @ ${r.fixture}`))
+  if (failed.length > 0) console.error(`\nClassification check failed: ${failed.join(', ')}`)
+  process.exit(failed.length > 0 ? 1 : 0)
+}
+
+main()
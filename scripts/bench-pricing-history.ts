@@ -0,0 +1,234 @@
+/**
+ * bench-pricing-history.ts
+ *
+ * Benchmark of the pricing history (PricingMemoryStore in src/lib/PricingLogic.ts) at
+ * 10k and 100k entries against the previous array store (linear getById/findSimilar,
+ * getStats reducing every entry), kept below as the reference. Reports per-operation
+ * cost for add, getById, findSimilar and getStats, and for the SQLite backend
+ * (api/_lib/pricing-history-sqlite.ts) the write and reload time. Checks that
+ * findSimilar and getStats agree with the reference, that eviction keeps the aggregates
+ * right, and that a store re-attached to the SQLite file gets the same history back.
+ *
+ * Usage:
+ *   npm run bench:history -- [--sizes 10000,100000] [--queries 2000] [--json report.json]
+ */
+
+import { mkdtempSync, rmSync, writeFileSync } from 'node:fs'
+import { tmpdir } from 'node:os'
+import { join } from 'node:path'
+import { performance } from 'node:perf_hooks'
+import { rng } from './fixtures/quickpricer.ts'
+import { PricingMemoryStore, type LoanScenario, type PricingMemoryEntry } from '../src/lib/PricingLogic.ts'
+import { sqliteHistoryBackend } from '../api/_lib/pricing-history-sqlite.ts'
+import { argValue } from './lib/cli.ts'
+
+const OCCUPANCIES = ['primary', 'secondary', 'investment']
+const PURPOSES = ['purchase', 'refinance', 'cashout']
+
+interface SizeReport {
+  entries: number
+  addUs: { reference: number; indexed: number }
+  getByIdUs: { reference: number; indexed: number }
+  findSimilarUs: { reference: number; indexed: number }
+  getStatsUs: { reference: number; indexed: number }
+  sqliteWriteMs: number
+  sqliteReloadMs: number
+  checks: Record<string, boolean>
+}
+
+// ============================================================================
+// REFERENCE: the previous array store, without its 100-entry cap
+// ============================================================================
+
+class ReferenceStore {
+  entries: PricingMemoryEntry[] = []
+
+  add(entry: PricingMemoryEntry): void {
+    this.entries.unshift(entry)
+  }
+
+  getById(id: string): PricingMemoryEntry | undefined {
+    return this.entries.find(e => e.id === id)
+  }
+
+  findSimilar(scenario: LoanScenario, tolerance: number = 0.1): PricingMemoryEntry[] {
+    return this.entries.filter(entry => {
+      const s = entry.scenario
+      const ltvDiff = Math.abs(s.ltv - scenario.ltv) / scenario.ltv
+      const scoreDiff = Math.abs(s.creditScore - scenario.creditScore) / scenario.creditScore
+      const amountDiff = Math.abs(s.loanAmount - scenario.loanAmount) / scenario.loanAmount
+      return ltvDiff <= tolerance && scoreDiff <= tolerance && amountDiff <= tolerance &&
+        s.occupancyType === scenario.occupancyType && s.loanPurpose === scenario.loanPurpose
+    })
+  }
+
+  getStats() {
+    const successful = this.entries.filter(e => e.result && !e.result.apiError)
+    const avgDuration = this.entries.length > 0 ? this.entries.reduce((sum, e) => sum + e.duration, 0) / this.entries.length : 0
+    const avgRate = successful.length > 0 ? successful.reduce((sum, e) => sum + (e.targetPricing?.rate || 0), 0) / successful.length : 0
+    return {
+      totalQueries: this.entries.length,
+      avgDuration: Math.round(avgDuration),
+      avgRate: Math.round(avgRate * 1000) / 1000,
+      successRate: this.entries.length > 0 ? Math.round((successful.length / this.entries.length) * 100) : 0,
+    }
+  }
+}
+
+// ============================================================================
+// WORKLOAD
+// ============================================================================
+
+function randomScenario(next: () => number): LoanScenario {
+  const propertyValue = Math.round(200000 + next() * 2800000)
+  const ltv = Math.round(50 + next() * 35)
+  return {
+    loanAmount: Math.round((propertyValue * ltv) / 100),
+    propertyValue,
+    ltv,
+    creditScore: Math.round(620 + next() * 200),
+    dti: Math.round(20 + next() * 30),
+    occupancyType: OCCUPANCIES[Math.floor(next() * OCCUPANCIES.length)],
+    propertyType: 'sfr',
+    loanPurpose: PURPOSES[Math.floor(next() * PURPOSES.length)],
+    loanTerm: 360,
+  }
+}
+
+function randomPricing(next: () => number): Pick<PricingMemoryEntry, 'result' | 'targetPricing' | 'duration'> {
+  const rate = Math.round((5.5 + next() * 3) * 1000) / 1000
+  const failed = next() < 0.1
+  return {
+    result: { rate, apr: rate + 0.05, monthlyPayment: 2500, points: 0, closingCosts: 0, ltvRatio: 75, apiError: failed ? 'No programs found' : undefined },
+    targetPricing: failed ? null : { rate, points: 0.5, apr: rate + 0.05, price: 99.5, payment: 2500, programName: 'DSCR 30YR', adjustments: [] },
+    duration: Math.round(300 + next() * 3000),
+  }
+}
+
+// Microseconds per call, over `count` calls
+function perCall(count: number, fn: (i: number) => void): number {
+  const start = performance.now()
+  for (let i = 0; i < count; i++) fn(i)
+  return Math.round(((performance.now() - start) * 1000 / count) * 100) / 100
+}
+
+const sameIds = (a: PricingMemoryEntry[], b: PricingMemoryEntry[]) => a.length === b.length && a.every((e, i) => e.id === b[i].id)
+
+async function benchSize(size: number, queries: number): Promise<SizeReport> {
+  const next = rng(size)
+  const reference = new ReferenceStore()
+  const indexed = new PricingMemoryStore({ maxEntries: size })
+
+  const workload = Array.from({ length: size }, () => ({ scenario: randomScenario(next), ...randomPricing(next) }))
+  const ids: string[] = []
+  const addIndexed = perCall(size, i => {
+    const w = workload[i]
+    ids.push(indexed.add(w.scenario, w.result, w.targetPricing, w.duration))
+  })
+  // Same entries (ids included), newest first, in the reference store
+  reference.entries = indexed.getAll()
+
+  const lookups = Array.from({ length: queries }, () => ids[Math.floor(next() * ids.length)])
+  const probes = Array.from({ length: queries }, () => randomScenario(next))
+  const refQueries = Math.max(20, Math.floor(queries / 10))
+
+  // add at full size (the reference unshifts onto the whole array)
+  const extra = Array.from({ length: refQueries }, () => ({ scenario: randomScenario(next), ...randomPricing(next) }))
+  const addUs = {
+    reference: perCall(refQueries, i => reference.add({ id: `extra_${i}`, timestamp: new Date(), ...extra[i] })),
+    indexed: addIndexed,
+  }
+  reference.entries.splice(0, refQueries)
+
+  const getByIdUs = {
+    reference: perCall(refQueries, i => reference.getById(lookups[i])),
+    indexed: perCall(queries, i => indexed.getById(lookups[i])),
+  }
+  const findSimilarUs = {
+    reference: perCall(refQueries, i => reference.findSimilar(probes[i])),
+    indexed: perCall(queries, i => indexed.findSimilar(probes[i])),
+  }
+  const getStatsUs = {
+    reference: perCall(refQueries, () => reference.getStats()),
+    indexed: perCall(queries, () => indexed.getStats()),
+  }
+
+  const checks: Record<string, boolean> = {}
+  checks['getById matches'] = lookups.slice(0, refQueries).every(id => reference.getById(id) === indexed.getById(id))
+  checks['findSimilar matches'] = probes.slice(0, refQueries).every(p =>
+    [0.05, 0.1, 0.5].every(t => sameIds(reference.findSimilar(p, t), indexed.findSimilar(p, t))))
+  checks['getStats matches'] = JSON.stringify(reference.getStats()) === JSON.stringify(indexed.getStats())
+
+  // Eviction: adding past capacity drops the oldest and keeps the aggregates right
+  const overflow = Array.from({ length: Math.min(1000, size) }, () => ({ scenario: randomScenario(next), ...randomPricing(next) }))
+  for (const w of overflow) indexed.add(w.scenario, w.result, w.targetPricing, w.duration)
+  const kept = new ReferenceStore()
+  kept.entries = indexed.getAll()
+  checks['eviction keeps aggregates'] = kept.entries.length === size && indexed.getById(ids[0]) === undefined &&
+    JSON.stringify(kept.getStats()) === JSON.stringify(indexed.getStats()) &&
+    probes.slice(0, 20).every(p => sameIds(kept.findSimilar(p), indexed.findSimilar(p)))
+
+  // SQLite persistence: write the history, then reload it into a fresh store
+  const dir = mkdtempSync(join(tmpdir(), 'pricing-history-'))
+  const path = join(dir, 'history.db')
+  const persisted = new PricingMemoryStore({ maxEntries: size })
+  await persisted.attach(sqliteHistoryBackend(path))
+  let start = performance.now()
+  for (const w of workload) persisted.add(w.scenario, w.result, w.targetPricing, w.duration)
+  await persisted.flush()
+  const sqliteWriteMs = Math.round(performance.now() - start)
+  const reloaded = new PricingMemoryStore({ maxEntries: size })
+  start = performance.now()
+  await reloaded.attach(sqliteHistoryBackend(path))
+  const sqliteReloadMs = Math.round(performance.now() - start)
+  checks['sqlite reload matches'] = sameIds(reloaded.getAll(), persisted.getAll()) &&
+    JSON.stringify(reloaded.getStats()) === JSON.stringify(persisted.getStats())
+  rmSync(dir, { recursive: true, force: true })
+
+  return {
+    entries: size,
+    addUs,
+    getByIdUs,
+    findSimilarUs,
+    getStatsUs,
+    sqliteWriteMs,
+    sqliteReloadMs,
+    checks,
+  }
+}
+
+async function main(): Promise<void> {
+  const sizes = (argValue('--sizes') ?? '10000,100000').split(',').map(Number)
+  const queries = Number(argValue('--queries')) || 2000
+  const jsonOut = argValue('--json')
+
+  const reports: SizeReport[] = []
+  for (const size of sizes) reports.push(await benchSize(size, queries))
+
+  console.log('\nPricing history: indexed store vs previous array store (us per call)')
+  console.log('='.repeat(132))
+  console.log(['entries'.padStart(8), 'op'.padEnd(12), 'array us'.padStart(11), 'indexed us'.padStart(11), 'speedup'.padStart(9)].join(' '))
+  for (const r of reports) {
+    for (const [op, t] of [['add', r.addUs], ['getById', r.getByIdUs], ['findSimilar', r.findSimilarUs], ['getStats', r.getStatsUs]] as const) {
+      console.log([String(r.entries).padStart(8), op.padEnd(12), t.reference.toFixed(2).padStart(11), t.indexed.toFixed(2).padStart(11),
+        `${(t.reference / Math.max(t.indexed, 0.01)).toFixed(t.reference < t.indexed * 10 ? 1 : 0)}x`.padStart(9)].join(' '))
+    }
+    console.log([String(r.entries).padStart(8), 'sqlite'.padEnd(12), `write ${r.sqliteWriteMs} ms, reload ${r.sqliteReloadMs} ms`].join(' '))
+  }
+  console.log('')
+  const names = Object.keys(reports[0]?.checks || {})
+  for (const name of names) {
+    console.log(`${name.padEnd(28)} ${reports.map(r => `${r.entries}: ${r.checks[name] ? 'ok' : 'DIFF'}`).join('  ')}`)
+  }
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ queries, reports }, null, 2) + '\n')
+
+  const failed = reports.flatMap(r => Object.entries(r.checks).filter(([, ok]) => !ok).map(([name]) => `${name} @ ${r.entries}`))
+  if (failed.length > 0) console.error(`\nPricing history check failed: ${failed.join(', ')}`)
+  process.exit(failed.length > 0 ? 1 : 0)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
@@ -0,0 +1,208 @@
+/**
+ * lenderprice.ts
+ *
+ * Deterministic fixture corpus for the LenderPrice pricing/search replay. Builds
+ * search responses with the documented result tree
+ * (ROOT → CriteriaFromLineResultKey → RateKey → LenderKey → leafs), leafs carrying the
+ * documented pricing fields plus the bulky sub-objects (closing cost details,
+ * amortization schedule, rate grid) so payload sizes are realistic.
+ *
+ * Captured production responses can be dropped into fixtures/lenderprice/*.json
+ * (the raw search response body) and are replayed alongside the generated ones.
+ */
+
+import { readdirSync, readFileSync, existsSync } from 'node:fs'
+import { join, basename } from 'node:path'
+import { rng, monthlyPayment, type ReplayScenario } from './quickpricer.ts'
+
+// ============================================================================
+// TYPES
+// ============================================================================
+
+export interface LenderPriceFixture {
+  name: string
+  description: string
+  scenario: ReplayScenario | null
+  response: any
+}
+
+interface FixtureSpec {
+  name: string
+  description: string
+  seed: number
+  qmPrograms: number
+  nonQMPrograms: number
+  lenders: number
+  ratesPerProgram: number
+  scheduleMonths: number
+  scenario: ReplayScenario
+  edgeCases?: boolean
+}
+
+const LENDERS = ['Oaktree Funding Corp.', 'Arc Home LLC', 'Sierra Pacific Mortgage', 'Logan Finance']
+const PROGRAMS = [
+  '30 YR FIXED INVESTOR ADVANTAGE', '30 YR FIXED PLATINUM ADVANTAGE', '30 YR FIXED DSCR PLUS',
+  '30 YR FIXED BANK STATEMENT', '30 YR FIXED ASSET UTILIZATION', '30 YR FIXED FOREIGN NATIONAL',
+]
+
+const round3 = (n: number) => Math.round(n * 1000) / 1000
+const round2 = (n: number) => Math.round(n * 100) / 100
+
+function hexId(rand: () => number): string {
+  return Array.from({ length: 24 }, () => Math.floor(rand() * 16).toString(16)).join('')
+}
+
+// ============================================================================
+// RESULT TREE
+// ============================================================================
+
+function buildLeaf(spec: FixtureSpec, rand: () => number, program: string, lender: string, rate: number, parRate: number) {
+  const s = spec.scenario
+  const basePoints = round3((parRate - rate) * 3)
+  const adjustmentPoints = round3((s.fico < 700 ? 0.75 : 0.25) + (s.ltv > 70 ? 0.5 : 0) + Math.floor(rand() * 4) * 0.125)
+  const adjustedPoints = round3(basePoints + adjustmentPoints)
+  const pi = round2(monthlyPayment(s.loanAmount, rate, 360))
+  const lenderFees = 1950
+  const pointsCost = Math.round((adjustedPoints / 100) * s.loanAmount)
+
+  const schedule = Array.from({ length: spec.scheduleMonths }, (_, i) => ({
+    startMonth: i * 12 + 1, endMonth: (i + 1) * 12, rate, payment: pi,
+  }))
+  const closingCostDetails = ['Underwriting Fee', 'Processing Fee', 'Appraisal Review', 'Flood Cert', 'Tax Service', 'Credit Report']
+    .map((description, i) => ({ description, points: 0, amount: [1295, 395, 150, 10, 85, 15][i], type: 'LenderFee' }))
+
+  return {
+    rate, rawRates: rate, baseRates: rate, adjustedRates: rate, adjustmentRates: 0,
+    basePoints, rawBasePoints: basePoints, adjustedPoints, adjustmentPoints,
+    borrowerPaidPoints: Math.max(0, adjustedPoints), discountPoints: Math.max(0, adjustedPoints),
+    undiscountedRate: parRate, startedAdjustedRate: parRate,
+    monthlyPayment: {
+      monthlyPI: pi, totalPrincipal: s.loanAmount, totalInterest: round2(pi * 360 - s.loanAmount),
+      propertyTaxes: 0, homeOwnerInsurance: 0, mi: 0, total: pi,
+    },
+    monthlyPayments: schedule,
+    borrowerPaid: pointsCost, borrowerPaidAmount: pointsCost, lenderPaid: pointsCost,
+    lenderPaidOnlyComp: 0, lenderPaidOnlyCompDollarAmount: 0,
+    finalClosingCost: Math.max(0, pointsCost) + lenderFees, finalSubClosingCost: 0,
+    totalLenderFees: lenderFees, totalOriginationFee: 0, originationCredit: adjustedPoints,
+    fico: s.fico, dscr: s.dscr, ltv: s.ltv / 100, cltv: s.ltv / 100, loanAmount: s.loanAmount,
+    totalLoanAmount: s.loanAmount, term: 30, dayLock: 30, mortgageType: 'Conventional',
+    loanPurpose: 'Purchase', loanType: 'Fixed', termInfo: '30 Years', isInterestOnly: false, pmiType: 'None',
+    apr: round3(rate + 0.21), notRoundedAPR: rate + 0.2103, qualifyingRatePercent: rate,
+    programName: program, productName: program, companyName: lender, companyId: hexId(rand),
+    rateGridName: program, rateGridId: hexId(rand),
+    disqualified: false, expired: false, interpolated: false, hideDisqualified: false,
+    closingCostDetails,
+    lenderPaidDetails: [],
+    borrowerPaidDetails: [{ description: 'Discount Points', points: adjustedPoints, amount: pointsCost }],
+    rateProgram: { id: hexId(rand), name: program, externalName: program, applyParRounding: false },
+    rateGrid: { id: hexId(rand), name: program, mortgageTypes: ['Conventional'], terms: [30], loanTypes: ['Fixed'] },
+    ratePeriod: { id: hexId(rand), name: 'Daily', rateType: 'Fixed', validAsOf: '2026-01-05T07:30:00Z' },
+    overrideLLPA: { pointAdjs: [], rateAdjs: [], executionType: 'Best' },
+  }
+}
+
+function buildTree(spec: FixtureSpec, rand: () => number, programs: string[], label: string) {
+  const lenders = LENDERS.slice(0, spec.lenders)
+  const childs = programs.map((program, p) => {
+    const startRate = 6.125 + (p % 3) * 0.125
+    const parRate = startRate + 0.5
+    const rateNodes = Array.from({ length: spec.ratesPerProgram }, (_, i) => {
+      const rate = round3(startRate + i * 0.125)
+      return {
+        type: 'RateKey',
+        keyLabel: rate.toFixed(3),
+        childs: lenders.map(lender => {
+          const leaf = buildLeaf(spec, rand, program, lender, rate, parRate)
+          if (spec.edgeCases && i === 1) leaf.disqualified = true
+          if (spec.edgeCases && i === 2 && lender === lenders[0]) leaf.expired = true
+          return { type: 'LenderKey', keyLabel: lender, leafs: [leaf] }
+        }),
+      }
+    })
+    return {
+      type: 'CriteriaFromLineResultKey',
+      keyLabel: `30 Years Fixed Conventional Purchase ${label}`,
+      key: ['Fixed', '30 Years', 'Purchase', 'Conventional', `${spec.scenario.loanAmount}.0`, ''],
+      childs: rateNodes,
+    }
+  })
+  return { keyLabel: 'ROOT', childs }
+}
+
+function buildResponse(spec: FixtureSpec) {
+  const rand = rng(spec.seed)
+  const qmPrograms = PROGRAMS.slice(0, spec.qmPrograms)
+  const nonQMPrograms = Array.from({ length: spec.nonQMPrograms }, (_, i) => `${PROGRAMS[(i + 2) % PROGRAMS.length]} ${String.fromCharCode(65 + i)}`)
+  const lenderMap = Object.fromEntries(LENDERS.slice(0, spec.lenders).map(l => [l, hexId(rand)]))
+
+  const results: Record<string, unknown> = {
+    qualifiedQMData: buildTree(spec, rand, qmPrograms, 'QM'),
+    qualifiedNonQMData: buildTree(spec, rand, nonQMPrograms, 'NonQM'),
+    disqualifiedData: { keyLabel: 'ROOT', childs: [] },
+    qualifiedQMLenders: qmPrograms.length ? lenderMap : {},
+    qualifiedNonQMLenders: nonQMPrograms.length ? lenderMap : {},
+    disqualifiedLenders: {},
+    programs: qmPrograms.concat(nonQMPrograms),
+    lenderDtos: {},
+    sponsoredLenders: {},
+    nextClosestRate: {},
+  }
+  if (spec.edgeCases) {
+    // Missing trees and childless groups must parse to nothing rather than throw
+    results.qualifiedQMData = null
+    ;(results.qualifiedNonQMData as any).childs.push({ type: 'CriteriaFromLineResultKey', keyLabel: 'empty', childs: [] })
+  }
+
+  return {
+    id: hexId(rand),
+    provider: { code: 'LenderPrice' },
+    status: { code: 'New' },
+    search: { date: '2026-01-05T15:00:00Z' },
+    results,
+    closingCost: null,
+  }
+}
+
+// ============================================================================
+// CORPUS
+// ============================================================================
+
+const BASE_SCENARIO: ReplayScenario = {
+  fico: 740, ltv: 75, loanAmount: 600000, occupancy: 'primary', docType: 'fullDoc',
+  purpose: 'purchase', propertyType: 'sfr', dscr: 0,
+}
+
+const DSCR_SCENARIO: ReplayScenario = {
+  fico: 720, ltv: 75, loanAmount: 500000, occupancy: 'investment', docType: 'dscr',
+  purpose: 'purchase', propertyType: 'sfr', dscr: 1.3,
+}
+
+export const FIXTURE_SPECS: FixtureSpec[] = [
+  { name: 'small-fulldoc-primary', description: '2 QM programs x 8 rates, 1 lender', seed: 11, qmPrograms: 2, nonQMPrograms: 0, lenders: 1, ratesPerProgram: 8, scheduleMonths: 1, scenario: BASE_SCENARIO },
+  { name: 'typical-dscr-investment', description: '2 non-QM programs x 32 rates (the documented sample)', seed: 23, qmPrograms: 0, nonQMPrograms: 2, lenders: 1, ratesPerProgram: 32, scheduleMonths: 30, scenario: DSCR_SCENARIO },
+  { name: 'edge-disqualified-empty', description: 'disqualified/expired leafs, null QM tree, empty group', seed: 37, qmPrograms: 1, nonQMPrograms: 1, lenders: 2, ratesPerProgram: 6, scheduleMonths: 1, scenario: BASE_SCENARIO, edgeCases: true },
+  { name: 'large-multi-lender', description: '6 programs x 32 rates x 4 lenders', seed: 41, qmPrograms: 2, nonQMPrograms: 4, lenders: 4, ratesPerProgram: 32, scheduleMonths: 30, scenario: { ...DSCR_SCENARIO, purpose: 'cashout', ltv: 70 } },
+]
+
+export function buildFixture(spec: FixtureSpec): LenderPriceFixture {
+  return { name: spec.name, description: spec.description, scenario: spec.scenario, response: buildResponse(spec) }
+}
+
+/**
+ * Generated corpus followed by any captured responses in fixtures/lenderprice/*.json
+ */
+export function loadFixtureCorpus(capturedDir: string, only?: string[]): LenderPriceFixture[] {
+  const fixtures = FIXTURE_SPECS
+    .filter(spec => !only || only.includes(spec.name))
+    .map(buildFixture)
+
+  if (existsSync(capturedDir)) {
+    for (const file of readdirSync(capturedDir).filter(f => f.endsWith('.json')).sort()) {
+      const name = `captured-${basename(file, '.json')}`
+      if (only && !only.includes(name)) continue
+      fixtures.push({ name, description: `captured ${file}`, scenario: null, response: JSON.parse(readFileSync(join(capturedDir, file), 'utf8')) })
+    }
+  }
+  return fixtures
+}
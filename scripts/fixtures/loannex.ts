@@ -0,0 +1,112 @@
+/**
+ * loannex.ts
+ *
+ * Deterministic fixture corpus for the LoanNEX quick-prices replay. Responses come in
+ * the two shapes the mapper accepts: a flat row list, and rows grouped
+ * investor → product → prices with names only on the enclosing groups.
+ *
+ * Captured production responses can be dropped into fixtures/loannex/*.json
+ * (the raw quick-prices response body) and are replayed alongside the generated ones.
+ */
+
+import { readdirSync, readFileSync, existsSync } from 'node:fs'
+import { join, basename } from 'node:path'
+import { rng, monthlyPayment, type ReplayScenario } from './quickpricer.ts'
+
+export interface LoanNexFixture {
+  name: string
+  description: string
+  scenario: ReplayScenario | null
+  response: any
+}
+
+interface FixtureSpec {
+  name: string
+  description: string
+  seed: number
+  investors: number
+  products: number
+  ratesPerProduct: number
+  grouped: boolean
+  scenario: ReplayScenario
+}
+
+const INVESTORS = ['Verus', 'Deephaven', 'Angel Oak', 'NQM Funding', 'Arc Home', 'Kind Lending']
+const PRODUCTS = ['DSCR 30Y Fixed', 'DSCR 30Y Fixed IO', 'Bank Statement 30Y Fixed', 'Full Doc Expanded 30Y', 'Asset Qualifier 30Y']
+
+const round3 = (n: number) => Math.round(n * 1000) / 1000
+const round2 = (n: number) => Math.round(n * 100) / 100
+
+function buildRows(spec: FixtureSpec) {
+  const rand = rng(spec.seed)
+  const s = spec.scenario
+  const investors = INVESTORS.slice(0, spec.investors).map(investorName => ({
+    investorName,
+    products: PRODUCTS.slice(0, spec.products).map(productName => {
+      const startRate = 6.5 + Math.floor(rand() * 4) * 0.125
+      return {
+        productName,
+        prices: Array.from({ length: spec.ratesPerProduct }, (_, i) => {
+          const noteRate = round3(startRate + i * 0.125)
+          const price = round3(98.5 + i * 0.375 - Math.floor(rand() * 3) * 0.125)
+          return {
+            noteRate,
+            lockPeriod: 30,
+            price,
+            cost: round2(((100 - price) / 100) * s.loanAmount),
+            principalAndInterest: round2(monthlyPayment(s.loanAmount, noteRate, 360)),
+            adjustments: [
+              { description: 'FICO/LTV', value: round3(-0.25 - Math.floor(rand() * 3) * 0.125) },
+              { description: 'Loan Amount', value: 0.125 },
+            ],
+          }
+        }),
+      }
+    }),
+  }))
+
+  if (spec.grouped) return { id: `qp-${spec.seed}`, quickPrices: investors }
+  return {
+    id: `qp-${spec.seed}`,
+    quickPrices: investors.flatMap(inv => inv.products.flatMap(prod =>
+      prod.prices.map(p => ({ investorName: inv.investorName, productName: prod.productName, ...p })))),
+  }
+}
+
+const BASE_SCENARIO: ReplayScenario = {
+  fico: 740, ltv: 75, loanAmount: 600000, occupancy: 'primary', docType: 'fullDoc',
+  purpose: 'purchase', propertyType: 'sfr', dscr: 0,
+}
+
+const DSCR_SCENARIO: ReplayScenario = {
+  fico: 720, ltv: 75, loanAmount: 500000, occupancy: 'investment', docType: 'dscr',
+  purpose: 'purchase', propertyType: 'sfr', dscr: 1.3,
+}
+
+export const FIXTURE_SPECS: FixtureSpec[] = [
+  { name: 'small-flat-fulldoc', description: '1 investor x 2 products x 8 rates, flat rows', seed: 11, investors: 1, products: 2, ratesPerProduct: 8, grouped: false, scenario: BASE_SCENARIO },
+  { name: 'grouped-dscr', description: '3 investors x 2 products x 8 rates, grouped', seed: 23, investors: 3, products: 2, ratesPerProduct: 8, grouped: true, scenario: DSCR_SCENARIO },
+  { name: 'large-grouped-cashout', description: '6 investors x 5 products x 16 rates, grouped', seed: 41, investors: 6, products: 5, ratesPerProduct: 16, grouped: true, scenario: { ...DSCR_SCENARIO, purpose: 'cashout', ltv: 70 } },
+]
+
+export function buildFixture(spec: FixtureSpec): LoanNexFixture {
+  return { name: spec.name, description: spec.description, scenario: spec.scenario, response: buildRows(spec) }
+}
+
+/**
+ * Generated corpus followed by any captured responses in fixtures/loannex/*.json
+ */
+export function loadFixtureCorpus(capturedDir: string, only?: string[]): LoanNexFixture[] {
+  const fixtures = FIXTURE_SPECS
+    .filter(spec => !only || only.includes(spec.name))
+    .map(buildFixture)
+
+  if (existsSync(capturedDir)) {
+    for (const file of readdirSync(capturedDir).filter(f => f.endsWith('.json')).sort()) {
+      const name = `captured-${basename(file, '.json')}`
+      if (only && !only.includes(name)) continue
+      fixtures.push({ name, description: `captured ${file}`, scenario: null, response: JSON.parse(readFileSync(join(capturedDir, file), 'utf8')) })
+    }
+  }
+  return fixtures
+}
@@ -0,0 +1,329 @@
+/**
+ * quickpricer.ts
+ *
+ * Deterministic fixture corpus for the MeridianLink QuickPricer replay harness.
+ * Builds SOAP envelopes whose RunQuickPricerV2Result is double-escaped exactly the
+ * way MeridianLink returns it, with prices derived from a fixed LLPA grid so the
+ * same scenario always produces the same bytes.
+ *
+ * Captured production payloads can be dropped into fixtures/quickpricer/*.xml
+ * (the full SOAP response body) and are replayed alongside the generated ones.
+ */
+
+import { readdirSync, readFileSync, existsSync } from 'node:fs'
+import { join, basename } from 'node:path'
+
+// ============================================================================
+// TYPES
+// ============================================================================
+
+export interface ReplayScenario {
+  fico: number
+  ltv: number
+  loanAmount: number
+  occupancy: 'primary' | 'secondary' | 'investment'
+  docType: 'fullDoc' | 'bankStatement' | 'dscr'
+  purpose: 'purchase' | 'refinance' | 'cashout'
+  propertyType: 'sfr' | 'condo' | '2unit'
+  dscr: number
+}
+
+export interface QuickPricerFixture {
+  name: string
+  description: string
+  scenario: ReplayScenario | null
+  soap: string
+}
+
+interface FixtureSpec {
+  name: string
+  description: string
+  seed: number
+  investors: number
+  products: number
+  ratesPerProgram: number
+  fillerItems: number
+  scenario: ReplayScenario
+  edgeCases?: boolean
+}
+
+// ============================================================================
+// LLPA GRID
+// ============================================================================
+
+const FICO_BUCKETS: [number, number][] = [
+  [800, 850], [780, 799], [760, 779], [740, 759], [720, 739],
+  [700, 719], [680, 699], [660, 679], [640, 659], [620, 639],
+]
+const LTV_BUCKETS: [number, number][] = [
+  [0, 50], [50.01, 55], [55.01, 60], [60.01, 65], [65.01, 70],
+  [70.01, 75], [75.01, 80], [80.01, 85], [85.01, 90],
+]
+const LOAN_AMOUNT_BUCKETS: [number, number][] = [
+  [100000, 149999], [150000, 399999], [400000, 999999], [1000000, 1999999], [2000000, 3500000],
+]
+export const PPP_TERMS = ['0MO PPP', '1 YR PPP', '2 YR PPP', '3 YR PPP', '4 YR PPP', '5 YR PPP']
+const PPP_LLPA = [0.5, 0.25, 0, -0.25, -0.5, -0.75]
+const INVESTORS = ['SLATE', 'DEEPHAVEN', 'VERUS', 'ANGEL OAK', 'NQM FUNDING', 'A&D MORTGAGE', 'CHAMPIONS', 'ACRA']
+const PRODUCTS = [
+  { label: '30 YR FIXED', term: 360, finMeth: 'Fixed' },
+  { label: '40 YR FIXED IO', term: 480, finMeth: 'Fixed' },
+  { label: '7/6 ARM', term: 360, finMeth: 'ARM' },
+  { label: '5/6 ARM', term: 360, finMeth: 'ARM' },
+  { label: '15 YR FIXED', term: 180, finMeth: 'Fixed' },
+]
+
+const round3 = (n: number) => Math.round(n * 1000) / 1000
+const money = (n: number) => n.toLocaleString('en-US', { minimumFractionDigits: 2, maximumFractionDigits: 2 })
+const pct = (n: number) => `${n.toFixed(3)}%`
+
+function bucketIndex(value: number, buckets: [number, number][]): number {
+  const idx = buckets.findIndex(([lo, hi]) => value >= lo && value <= hi)
+  return idx === -1 ? buckets.length - 1 : idx
+}
+
+export function ficoLabel(fico: number): string {
+  const [lo, hi] = FICO_BUCKETS[bucketIndex(fico, FICO_BUCKETS)]
+  return lo === 800 ? 'FICO >= 800' : `FICO ${lo}-${hi}`
+}
+
+export function ltvLabel(ltv: number): string {
+  const [lo, hi] = LTV_BUCKETS[bucketIndex(ltv, LTV_BUCKETS)]
+  return lo === 0 ? 'LTV <= 50.00%' : `LTV ${lo.toFixed(2)}-${hi.toFixed(2)}%`
+}
+
+function loanAmountLabel(amount: number): string {
+  const [lo, hi] = LOAN_AMOUNT_BUCKETS[bucketIndex(amount, LOAN_AMOUNT_BUCKETS)]
+  return `LOAN AMOUNT $${lo.toLocaleString('en-US')} - $${hi.toLocaleString('en-US')}`
+}
+
+/**
+ * The LLPA items (industry convention: positive = cost) a program template applies
+ * to a scenario. Each investor/product pair shifts the grid slightly so templates differ.
+ */
+export function llpaItems(scenario: ReplayScenario, investorIdx: number, productIdx: number, pppIdx: number): { description: string; llpa: number }[] {
+  const ficoIdx = bucketIndex(scenario.fico, FICO_BUCKETS)
+  const ltvIdx = bucketIndex(scenario.ltv, LTV_BUCKETS)
+  const tilt = ((investorIdx * 3 + productIdx) % 5) * 0.125
+  const items: { description: string; llpa: number }[] = []
+
+  const gridHit = Math.max(0, ficoIdx - 2) * 0.25 + Math.max(0, ltvIdx - 3) * 0.25 + (ficoIdx > 4 && ltvIdx > 5 ? tilt : 0)
+  items.push({ description: `${ficoLabel(scenario.fico)} / ${ltvLabel(scenario.ltv)}`, llpa: gridHit })
+
+  if (scenario.docType === 'dscr') {
+    items.push({ description: 'DOC TYPE: DSCR', llpa: 0.25 + tilt / 2 })
+    const dscrLlpa = scenario.dscr >= 1.25 ? -0.125 : scenario.dscr >= 1 ? 0 : 0.75
+    const dscrLabel = scenario.dscr >= 1.25 ? 'DSCR >= 1.25' : scenario.dscr >= 1 ? 'DSCR 1.00-1.249' : 'DSCR < 1.00'
+    items.push({ description: dscrLabel, llpa: dscrLlpa })
+  } else if (scenario.docType === 'bankStatement') {
+    items.push({ description: 'DOC TYPE: 12/24 MO BANK STMT & P&L', llpa: 0.5 })
+  }
+
+  if (scenario.occupancy === 'investment') items.push({ description: 'OCCUPANCY: INVESTMENT', llpa: 0.75 })
+  if (scenario.occupancy === 'secondary') items.push({ description: 'OCCUPANCY: 2ND HOME', llpa: 0.5 })
+  if (scenario.occupancy === 'investment') items.push({ description: `PREPAY: ${PPP_TERMS[pppIdx]}`, llpa: PPP_LLPA[pppIdx] })
+
+  items.push({ description: loanAmountLabel(scenario.loanAmount), llpa: scenario.loanAmount < 150000 ? 0.5 : scenario.loanAmount > 1999999 ? 0.375 : 0 })
+  if (scenario.purpose === 'cashout') items.push({ description: 'PURPOSE: CASHOUT REFI', llpa: 0.5 + Math.max(0, ltvIdx - 4) * 0.125 })
+  if (scenario.propertyType === 'condo') items.push({ description: 'PROPERTY: CONDO (WARRANTABLE)', llpa: 0.25 })
+  if (scenario.propertyType === '2unit') items.push({ description: 'PROPERTY: 2-4 UNITS', llpa: 0.375 })
+
+  return items.map(i => ({ description: i.description, llpa: round3(i.llpa) }))
+}
+
+// ============================================================================
+// XML BUILDING
+// ============================================================================
+
+function escapeXml(unsafe: string): string {
+  return unsafe.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;').replace(/"/g, '&quot;').replace(/'/g, '&apos;')
+}
+
+function attrs(pairs: [string, string | number][]): string {
+  return pairs.map(([k, v]) => `${k}="${escapeXml(String(v))}"`).join(' ')
+}
+
+// mulberry32 — tiny seeded PRNG so fixtures are byte-stable across runs
+export function rng(seed: number): () => number {
+  let a = seed >>> 0
+  return () => {
+    a = (a + 0x6d2b79f5) >>> 0
+    let t = a
+    t = Math.imul(t ^ (t >>> 15), t | 1)
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61)
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296
+  }
+}
+
+function templateId(rand: () => number): string {
+  const hex = (n: number) => Array.from({ length: n }, () => Math.floor(rand() * 16).toString(16)).join('')
+  return `${hex(8)}-${hex(4)}-4${hex(3)}-a${hex(3)}-${hex(12)}`
+}
+
+export function monthlyPayment(amount: number, rate: number, term: number): number {
+  const r = rate / 1200
+  return r > 0 ? (amount * r) / (1 - Math.pow(1 + r, -term)) : amount / term
+}
+
+/**
+ * Build the inner (level-2) pricing XML: Programs with RateOptions plus the
+ * AdjustmentsTable keyed by lLpTemplateId.
+ */
+function buildPricingXml(spec: FixtureSpec): string {
+  const rand = rng(spec.seed)
+  const s = spec.scenario
+  const pppVariants = s.occupancy === 'investment' ? PPP_TERMS.length : 1
+  const programsXml: string[] = []
+  const tableXml: string[] = []
+
+  for (let inv = 0; inv < spec.investors; inv++) {
+    for (let prod = 0; prod < spec.products; prod++) {
+      for (let ppp = 0; ppp < pppVariants; ppp++) {
+        const investor = INVESTORS[inv % INVESTORS.length]
+        const product = PRODUCTS[prod % PRODUCTS.length]
+        const docLabel = s.docType === 'dscr' ? 'DSCR' : s.docType === 'bankStatement' ? 'BANK STMT' : 'FULL DOC'
+        const pppLabel = s.occupancy === 'investment' ? ` ${PPP_TERMS[ppp]}` : ''
+        const name = `${product.label} NONCONFORMING${pppLabel} (${investor} ${docLabel})`
+        const tId = templateId(rand)
+        const ineligible = rand() < 0.08
+        const parRate = round3(6.25 + ((inv + prod) % 6) * 0.125)
+
+        const items = llpaItems(s, inv, prod, ppp)
+        const llpaTotal = items.reduce((sum, i) => sum + i.llpa, 0)
+
+        // AdjustmentsTable block: MeridianLink reports Point in price convention (negated LLPA)
+        const itemXml = items.map(i => `<AdjustmentItem ${attrs([
+          ['Description', i.description], ['Point', pct(-i.llpa)], ['Rate', '0.000%'], ['Margin', '0.000%'], ['TeaserRate', '0.000%'], ['IsHidden', 'False'],
+        ])} />`)
+        itemXml.push(`<AdjustmentItem ${attrs([['Description', `PRICE GROUP ${investor}`], ['Point', '0.000%'], ['Rate', '0.000%'], ['IsHidden', 'True']])} />`)
+        for (let f = 0; f < spec.fillerItems; f++) {
+          itemXml.push(`<AdjustmentItem ${attrs([['Description', `RULE ${f + 1}: ${investor} STATE OVERLAY ${['CA', 'FL', 'TX', 'NY'][f % 4]}`], ['Point', '0.000%'], ['Rate', '0.000%'], ['IsHidden', f % 3 === 0 ? 'True' : 'False']])} />`)
+        }
+        tableXml.push(`<Adjustment lLpTemplateId="${tId}" lLpTemplateNm="${escapeXml(name)}">${itemXml.join('')}</Adjustment>`)
+
+        const rateXml: string[] = []
+        let bestIdx = 0
+        let bestDist = Infinity
+        const rows: [string, string | number][][] = []
+        for (let r = 0; r < spec.ratesPerProgram; r++) {
+          const rate = round3(parRate - 0.75 + r * 0.125)
+          const points = round3((parRate - rate) * 3 + llpaTotal)
+          const payment = monthlyPayment(s.loanAmount, rate, product.term)
+          const closing = 1950 + Math.max(0, points) * s.loanAmount / 100
+          if (Math.abs(points) < bestDist) { bestDist = Math.abs(points); bestIdx = r }
+          rows.push([
+            ['Rate', rate.toFixed(3)], ['Point', points.toFixed(3)], ['APR', (rate + 0.062).toFixed(3)],
+            ['Payment', money(payment)], ['Description', name], ['lLpInvestorNm', investor],
+            ['Status', ineligible ? 'Unavailable' : 'Available'], ['BestPrice', 'False'],
+            ['TotalClosingCost', closing.toFixed(2)], ['CashToClose', (closing + (s.purpose === 'purchase' ? s.loanAmount / s.ltv * 100 - s.loanAmount : 0)).toFixed(2)],
+            ['QualRate', rate.toFixed(3)], ['lLpTemplateId', tId],
+          ])
+        }
+        rows.forEach((row, r) => {
+          if (r === bestIdx) row[7] = ['BestPrice', 'True']
+          rateXml.push(`<RateOption ${attrs(row)} />`)
+        })
+
+        programsXml.push(`<Program ${attrs([
+          ['Name', name], ['Status', ineligible ? 'Ineligible' : 'Eligible'], ['Term', product.term], ['FinMethT', product.finMeth],
+          ['LoanType', 'Conventional'], ['ParRate', parRate.toFixed(3)], ['ParPoints', '0.000'], ['ProductType', 'NON-QM'], ['sProdRLckdDays', 30],
+        ])}><RateOptions>${rateXml.join('')}</RateOptions></Program>`)
+      }
+    }
+  }
+
+  if (spec.edgeCases) {
+    // Legacy shapes the regex parser still honours: nested per-rate adjustments, program-level
+    // adjustments, PricingAdjustment elements, entity-laden descriptions and a duplicate template id
+    const dupId = templateId(rand)
+    tableXml.push(`<Adjustment lLpTemplateId="${dupId}"><AdjustmentItem ${attrs([['Description', 'DSCR >= 1.25 & "NO RATIO" <OVERLAY>'], ['Point', '0.125%'], ['Rate', '-0.125%'], ['IsHidden', 'False']])} /></Adjustment>`)
+    tableXml.push(`<Adjustment lLpTemplateId="${dupId}"><AdjustmentItem ${attrs([['Description', "BORROWER'S 2ND HOME"], ['Point', '-0.250%'], ['Rate', '0.000%'], ['IsHidden', 'False']])} /><AdjustmentItem ${attrs([['Point', '-0.250%']])} /></Adjustment>`)
+    programsXml.push(`<Program ${attrs([['Name', '30 YR FIXED LEGACY (NESTED)'], ['Status', 'Eligible'], ['Term', 360], ['FinMethT', 'Fixed'], ['ParRate', '7.000'], ['ParPoints', '0.125'], ['ProductType', 'NON-QM']])}>`
+      + `<Adjustment ${attrs([['Description', 'PROGRAM LEVEL: INTEREST ONLY'], ['Amount', '0.375'], ['RateAdj', '0.125']])} />`
+      + `<RateOption ${attrs([['Rate', '6.875'], ['Point', '0.750'], ['APR', '6.990'], ['Payment', '4,001.10'], ['Description', '30 YR FIXED LEGACY'], ['Status', 'Available'], ['BestPrice', 'False']])} />`
+      + `<RateOption ${attrs([['Rate', '7.000'], ['Point', '0.125'], ['APR', '7.110'], ['Payment', '4,087.50'], ['Description', '30 YR FIXED LEGACY'], ['Status', 'Available'], ['BestPrice', 'True'], ['lLpTemplateId', dupId]])}>`
+      + `<Adjustment ${attrs([['Description', 'NESTED: FICO 720-739 & LTV > 75'], ['Amount', '0.500'], ['Rate', '0.000']])} /></RateOption>`
+      + `<RateOption ${attrs([['Rate', '7.125'], ['Point', '-0.250'], ['APR', '7.230'], ['Payment', '4,150.00'], ['Description', '30 YR FIXED LEGACY'], ['Status', 'Available'], ['lLpTemplateId', 'missing-template']])}>`
+      + `<Adjustment ${attrs([['Name', 'NESTED BY NAME'], ['Price', '-0.125'], ['RateAdj', '0.000']])} /></RateOption>`
+      + `</Program>`)
+    programsXml.push(`<Program ${attrs([['Name', 'EMPTY PROGRAM'], ['Status', 'Eligible']])}></Program>`)
+    programsXml.push(`<Program ${attrs([['Name', '5/6 ARM NO RATES'], ['Status', 'Ineligible']])}><RateOptions /></Program>`)
+    programsXml.unshift(`<PricingAdjustment ${attrs([['sAdjDescription', 'LOCK EXTENSION 15 DAYS'], ['dAdjPriceAdj', '0.125'], ['dAdjRateAdj', '0.000']])} />`)
+  }
+
+  return `<PricingResults>${programsXml.join('')}<AdjustmentsTable>${tableXml.join('')}</AdjustmentsTable></PricingResults>`
+}
+
+/**
+ * Wrap the pricing XML the way QuickPricer.asmx does: escaped once inside the
+ * LOXmlFormat result document, which is escaped again as the SOAP string result.
+ */
+export function wrapSOAPResponse(pricingXml: string): string {
+  const level1 = `<LOXmlFormat version="1.0"><loan><field id="sLNm">QUICKPRICER</field><field id="sStatusT">0</field></loan><PricingResultXml status="OK">${escapeXml(pricingXml)}</PricingResultXml></LOXmlFormat>`
+  return `<?xml version="1.0" encoding="utf-8"?><soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema"><soap:Body><RunQuickPricerV2Response xmlns="http://www.lendersoffice.com/los/webservices/"><RunQuickPricerV2Result>${escapeXml(level1)}</RunQuickPricerV2Result></RunQuickPricerV2Response></soap:Body></soap:Envelope>`
+}
+
+// ============================================================================
+// CORPUS
+// ============================================================================
+
+const BASE_SCENARIO: ReplayScenario = {
+  fico: 740, ltv: 75, loanAmount: 600000, occupancy: 'primary', docType: 'fullDoc',
+  purpose: 'purchase', propertyType: 'sfr', dscr: 0,
+}
+
+const DSCR_SCENARIO: ReplayScenario = {
+  fico: 720, ltv: 75, loanAmount: 500000, occupancy: 'investment', docType: 'dscr',
+  purpose: 'purchase', propertyType: 'sfr', dscr: 1.3,
+}
+
+export const FIXTURE_SPECS: FixtureSpec[] = [
+  { name: 'small-fulldoc-primary', description: '2 programs, 8 rate options each', seed: 11, investors: 1, products: 2, ratesPerProgram: 8, fillerItems: 0, scenario: BASE_SCENARIO },
+  { name: 'medium-bankstmt-second', description: '12 programs, 24 rate options each', seed: 23, investors: 4, products: 3, ratesPerProgram: 24, fillerItems: 4, scenario: { ...BASE_SCENARIO, occupancy: 'secondary', docType: 'bankStatement', fico: 705 } },
+  { name: 'edge-legacy-shapes', description: 'nested adjustments, entities, duplicate templates', seed: 37, investors: 1, products: 1, ratesPerProgram: 6, fillerItems: 1, scenario: { ...BASE_SCENARIO, propertyType: 'condo' }, edgeCases: true },
+  { name: 'large-dscr-investment', description: '120 programs x 32 rate options, 6 PPP terms', seed: 41, investors: 5, products: 4, ratesPerProgram: 32, fillerItems: 12, scenario: DSCR_SCENARIO },
+  { name: 'xl-dscr-cashout', description: '240 programs x 40 rate options, big AdjustmentsTable', seed: 53, investors: 8, products: 5, ratesPerProgram: 40, fillerItems: 30, scenario: { ...DSCR_SCENARIO, purpose: 'cashout', ltv: 70, propertyType: '2unit' } },
+]
+
+// Form body the frontend would POST for a scenario (null → the default scenario)
+export function scenarioToRequestBody(scenario: ReplayScenario | null): Record<string, unknown> {
+  const s = scenario || BASE_SCENARIO
+  return {
+    loanAmount: s.loanAmount,
+    propertyValue: Math.round(s.loanAmount / (s.ltv / 100)),
+    creditScore: s.fico,
+    propertyZip: '90210',
+    propertyState: 'CA',
+    propertyCounty: 'Los Angeles',
+    occupancyType: s.occupancy,
+    propertyType: s.propertyType,
+    loanPurpose: s.purpose,
+    documentationType: s.docType,
+    loanType: 'nonqm',
+    lockPeriod: '30',
+    dscrRatio: s.docType === 'dscr' ? (s.dscr >= 1.25 ? '>=1.250' : '1.00-1.149') : undefined,
+    dscrValue: s.docType === 'dscr' ? s.dscr : undefined,
+  }
+}
+
+export function buildFixture(spec: FixtureSpec): QuickPricerFixture {
+  return { name: spec.name, description: spec.description, scenario: spec.scenario, soap: wrapSOAPResponse(buildPricingXml(spec)) }
+}
+
+/**
+ * Generated corpus followed by any captured payloads in fixtures/quickpricer/*.xml
+ */
+export function loadFixtureCorpus(capturedDir: string, only?: string[]): QuickPricerFixture[] {
+  const fixtures = FIXTURE_SPECS
+    .filter(spec => !only || only.includes(spec.name))
+    .map(buildFixture)
+
+  if (existsSync(capturedDir)) {
+    for (const file of readdirSync(capturedDir).filter(f => f.endsWith('.xml')).sort()) {
+      const name = `captured-${basename(file, '.xml')}`
+      if (only && !only.includes(name)) continue
+      fixtures.push({ name, description: `captured ${file}`, scenario: null, soap: readFileSync(join(capturedDir, file), 'utf8') })
+    }
+  }
+  return fixtures
+}
@@ -0,0 +1,18 @@
+/**
+ * cli.ts
+ *
+ * Argument and statistics helpers shared by the replay, bench and serve-local scripts.
+ */
+
+// The value after `name` on the command line (`--iterations 20`), if given
+export function argValue(name: string): string | undefined {
+  const idx = process.argv.indexOf(name)
+  return idx >= 0 ? process.argv[idx + 1] : undefined
+}
+
+// Nearest-rank percentile of an ascending list; 0 for an empty one
+export function percentile(sorted: number[], p: number): number {
+  if (sorted.length === 0) return 0
+  const idx = Math.min(sorted.length - 1, Math.ceil((p / 100) * sorted.length) - 1)
+  return sorted[Math.max(0, idx)]
+}
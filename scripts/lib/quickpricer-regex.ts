@@ -0,0 +1,230 @@
+/**
+ * quickpricer-regex.ts
+ *
+ * The original RunQuickPricerV2Result parser: unescape the whole payload twice, then
+ * regex over it. api/_lib/quickpricer-parser.ts replaced it with a single pass; this
+ * copy stays out of the function bundles and is only imported by
+ * scripts/replay-quickpricer.ts, which proves the two byte-for-byte.
+ */
+
+function unescapeHtmlEntities(text: string): string {
+  if (!text) return ''
+  return text.replace(/&gt;/g, '>').replace(/&lt;/g, '<').replace(/&quot;/g, '"').replace(/&apos;/g, "'").replace(/&amp;/g, '&')
+}
+
+function unescapeXml(escaped: string): string {
+  if (!escaped) return ''
+  return escaped.replace(/&lt;/g, '<').replace(/&gt;/g, '>').replace(/&quot;/g, '"').replace(/&apos;/g, "'").replace(/&amp;/g, '&')
+}
+
+function getAttrUncached(tag: string, attr: string): string {
+  const match = tag.match(new RegExp(`${attr}="([^"]*)"`, 'i'))
+  return match ? match[1] : ''
+}
+
+export function parseSOAPResponseRegex(xmlString: string): any {
+  const level1 = unescapeXml(xmlString)
+  const level2 = unescapeXml(level1)
+
+  const programs: any[] = []
+  let debugXmlSample = ''
+
+  // Look for Adjustments section (MeridianLink returns these in a separate block)
+  // The format could be <Adjustments><Adjustment .../></Adjustments> or <PricingAdjustments>
+  const globalAdjustments: any[] = []
+
+  // Look for <Adjustment> elements with proper attributes
+  const adjItemRegex = /<Adjustment\s+([^>]+)\/?>|<PricingAdjustment\s+([^>]+)\/?>/gi
+  let adjMatch
+  while ((adjMatch = adjItemRegex.exec(level2)) !== null) {
+    const adjAttrs = adjMatch[1] || adjMatch[2] || ''
+    // Skip if this is just a template reference
+    if (adjAttrs.includes('lLpTemplateId') && !adjAttrs.includes('Description') && !adjAttrs.includes('sAdjDescription')) {
+      continue
+    }
+    globalAdjustments.push({
+      description: getAttrUncached(adjAttrs, 'sAdjDescription') || getAttrUncached(adjAttrs, 'Description') || getAttrUncached(adjAttrs, 'Name'),
+      amount: -(parseFloat(getAttrUncached(adjAttrs, 'dAdjPriceAdj')) || parseFloat(getAttrUncached(adjAttrs, 'Amount')) || parseFloat(getAttrUncached(adjAttrs, 'Price')) || 0),
+      rateAdj: -(parseFloat(getAttrUncached(adjAttrs, 'dAdjRateAdj')) || parseFloat(getAttrUncached(adjAttrs, 'RateAdj')) || 0),
+    })
+  }
+
+  // Also capture the AdjustmentsTable section
+  const adjustmentsTableMatch = level2.match(/<AdjustmentsTable>([\s\S]*?)<\/AdjustmentsTable>/i)
+  let debugAdjustmentsSection = 'No AdjustmentsTable found'
+
+  // Build a map of adjustments by template ID
+  const adjustmentsByTemplateId: Record<string, any[]> = {}
+
+  if (adjustmentsTableMatch) {
+    debugAdjustmentsSection = adjustmentsTableMatch[0].substring(0, 3000)
+
+    // Parse each <Adjustment lLpTemplateId="..."> block and its AdjustmentItems
+    const tableContent = adjustmentsTableMatch[1]
+    const adjBlockRegex = /<Adjustment\s+lLpTemplateId="([^"]+)"[^>]*>([\s\S]*?)<\/Adjustment>/gi
+    let adjBlockMatch
+    while ((adjBlockMatch = adjBlockRegex.exec(tableContent)) !== null) {
+      const templateId = adjBlockMatch[1]
+      const adjBlockContent = adjBlockMatch[2]
+      const templateAdjustments: any[] = []
+
+      // Parse AdjustmentItem elements within this Adjustment block
+      const adjItemRegex = /<AdjustmentItem\s+([^>]+)\/?>/gi
+      let adjItemMatch
+      while ((adjItemMatch = adjItemRegex.exec(adjBlockContent)) !== null) {
+        const adjAttrs = adjItemMatch[1]
+        const desc = getAttrUncached(adjAttrs, 'Description')
+        const isHidden = getAttrUncached(adjAttrs, 'IsHidden') === 'True'
+
+        // Skip hidden adjustments (like Price Group)
+        if (isHidden) continue
+
+        // Point is the price adjustment as a percentage string (e.g., "0.500%", "-0.250%")
+        // MeridianLink uses "price convention": positive = adds to price (better for borrower)
+        // Industry LLPA convention: positive = cost/hit, negative = credit/benefit
+        // Negate to convert from price convention to LLPA convention
+        const pointStr = getAttrUncached(adjAttrs, 'Point') || '0'
+        const priceAdj = -(parseFloat(pointStr.replace('%', '')) || 0)
+
+        // Rate adjustment (also negate for consistency)
+        const rateStr = getAttrUncached(adjAttrs, 'Rate') || '0'
+        const rateAdj = -(parseFloat(rateStr.replace('%', '')) || 0)
+
+        if (desc) {
+          templateAdjustments.push({
+            description: unescapeHtmlEntities(desc),
+            amount: priceAdj,
+            rateAdj: rateAdj,
+          })
+        }
+      }
+
+      adjustmentsByTemplateId[templateId] = templateAdjustments
+      // Also add to global for backwards compatibility
+      globalAdjustments.push(...templateAdjustments)
+    }
+  }
+
+  const programRegex = /<Program\s([^>]+)>([\s\S]*?)<\/Program>/gi
+  let programMatch
+  while ((programMatch = programRegex.exec(level2)) !== null) {
+    const progAttrs = programMatch[1]
+    const progBody = programMatch[2]
+
+    // Capture first program's body for debug
+    if (!debugXmlSample && progBody) {
+      debugXmlSample = progBody.substring(0, 2000)
+    }
+
+    const programName = getAttrUncached(progAttrs, 'Name')
+    const status = getAttrUncached(progAttrs, 'Status')
+    const term = getAttrUncached(progAttrs, 'Term')
+    const finMethod = getAttrUncached(progAttrs, 'FinMethT')
+    const loanType = getAttrUncached(progAttrs, 'LoanType')
+    const parRate = getAttrUncached(progAttrs, 'ParRate')
+    const parPoints = getAttrUncached(progAttrs, 'ParPoints')
+    const investor = getAttrUncached(progAttrs, 'ProductType')
+    const lockDays = getAttrUncached(progAttrs, 'sProdRLckdDays')
+
+    // Parse adjustments at the Program level (outside RateOptions)
+    const programAdjustments: any[] = []
+    const progAdjRegex = /<Adjustment\s([^>]*)\/?>/gi
+    let progAdjMatch
+    while ((progAdjMatch = progAdjRegex.exec(progBody)) !== null) {
+      const adjAttrs = progAdjMatch[1]
+      programAdjustments.push({
+        description: getAttrUncached(adjAttrs, 'Description') || getAttrUncached(adjAttrs, 'Name') || getAttrUncached(adjAttrs, 'Desc'),
+        amount: -(parseFloat(getAttrUncached(adjAttrs, 'Amount')) || parseFloat(getAttrUncached(adjAttrs, 'Price')) || parseFloat(getAttrUncached(adjAttrs, 'PriceAdj')) || 0),
+        rateAdj: -(parseFloat(getAttrUncached(adjAttrs, 'RateAdj')) || parseFloat(getAttrUncached(adjAttrs, 'Rate')) || 0),
+      })
+    }
+
+    const rateOptions: any[] = []
+    // Match RateOption with potential nested content (adjustments)
+    const rateRegex = /<RateOption\s([^>]*)(?:\/>|>([\s\S]*?)<\/RateOption>)/gi
+    let rateMatch
+    while ((rateMatch = rateRegex.exec(progBody)) !== null) {
+      const rAttrs = rateMatch[1]
+      const rateBody = rateMatch[2] || ''
+
+      // Get template ID to look up adjustments
+      const templateId = getAttrUncached(rAttrs, 'lLpTemplateId')
+
+      // Look up adjustments from AdjustmentsTable by template ID
+      let adjustments = templateId ? adjustmentsByTemplateId[templateId] : undefined
+
+      // If no adjustments found in table, try parsing from within RateOption (legacy)
+      if (!adjustments || adjustments.length === 0) {
+        adjustments = []
+        const adjRegex = /<Adjustment\s([^>]*)\/?>/gi
+        let adjMatch
+        while ((adjMatch = adjRegex.exec(rateBody)) !== null) {
+          const adjAttrs = adjMatch[1]
+          adjustments.push({
+            description: unescapeHtmlEntities(getAttrUncached(adjAttrs, 'Description') || getAttrUncached(adjAttrs, 'Name')),
+            amount: -(parseFloat(getAttrUncached(adjAttrs, 'Amount')) || parseFloat(getAttrUncached(adjAttrs, 'Price')) || 0),
+            rateAdj: -(parseFloat(getAttrUncached(adjAttrs, 'RateAdj')) || parseFloat(getAttrUncached(adjAttrs, 'Rate')) || 0),
+          })
+        }
+      }
+
+      rateOptions.push({
+        rate: parseFloat(getAttrUncached(rAttrs, 'Rate')) || 0,
+        points: parseFloat(getAttrUncached(rAttrs, 'Point')) || 0,
+        apr: parseFloat(getAttrUncached(rAttrs, 'APR')) || 0,
+        payment: parseFloat(getAttrUncached(rAttrs, 'Payment').replace(/,/g, '')) || 0,
+        description: getAttrUncached(rAttrs, 'Description'),
+        investor: getAttrUncached(rAttrs, 'lLpInvestorNm'),
+        status: getAttrUncached(rAttrs, 'Status'),
+        bestPrice: getAttrUncached(rAttrs, 'BestPrice') === 'True',
+        totalClosingCost: parseFloat(getAttrUncached(rAttrs, 'TotalClosingCost')) || 0,
+        cashToClose: parseFloat(getAttrUncached(rAttrs, 'CashToClose')) || 0,
+        adjustments: adjustments && adjustments.length > 0 ? adjustments : undefined,
+      })
+    }
+
+    const bestOption = rateOptions.find(r => r.bestPrice)
+      || rateOptions.find(r => r.status === 'Available')
+      || rateOptions[0]
+
+    if (programName && bestOption) {
+      programs.push({
+        name: programName,
+        programName,
+        status,
+        term: parseInt(term) || 360,
+        finMethod,
+        loanType,
+        parRate: parseFloat(parRate) || 0,
+        parPoints: parseFloat(parPoints) || 0,
+        investor,
+        lockDays: parseInt(lockDays) || 30,
+        rate: bestOption.rate,
+        apr: bestOption.apr,
+        points: bestOption.points,
+        payment: bestOption.payment,
+        description: bestOption.description,
+        investorName: bestOption.investor,
+        totalClosingCost: bestOption.totalClosingCost,
+        cashToClose: bestOption.cashToClose,
+        rateOptions,
+        adjustments: programAdjustments.length > 0 ? programAdjustments : undefined,
+      })
+    }
+  }
+
+  programs.sort((a, b) => {
+    const aEligible = a.status === 'Eligible' ? 0 : 1
+    const bEligible = b.status === 'Eligible' ? 0 : 1
+    if (aEligible !== bEligible) return aEligible - bEligible
+    return a.rate - b.rate
+  })
+
+  return {
+    programs,
+    totalPrograms: programs.length,
+    globalAdjustments: globalAdjustments.length > 0 ? globalAdjustments : undefined,
+    debugXmlSample,
+    debugAdjustmentsSection,
+  }
+}
@@ -0,0 +1,161 @@
+/**
+ * vercel.ts
+ *
+ * Minimal in-process stand-ins for VercelRequest/VercelResponse so api/ handlers
+ * can be driven from scripts without `vercel dev`, and a small HTTP server that
+ * mounts handlers by path for tools that need real sockets (scripts/loadtest.py).
+ */
+
+import { createServer, type IncomingMessage, type ServerResponse } from 'node:http'
+import type { AddressInfo } from 'node:net'
+import type { VercelRequest, VercelResponse } from '@vercel/node'
+
+export type Handler = (req: VercelRequest, res: VercelResponse) => unknown
+
+export interface InvokeOptions {
+  method?: string
+  body?: unknown
+  headers?: Record<string, string>
+  query?: Record<string, string>
+}
+
+export interface InvokeResult {
+  status: number
+  headers: Record<string, string>
+  text: string
+  body: any
+}
+
+export async function invokeHandler(handler: Handler, options: InvokeOptions = {}): Promise<InvokeResult> {
+  const headers: Record<string, string> = {}
+  const chunks: string[] = []
+  let status = 200
+  let finished: () => void = () => {}
+  const done = new Promise<void>(resolve => { finished = resolve })
+
+  const req = {
+    method: options.method || 'POST',
+    url: '/',
+    headers: Object.fromEntries(Object.entries(options.headers || {}).map(([k, v]) => [k.toLowerCase(), v])),
+    query: options.query || {},
+    cookies: {},
+    body: options.body,
+  }
+
+  const res = {
+    statusCode: 200,
+    headersSent: false,
+    writableEnded: false,
+    setHeader(name: string, value: string | number | string[]) { headers[name.toLowerCase()] = String(value); return res },
+    getHeader(name: string) { return headers[name.toLowerCase()] },
+    removeHeader(name: string) { delete headers[name.toLowerCase()] },
+    status(code: number) { status = code; res.statusCode = code; return res },
+    write(chunk: string | Uint8Array) {
+      res.headersSent = true
+      chunks.push(typeof chunk === 'string' ? chunk : Buffer.from(chunk).toString('utf8'))
+      return true
+    },
+    end(chunk?: string | Uint8Array) {
+      if (chunk) res.write(chunk)
+      res.writableEnded = true
+      finished()
+      return res
+    },
+    send(body: unknown) { return res.end(typeof body === 'string' ? body : JSON.stringify(body)) },
+    json(body: unknown) {
+      if (!headers['content-type']) headers['content-type'] = 'application/json; charset=utf-8'
+      return res.end(JSON.stringify(body))
+    },
+  }
+
+  await handler(req as unknown as VercelRequest, res as unknown as VercelResponse)
+  await done
+  const text = chunks.join('')
+  // Parsed on first access so timing callers don't pay for JSON.parse of large bodies
+  let parsed: { value: any } | null = null
+  return {
+    status,
+    headers,
+    text,
+    get body() {
+      if (!parsed) {
+        try { parsed = { value: JSON.parse(text) } } catch { parsed = { value: null } }
+      }
+      return parsed.value
+    },
+  }
+}
+
+function readBody(req: IncomingMessage): Promise<string> {
+  return new Promise((resolve, reject) => {
+    const chunks: Buffer[] = []
+    req.on('data', c => chunks.push(c))
+    req.on('end', () => resolve(Buffer.concat(chunks).toString('utf8')))
+    req.on('error', reject)
+  })
+}
+
+export interface HandlerServer {
+  url: string
+  close(): Promise<void>
+}
+
+/**
+ * Serve handlers over HTTP with the Vercel helpers they use (query, parsed JSON body,
+ * res.status/json/send), e.g. { '/api/get-pricing': handler }.
+ */
+export async function serveHandlers(routes: Record<string, Handler>, port = 0): Promise<HandlerServer> {
+  const server = createServer(async (nodeReq: IncomingMessage, nodeRes: ServerResponse) => {
+    const [path, search = ''] = (nodeReq.url || '/').split('?')
+    const handler = routes[path]
+    if (!handler) {
+      nodeRes.writeHead(404)
+      return nodeRes.end()
+    }
+
+    const raw = await readBody(nodeReq)
+    let body: unknown = raw
+    if (String(nodeReq.headers['content-type'] || '').includes('application/json')) {
+      try {
+        body = raw ? JSON.parse(raw) : {}
+      } catch {
+        nodeRes.writeHead(400, { 'Content-Type': 'application/json' })
+        return nodeRes.end('{"success":false,"error":"Invalid JSON body"}')
+      }
+    }
+
+    const req = Object.assign(nodeReq, { query: Object.fromEntries(new URLSearchParams(search)), cookies: {}, body })
+    const res = Object.assign(nodeRes, {
+      status(code: number) { nodeRes.statusCode = code; return res },
+      send(payload: unknown) {
+        if (typeof payload === 'string' || Buffer.isBuffer(payload)) nodeRes.end(payload)
+        else res.json(payload)
+        return res
+      },
+      json(payload: unknown) {
+        if (!nodeRes.getHeader('content-type')) nodeRes.setHeader('Content-Type', 'application/json; charset=utf-8')
+        nodeRes.end(JSON.stringify(payload))
+        return res
+      },
+    })
+
+    try {
+      await handler(req as unknown as VercelRequest, res as unknown as VercelResponse)
+    } catch (err) {
+      console.error(`[serve] ${path} threw:`, err)
+      if (!nodeRes.headersSent) nodeRes.writeHead(500, { 'Content-Type': 'application/json' })
+      if (!nodeRes.writableEnded) nodeRes.end('{"success":false,"error":"Unhandled handler error"}')
+    }
+  })
+  server.keepAliveTimeout = 5000
+
+  await new Promise<void>(resolve => server.listen(port, '127.0.0.1', resolve))
+  const { port: bound } = server.address() as AddressInfo
+  return {
+    url: `http://127.0.0.1:${bound}`,
+    close: () => new Promise<void>(resolve => {
+      server.closeAllConnections()
+      server.close(() => resolve())
+    }),
+  }
+}
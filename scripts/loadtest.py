@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""Concurrent load test for the three pricing endpoints.
+
+Drives /api/get-pricing, /api/get-lp-pricing and /api/get-ln-pricing together with an
+open-loop (Poisson) arrival process at a series of offered rates. For each step and each
+endpoint it reports throughput, p50/p95/p99 latency, and the error and timeout rates.
+The saturation curve then shows where the handlers stop keeping up.
+
+Latency is measured from each request's *scheduled* arrival time. A request that waits
+for a free client worker is charged for that wait, as a real user would be. This avoids
+the coordinated omission of closed-loop "send, wait, send" tests.
+
+--duplicates sends that fraction of arrivals with the same body as the endpoint's previous
+request, as double-clicks, extra broker tabs and UI retries do. Responses marked
+X-Coalesced (answered by an identical scenario already in flight) are counted per step,
+and when the server has /api/_stats (serve-local.ts does) its coalescing counters are
+printed at the end.
+
+By default the tool starts scripts/serve-local.ts, which serves the real handlers in
+front of the local MeridianLink / LenderPrice / LoanNEX / Browserless stand-ins, so the
+run is fully offline. --base-url points it at a running server instead. Standard library
+only.
+
+Usage:
+  python3 scripts/loadtest.py [--rates 5,10,20,40,80] [--duration 10]
+      [--mix pricing=6,lp=2,ln=2] [--timeout 30] [--workers 512] [--seed 1]
+      [--lp-mode api|bql] [--ln-mode api|bql] [--no-cache] [--duplicates 0.2]
+      [--server-cmd "npx --yes tsx@4.21.0 scripts/serve-local.ts"] [--server-args "--ml-latency-ms 300"]
+      [--base-url http://127.0.0.1:3000] [--json report.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    "pricing": "/api/get-pricing",
+    "lp": "/api/get-lp-pricing",
+    "ln": "/api/get-ln-pricing",
+}
+
+# A step is saturated once any of these hold
+MAX_ERROR_RATE = 0.01
+MIN_THROUGHPUT_RATIO = 0.9
+MAX_P95_GROWTH = 3.0
+
+
+# ================= Scenarios =================
+
+def scenario(rng):
+    """A random UI form body; the same shape is accepted by all three endpoints."""
+    doc = rng.choice(["fullDoc", "dscr", "bankStatement"])
+    occupancy = "investment" if doc == "dscr" else rng.choice(["primary", "secondary", "investment"])
+    value = rng.choice([400000, 600000, 800000, 1200000])
+    ltv = rng.choice([55, 60, 65, 70, 75, 80])
+    body = {
+        "loanAmount": round(value * ltv / 100),
+        "propertyValue": value,
+        "creditScore": rng.randrange(660, 801, 20),
+        "propertyZip": "90210",
+        "propertyState": "CA",
+        "occupancyType": occupancy,
+        "propertyType": rng.choice(["sfr", "sfr", "condo", "2unit"]),
+        "loanPurpose": rng.choice(["purchase", "refinance", "cashout"]),
+        "documentationType": doc,
+        "loanType": "nonqm",
+        "lockPeriod": "30",
+    }
+    if doc == "dscr":
+        body["dscrRatio"] = rng.choice(["1.0-1.149", "1.150-1.249", ">=1.250"])
+    return body
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"unknown endpoint in --mix: {name} (use {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ================= Requests =================
+
+class Sample:
+    __slots__ = ("endpoint", "latency", "service", "status", "ok", "timeout", "error", "cache", "coalesced")
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.latency = 0.0
+        self.service = 0.0
+        self.status = 0
+        self.ok = False
+        self.timeout = False
+        self.error = None
+        self.cache = None
+        self.coalesced = False
+
+
+def send(base_url, endpoint, query, body, scheduled, timeout, no_cache):
+    sample = Sample(endpoint)
+    headers = {"Content-Type": "application/json"}
+    if no_cache:
+        headers["Cache-Control"] = "no-cache"
+    url = base_url + ENDPOINTS[endpoint] + query
+    req = urllib.request.Request(url, data=json.dumps(body).encode(), headers=headers, method="POST")
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            payload = resp.read()
+            sample.status = resp.status
+            sample.cache = resp.headers.get("X-Cache")
+            sample.coalesced = resp.headers.get("X-Coalesced") == "follower"
+        data = json.loads(payload)
+        sample.ok = data.get("success") is True
+        if not sample.ok:
+            sample.error = str(data.get("error") or "success=false")[:80]
+    except urllib.error.HTTPError as err:
+        sample.status = err.code
+        sample.error = f"HTTP {err.code}"
+    except (socket.timeout, TimeoutError):
+        sample.timeout = True
+        sample.error = "timeout"
+    except urllib.error.URLError as err:
+        sample.timeout = isinstance(err.reason, (socket.timeout, TimeoutError))
+        sample.error = "timeout" if sample.timeout else str(err.reason)[:80]
+    except (ConnectionError, ValueError) as err:
+        sample.error = f"{type(err).__name__}: {err}"[:80]
+    ended = time.perf_counter()
+    sample.latency = ended - scheduled
+    sample.service = ended - started
+    return sample
+
+
+def run_step(args, base_url, rate, mix, step_seed):
+    rng = random.Random(step_seed)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    queries = {"pricing": "", "lp": f"?mode={args.lp_mode}", "ln": f"?mode={args.ln_mode}"}
+
+    futures = []
+    last_body = {}
+    lag = 0.0
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        start = time.perf_counter()
+        offset = 0.0
+        while True:
+            offset += rng.expovariate(rate)
+            if offset >= args.duration:
+                break
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag = max(lag, -delay)
+            endpoint = rng.choices(names, weights)[0]
+            body = scenario(rng)
+            if endpoint in last_body and rng.random() < args.duplicates:
+                body = last_body[endpoint]
+            last_body[endpoint] = body
+            futures.append(pool.submit(send, base_url, endpoint, queries[endpoint], body, scheduled,
+                                       args.timeout, args.no_cache))
+        wait(futures)
+        elapsed = time.perf_counter() - start
+    return [f.result() for f in futures], elapsed, lag
+
+
+# ================= Reporting =================
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, -(-p * len(sorted_values) // 100) - 1))
+    return sorted_values[int(idx)]
+
+
+def summarize(samples, elapsed, offered, duration):
+    latencies = sorted(s.latency * 1000 for s in samples)
+    n = len(samples)
+    ok = sum(1 for s in samples if s.ok)
+    timeouts = sum(1 for s in samples if s.timeout)
+    errors = n - ok - timeouts
+    return {
+        "requests": n,
+        "offeredRps": round(offered, 2),
+        # Poisson arrivals drift from the nominal rate; saturation is judged against what was sent
+        "sentRps": round(n / duration, 2),
+        "throughputRps": round(ok / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50Ms": round(percentile(latencies, 50), 1),
+        "p95Ms": round(percentile(latencies, 95), 1),
+        "p99Ms": round(percentile(latencies, 99), 1),
+        "errorRate": round(errors / n, 4) if n else 0.0,
+        "timeoutRate": round(timeouts / n, 4) if n else 0.0,
+        "cacheHits": sum(1 for s in samples if s.cache == "HIT"),
+        "coalesced": sum(1 for s in samples if s.coalesced),
+        "topErrors": top_errors(samples),
+    }
+
+
+def top_errors(samples, limit=3):
+    counts = {}
+    for s in samples:
+        if not s.ok and s.error:
+            counts[s.error] = counts.get(s.error, 0) + 1
+    return sorted(counts.items(), key=lambda kv: -kv[1])[:limit]
+
+
+def saturation_reason(step, baseline_p95):
+    overall = step["all"]
+    if overall["errorRate"] + overall["timeoutRate"] > MAX_ERROR_RATE:
+        return f"errors+timeouts {100 * (overall['errorRate'] + overall['timeoutRate']):.1f}%"
+    if overall["throughputRps"] < MIN_THROUGHPUT_RATIO * overall["sentRps"]:
+        return f"throughput {overall['throughputRps']:.1f}/{overall['sentRps']:.1f} req/s sent"
+    if baseline_p95 and overall["p95Ms"] > MAX_P95_GROWTH * baseline_p95:
+        return f"p95 {overall['p95Ms']:.0f} ms > {MAX_P95_GROWTH:.0f}x baseline"
+    return None
+
+
+def print_step(step):
+    print(f"\noffered {step['rate']:g} req/s for {step['elapsedS']:.1f}s"
+          f"{' (client lag ' + format(step['clientLagMs'], '.0f') + ' ms)' if step['clientLagMs'] > 50 else ''}")
+    print("  " + " ".join([
+        "endpoint".ljust(9), "reqs".rjust(6), "offered".rjust(8), "thruput".rjust(8), "p50 ms".rjust(9),
+        "p95 ms".rjust(9), "p99 ms".rjust(9), "err %".rjust(6), "tmo %".rjust(6), "hits".rjust(5), "coal".rjust(5)]))
+    for name, s in list(step["endpoints"].items()) + [("all", step["all"])]:
+        print("  " + " ".join([
+            name.ljust(9), str(s["requests"]).rjust(6), f"{s['offeredRps']:.1f}".rjust(8),
+            f"{s['throughputRps']:.1f}".rjust(8), f"{s['p50Ms']:.1f}".rjust(9), f"{s['p95Ms']:.1f}".rjust(9),
+            f"{s['p99Ms']:.1f}".rjust(9), f"{100 * s['errorRate']:.1f}".rjust(6),
+            f"{100 * s['timeoutRate']:.1f}".rjust(6), str(s["cacheHits"]).rjust(5), str(s["coalesced"]).rjust(5)]))
+        for error, count in s["topErrors"] if name != "all" else []:
+            print(f"      {count} x {error}")
+
+
+def print_curve(steps):
+    print("\nSaturation curve (achieved throughput | p95 latency)")
+    print("=" * 78)
+    max_rate = max(s["rate"] for s in steps) or 1
+    max_p95 = max(s["all"]["p95Ms"] for s in steps) or 1
+    for s in steps:
+        thr = s["all"]["throughputRps"]
+        bar = "#" * round(30 * thr / max_rate)
+        lat = "*" * max(1, round(20 * s["all"]["p95Ms"] / max_p95))
+        mark = "  <- " + s["saturated"] if s["saturated"] else ""
+        print(f"{s['rate']:>7g} -> {thr:>7.1f} {bar:<30} | {s['all']['p95Ms']:>8.0f} ms {lat}{mark}")
+
+
+def server_stats(base_url):
+    """The server's in-process counters from /api/_stats, or None where it has none."""
+    try:
+        with urllib.request.urlopen(base_url + "/api/_stats", timeout=5) as resp:
+            return json.loads(resp.read())
+    except (urllib.error.URLError, socket.timeout, TimeoutError, ValueError):
+        return None
+
+
+def print_coalescing(stats):
+    print("\nCoalescing (server counters)")
+    print("  " + " ".join(["provider".ljust(9), "leaders".rjust(8), "followers".rjust(10), "timeouts".rjust(9)]))
+    for name, c in sorted(stats.items()):
+        print("  " + " ".join([name.ljust(9), str(c["leaders"]).rjust(8), str(c["followers"]).rjust(10),
+                               str(c["followerTimeouts"]).rjust(9)]))
+
+
+# ================= Local server =================
+
+def start_local_server(args):
+    cmd = shlex.split(args.server_cmd) + shlex.split(args.server_args)
+    log = tempfile.NamedTemporaryFile(prefix="serve-local-", suffix=".log", delete=False)
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.PIPE, stderr=log, text=True)
+    deadline = time.time() + 60
+    url = None
+    while time.time() < deadline:
+        line = proc.stdout.readline()
+        if not line:
+            break
+        if line.startswith("READY "):
+            url = line.split()[1]
+            break
+    if not url:
+        proc.kill()
+        raise SystemExit(f"local server did not start; see {log.name}")
+
+    # Keep draining handler logs so the pipe never fills up and blocks the server
+    def drain():
+        for line in proc.stdout:
+            log.write(line.encode())
+        log.flush()
+    threading.Thread(target=drain, daemon=True).start()
+    print(f"local server {url} (logs: {log.name})")
+    return proc, url
+
+
+# ================= Main =================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rates", default="5,10,20,40,80", help="offered req/s per step, comma separated")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    parser.add_argument("--mix", default="pricing=6,lp=2,ln=2", help="endpoint weights")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--workers", type=int, default=512, help="max concurrent client requests")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--lp-mode", default="api", choices=["api", "bql"])
+    parser.add_argument("--ln-mode", default="api", choices=["api", "bql"])
+    parser.add_argument("--no-cache", action="store_true", help="send Cache-Control: no-cache (skip the quote cache)")
+    parser.add_argument("--duplicates", type=float, default=0.0,
+                        help="fraction of requests repeating the endpoint's previous scenario")
+    parser.add_argument("--base-url", help="target a running server instead of starting serve-local.ts")
+    parser.add_argument("--server-cmd", default="npx --yes tsx@4.21.0 scripts/serve-local.ts")
+    parser.add_argument("--server-args", default="", help="extra serve-local.ts flags, e.g. latencies")
+    parser.add_argument("--json", help="write the full report here")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    rates = [float(r) for r in args.rates.split(",")]
+    total_weight = sum(mix.values())
+
+    proc = None
+    base_url = args.base_url
+    if not base_url:
+        proc, base_url = start_local_server(args)
+
+    steps = []
+    stats = None
+    try:
+        baseline_p95 = None
+        for i, rate in enumerate(rates):
+            samples, elapsed, lag = run_step(args, base_url.rstrip("/"), rate, mix, args.seed * 1000 + i)
+            step = {
+                "rate": rate,
+                "elapsedS": round(elapsed, 2),
+                "clientLagMs": round(lag * 1000, 1),
+                "endpoints": {
+                    name: summarize([s for s in samples if s.endpoint == name], elapsed,
+                              rate * mix[name] / total_weight, args.duration)
+                    for name in mix
+                },
+                "all": summarize(samples, elapsed, rate, args.duration),
+            }
+            if baseline_p95 is None:
+                baseline_p95 = step["all"]["p95Ms"]
+            step["saturated"] = saturation_reason(step, baseline_p95)
+            steps.append(step)
+            print_step(step)
+        stats = server_stats(base_url.rstrip("/"))
+    finally:
+        if proc:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    print_curve(steps)
+    if stats and stats.get("coalesce"):
+        print_coalescing(stats["coalesce"])
+    knee = next((s for s in steps if s["saturated"]), None)
+    if knee:
+        print(f"\nSaturates at ~{knee['rate']:g} req/s offered ({knee['saturated']})")
+    else:
+        print(f"\nNo saturation up to {rates[-1]:g} req/s offered")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "steps": steps, "saturatesAt": knee["rate"] if knee else None,
+                       "serverStats": stats}, f, indent=2)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+/**
+ * replay-adjustments.ts
+ *
+ * Offline comparison of get-pricing's two adjustment formats over the QuickPricer
+ * fixture corpus:
+ *   inline  every rate option repeats its LLPA template's adjustment array (default)
+ *   table   ?adjustments=table: one data.adjustmentTable keyed by template ID, rate
+ *           options carry adjustmentsRef
+ * For each fixture it reports response bytes (JSON and brotli), JSON.parse p50 and the
+ * heap the parsed client-side result retains (measured in a child with --expose-gc;
+ * for table that is after PricingLogic.expandAdjustmentTable, i.e. what the UI holds),
+ * and checks that the expanded table result carries exactly the inline adjustments.
+ *
+ * Usage:
+ *   npm run replay:adjustments -- [--fixture large-dscr-investment] [--iterations 20] [--json report.json]
+ */
+
+import { fork } from 'node:child_process'
+import { mkdtempSync, readFileSync, rmSync, writeFileSync } from 'node:fs'
+import { tmpdir } from 'node:os'
+import { join, dirname } from 'node:path'
+import { fileURLToPath } from 'node:url'
+import { performance } from 'node:perf_hooks'
+import { brotliCompressSync, constants as zlibConstants } from 'node:zlib'
+import { loadFixtureCorpus, scenarioToRequestBody } from './fixtures/quickpricer.ts'
+import { startMeridianLinkStub } from './stubs/meridianlink.ts'
+import { invokeHandler } from './lib/vercel.ts'
+import { argValue } from './lib/cli.ts'
+
+const ROOT = join(dirname(fileURLToPath(import.meta.url)), '..')
+const FORMATS = ['inline', 'table'] as const
+type Format = typeof FORMATS[number]
+
+interface FormatReport {
+  jsonBytes: number
+  brBytes: number
+  parseP50Ms: number
+  heapMB: number | null
+  tableEntries: number
+}
+
+const mb = (bytes: number) => Math.round((bytes / 1024 / 1024) * 100) / 100
+
+function parseP50(text: string, iterations: number): number {
+  const times: number[] = []
+  for (let i = 0; i < iterations; i++) {
+    const start = performance.now()
+    JSON.parse(text)
+    times.push(performance.now() - start)
+  }
+  times.sort((a, b) => a - b)
+  return Math.round(times[Math.floor(times.length / 2)] * 100) / 100
+}
+
+// ============================================================================
+// CHILD: heap retained by the parsed (and, for table, expanded) result
+// ============================================================================
+
+async function measureHeapChild(bodyPath: string, format: Format): Promise<void> {
+  const { expandAdjustmentTable } = await import('../src/lib/PricingLogic.ts')
+  const text = readFileSync(bodyPath, 'utf8')
+  const gc = (globalThis as { gc?: () => void }).gc
+  gc?.(); gc?.()
+  const before = process.memoryUsage().heapUsed
+  const parsed = JSON.parse(text)
+  const held = format === 'table' ? expandAdjustmentTable(parsed.data) : parsed.data
+  gc?.(); gc?.()
+  const after = process.memoryUsage().heapUsed
+  if (!held) throw new Error('nothing parsed')
+  process.send?.(mb(after - before))
+}
+
+function measureHeap(body: string, format: Format): Promise<number | null> {
+  const dir = mkdtempSync(join(tmpdir(), 'adj-replay-'))
+  const bodyPath = join(dir, 'body.json')
+  writeFileSync(bodyPath, body)
+  return new Promise(resolve => {
+    const child = fork(fileURLToPath(import.meta.url), ['--measure-heap', bodyPath, '--format', format], {
+      execArgv: [...process.execArgv, '--expose-gc'],
+      stdio: ['ignore', 'inherit', 'inherit', 'ipc'],
+    })
+    let heap: number | null = null
+    child.on('message', msg => { heap = msg as number })
+    child.on('exit', () => {
+      rmSync(dir, { recursive: true, force: true })
+      resolve(heap)
+    })
+  })
+}
+
+// ============================================================================
+// MAIN
+// ============================================================================
+
+// Per-rate-option adjustments, in order, as the UI sees them
+function adjustmentsOf(data: any): string {
+  return JSON.stringify((data.programs || []).map((p: any) => (p.rateOptions || []).map((o: any) => o.adjustments || [])))
+}
+
+async function main(): Promise<void> {
+  const iterations = Number(argValue('--iterations')) || 20
+  const only = argValue('--fixture')?.split(',')
+  const jsonOut = argValue('--json')
+
+  const stub = await startMeridianLinkStub()
+  process.env.MERIDIANLINK_PRICER_URL = stub.pricerUrl
+  process.env.MERIDIANLINK_OAUTH_URL = stub.oauthUrl
+  process.env.MERIDIANLINK_CLIENT_ID ||= 'replay-client'
+  process.env.MERIDIANLINK_CLIENT_SECRET ||= 'replay-secret'
+  delete process.env.QUOTE_CACHE_REDIS_URL
+  delete process.env.PRICING_VERBOSITY
+
+  const { default: handler } = await import('../api/get-pricing.ts')
+  const { expandAdjustmentTable } = await import('../src/lib/PricingLogic.ts')
+
+  const reports: { fixture: string; rateOptions: number; inline: FormatReport; table: FormatReport; match: boolean }[] = []
+  for (const fixture of loadFixtureCorpus(join(ROOT, 'fixtures', 'quickpricer'), only)) {
+    stub.setFixture(fixture.soap)
+    const body = scenarioToRequestBody(fixture.scenario)
+    const texts = {} as Record<Format, string>
+    const formats = {} as Record<Format, FormatReport>
+    for (const format of FORMATS) {
+      const response = await invokeHandler(handler, { body, query: { verbosity: 'minimal', adjustments: format }, headers: { 'Cache-Control': 'no-cache' } })
+      const text = response.text
+      texts[format] = text
+      formats[format] = {
+        jsonBytes: Buffer.byteLength(text),
+        brBytes: brotliCompressSync(text, { params: { [zlibConstants.BROTLI_PARAM_QUALITY]: 4 } }).length,
+        parseP50Ms: parseP50(text, iterations),
+        heapMB: await measureHeap(text, format),
+        tableEntries: Object.keys(JSON.parse(text).data?.adjustmentTable || {}).length,
+      }
+    }
+    const inline = JSON.parse(texts.inline)
+    const table = JSON.parse(texts.table)
+    const match = inline.success === table.success && (!inline.data || adjustmentsOf(inline.data) === adjustmentsOf(expandAdjustmentTable(table.data)))
+    const rateOptions = (inline.data?.programs || []).reduce((n: number, p: any) => n + (p.rateOptions?.length || 0), 0)
+    reports.push({ fixture: fixture.name, rateOptions, inline: formats.inline, table: formats.table, match })
+  }
+  await stub.close()
+
+  const pct = (a: number, b: number) => `-${(100 * (1 - b / a)).toFixed(1)}%`
+  console.log(`\nMeridianLink adjustments: inline vs ?adjustments=table (verbosity=minimal, parse p50 of ${iterations})`)
+  console.log('='.repeat(148))
+  console.log(['fixture'.padEnd(24), 'rates'.padStart(6), 'templates'.padStart(10), 'inline B'.padStart(10), 'table B'.padStart(9), 'json'.padStart(8),
+    'inline br'.padStart(10), 'table br'.padStart(9), 'parse in'.padStart(9), 'parse tbl'.padStart(10), 'heap in MB'.padStart(11),
+    'heap tbl MB'.padStart(12), 'heap'.padStart(8), 'match'.padStart(6)].join(' '))
+  for (const r of reports) {
+    const heap = r.inline.heapMB && r.table.heapMB !== null ? pct(r.inline.heapMB, r.table.heapMB) : '-'
+    console.log([r.fixture.padEnd(24), String(r.rateOptions).padStart(6), String(r.table.tableEntries).padStart(10),
+      String(r.inline.jsonBytes).padStart(10), String(r.table.jsonBytes).padStart(9), pct(r.inline.jsonBytes, r.table.jsonBytes).padStart(8),
+      String(r.inline.brBytes).padStart(10), String(r.table.brBytes).padStart(9),
+      r.inline.parseP50Ms.toFixed(2).padStart(9), r.table.parseP50Ms.toFixed(2).padStart(10),
+      String(r.inline.heapMB ?? '-').padStart(11), String(r.table.heapMB ?? '-').padStart(12), heap.padStart(8),
+      (r.match ? 'ok' : 'DIFF').padStart(6)].join(' '))
+  }
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ iterations, reports }, null, 2) + '\n')
+
+  const failed = reports.filter(r => !r.match)
+  if (failed.length > 0) console.error(`\nExpanded table adjustments differ from inline for: ${failed.map(r => r.fixture).join(', ')}`)
+  process.exit(failed.length > 0 ? 1 : 0)
+}
+
+if (process.argv.includes('--measure-heap')) {
+  measureHeapChild(argValue('--measure-heap') as string, argValue('--format') as Format).then(() => process.exit(0))
+} else {
+  main().catch(err => {
+    console.error(err)
+    process.exit(1)
+  })
+}
@@ -0,0 +1,154 @@
+/**
+ * replay-columnar.ts
+ *
+ * Offline comparison of get-pricing's two rate-option encodings over the QuickPricer
+ * fixtures with 500+ rate options:
+ *   rows      every rate option is an object repeating its field names (default)
+ *   columnar  ?encoding=columnar: parallel columns per program, strings dictionary-encoded
+ * Both are requested as the UI does (verbosity=minimal, adjustments=table). For each
+ * fixture it reports response bytes (JSON and brotli) and time-to-render p50: JSON.parse
+ * plus what the results view computes from the programs (filterRateOptionsByPrice and
+ * sortRateOptions per program, getTargetPricing, row objects for the options shown),
+ * on row objects for rows and on the decoded typed-array columns for columnar.
+ *
+ * Checks that decoded columns give back exactly the rows response's rate options, that
+ * both encodings render the same options and target, and that ?fields= projection
+ * reaches the columns.
+ *
+ * Usage:
+ *   npm run replay:columnar -- [--fixture xl-dscr-cashout] [--min-options 500] [--iterations 20] [--json report.json]
+ */
+
+import { writeFileSync } from 'node:fs'
+import { join, dirname } from 'node:path'
+import { fileURLToPath } from 'node:url'
+import { performance } from 'node:perf_hooks'
+import { brotliCompressSync, constants as zlibConstants } from 'node:zlib'
+import { loadFixtureCorpus, scenarioToRequestBody } from './fixtures/quickpricer.ts'
+import { startMeridianLinkStub } from './stubs/meridianlink.ts'
+import { invokeHandler } from './lib/vercel.ts'
+import { argValue } from './lib/cli.ts'
+
+const ROOT = join(dirname(fileURLToPath(import.meta.url)), '..')
+const ENCODINGS = ['rows', 'columnar'] as const
+type Encoding = typeof ENCODINGS[number]
+
+interface EncodingReport {
+  jsonBytes: number
+  brBytes: number
+  renderP50Ms: number
+}
+
+// p50 after a few warm-up runs, so both encodings are timed with their code paths compiled
+function p50(iterations: number, fn: () => void): number {
+  for (let i = 0; i < 3; i++) fn()
+  const times: number[] = []
+  for (let i = 0; i < iterations; i++) {
+    const start = performance.now()
+    fn()
+    times.push(performance.now() - start)
+  }
+  times.sort((a, b) => a - b)
+  return Math.round(times[Math.floor(times.length / 2)] * 100) / 100
+}
+
+async function main(): Promise<void> {
+  const iterations = Number(argValue('--iterations')) || 20
+  const minOptions = Number(argValue('--min-options') ?? 500)
+  const only = argValue('--fixture')?.split(',')
+  const jsonOut = argValue('--json')
+
+  const stub = await startMeridianLinkStub()
+  process.env.MERIDIANLINK_PRICER_URL = stub.pricerUrl
+  process.env.MERIDIANLINK_OAUTH_URL = stub.oauthUrl
+  process.env.MERIDIANLINK_CLIENT_ID ||= 'replay-client'
+  process.env.MERIDIANLINK_CLIENT_SECRET ||= 'replay-secret'
+  delete process.env.QUOTE_CACHE_REDIS_URL
+  delete process.env.PRICING_VERBOSITY
+
+  const { default: handler } = await import('../api/get-pricing.ts')
+  const { canonicalJson } = await import('../api/_lib/quote-cache.ts')
+  const { decodeColumnarRateOptions, filterRateOptionsByPrice, getTargetPricing, sortRateOptions } = await import('../src/lib/PricingLogic.ts')
+
+  // What the results view computes from a get-pricing body
+  const render = (text: string, encoding: Encoding, occupancy: string) => {
+    const data = JSON.parse(text).data
+    const programs = encoding === 'rows'
+      ? data.programs
+      : data.programs.map((p: any) => ({ ...p, rateOptions: decodeColumnarRateOptions(p.rateOptions) }))
+    const shown = programs.map((p: any) => {
+      const options = sortRateOptions(filterRateOptionsByPrice(p.rateOptions), 'price')
+      return encoding === 'rows' ? options : options.toArray()
+    })
+    const target = getTargetPricing(programs, occupancy, '5year', data.adjustmentTable, data.pppIndex)
+    return { shown, target }
+  }
+
+  const fetchBody = async (body: Record<string, unknown>, encoding: Encoding, fields?: string) => {
+    const query: Record<string, string> = { verbosity: 'minimal', adjustments: 'table', encoding }
+    if (fields) query.fields = fields
+    return (await invokeHandler(handler, { body, query, headers: { 'Cache-Control': 'no-cache' } })).text
+  }
+
+  const reports: { fixture: string; rateOptions: number; rows: EncodingReport; columnar: EncodingReport; checks: Record<string, boolean> }[] = []
+  for (const fixture of loadFixtureCorpus(join(ROOT, 'fixtures', 'quickpricer'), only)) {
+    stub.setFixture(fixture.soap)
+    const body = scenarioToRequestBody(fixture.scenario)
+    const occupancy = String(body.occupancyType)
+    const texts = {} as Record<Encoding, string>
+    for (const encoding of ENCODINGS) texts[encoding] = await fetchBody(body, encoding)
+
+    const rows = JSON.parse(texts.rows)
+    const rateOptions = (rows.data?.programs || []).reduce((n: number, p: any) => n + (p.rateOptions?.length || 0), 0)
+    if (rateOptions < minOptions) continue
+
+    const encodings = {} as Record<Encoding, EncodingReport>
+    for (const encoding of ENCODINGS) {
+      const text = texts[encoding]
+      encodings[encoding] = {
+        jsonBytes: Buffer.byteLength(text),
+        brBytes: brotliCompressSync(text, { params: { [zlibConstants.BROTLI_PARAM_QUALITY]: 4 } }).length,
+        renderP50Ms: p50(iterations, () => render(text, encoding, occupancy)),
+      }
+    }
+
+    const columnar = JSON.parse(texts.columnar)
+    const checks: Record<string, boolean> = {}
+    checks.decoded = columnar.encoding === 'columnar' && rows.data.programs.every((p: any, i: number) =>
+      canonicalJson(p.rateOptions) === canonicalJson(decodeColumnarRateOptions(columnar.data.programs[i].rateOptions)?.toArray()))
+    checks.render = canonicalJson(render(texts.rows, 'rows', occupancy)) === canonicalJson(render(texts.columnar, 'columnar', occupancy))
+    const fields = 'programs.name,programs.rateOptions.rate,programs.rateOptions.points'
+    const projected = { rows: JSON.parse(await fetchBody(body, 'rows', fields)), columnar: JSON.parse(await fetchBody(body, 'columnar', fields)) }
+    checks.fields = projected.rows.data.programs.every((p: any, i: number) =>
+      canonicalJson(p.rateOptions) === canonicalJson(decodeColumnarRateOptions(projected.columnar.data.programs[i].rateOptions)?.toArray()))
+
+    reports.push({ fixture: fixture.name, rateOptions, rows: encodings.rows, columnar: encodings.columnar, checks })
+  }
+  await stub.close()
+
+  const pct = (a: number, b: number) => `${b <= a ? '-' : '+'}${Math.abs(100 * (1 - b / a)).toFixed(1)}%`
+  console.log(`\nMeridianLink rate options: rows vs ?encoding=columnar (verbosity=minimal, adjustments=table, render p50 of ${iterations})`)
+  console.log('='.repeat(132))
+  console.log(['fixture'.padEnd(24), 'rates'.padStart(6), 'rows B'.padStart(10), 'col B'.padStart(9), 'json'.padStart(8),
+    'rows br'.padStart(9), 'col br'.padStart(8), 'br'.padStart(8), 'render rows'.padStart(12), 'render col'.padStart(11), 'render'.padStart(8),
+    'decoded'.padStart(8), 'render'.padStart(7), 'fields'.padStart(7)].join(' '))
+  for (const r of reports) {
+    console.log([r.fixture.padEnd(24), String(r.rateOptions).padStart(6),
+      String(r.rows.jsonBytes).padStart(10), String(r.columnar.jsonBytes).padStart(9), pct(r.rows.jsonBytes, r.columnar.jsonBytes).padStart(8),
+      String(r.rows.brBytes).padStart(9), String(r.columnar.brBytes).padStart(8), pct(r.rows.brBytes, r.columnar.brBytes).padStart(8),
+      r.rows.renderP50Ms.toFixed(2).padStart(12), r.columnar.renderP50Ms.toFixed(2).padStart(11), pct(r.rows.renderP50Ms, r.columnar.renderP50Ms).padStart(8),
+      (r.checks.decoded ? 'ok' : 'DIFF').padStart(8), (r.checks.render ? 'ok' : 'DIFF').padStart(7), (r.checks.fields ? 'ok' : 'DIFF').padStart(7)].join(' '))
+  }
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ iterations, minOptions, reports }, null, 2) + '\n')
+
+  const failed = reports.flatMap(r => Object.entries(r.checks).filter(([, ok]) => !ok).map(([name]) => `${name} @ ${r.fixture}`))
+  if (reports.length === 0) console.error(`\nNo fixture has ${minOptions}+ rate options`)
+  if (failed.length > 0) console.error(`\nColumnar encoding check failed: ${failed.join(', ')}`)
+  process.exit(failed.length > 0 || reports.length === 0 ? 1 : 0)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
@@ -0,0 +1,165 @@
+/**
+ * replay-keepalive.ts
+ *
+ * Offline comparison of MeridianLink calls with and without the keep-alive pool in
+ * api/_lib/http-pool.ts. The MeridianLink stand-in serves HTTPS with a throwaway
+ * self-signed certificate (generated with openssl; plain HTTP when openssl is missing)
+ * and gzips the SOAP body when asked. For each mode the same sequence of uncached
+ * /api/get-pricing requests runs sequentially, then in small concurrent bursts, and the
+ * report shows connections and TLS handshakes the stand-in saw, the client's reuse
+ * counters, bytes on the wire and p50/p95 latency.
+ *
+ * It also checks that a gzipped body cut off halfway fails the read instead of hanging
+ * it: a connection reset mid-body, and a body that stalls until the request deadline
+ * (which must surface as that deadline's TimeoutError).
+ *
+ * Loopback has no round-trip time, so the latency gap here understates a real lambda's:
+ * each avoided handshake saves one TCP and one or two TLS round trips to MeridianLink.
+ *
+ * Usage:
+ *   npm run replay:keepalive -- [--requests 100] [--concurrency 4] [--ml-latency-ms 20]
+ *       [--fixture medium-bankstmt-second] [--json report.json]
+ */
+
+import { execFileSync } from 'node:child_process'
+import { mkdtempSync, readFileSync, rmSync, writeFileSync } from 'node:fs'
+import { tmpdir } from 'node:os'
+import { join, dirname } from 'node:path'
+import { fileURLToPath } from 'node:url'
+import { performance } from 'node:perf_hooks'
+import { loadFixtureCorpus, scenarioToRequestBody } from './fixtures/quickpricer.ts'
+import { startMeridianLinkStub } from './stubs/meridianlink.ts'
+import { invokeHandler } from './lib/vercel.ts'
+import { argValue, percentile } from './lib/cli.ts'
+
+const ROOT = join(dirname(fileURLToPath(import.meta.url)), '..')
+
+interface ModeReport {
+  mode: string
+  requests: number
+  connections: number
+  tlsHandshakes: number
+  reusedSockets: number
+  bytesServed: number
+  p50Ms: number
+  p95Ms: number
+  failures: number
+}
+
+// A self-signed localhost certificate, or null when openssl is not available
+function selfSignedCert(): { key: string; cert: string } | null {
+  const dir = mkdtempSync(join(tmpdir(), 'ml-tls-'))
+  try {
+    execFileSync('openssl', ['req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+      '-keyout', join(dir, 'key.pem'), '-out', join(dir, 'cert.pem')], { stdio: 'ignore' })
+    return { key: readFileSync(join(dir, 'key.pem'), 'utf8'), cert: readFileSync(join(dir, 'cert.pem'), 'utf8') }
+  } catch {
+    return null
+  } finally {
+    rmSync(dir, { recursive: true, force: true })
+  }
+}
+
+async function main(): Promise<void> {
+  const requests = Number(argValue('--requests') ?? 100)
+  const concurrency = Number(argValue('--concurrency') ?? 4)
+  const mlLatencyMs = Number(argValue('--ml-latency-ms') ?? 20)
+  const fixtureName = argValue('--fixture') ?? 'medium-bankstmt-second'
+  const jsonOut = argValue('--json')
+
+  const tls = selfSignedCert()
+  if (!tls) console.warn('openssl not found: comparing over plain HTTP (no TLS handshakes)')
+  // The stand-in's certificate is self-signed
+  if (tls) process.env.NODE_TLS_REJECT_UNAUTHORIZED = '0'
+
+  const stub = await startMeridianLinkStub({ pricerLatencyMs: mlLatencyMs, tls: tls ?? undefined })
+  process.env.MERIDIANLINK_PRICER_URL = stub.pricerUrl
+  process.env.MERIDIANLINK_OAUTH_URL = stub.oauthUrl
+  process.env.MERIDIANLINK_CLIENT_ID ||= 'replay-client'
+  process.env.MERIDIANLINK_CLIENT_SECRET ||= 'replay-secret'
+  delete process.env.MERIDIANLINK_TOKEN_REDIS_URL
+  delete process.env.QUOTE_CACHE_REDIS_URL
+
+  const { poolStats, pooledFetch, resetPools } = await import('../api/_lib/http-pool.ts')
+  const { default: handler } = await import('../api/get-pricing.ts')
+  const [fixture] = loadFixtureCorpus(join(ROOT, 'fixtures', 'quickpricer'), [fixtureName])
+  stub.setFixture(fixture.soap)
+  const body = scenarioToRequestBody(fixture.scenario)
+
+  const reports: ModeReport[] = []
+  for (const keepAlive of [false, true]) {
+    process.env.MERIDIANLINK_KEEPALIVE = keepAlive ? '1' : '0'
+    resetPools()
+    for (const key of Object.keys(poolStats)) delete poolStats[key]
+    const before = { ...stub.stats }
+    const times: number[] = []
+    let failures = 0
+
+    const price = async () => {
+      const start = performance.now()
+      const result = await invokeHandler(handler, { body, headers: { 'Cache-Control': 'no-cache' } })
+      times.push(performance.now() - start)
+      if (result.body?.success !== true) failures++
+    }
+    for (let i = 0; i < requests / 2; i++) await price()
+    for (let i = 0; i < requests / 2; i += concurrency) await Promise.all(Array.from({ length: concurrency }, price))
+
+    times.sort((a, b) => a - b)
+    const reused = Object.values(poolStats).reduce((sum, s) => sum + s.reusedSockets, 0)
+    reports.push({
+      mode: keepAlive ? 'keep-alive' : 'no keep-alive',
+      requests: times.length,
+      connections: stub.stats.connections - before.connections,
+      tlsHandshakes: stub.stats.tlsHandshakes - before.tlsHandshakes,
+      reusedSockets: reused,
+      bytesServed: stub.stats.bytesServed - before.bytesServed,
+      p50Ms: Math.round(percentile(times, 50) * 10) / 10,
+      p95Ms: Math.round(percentile(times, 95) * 10) / 10,
+      failures,
+    })
+  }
+  // Truncated gzipped bodies: the read must end in an error, well before the guard
+  stub.setFault(soap => soap.includes('replay-reset') ? { truncate: 'reset' } : soap.includes('replay-stall') ? { truncate: 'stall' } : null)
+  const truncatedRead = async (marker: string) => {
+    const guard = new Promise<string>(resolve => setTimeout(() => resolve('hung'), 5000).unref())
+    const read = pooledFetch(stub.pricerUrl, {
+      method: 'POST',
+      headers: { 'Content-Type': 'text/xml; charset=utf-8' },
+      body: `<RunQuickPricerV2>Bearer stub-token-0 ${marker}</RunQuickPricerV2>`,
+      signal: AbortSignal.timeout(1000),
+    }).then(response => response.text()).then(() => 'completed', (err: Error) => err.name)
+    return Promise.race([read, guard])
+  }
+  const reset = await truncatedRead('replay-reset')
+  const stall = await truncatedRead('replay-stall')
+  stub.setFault(null)
+  const truncationOk = reset !== 'hung' && reset !== 'completed' && stall === 'TimeoutError'
+
+  resetPools()
+  await stub.close()
+
+  console.log(`\nMeridianLink connections (${tls ? 'HTTPS' : 'HTTP'} stand-in, ${mlLatencyMs}ms pricer latency, ${fixtureName}, ` +
+    `${fixture.soap.length} SOAP bytes uncompressed)`)
+  console.log('='.repeat(100))
+  console.log(['mode'.padEnd(14), 'requests'.padStart(9), 'connections'.padStart(12), 'handshakes'.padStart(11), 'reused'.padStart(8),
+    'bytes'.padStart(10), 'p50 ms'.padStart(8), 'p95 ms'.padStart(8), 'failed'.padStart(7)].join(' '))
+  for (const r of reports) {
+    console.log([r.mode.padEnd(14), String(r.requests).padStart(9), String(r.connections).padStart(12), String(r.tlsHandshakes).padStart(11),
+      String(r.reusedSockets).padStart(8), String(r.bytesServed).padStart(10), r.p50Ms.toFixed(1).padStart(8), r.p95Ms.toFixed(1).padStart(8),
+      String(r.failures).padStart(7)].join(' '))
+  }
+
+  console.log(`\ntruncated gzip body: reset mid-body -> ${reset}, stalled past the deadline -> ${stall} (${truncationOk ? 'ok' : 'DIFF'})`)
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ tls: !!tls, mlLatencyMs, fixture: fixtureName, reports, truncationOk }, null, 2) + '\n')
+
+  const [fresh, pooled] = reports
+  const ok = fresh.failures === 0 && pooled.failures === 0 && pooled.connections < fresh.connections && truncationOk
+  if (!ok) console.error('\nKeep-alive check failed: the pool did not reduce connections, requests failed, or a truncated body hung')
+  process.exit(ok ? 0 : 1)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
@@ -0,0 +1,356 @@
+/**
+ * replay-lenderprice.ts
+ *
+ * Offline replay of api/get-lp-pricing.ts against the local LenderPrice / Browserless
+ * stand-ins. For every fixture it reports:
+ *   - end-to-end handler latency (p50/p95) in api mode (direct pricing/search JSON)
+ *     and the time spent flattening the result tree
+ *   - the Browserless scrape path for the same response: handler latency against the
+ *     stand-in plus the fixed sleeps the evaluate script imposes before it can return
+ *   - that the search payload built from mapFormValues carries the scenario, that every
+ *     row the scrape sees is also produced by the API parse, and that a failing search
+ *     or a form value with no API mapping falls back to the scrape
+ *   - with the Flex page pool on (LP_PAGE_POOL_SIZE=1): the cold scrape that opens a
+ *     page, the warm scrape that reuses it (no navigation, --navigation-ms in the
+ *     stand-in), that a page Browserless has closed falls back to a cold scrape, and
+ *     that two cold scrapes racing for one free slot keep only one browser open
+ *   - lock period / prepay variants (30 and 45 days x 36 and 60 months): each priced in
+ *     its own scrape session against all four in one page (--research-ms per re-search
+ *     in the stand-in), the incremental cost of each further variant, that the keyed
+ *     results match the separate sessions', and that a scrape budget too short for the
+ *     re-searches (LP_SCRAPE_TIMEOUT_MS) still returns the first variant with the rest
+ *     marked scrape_budget_exhausted
+ *   - rates from the captured pricing/search response (BROWSERLESS_CAPTURE=network)
+ *     against the results table scrape (=dom): rows returned next to the API's, the
+ *     extraction time after results render (in-page reads plus the server parse, from
+ *     Server-Timing) and the bytes the Browserless answer carried
+ *
+ * Usage:
+ *   npm run replay:lenderprice -- [--fixture a,b] [--iterations 20] [--search-latency-ms 0]
+ *                                 [--navigation-ms 500] [--research-ms 100] [--simulate-scrape-sleeps]
+ *                                 [--json report.json]
+ */
+
+import { writeFileSync } from 'node:fs'
+import { join, dirname } from 'node:path'
+import { fileURLToPath } from 'node:url'
+import { performance } from 'node:perf_hooks'
+import { loadFixtureCorpus, type LenderPriceFixture } from './fixtures/lenderprice.ts'
+import { scenarioToRequestBody } from './fixtures/quickpricer.ts'
+import { startLenderPriceStub } from './stubs/lenderprice.ts'
+import { invokeHandler } from './lib/vercel.ts'
+import { argValue, percentile } from './lib/cli.ts'
+
+const ROOT = join(dirname(fileURLToPath(import.meta.url)), '..')
+const CAPTURED_DIR = join(ROOT, 'fixtures', 'lenderprice')
+
+const INCOME_DOC: Record<string, string> = { fullDoc: 'Full Doc', bankStatement: '24 Mo Personal Bank Statements', dscr: 'DSCR' }
+
+interface FixtureReport {
+  fixture: string
+  bytes: number
+  rateOptions: number
+  apiP50Ms: number
+  apiP95Ms: number
+  treeParseMs: number
+  bqlMs: number
+  bqlSleepFloorMs: number
+  speedup: number
+  coldPageMs: number
+  warmPageMs: number
+  pagesOk: boolean
+  separateSessionsMs: number
+  onePageMs: number
+  incrementalMs: number
+  variantsOk: boolean
+  domRows: number
+  networkRows: number
+  domExtractMs: number
+  networkExtractMs: number
+  domBytes: number
+  networkBytes: number
+  captureOk: boolean
+  payloadMatch: boolean
+  scrapeSubset: boolean
+  fallbackOk: boolean
+}
+
+// ============================================================================
+// CLI
+// ============================================================================
+
+const round2 = (n: number) => Math.round(n * 100) / 100
+
+// Every row the scrape returns must be one the API parse also produced
+function isSubset(scraped: any[], api: any[]): boolean {
+  const counts = new Map<string, number>()
+  for (const row of api) {
+    const key = JSON.stringify(row)
+    counts.set(key, (counts.get(key) || 0) + 1)
+  }
+  return scraped.every(row => {
+    const key = JSON.stringify(row)
+    const n = counts.get(key) || 0
+    counts.set(key, n - 1)
+    return n > 0
+  })
+}
+
+// Summed dur of the named Server-Timing entries
+function serverTimingMs(header: string | undefined, names: string[]): number {
+  let total = 0
+  for (const entry of String(header || '').split(',')) {
+    const [name, dur] = entry.trim().split(';dur=')
+    if (names.includes(name)) total += Number(dur) || 0
+  }
+  return total
+}
+
+// ============================================================================
+// MAIN
+// ============================================================================
+
+async function main(): Promise<void> {
+  const iterations = Number(argValue('--iterations')) || 20
+  const only = argValue('--fixture')?.split(',')
+  const jsonOut = argValue('--json')
+
+  const stub = await startLenderPriceStub({
+    searchLatencyMs: Number(argValue('--search-latency-ms') ?? 0),
+    simulateScrapeSleeps: process.argv.includes('--simulate-scrape-sleeps'),
+    navigationMs: Number(argValue('--navigation-ms') ?? 500),
+    researchMs: Number(argValue('--research-ms') ?? 100),
+  })
+  process.env.LP_API_URL = stub.apiUrl
+  process.env.BROWSERLESS_URL = stub.browserlessUrl
+  process.env.BROWSERLESS_TOKEN ||= 'replay-token'
+
+  // Import after the env is pointed at the stand-ins (URLs are read at module load)
+  const { default: handler } = await import('../api/get-lp-pricing.ts')
+  const { parseSearchResponse, clearLockDaysCache } = await import('../api/_lib/lenderprice.ts')
+  const { clearPagePool } = await import('../api/_lib/lp-page-pool.ts')
+
+  const corpus: LenderPriceFixture[] = loadFixtureCorpus(CAPTURED_DIR, only)
+  const reports: FixtureReport[] = []
+  const quiet = { log: console.log, warn: console.warn }
+
+  for (const fixture of corpus) {
+    stub.setFixture(fixture.response)
+    clearLockDaysCache()
+    const body = scenarioToRequestBody(fixture.scenario)
+    // The handler logs mapped values on every call; keep the table readable
+    console.log = () => {}
+    console.warn = () => {}
+
+    const timings: number[] = []
+    let api: any = null
+    for (let i = 0; i <= iterations; i++) {
+      const start = performance.now()
+      const result = await invokeHandler(handler, { body, query: { mode: 'api' } })
+      if (i > 0) timings.push(performance.now() - start)
+      api = result.body
+    }
+    timings.sort((a, b) => a - b)
+
+    const responseJson = JSON.stringify(fixture.response)
+    const parseTimings: number[] = []
+    for (let i = 0; i < iterations; i++) {
+      const start = performance.now()
+      parseSearchResponse(JSON.parse(responseJson))
+      parseTimings.push(performance.now() - start)
+    }
+
+    const payload = stub.lastSearchPayload()
+    const s = fixture.scenario
+    const payloadMatch = !s || (
+      payload.criteria.loanAmount === s.loanAmount &&
+      payload.criteria.fico === s.fico &&
+      Math.abs(payload.criteria.ltv - s.ltv / 100) < 0.001 &&
+      payload.criteria.dscr === (s.docType === 'dscr' ? s.dscr : 0) &&
+      payload.dynamicPropertiesMap.IncomeDocType.value === INCOME_DOC[s.docType] &&
+      payload.dayLocksCriteria[0] === 30
+    )
+
+    const bqlStart = performance.now()
+    const bql = (await invokeHandler(handler, { body, query: { mode: 'bql' } })).body
+    const bqlMs = performance.now() - bqlStart
+
+    // Flex page pool: cold opens a page, warm reuses it, a closed page falls back cold
+    process.env.LP_PAGE_POOL_SIZE = '1'
+    clearPagePool()
+    const timedBql = async (request: any = body) => {
+      const start = performance.now()
+      const result = (await invokeHandler(handler, { body: request, query: { mode: 'bql' } })).body
+      return { result, ms: performance.now() - start }
+    }
+    const coldPage = await timedBql()
+    const warmPage = await timedBql()
+    stub.dropPages()
+    const closedPage = await timedBql()
+    // Room for one page: the second of two concurrent cold scrapes must not keep its browser
+    clearPagePool()
+    stub.dropPages()
+    // (an unused extra field keeps single-flight from merging them into one scrape)
+    await Promise.all([timedBql({ ...body, replayLane: 1 }), timedBql({ ...body, replayLane: 2 })])
+    const keptOne = stub.openPages() === 1
+    delete process.env.LP_PAGE_POOL_SIZE
+    clearPagePool()
+    stub.dropPages()
+    const pageOf = (r: any) => r?.data?.debug?.page
+    const pagesOk = pageOf(coldPage.result)?.warm === false && pageOf(warmPage.result)?.warm === true &&
+      pageOf(closedPage.result)?.warm === false && !!pageOf(closedPage.result)?.pageError &&
+      JSON.stringify(warmPage.result?.data?.rateOptions) === JSON.stringify(bql?.data?.rateOptions) && keptOne
+
+    stub.failSearch(503)
+    const fallback = (await invokeHandler(handler, { body, query: { mode: 'api' } })).body
+    stub.failSearch(null)
+    const unmapped = (await invokeHandler(handler, { body: { ...body, propertyType: 'coop' }, query: { mode: 'api' } })).body
+    const floor = stub.stats.scrapeSleepFloorMs
+
+    // Capture: the same bql scrape reading the table cells, then the captured response
+    const captureRun = async (mode: string) => {
+      process.env.BROWSERLESS_CAPTURE = mode
+      const bytesBefore = stub.stats.bytesServed
+      const result = await invokeHandler(handler, { body, query: { mode: 'bql' } })
+      const bytes = stub.stats.bytesServed - bytesBefore
+      delete process.env.BROWSERLESS_CAPTURE
+      // Everything after the results appear: settling and reading rows in the page, then the parse
+      const extractMs = serverTimingMs(result.headers['server-timing'], ['page.rows_settled', 'page.extracted', 'page.captured', 'parse'])
+      return { data: result.body?.data, bytes, extractMs }
+    }
+    const domCapture = await captureRun('dom')
+    const networkCapture = await captureRun('network')
+
+    // Variants: one scrape session each, then all of them in one page
+    const variants = [30, 45].flatMap(lockDays => ['36mo', '60mo'].map(prepayPeriod => ({ lockDays, prepayPeriod })))
+    const priceVariants = async (list: typeof variants, mode: string) => {
+      const start = performance.now()
+      const result = (await invokeHandler(handler, { body: { ...body, variants: list }, query: { mode } })).body
+      return { variants: result?.data?.variants || {}, ms: performance.now() - start }
+    }
+    const separate: Record<string, any> = {}
+    let separateSessionsMs = 0
+    for (const v of variants) {
+      const one = await priceVariants([v], 'bql')
+      Object.assign(separate, one.variants)
+      separateSessionsMs += one.ms
+    }
+    const coldBefore = stub.stats.coldScrapes
+    const onePage = await priceVariants(variants, 'bql')
+    const onePageScrapes = stub.stats.coldScrapes - coldBefore
+    const searchesBefore = stub.stats.searchCalls
+    const apiVariants = await priceVariants(variants, 'api')
+    const apiSearches = stub.stats.searchCalls - searchesBefore
+    const keys = Object.keys(onePage.variants)
+    const topPrice = (key: string) => onePage.variants[key]?.rateOptions?.[0]?.price
+    const variantsOk = keys.length === variants.length && onePageScrapes === 1 &&
+      keys.every(key => onePage.variants[key].totalRates > 0 && !onePage.variants[key].error &&
+        JSON.stringify(onePage.variants[key].rateOptions) === JSON.stringify(separate[key]?.rateOptions)) &&
+      // The stand-in prices a 45-day lock 0.125 lower
+      Math.abs(topPrice(keys[0]) - topPrice(keys[2]) - 0.125) < 1e-6 &&
+      Object.keys(apiVariants.variants).join() === keys.join() && apiSearches === variants.length
+
+    // A scrape budget with no room past the first variant: the rest come back marked,
+    // not as a failed request
+    process.env.LP_SCRAPE_TIMEOUT_MS = '9000'
+    const budgetCut = (await invokeHandler(handler, { body: { ...body, variants }, query: { mode: 'bql' } })).body
+    delete process.env.LP_SCRAPE_TIMEOUT_MS
+    const cutVariants = Object.values(budgetCut?.data?.variants || {}) as any[]
+    const budgetOk = budgetCut?.success === true && cutVariants.length === variants.length &&
+      cutVariants[0].totalRates > 0 && !cutVariants[0].error &&
+      cutVariants.slice(1).every(v => v.error === 'scrape_budget_exhausted' && v.totalRates === 0)
+    console.log = quiet.log
+    console.warn = quiet.warn
+
+    const apiRates = api?.data?.rateOptions || []
+    const domRates = domCapture.data?.rateOptions || []
+    const networkRates = networkCapture.data?.rateOptions || []
+    const bqlRates = bql?.data?.rateOptions || []
+    const apiP50 = percentile(timings, 50)
+    const simulated = process.argv.includes('--simulate-scrape-sleeps')
+    reports.push({
+      fixture: fixture.name,
+      bytes: Buffer.byteLength(responseJson),
+      rateOptions: apiRates.length,
+      apiP50Ms: round2(apiP50),
+      apiP95Ms: round2(percentile(timings, 95)),
+      treeParseMs: round2(percentile(parseTimings.sort((a, b) => a - b), 50)),
+      bqlMs: round2(bqlMs),
+      bqlSleepFloorMs: floor,
+      speedup: round2((bqlMs + (simulated ? 0 : floor)) / Math.max(apiP50, 0.01)),
+      coldPageMs: round2(coldPage.ms),
+      warmPageMs: round2(warmPage.ms),
+      pagesOk,
+      separateSessionsMs: round2(separateSessionsMs),
+      onePageMs: round2(onePage.ms),
+      incrementalMs: round2((onePage.ms - separateSessionsMs / variants.length) / (variants.length - 1)),
+      variantsOk: variantsOk && budgetOk,
+      domRows: domRates.length,
+      networkRows: networkRates.length,
+      domExtractMs: round2(domCapture.extractMs),
+      networkExtractMs: round2(networkCapture.extractMs),
+      domBytes: domCapture.bytes,
+      networkBytes: networkCapture.bytes,
+      // The captured response carries every row the API does; the table shows at most 48
+      captureOk: domCapture.data?.debug?.capture === 'dom' && networkCapture.data?.debug?.capture === 'network' &&
+        JSON.stringify(networkRates) === JSON.stringify(apiRates) && domRates.length <= 48 && isSubset(domRates, apiRates),
+      payloadMatch,
+      scrapeSubset: api?.data?.provider === 'api' && bql?.data?.provider === 'bql' && isSubset(bqlRates, apiRates),
+      fallbackOk: fallback?.success === true && fallback.data?.provider === 'bql' && /503/.test(fallback.data?.debug?.fallbackReason || '') &&
+        unmapped?.data?.provider === 'bql' && /No LenderPrice API mapping for propertyType/.test(unmapped.data?.debug?.fallbackReason || ''),
+    })
+  }
+
+  await stub.close()
+
+  console.log('\nLenderPrice replay (direct pricing/search API vs Browserless Flex scrape)')
+  console.log('='.repeat(158))
+  console.log(['fixture'.padEnd(26), 'KB'.padStart(6), 'rates'.padStart(6), 'api p50'.padStart(8), 'api p95'.padStart(8), 'tree ms'.padStart(8),
+    'bql ms'.padStart(8), 'sleep floor'.padStart(12), 'speedup'.padStart(9), 'cold pg'.padStart(8), 'warm pg'.padStart(8), 'pages'.padStart(6),
+    'payload'.padStart(8), 'rows'.padStart(6), 'fallback'.padStart(9)].join(' '))
+  const mark = (m: boolean) => (m ? 'ok' : 'DIFF')
+  for (const r of reports) {
+    console.log([r.fixture.padEnd(26), String(Math.round(r.bytes / 1024)).padStart(6), String(r.rateOptions).padStart(6),
+      r.apiP50Ms.toFixed(2).padStart(8), r.apiP95Ms.toFixed(2).padStart(8), r.treeParseMs.toFixed(2).padStart(8),
+      r.bqlMs.toFixed(2).padStart(8), String(r.bqlSleepFloorMs).padStart(12), `${r.speedup.toFixed(0)}x`.padStart(9),
+      r.coldPageMs.toFixed(0).padStart(8), r.warmPageMs.toFixed(0).padStart(8), mark(r.pagesOk).padStart(6),
+      mark(r.payloadMatch).padStart(8), mark(r.scrapeSubset).padStart(6), mark(r.fallbackOk).padStart(9)].join(' '))
+  }
+  console.log('\nbql ms is the scrape path against the stand-in; sleep floor is the fixed waits in the evaluate script')
+  console.log('(navigation and Flex rendering come on top in production). speedup = (bql ms + floor) / api p50.')
+  console.log('cold pg / warm pg: ms for the scrape that opens a pooled Flex page and the one that reuses it.')
+
+  console.log('\nLock period / prepay variants (4 per request, bql mode)')
+  console.log('='.repeat(84))
+  console.log(['fixture'.padEnd(26), 'separate ms'.padStart(12), 'per session'.padStart(12), 'one page ms'.padStart(12),
+    'per extra'.padStart(10), 'variants'.padStart(9)].join(' '))
+  for (const r of reports) {
+    console.log([r.fixture.padEnd(26), r.separateSessionsMs.toFixed(0).padStart(12), (r.separateSessionsMs / 4).toFixed(0).padStart(12),
+      r.onePageMs.toFixed(0).padStart(12), r.incrementalMs.toFixed(0).padStart(10), mark(r.variantsOk).padStart(9)].join(' '))
+  }
+  console.log('\nper extra: what each variant after the first adds to the one-page request, against per session for')
+  console.log('opening its own (navigation and the full form fill again).')
+
+  console.log('\nCaptured pricing response vs results table scrape (bql mode)')
+  console.log('='.repeat(100))
+  console.log(['fixture'.padEnd(26), 'api rows'.padStart(9), 'dom rows'.padStart(9), 'net rows'.padStart(9), 'dom ms'.padStart(8),
+    'net ms'.padStart(8), 'dom KB'.padStart(8), 'net KB'.padStart(8), 'capture'.padStart(8)].join(' '))
+  for (const r of reports) {
+    console.log([r.fixture.padEnd(26), String(r.rateOptions).padStart(9), String(r.domRows).padStart(9), String(r.networkRows).padStart(9),
+      r.domExtractMs.toFixed(1).padStart(8), r.networkExtractMs.toFixed(1).padStart(8), (r.domBytes / 1024).toFixed(0).padStart(8),
+      (r.networkBytes / 1024).toFixed(0).padStart(8), mark(r.captureOk).padStart(8)].join(' '))
+  }
+  console.log('\ndom ms / net ms: from results rendering to rates in hand (in-page settle and read, plus the server parse).')
+  console.log('KB: size of the Browserless answer; the stand-in\'s diag is the same under both, so the difference is rows.')
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ iterations, reports }, null, 2) + '\n')
+
+  const failures = reports.filter(r => !r.payloadMatch || !r.scrapeSubset || !r.fallbackOk || !r.pagesOk || !r.variantsOk || !r.captureOk)
+  if (failures.length > 0) console.error(`\nPayload, row, fallback, page pool, variant or capture check failed for: ${failures.map(r => r.fixture).join(', ')}`)
+  process.exit(failures.length > 0 ? 1 : 0)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
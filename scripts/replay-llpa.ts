@@ -0,0 +1,216 @@
+/**
+ * replay-llpa.ts
+ *
+ * Offline replay of the in-process LLPA engine (api/_lib/llpa-engine.ts) against the
+ * MeridianLink stand-in. For each fixture spec the engine first learns from a FICO x LTV
+ * grid (and two loan amounts) priced for another ZIP, the way other brokers' quotes
+ * would teach it, then the spec's scenario is priced live and a series of what-ifs
+ * (FICO, LTV, loan amount) is priced against it. Each what-if's indicative re-price is
+ * compared with the live response for that scenario (its own fixture, generated from
+ * the same seed):
+ *   - latency: indicative ms vs live ms (MeridianLink latency injected), and through the
+ *     /api/quote stream, where the indicative event must precede the live one
+ *   - accuracy: rate options whose points, payment and adjustments match exactly, max
+ *     points error, and the share of live programs the engine could re-price
+ * A cashout what-if that changes the LTV bucket is expected to drift (the fixture's
+ * cashout LLPA depends on LTV but is carried over as categorical); it is reported as
+ * 'drift', any other mismatch as DIFF. LLPA_ENGINE=off must produce no indicative.
+ *
+ * Usage:
+ *   npm run replay:llpa -- [--fixture large-dscr-investment] [--ml-latency-ms 800] [--json report.json]
+ */
+
+import { writeFileSync } from 'node:fs'
+import { performance } from 'node:perf_hooks'
+import { buildFixture, FIXTURE_SPECS, scenarioToRequestBody, type ReplayScenario } from './fixtures/quickpricer.ts'
+import { startMeridianLinkStub } from './stubs/meridianlink.ts'
+import { serveHandlers } from './lib/vercel.ts'
+import { argValue } from './lib/cli.ts'
+
+const TEACH_FICOS = [660, 680, 700, 720, 740, 760, 780, 800]
+const TEACH_LTVS = [60, 65, 70, 75, 80, 85]
+const TEACH_AMOUNTS = [300000, 1200000]
+const ELSEWHERE = { propertyZip: '33101', propertyState: 'FL', propertyCounty: 'Miami-Dade' }
+
+interface WhatIfReport {
+  fixture: string
+  whatIf: string
+  indicativeMs: number | null
+  repriceMs: number | null
+  liveMs: number
+  options: number
+  exact: number
+  maxPointsError: number
+  coverage: number
+  status: 'ok' | 'drift' | 'live only' | 'DIFF'
+}
+
+// What-ifs on a base scenario; loan amount changes keep the property value
+function whatIfs(s: ReplayScenario): { label: string; scenario: ReplayScenario }[] {
+  const propertyValue = s.loanAmount / (s.ltv / 100)
+  const amount = (loanAmount: number) => ({ ...s, loanAmount, ltv: Math.round((loanAmount / propertyValue) * 10000) / 100 })
+  return [
+    { label: `FICO ${s.fico} -> ${s.fico - 20}`, scenario: { ...s, fico: s.fico - 20 } },
+    { label: `FICO ${s.fico} -> ${s.fico + 20}`, scenario: { ...s, fico: s.fico + 20 } },
+    { label: `FICO ${s.fico} -> ${s.fico - 40}`, scenario: { ...s, fico: s.fico - 40 } },
+    { label: `LTV ${s.ltv} -> ${s.ltv + 5}`, scenario: { ...s, ltv: s.ltv + 5 } },
+    { label: `LTV ${s.ltv} -> ${s.ltv - 10}`, scenario: { ...s, ltv: s.ltv - 10 } },
+    { label: `FICO -20, LTV +5`, scenario: { ...s, fico: s.fico - 20, ltv: s.ltv + 5 } },
+    { label: `amount ${s.loanAmount} -> ${s.loanAmount * 0.9}`, scenario: amount(s.loanAmount * 0.9) },
+    { label: `FICO ${s.fico} -> 630 (unlearned)`, scenario: { ...s, fico: 630 } },
+  ]
+}
+
+const requestBody = (s: ReplayScenario, elsewhere = false) => ({ ...scenarioToRequestBody(s), ...(elsewhere ? ELSEWHERE : {}) })
+
+// Indicative programs against the live ones, by program name
+function compare(indicative: any, live: any): { options: number; exact: number; maxPointsError: number; coverage: number } {
+  const liveByName = new Map((live?.programs || []).map((p: any) => [p.name, p]))
+  let options = 0
+  let exact = 0
+  let maxPointsError = 0
+  for (const program of indicative?.programs || []) {
+    const match: any = liveByName.get(program.name)
+    program.rateOptions.forEach((o: any, i: number) => {
+      options++
+      const l = match?.rateOptions?.[i]
+      if (!l) return
+      const pointsError = Math.abs(o.points - l.points)
+      maxPointsError = Math.max(maxPointsError, pointsError)
+      if (o.rate === l.rate && pointsError < 0.0005 && Math.abs(o.payment - l.payment) < 0.01 &&
+        JSON.stringify(o.adjustments) === JSON.stringify(l.adjustments)) exact++
+    })
+  }
+  return {
+    options,
+    exact,
+    maxPointsError: Math.round(maxPointsError * 1000) / 1000,
+    coverage: liveByName.size > 0 ? (indicative?.programs?.length || 0) / liveByName.size : 0,
+  }
+}
+
+const ltvBucket = (ltv: number) => Math.ceil(Math.max(ltv, 50) / 5)
+
+async function main(): Promise<void> {
+  const only = argValue('--fixture')?.split(',')
+  const latencyMs = Number(argValue('--ml-latency-ms') ?? 800)
+  const jsonOut = argValue('--json')
+
+  const stub = await startMeridianLinkStub()
+  process.env.MERIDIANLINK_PRICER_URL = stub.pricerUrl
+  process.env.MERIDIANLINK_OAUTH_URL = stub.oauthUrl
+  process.env.MERIDIANLINK_CLIENT_ID ||= 'replay-client'
+  process.env.MERIDIANLINK_CLIENT_SECRET ||= 'replay-secret'
+  delete process.env.QUOTE_CACHE_REDIS_URL
+  delete process.env.LLPA_ENGINE
+
+  const { priceScenario } = await import('../api/_lib/meridianlink.ts')
+  const { clearLlpaEngine } = await import('../api/_lib/llpa-engine.ts')
+  const { default: quote } = await import('../api/quote.ts')
+
+  const price = async (spec: (typeof FIXTURE_SPECS)[number], scenario: ReplayScenario, body: Record<string, unknown>) => {
+    stub.setFixture(buildFixture({ ...spec, scenario }).soap)
+    let indicative: { body: string; ms: number } | null = null
+    const start = performance.now()
+    const outcome = await priceScenario(body, {
+      bypassCache: true,
+      verbosity: 'minimal',
+      onIndicative: b => { indicative = { body: b, ms: performance.now() - start } },
+    })
+    return { live: JSON.parse(outcome.body), liveMs: performance.now() - start, indicative: indicative as { body: string; ms: number } | null }
+  }
+
+  const reports: WhatIfReport[] = []
+  const checks: Record<string, boolean> = {}
+  const specs = FIXTURE_SPECS.filter(spec => !only || only.includes(spec.name))
+  for (const spec of specs) {
+    clearLlpaEngine()
+    stub.setFault(null)
+    const s = spec.scenario
+    for (const fico of TEACH_FICOS) for (const ltv of TEACH_LTVS) await price(spec, { ...s, fico, ltv }, requestBody({ ...s, fico, ltv }, true))
+    for (const loanAmount of TEACH_AMOUNTS) await price(spec, { ...s, loanAmount }, requestBody({ ...s, loanAmount }, true))
+    await price(spec, s, requestBody(s))
+
+    stub.setFault(() => ({ delayMs: latencyMs }))
+    for (const { label, scenario } of whatIfs(s)) {
+      const run = await price(spec, scenario, requestBody(scenario))
+      const indicative = run.indicative ? JSON.parse(run.indicative.body) : null
+      const accuracy = compare(indicative?.data, run.live.data)
+      const drift = s.purpose === 'cashout' && ltvBucket(scenario.ltv) !== ltvBucket(s.ltv)
+      const status = !indicative ? 'live only' : accuracy.exact === accuracy.options ? 'ok' : drift ? 'drift' : 'DIFF'
+      reports.push({
+        fixture: spec.name,
+        whatIf: label,
+        indicativeMs: run.indicative ? Math.round(run.indicative.ms * 100) / 100 : null,
+        repriceMs: indicative?.data?.indicative?.repriceMs ?? null,
+        liveMs: Math.round(run.liveMs),
+        ...accuracy,
+        status,
+      })
+    }
+    stub.setFault(null)
+
+    checks[`${spec.name}: unlearned cell goes live`] = reports.some(r => r.fixture === spec.name && r.whatIf.includes('unlearned') && r.status === 'live only')
+  }
+
+  // Through /api/quote: the indicative event arrives first, then the live one
+  const spec = specs[specs.length - 1]
+  clearLlpaEngine()
+  stub.setFixture(buildFixture(spec).soap)
+  const server = await serveHandlers({ '/api/quote': quote })
+  const post = (s: ReplayScenario) => fetch(`${server.url}/api/quote?providers=ml&verbosity=minimal&adjustments=table`, {
+    method: 'POST', headers: { 'Content-Type': 'application/json', 'Cache-Control': 'no-cache' }, body: JSON.stringify(requestBody(s)),
+  }).then(r => r.text()).then(text => text.trim().split('\n').map(line => JSON.parse(line)))
+  for (const fico of [spec.scenario.fico - 20, spec.scenario.fico]) {
+    stub.setFixture(buildFixture({ ...spec, scenario: { ...spec.scenario, fico } }).soap)
+    await post({ ...spec.scenario, fico })
+  }
+  const target = { ...spec.scenario, fico: spec.scenario.fico - 20 }
+  stub.setFixture(buildFixture({ ...spec, scenario: target }).soap)
+  stub.setFault(() => ({ delayMs: latencyMs }))
+  const events = await post(target)
+  stub.setFault(null)
+  const [first, second, done] = events
+  const stream = { indicativeMs: first?.ms ?? null, liveMs: second?.ms ?? null, summaryIndicativeMs: done?.summary?.providers?.ml?.indicativeMs ?? null }
+  checks['quote: indicative event first'] = events.length === 3 && first.indicative === true && first.success === true &&
+    second.indicative === undefined && second.cache === 'MISS' && first.ms < second.ms && done.done === true
+  checks['quote: summary records indicativeMs'] = stream.summaryIndicativeMs === first?.ms
+  checks['quote: indicative table expands'] = Object.keys(first?.data?.adjustmentTable || {}).length > 0 &&
+    first.data.programs.every((p: any) => p.rateOptions.every((o: any) => first.data.adjustmentTable[o.adjustmentsRef]))
+
+  process.env.LLPA_ENGINE = 'off'
+  const off = await post(target)
+  delete process.env.LLPA_ENGINE
+  checks['LLPA_ENGINE=off: live only'] = off.length === 2 && !off[0].indicative
+  await server.close()
+  await stub.close()
+
+  console.log(`\nLLPA engine: indicative what-if re-price vs live MeridianLink (stand-in latency ${latencyMs} ms, verbosity=minimal)`)
+  console.log('='.repeat(132))
+  console.log(['fixture'.padEnd(24), 'what-if'.padEnd(28), 'indic ms'.padStart(9), 'engine ms'.padStart(10), 'live ms'.padStart(8),
+    'options'.padStart(8), 'exact'.padStart(7), 'max dpts'.padStart(9), 'coverage'.padStart(9), 'status'.padStart(10)].join(' '))
+  for (const r of reports) {
+    console.log([r.fixture.padEnd(24), r.whatIf.padEnd(28), (r.indicativeMs === null ? '-' : r.indicativeMs.toFixed(2)).padStart(9),
+      (r.repriceMs === null ? '-' : r.repriceMs.toFixed(2)).padStart(10), String(r.liveMs).padStart(8), String(r.options).padStart(8),
+      (r.options ? `${Math.round((100 * r.exact) / r.options)}%` : '-').padStart(7), r.maxPointsError.toFixed(3).padStart(9),
+      `${Math.round(r.coverage * 100)}%`.padStart(9), r.status.padStart(10)].join(' '))
+  }
+  const repriced = reports.filter(r => r.indicativeMs !== null)
+  const exact = repriced.reduce((n, r) => n + r.exact, 0)
+  const options = repriced.reduce((n, r) => n + r.options, 0)
+  console.log(`\n${repriced.length}/${reports.length} what-ifs re-priced in-process; ${options ? ((100 * exact) / options).toFixed(1) : 0}% of ${options} rate options exact`)
+  console.log(`/api/quote (${spec.name}): indicative event at ${stream.indicativeMs} ms, live at ${stream.liveMs} ms`)
+  console.log('')
+  for (const [name, ok] of Object.entries(checks)) console.log(`${name.padEnd(48)} ${ok ? 'ok' : 'DIFF'}`)
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ latencyMs, reports, stream, checks }, null, 2) + '\n')
+
+  const failed = [...reports.filter(r => r.status === 'DIFF').map(r => `${r.fixture} ${r.whatIf}`), ...Object.entries(checks).filter(([, ok]) => !ok).map(([name]) => name)]
+  if (failed.length > 0) console.error(`\nLLPA engine check failed: ${failed.join(', ')}`)
+  process.exit(failed.length > 0 ? 1 : 0)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
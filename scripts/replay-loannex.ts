@@ -0,0 +1,426 @@
+/**
+ * replay-loannex.ts
+ *
+ * Offline replay of api/get-ln-pricing.ts against the local LoanNEX / Browserless
+ * stand-ins, side by side:
+ *   - api mode: cold call (login + exception-buyers + quick-prices) and warm p50/p95
+ *     with the cached session, and how many logins the run needed
+ *   - bql mode: the FillAndPrice mutation against the stand-in, plus the fixed waits
+ *     its login/waitForNav/navToIframe steps impose before any form work
+ *   - checks: the quick-prices request carries the scenario, every scraped row is also
+ *     produced by the API mapping, a revoked token re-logs in once, a failing login is
+ *     not retried on the next request, and a failing quick-prices call falls back to
+ *     the Browserless flow
+ *   - Browserless session pool: p50/p95 for cold requests (full login every time)
+ *     against warm ones reusing the pooled tokenKey URL, and reusing the kept browser
+ *     through reconnects. The stand-in sleeps each mutation's modeled duration times
+ *     --bql-time-scale; latencies are reported scaled back up. Also checks that an
+ *     expired session re-logs in and is pooled again, and that a health check runs.
+ *   - Lock Desk mix: cold requests where every --lock-desk-every'th login lands on Lock
+ *     Desk and needs the RetryPrice round trip. Reports the modeled BQL time against the
+ *     old always-retry mutation (a 5 s waitForQP and a second fill pass on every request)
+ *     and checks that retried requests still return the rows, and that with the session
+ *     pool off no request leaves a browser open (the first pass's is closed explicitly
+ *     when no retry needs it)
+ *   - capture: the bql path reading the captured quick-prices response
+ *     (BROWSERLESS_CAPTURE=network) against scraping the results table (=dom): rows
+ *     returned next to the API mapping's, and the server-side parse time (Server-Timing)
+ *
+ * Usage:
+ *   npm run replay:loannex -- [--fixture a,b] [--iterations 20] [--api-latency-ms 0]
+ *                             [--login-latency-ms 0] [--session-iterations 8]
+ *                             [--bql-time-scale 0.01] [--lock-desk-every 4] [--json report.json]
+ */
+
+import { writeFileSync } from 'node:fs'
+import { join, dirname } from 'node:path'
+import { fileURLToPath } from 'node:url'
+import { performance } from 'node:perf_hooks'
+import { loadFixtureCorpus, type LoanNexFixture } from './fixtures/loannex.ts'
+import { scenarioToRequestBody } from './fixtures/quickpricer.ts'
+import { startLoanNexStub } from './stubs/loannex.ts'
+import { invokeHandler } from './lib/vercel.ts'
+import { argValue, percentile } from './lib/cli.ts'
+
+const ROOT = join(dirname(fileURLToPath(import.meta.url)), '..')
+const CAPTURED_DIR = join(ROOT, 'fixtures', 'loannex')
+
+interface FixtureReport {
+  fixture: string
+  bytes: number
+  rateOptions: number
+  coldMs: number
+  warmP50Ms: number
+  warmP95Ms: number
+  logins: number
+  bqlMs: number
+  bqlSleepFloorMs: number
+  speedup: number
+  requestMatch: boolean
+  scrapeSubset: boolean
+  reloginOk: boolean
+  fallbackOk: boolean
+  domRows: number
+  networkRows: number
+  domParseMs: number
+  networkParseMs: number
+  captureOk: boolean
+}
+
+interface SessionReport {
+  fixture: string
+  coldP50Ms: number
+  coldP95Ms: number
+  warmP50Ms: number
+  warmP95Ms: number
+  reconnectP50Ms: number
+  reconnectP95Ms: number
+  browserLogins: number
+  warmOk: boolean
+  reconnectOk: boolean
+  expiryOk: boolean
+  healthOk: boolean
+}
+
+interface RetryMixReport {
+  fixture: string
+  requests: number
+  retried: number
+  modeledMs: number
+  legacyModeledMs: number
+  savedPerRequestMs: number
+  rowsOk: boolean
+}
+
+// What the old single mutation spent on every request: the waitForQP sleep and the retry
+// fill pass. The RetryPrice round trip costs its 1 s settle wait plus that fill pass.
+const LEGACY_QP_WAIT_MS = 5000
+const RETRY_SETTLE_MS = 1000
+const FILL_PASS_MS = 4000
+
+// ============================================================================
+// CLI
+// ============================================================================
+
+const round2 = (n: number) => Math.round(n * 100) / 100
+
+// The scrape only sees the cost magnitude ("$1,250.00"), so compare on that
+const rowKey = (r: any) => JSON.stringify({ ...r, cost: Math.abs(r.cost) })
+
+function isSubset(scraped: any[], api: any[]): boolean {
+  const counts = new Map<string, number>()
+  for (const row of api) counts.set(rowKey(row), (counts.get(rowKey(row)) || 0) + 1)
+  return scraped.every(row => {
+    const n = counts.get(rowKey(row)) || 0
+    counts.set(rowKey(row), n - 1)
+    return n > 0
+  })
+}
+
+// dur of one Server-Timing entry, 0 when absent
+function serverTimingMs(header: string | undefined, name: string): number {
+  const entry = String(header || '').split(',').map(e => e.trim().split(';dur=')).find(([n]) => n === name)
+  return Number(entry?.[1]) || 0
+}
+
+// ============================================================================
+// MAIN
+// ============================================================================
+
+async function main(): Promise<void> {
+  const iterations = Number(argValue('--iterations')) || 20
+  const only = argValue('--fixture')?.split(',')
+  const jsonOut = argValue('--json')
+  const sessionIterations = Number(argValue('--session-iterations')) || 8
+  const timeScale = Number(argValue('--bql-time-scale')) || 0.01
+  const lockDeskEvery = Number(argValue('--lock-desk-every')) || 4
+
+  const stub = await startLoanNexStub({
+    apiLatencyMs: Number(argValue('--api-latency-ms') ?? 0),
+    loginLatencyMs: Number(argValue('--login-latency-ms') ?? 0),
+  })
+  process.env.LOANNEX_API_URL = stub.apiUrl
+  process.env.BROWSERLESS_URL = stub.browserlessUrl
+  process.env.BROWSERLESS_TOKEN ||= 'replay-token'
+  process.env.LOANNEX_USER ||= 'replay@example.com'
+  process.env.LOANNEX_PASSWORD ||= 'replay-password'
+
+  // Import after the env is pointed at the stand-ins (URLs are read at module load)
+  const { default: handler } = await import('../api/get-ln-pricing.ts')
+  const { clearLoannexSession } = await import('../api/_lib/loannex.ts')
+  const { clearSessionPool } = await import('../api/_lib/ln-session-pool.ts')
+
+  const bqlTimings = async (body: any, n: number) => {
+    const timings: number[] = []
+    const results: any[] = []
+    for (let i = 0; i < n; i++) {
+      const start = performance.now()
+      results.push((await invokeHandler(handler, { body, query: { mode: 'bql' } })).body)
+      timings.push((performance.now() - start) / timeScale)
+    }
+    timings.sort((a, b) => a - b)
+    return { timings, results }
+  }
+
+  const sameRows = (a: any, b: any) => JSON.stringify(a?.data?.rateOptions) === JSON.stringify(b?.data?.rateOptions)
+
+  async function replaySessions(name: string, body: any, n: number, scale: number): Promise<SessionReport> {
+    stub.setBqlTimeScale(scale)
+    process.env.LN_SESSION_POOL_SIZE = '0'
+    const cold = await bqlTimings(body, n)
+
+    // tokenKey URL only: one login primes the pool, the rest should all be warm
+    process.env.LN_SESSION_POOL_SIZE = '2'
+    clearSessionPool()
+    const loginsBefore = stub.stats.browserLogins
+    await invokeHandler(handler, { body, query: { mode: 'bql' } })
+    const warm = await bqlTimings(body, n)
+    const browserLogins = stub.stats.browserLogins - loginsBefore
+    const warmOk = browserLogins === 1 && warm.results.every(r => r?.data?.session?.warm === true && sameRows(r, cold.results[0]))
+
+    // Kept browser: every warm request reconnects to the one the previous request left open
+    process.env.LN_SESSION_RECONNECT_SECONDS = '60'
+    clearSessionPool()
+    await invokeHandler(handler, { body, query: { mode: 'bql' } })
+    const reconnect = await bqlTimings(body, n)
+    const reconnectOk = reconnect.results.every(r => r?.data?.session?.reconnected === true && sameRows(r, cold.results[0]))
+
+    // Idle past the health-check interval: probe (and reconnect) before reuse
+    process.env.LN_SESSION_HEALTHCHECK_SECONDS = '0'
+    const checksBefore = stub.stats.healthChecks
+    const checked = (await invokeHandler(handler, { body, query: { mode: 'bql' } })).body
+    const healthOk = stub.stats.healthChecks === checksBefore + 1 && checked?.data?.session?.reconnected === true
+    delete process.env.LN_SESSION_HEALTHCHECK_SECONDS
+
+    // Expired tokenKey: one login-form hit, a fresh login, then warm again
+    stub.setBqlTimeScale(0)
+    stub.expireBrowserSessions()
+    const relogin = (await invokeHandler(handler, { body, query: { mode: 'bql' } })).body
+    const after = (await invokeHandler(handler, { body, query: { mode: 'bql' } })).body
+    const expiryOk = relogin?.success === true && relogin.data.session?.warm === false &&
+      relogin.data.session?.expiredReason === 'session_expired' && sameRows(relogin, cold.results[0]) &&
+      after?.data?.session?.warm === true
+    delete process.env.LN_SESSION_RECONNECT_SECONDS
+    process.env.LN_SESSION_POOL_SIZE = '0'
+
+    return {
+      fixture: name,
+      coldP50Ms: Math.round(percentile(cold.timings, 50)),
+      coldP95Ms: Math.round(percentile(cold.timings, 95)),
+      warmP50Ms: Math.round(percentile(warm.timings, 50)),
+      warmP95Ms: Math.round(percentile(warm.timings, 95)),
+      reconnectP50Ms: Math.round(percentile(reconnect.timings, 50)),
+      reconnectP95Ms: Math.round(percentile(reconnect.timings, 95)),
+      browserLogins,
+      warmOk,
+      reconnectOk,
+      expiryOk,
+      healthOk,
+    }
+  }
+
+  // Cold requests only, with some logins landing on Lock Desk
+  async function replayRetryMix(name: string, body: any, n: number): Promise<RetryMixReport> {
+    process.env.LN_SESSION_POOL_SIZE = '0'
+    stub.setBqlTimeScale(0)
+    stub.setLockDeskEvery(lockDeskEvery)
+    const before = { ...stub.stats }
+    const openBefore = stub.openBrowsers()
+    const results = (await bqlTimings(body, n)).results
+    stub.setLockDeskEvery(0)
+
+    const retried = results.filter(r => r?.data?.session?.retried === true).length
+    // Nothing pools the browsers: the first pass's is closed unless the retry reused it,
+    // and the retry keeps none
+    const noneKept = stub.openBrowsers() === openBefore && stub.stats.closedBrowsers - before.closedBrowsers === n - retried
+    const modeledMs = stub.stats.modeledBqlMs - before.modeledBqlMs
+    const retryMs = (stub.stats.retries - before.retries) * (RETRY_SETTLE_MS + FILL_PASS_MS)
+    const legacyModeledMs = modeledMs - retryMs + n * (LEGACY_QP_WAIT_MS + FILL_PASS_MS)
+    return {
+      fixture: name,
+      requests: n,
+      retried,
+      modeledMs,
+      legacyModeledMs,
+      savedPerRequestMs: Math.round((legacyModeledMs - modeledMs) / n),
+      rowsOk: retried === stub.stats.lockDeskLandings - before.lockDeskLandings && retried > 0 && noneKept &&
+        results.every(r => r?.success === true && sameRows(r, results[0]) && r.data.rateOptions.length > 0),
+    }
+  }
+
+  const corpus: LoanNexFixture[] = loadFixtureCorpus(CAPTURED_DIR, only)
+  const reports: FixtureReport[] = []
+  const sessionReports: SessionReport[] = []
+  const retryReports: RetryMixReport[] = []
+  const quiet = { warn: console.warn, error: console.error }
+
+  for (const fixture of corpus) {
+    stub.setFixture(fixture.response)
+    clearLoannexSession()
+    const body = scenarioToRequestBody(fixture.scenario)
+    const loginsBefore = stub.stats.logins
+    console.warn = () => {}
+    console.error = () => {}
+    // The first table measures the full FillAndPrice mutation: no pooled sessions
+    process.env.LN_SESSION_POOL_SIZE = '0'
+
+    const coldStart = performance.now()
+    const cold = (await invokeHandler(handler, { body, query: { mode: 'api' } })).body
+    const coldMs = performance.now() - coldStart
+
+    const timings: number[] = []
+    let api: any = cold
+    for (let i = 0; i < iterations; i++) {
+      const start = performance.now()
+      api = (await invokeHandler(handler, { body, query: { mode: 'api' } })).body
+      timings.push(performance.now() - start)
+    }
+    timings.sort((a, b) => a - b)
+    const logins = stub.stats.logins - loginsBefore
+
+    const request = stub.lastQuickPriceRequest()
+    const s = fixture.scenario
+    const requestMatch = !s || (
+      request.firstLienAmount === s.loanAmount &&
+      request.fico === s.fico &&
+      request.appraisedValue === Math.round(s.loanAmount / (s.ltv / 100)) &&
+      (s.docType !== 'dscr' || request.dscr === s.dscr)
+    )
+
+    stub.revokeTokens()
+    const relogin = (await invokeHandler(handler, { body, query: { mode: 'api' } })).body
+    const reloginOk = relogin?.data?.provider === 'api' && relogin.data.totalRates === api?.data?.totalRates &&
+      stub.stats.logins - loginsBefore === logins + 1
+
+    const bqlStart = performance.now()
+    const bql = (await invokeHandler(handler, { body, query: { mode: 'bql' } })).body
+    const bqlMs = performance.now() - bqlStart
+
+    stub.failQuickPrices(503)
+    const fallback = (await invokeHandler(handler, { body, query: { mode: 'api' } })).body
+    stub.failQuickPrices(null)
+
+    // A failed login is remembered: the next request falls back without trying again
+    stub.failLogins(500)
+    clearLoannexSession()
+    const loginsBeforeFailure = stub.stats.logins
+    const failedLogin = (await invokeHandler(handler, { body, query: { mode: 'api' } })).body
+    const backedOff = (await invokeHandler(handler, { body, query: { mode: 'api' } })).body
+    stub.failLogins(null)
+    clearLoannexSession()
+    const loginBackoffOk = stub.stats.logins - loginsBeforeFailure === 1 &&
+      failedLogin?.data?.provider === 'bql' && /login failed: HTTP 500/.test(failedLogin.data?.fallbackReason || '') &&
+      backedOff?.data?.provider === 'bql' && /not retried/.test(backedOff.data?.fallbackReason || '')
+
+    // Capture: the table scrape, then the captured quick-prices response
+    const captureRun = async (mode: string) => {
+      process.env.BROWSERLESS_CAPTURE = mode
+      const result = await invokeHandler(handler, { body, query: { mode: 'bql' } })
+      delete process.env.BROWSERLESS_CAPTURE
+      return { data: result.body?.data, parseMs: serverTimingMs(result.headers['server-timing'], 'parse') }
+    }
+    const domCapture = await captureRun('dom')
+    const networkCapture = await captureRun('network')
+    sessionReports.push(await replaySessions(fixture.name, body, sessionIterations, timeScale))
+    retryReports.push(await replayRetryMix(fixture.name, body, Math.max(sessionIterations, lockDeskEvery * 2)))
+    console.warn = quiet.warn
+    console.error = quiet.error
+
+    const apiRates = api?.data?.rateOptions || []
+    const domRates = domCapture.data?.rateOptions || []
+    const networkRates = networkCapture.data?.rateOptions || []
+    const warmP50 = percentile(timings, 50)
+    const floor = stub.stats.scrapeSleepFloorMs
+    reports.push({
+      fixture: fixture.name,
+      bytes: Buffer.byteLength(JSON.stringify(fixture.response)),
+      rateOptions: apiRates.length,
+      coldMs: round2(coldMs),
+      warmP50Ms: round2(warmP50),
+      warmP95Ms: round2(percentile(timings, 95)),
+      logins,
+      bqlMs: round2(bqlMs),
+      bqlSleepFloorMs: floor,
+      speedup: round2((bqlMs + floor) / Math.max(warmP50, 0.01)),
+      requestMatch,
+      scrapeSubset: cold?.data?.provider === 'api' && bql?.data?.provider === 'bql' && isSubset(bql.data.rateOptions, apiRates),
+      reloginOk: reloginOk && loginBackoffOk,
+      fallbackOk: fallback?.success === true && fallback.data?.provider === 'bql' && /503/.test(fallback.data?.fallbackReason || ''),
+      domRows: domRates.length,
+      networkRows: networkRates.length,
+      domParseMs: round2(domCapture.parseMs),
+      networkParseMs: round2(networkCapture.parseMs),
+      // The captured response maps to exactly the API's rows; the table shows at most 49
+      captureOk: domCapture.data?.capture === 'dom' && networkCapture.data?.capture === 'network' &&
+        JSON.stringify(networkRates) === JSON.stringify(apiRates) && domRates.length <= 49 && isSubset(domRates, apiRates),
+    })
+  }
+
+  await stub.close()
+
+  console.log('\nLoanNEX replay (nex-app quick-prices API vs Browserless FillAndPrice)')
+  console.log('='.repeat(146))
+  console.log(['fixture'.padEnd(24), 'KB'.padStart(5), 'rates'.padStart(6), 'cold ms'.padStart(8), 'warm p50'.padStart(9), 'warm p95'.padStart(9),
+    'logins'.padStart(7), 'bql ms'.padStart(8), 'sleep floor'.padStart(12), 'speedup'.padStart(9), 'request'.padStart(8), 'rows'.padStart(6),
+    'relogin'.padStart(8), 'fallback'.padStart(9)].join(' '))
+  const mark = (m: boolean) => (m ? 'ok' : 'DIFF')
+  for (const r of reports) {
+    console.log([r.fixture.padEnd(24), String(Math.round(r.bytes / 1024)).padStart(5), String(r.rateOptions).padStart(6),
+      r.coldMs.toFixed(2).padStart(8), r.warmP50Ms.toFixed(2).padStart(9), r.warmP95Ms.toFixed(2).padStart(9),
+      String(r.logins).padStart(7), r.bqlMs.toFixed(2).padStart(8), String(r.bqlSleepFloorMs).padStart(12),
+      `${r.speedup.toFixed(0)}x`.padStart(9), mark(r.requestMatch).padStart(8), mark(r.scrapeSubset).padStart(6),
+      mark(r.reloginOk).padStart(8), mark(r.fallbackOk).padStart(9)].join(' '))
+  }
+  console.log('\nsleep floor is the fixed waits in the non-fill BQL steps; page loads and the fill/scrape pass')
+  console.log('come on top in production. speedup = (bql ms + floor) / warm p50.')
+
+  console.log(`\nBrowserless session pool (modeled ms, stand-in slept at ${timeScale}x, ${sessionIterations} requests each)`)
+  console.log('='.repeat(120))
+  console.log(['fixture'.padEnd(24), 'cold p50'.padStart(9), 'cold p95'.padStart(9), 'warm p50'.padStart(9), 'warm p95'.padStart(9),
+    'reconn p50'.padStart(11), 'reconn p95'.padStart(11), 'logins'.padStart(7), 'warm'.padStart(5), 'reconn'.padStart(7),
+    'expiry'.padStart(7), 'health'.padStart(7)].join(' '))
+  for (const r of sessionReports) {
+    console.log([r.fixture.padEnd(24), String(r.coldP50Ms).padStart(9), String(r.coldP95Ms).padStart(9), String(r.warmP50Ms).padStart(9),
+      String(r.warmP95Ms).padStart(9), String(r.reconnectP50Ms).padStart(11), String(r.reconnectP95Ms).padStart(11),
+      String(r.browserLogins).padStart(7), mark(r.warmOk).padStart(5), mark(r.reconnectOk).padStart(7), mark(r.expiryOk).padStart(7),
+      mark(r.healthOk).padStart(7)].join(' '))
+  }
+  console.log('\nmodeled per mutation: browser launch 1000 ms (not on reconnect), 1500 ms per page load, the fixed waits,')
+  console.log('and 4000 ms per fill/scrape pass. cold = loginPage..price; warm = goto tokenKey URL + one fill pass.')
+
+  console.log(`\nLock Desk retry only when needed (cold requests, every ${lockDeskEvery}th login lands on Lock Desk; modeled ms)`)
+  console.log('='.repeat(96))
+  console.log(['fixture'.padEnd(24), 'requests'.padStart(9), 'retried'.padStart(8), 'modeled ms'.padStart(11),
+    'always-retry ms'.padStart(16), 'saved/request'.padStart(14), 'rows'.padStart(6)].join(' '))
+  for (const r of retryReports) {
+    console.log([r.fixture.padEnd(24), String(r.requests).padStart(9), String(r.retried).padStart(8), String(r.modeledMs).padStart(11),
+      String(r.legacyModeledMs).padStart(16), String(r.savedPerRequestMs).padStart(14), mark(r.rowsOk).padStart(6)].join(' '))
+  }
+  console.log('\nalways-retry = the same requests with the old mutation: waitForQP (5000 ms) and a second fill pass every time.')
+
+  console.log('\nCaptured quick-prices response vs results table scrape (bql mode)')
+  console.log('='.repeat(82))
+  console.log(['fixture'.padEnd(24), 'api rows'.padStart(9), 'dom rows'.padStart(9), 'net rows'.padStart(9), 'dom parse'.padStart(10),
+    'net parse'.padStart(10), 'capture'.padStart(8)].join(' '))
+  for (const r of reports) {
+    console.log([r.fixture.padEnd(24), String(r.rateOptions).padStart(9), String(r.domRows).padStart(9), String(r.networkRows).padStart(9),
+      r.domParseMs.toFixed(1).padStart(10), r.networkParseMs.toFixed(1).padStart(10), mark(r.captureOk).padStart(8)].join(' '))
+  }
+  console.log('\nparse: server-side ms turning the page\'s result into rate options; with capture on, the in-page')
+  console.log('wait also ends as soon as the response lands instead of on the next 1.5 s poll.')
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ iterations, reports, sessionReports, retryReports }, null, 2) + '\n')
+
+  const failures = reports.filter(r => !r.requestMatch || !r.scrapeSubset || !r.reloginOk || !r.fallbackOk || !r.captureOk || r.logins !== 1)
+  if (failures.length > 0) console.error(`\nRequest, row, session, fallback or capture check failed for: ${failures.map(r => r.fixture).join(', ')}`)
+  const sessionFailures = sessionReports.filter(r => !r.warmOk || !r.reconnectOk || !r.expiryOk || !r.healthOk)
+  if (sessionFailures.length > 0) console.error(`\nBrowser session pool check failed for: ${sessionFailures.map(r => r.fixture).join(', ')}`)
+  const retryFailures = retryReports.filter(r => !r.rowsOk || r.savedPerRequestMs <= 0)
+  if (retryFailures.length > 0) console.error(`\nLock Desk retry check failed for: ${retryFailures.map(r => r.fixture).join(', ')}`)
+  process.exit(failures.length + sessionFailures.length + retryFailures.length > 0 ? 1 : 0)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
@@ -0,0 +1,191 @@
+/**
+ * replay-oauth.ts
+ *
+ * Offline check of the MeridianLink OAuth token handling in api/_lib/meridianlink.ts,
+ * run against the local OAuth stand-in with injected latency. Each phase reports how
+ * many callers asked for a token, how many client_credentials POSTs reached the
+ * stand-in, and the p50/max wait per caller:
+ *   - cold burst        concurrent getOAuthToken() callers on an empty lambda share one POST
+ *   - cold pricing      concurrent /api/get-pricing requests share one POST
+ *   - warm              cached token, no POSTs, sub-millisecond
+ *   - refresh ahead     past the refresh point callers get the current token at once
+ *                       while one background POST renews it
+ *   - expired           idle past expiry: one blocking POST
+ *   - shared store      a "new lambda" (memory cleared) takes the token from the Redis
+ *                       stand-in instead of POSTing
+ *   - failure           a failing POST rejects every waiting caller once and the next
+ *                       call retries
+ *
+ * Usage:
+ *   npm run replay:oauth -- [--oauth-latency-ms 300] [--callers 50] [--json report.json]
+ */
+
+import { writeFileSync } from 'node:fs'
+import { join, dirname } from 'node:path'
+import { fileURLToPath } from 'node:url'
+import { performance } from 'node:perf_hooks'
+import { loadFixtureCorpus, scenarioToRequestBody } from './fixtures/quickpricer.ts'
+import { startMeridianLinkStub } from './stubs/meridianlink.ts'
+import { startRedisStub } from './stubs/redis.ts'
+import { invokeHandler } from './lib/vercel.ts'
+import { argValue, percentile } from './lib/cli.ts'
+
+const ROOT = join(dirname(fileURLToPath(import.meta.url)), '..')
+
+// The stand-in issues 62s tokens: 2s usable after the 60s safety margin, renewed after 1s
+const TOKEN_TTL_SECONDS = 62
+const REFRESH_AHEAD_SECONDS = 1
+
+interface PhaseReport {
+  phase: string
+  callers: number
+  oauthCalls: number
+  expectedCalls: number
+  p50Ms: number
+  maxMs: number
+  ok: boolean
+  note: string
+}
+
+const sleep = (ms: number) => new Promise(r => setTimeout(r, ms))
+
+// Run `fn` for `count` concurrent callers, timing each one
+async function burst<T>(count: number, fn: () => Promise<T>): Promise<{ results: PromiseSettledResult<T>[]; times: number[] }> {
+  const times: number[] = []
+  const results = await Promise.allSettled(Array.from({ length: count }, async () => {
+    const start = performance.now()
+    try {
+      return await fn()
+    } finally {
+      times.push(performance.now() - start)
+    }
+  }))
+  return { results, times: times.sort((a, b) => a - b) }
+}
+
+async function main(): Promise<void> {
+  const oauthLatencyMs = Number(argValue('--oauth-latency-ms') ?? 300)
+  const callers = Number(argValue('--callers') ?? 50)
+  const jsonOut = argValue('--json')
+
+  const stub = await startMeridianLinkStub({ oauthLatencyMs, pricerLatencyMs: 20, tokenTtlSeconds: TOKEN_TTL_SECONDS })
+  const redis = await startRedisStub({ latencyMs: 1 })
+  process.env.MERIDIANLINK_PRICER_URL = stub.pricerUrl
+  process.env.MERIDIANLINK_OAUTH_URL = stub.oauthUrl
+  process.env.MERIDIANLINK_CLIENT_ID ||= 'replay-client'
+  process.env.MERIDIANLINK_CLIENT_SECRET ||= 'replay-secret'
+  process.env.MERIDIANLINK_TOKEN_REFRESH_AHEAD_SECONDS = String(REFRESH_AHEAD_SECONDS)
+  delete process.env.MERIDIANLINK_TOKEN_REDIS_URL
+  delete process.env.QUOTE_CACHE_REDIS_URL
+
+  const ml = await import('../api/_lib/meridianlink.ts')
+  const { default: handler } = await import('../api/get-pricing.ts')
+  const [fixture] = loadFixtureCorpus(join(ROOT, 'fixtures', 'quickpricer'), ['small-fulldoc-primary'])
+  stub.setFixture(fixture.soap)
+
+  const reports: PhaseReport[] = []
+  const record = (phase: string, count: number, before: number, expectedCalls: number, times: number[], ok: boolean, note: string) => {
+    reports.push({
+      phase,
+      callers: count,
+      oauthCalls: stub.stats.oauthCalls - before,
+      expectedCalls,
+      p50Ms: Math.round(percentile(times, 50) * 10) / 10,
+      maxMs: Math.round(percentile(times, 100) * 10) / 10,
+      ok: ok && stub.stats.oauthCalls - before === expectedCalls,
+      note,
+    })
+  }
+  const tokens = (results: PromiseSettledResult<string>[]) =>
+    new Set(results.map(r => (r.status === 'fulfilled' ? r.value : `error: ${r.reason?.message}`)))
+
+  // Cold burst
+  ml.clearOAuthToken()
+  let before = stub.stats.oauthCalls
+  let run = await burst(callers, () => ml.getOAuthToken())
+  record('cold burst', callers, before, 1, run.times, tokens(run.results).size === 1, `coalesced ${ml.oauthStats.coalesced}`)
+
+  // Cold pricing requests
+  ml.clearOAuthToken()
+  before = stub.stats.oauthCalls
+  const body = scenarioToRequestBody(fixture.scenario)
+  const priced = await burst(Math.min(callers, 20), () => invokeHandler(handler, { body, headers: { 'Cache-Control': 'no-cache' } }))
+  const allPriced = priced.results.every(r => r.status === 'fulfilled' && r.value.body?.success === true)
+  record('cold pricing', priced.results.length, before, 1, priced.times, allPriced, 'end-to-end /api/get-pricing')
+
+  // Warm
+  before = stub.stats.oauthCalls
+  const hitsBefore = ml.oauthStats.cacheHits
+  const warmTimes: number[] = []
+  for (let i = 0; i < 200; i++) {
+    const start = performance.now()
+    await ml.getOAuthToken()
+    warmTimes.push(performance.now() - start)
+  }
+  warmTimes.sort((a, b) => a - b)
+  record('warm', 200, before, 0, warmTimes, ml.oauthStats.cacheHits - hitsBefore === 200, `cache hits ${ml.oauthStats.cacheHits - hitsBefore}`)
+
+  // Refresh ahead: past refreshAt but before expiry
+  ml.clearOAuthToken()
+  const first = await ml.getOAuthToken()
+  await sleep(REFRESH_AHEAD_SECONDS * 1000 + 100)
+  before = stub.stats.oauthCalls
+  const bgBefore = ml.oauthStats.backgroundRefreshes
+  run = await burst(callers, () => ml.getOAuthToken())
+  const servedCurrent = tokens(run.results).size === 1 && tokens(run.results).has(first)
+  await sleep(oauthLatencyMs + 100)
+  const renewed = await ml.getOAuthToken()
+  record('refresh ahead', callers, before, 1, run.times, servedCurrent && renewed !== first && run.times[run.times.length - 1] < oauthLatencyMs / 2,
+    `background refreshes ${ml.oauthStats.backgroundRefreshes - bgBefore}, renewed ${renewed !== first ? 'yes' : 'no'}`)
+
+  // Expired after idling past the hard expiry
+  await sleep((TOKEN_TTL_SECONDS - 60) * 1000 + 100)
+  before = stub.stats.oauthCalls
+  run = await burst(callers, () => ml.getOAuthToken())
+  record('expired', callers, before, 1, run.times, tokens(run.results).size === 1 && !tokens(run.results).has(renewed), 'blocking refresh')
+
+  // Shared store: one lambda fetches and stores, a fresh one reads it
+  process.env.MERIDIANLINK_TOKEN_REDIS_URL = redis.url
+  ml.clearOAuthToken()
+  before = stub.stats.oauthCalls
+  const stored = await ml.getOAuthToken()
+  ml.clearOAuthToken()
+  const sharedBefore = ml.oauthStats.sharedHits
+  run = await burst(callers, () => ml.getOAuthToken())
+  record('shared store', callers + 1, before, 1, run.times, tokens(run.results).size === 1 && tokens(run.results).has(stored),
+    `new lambda served from store: ${ml.oauthStats.sharedHits - sharedBefore} read`)
+  delete process.env.MERIDIANLINK_TOKEN_REDIS_URL
+
+  // Failure: one failing POST for every waiter, then a clean retry
+  ml.clearOAuthToken()
+  stub.setOAuthFault({ status: 500 })
+  before = stub.stats.oauthCalls
+  run = await burst(callers, () => ml.getOAuthToken())
+  const allFailed = run.results.every(r => r.status === 'rejected' && /HTTP 500/.test(r.reason?.message))
+  stub.setOAuthFault(null)
+  const recovered = await ml.getOAuthToken().then(() => true, () => false)
+  record('failure', callers + 1, before, 2, run.times, allFailed && recovered, `all rejected ${allFailed ? 'yes' : 'no'}, retry ok ${recovered ? 'yes' : 'no'}`)
+
+  await Promise.all([stub.close(), redis.close()])
+
+  console.log(`\nMeridianLink OAuth token (stand-in latency ${oauthLatencyMs}ms, ${callers} concurrent callers)`)
+  console.log('='.repeat(104))
+  console.log(['phase'.padEnd(14), 'callers'.padStart(8), 'oauth POSTs'.padStart(12), 'expected'.padStart(9), 'p50 ms'.padStart(8),
+    'max ms'.padStart(8), 'check'.padStart(6), '  note'].join(' '))
+  for (const r of reports) {
+    console.log([r.phase.padEnd(14), String(r.callers).padStart(8), String(r.oauthCalls).padStart(12), String(r.expectedCalls).padStart(9),
+      r.p50Ms.toFixed(1).padStart(8), r.maxMs.toFixed(1).padStart(8), (r.ok ? 'ok' : 'DIFF').padStart(6), `  ${r.note}`].join(' '))
+  }
+  console.log(`\noauthStats: ${JSON.stringify(ml.oauthStats)}`)
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ oauthLatencyMs, callers, reports, stats: ml.oauthStats }, null, 2) + '\n')
+
+  const failed = reports.filter(r => !r.ok)
+  if (failed.length > 0) console.error(`\nOAuth check failed: ${failed.map(r => r.phase).join(', ')}`)
+  process.exit(failed.length > 0 ? 1 : 0)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
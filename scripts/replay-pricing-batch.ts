@@ -0,0 +1,245 @@
+/**
+ * replay-pricing-batch.ts
+ *
+ * Offline replay of api/get-pricing-batch.ts against the local OAuth + QuickPricer.asmx
+ * stand-ins. A FICO x LTV x DSCR grid is priced once as serial /api/get-pricing calls
+ * and then through the batch endpoint at several concurrency limits, reporting:
+ *   - wall time of the serial calls vs the batch, and the batch's own serial estimate
+ *     (sum of per-scenario latencies)
+ *   - peak RunQuickPricerV2 calls in flight (must stay within the limit) and OAuth calls
+ *   - checks: one NDJSON line per scenario plus the summary, injected HTTP 500s and
+ *     timeouts fail only their own scenarios, and every other result matches the
+ *     single-scenario endpoint, and a batch that outruns MERIDIANLINK_BATCH_BUDGET_MS
+ *     reports the rest as skipped and still ends with its summary
+ *
+ * Usage:
+ *   npm run replay:pricing-batch -- [--fixture small-fulldoc-primary] [--pricer-latency-ms 150]
+ *                                   [--concurrency 1,4,8,16] [--json report.json]
+ */
+
+import { writeFileSync } from 'node:fs'
+import { join, dirname } from 'node:path'
+import { fileURLToPath } from 'node:url'
+import { performance } from 'node:perf_hooks'
+import { loadFixtureCorpus } from './fixtures/quickpricer.ts'
+import { startMeridianLinkStub } from './stubs/meridianlink.ts'
+import { invokeHandler } from './lib/vercel.ts'
+import { argValue } from './lib/cli.ts'
+
+const ROOT = join(dirname(fileURLToPath(import.meta.url)), '..')
+const CAPTURED_DIR = join(ROOT, 'fixtures', 'quickpricer')
+
+interface BatchReport {
+  concurrency: number
+  scenarios: number
+  wallMs: number
+  batchSerialMs: number
+  measuredSerialMs: number
+  speedup: number
+  peakInFlight: number
+  oauthCalls: number
+  failed: number
+  timedOut: number
+  streamOk: boolean
+  isolationOk: boolean
+  resultsMatch: boolean
+}
+
+// ============================================================================
+// SCENARIOS
+// ============================================================================
+
+const GRID = {
+  creditScore: [680, 700, 720, 740, 760],
+  ltv: [60, 65, 70, 75, 80],
+  dscrRatio: ['1.0-1.149', '1.150-1.249', '>=1.250'],
+}
+
+const BASE = {
+  loanPurpose: 'purchase', occupancyType: 'investment', documentationType: 'dscr', propertyType: 'sfr',
+  propertyValue: '800000', propertyZip: '90210', propertyState: 'CA', loanType: 'nonqm',
+}
+
+// Injected faults, keyed off the LOXml fields in the SOAP body
+const FAIL_FICO = 680
+const FAIL_LTV = 80
+const SLOW_FICO = 760
+const SLOW_LTV = 60
+const ITEM_TIMEOUT_MS = 1000
+
+function soapField(soap: string, id: string): number {
+  const m = soap.match(new RegExp(`${id}&quot;&gt;([\\d.]+)`))
+  return m ? Number(m[1]) : NaN
+}
+
+const loanAmountFor = (ltv: number) => Math.round(Number(BASE.propertyValue) * ltv / 100)
+
+// ============================================================================
+// MAIN
+// ============================================================================
+
+async function main(): Promise<void> {
+  const fixtureName = argValue('--fixture') || 'small-fulldoc-primary'
+  const levels = (argValue('--concurrency') || '1,4,8,16').split(',').map(Number)
+  const jsonOut = argValue('--json')
+
+  const pricerLatencyMs = Number(argValue('--pricer-latency-ms') ?? 150)
+  const stub = await startMeridianLinkStub({ pricerLatencyMs })
+  process.env.MERIDIANLINK_PRICER_URL = stub.pricerUrl
+  process.env.MERIDIANLINK_OAUTH_URL = stub.oauthUrl
+  process.env.MERIDIANLINK_CLIENT_ID ||= 'replay-client'
+  process.env.MERIDIANLINK_CLIENT_SECRET ||= 'replay-secret'
+  delete process.env.QUOTE_CACHE_REDIS_URL
+
+  // Count RunQuickPricerV2 calls the handler has outstanding (an aborted call stops counting
+  // as soon as its timeout fires, not when the stand-in notices the closed socket)
+  const inFlight = { now: 0, peak: 0 }
+  const realFetch = globalThis.fetch
+  globalThis.fetch = (async (input: any, init?: any) => {
+    if (String(input) !== stub.pricerUrl) return realFetch(input, init)
+    inFlight.now++
+    inFlight.peak = Math.max(inFlight.peak, inFlight.now)
+    try {
+      const response = await realFetch(input, init)
+      const text = await response.text()
+      return new Response(text, { status: response.status, headers: response.headers })
+    } finally {
+      inFlight.now--
+    }
+  }) as typeof fetch
+
+  const { default: single } = await import('../api/get-pricing.ts')
+  const { default: batch } = await import('../api/get-pricing-batch.ts')
+
+  const [fixture] = loadFixtureCorpus(CAPTURED_DIR, [fixtureName])
+  if (!fixture) throw new Error(`Unknown fixture ${fixtureName}`)
+  stub.setFixture(fixture.soap)
+  stub.setFault(soap => {
+    const fico = soapField(soap, 'sCreditScoreEstimatePe')
+    const amount = soapField(soap, 'sLAmtCalcPe')
+    if (fico === FAIL_FICO && amount === loanAmountFor(FAIL_LTV)) return { status: 500 }
+    if (fico === SLOW_FICO && amount === loanAmountFor(SLOW_LTV)) return { delayMs: ITEM_TIMEOUT_MS + 500 }
+    return null
+  })
+
+  // Grid in the order the batch endpoint expands it
+  const points = GRID.creditScore.flatMap(creditScore => GRID.ltv.flatMap(ltv => GRID.dscrRatio.map(dscrRatio => ({ creditScore, ltv, dscrRatio }))))
+  const expectFail = (p: { creditScore: number; ltv: number }) => p.creditScore === FAIL_FICO && p.ltv === FAIL_LTV
+  const expectTimeout = (p: { creditScore: number; ltv: number }) => p.creditScore === SLOW_FICO && p.ltv === SLOW_LTV
+  const noCache = { 'Cache-Control': 'no-cache' }
+
+  // Serial baseline: one /api/get-pricing call per grid point
+  const serial: any[] = []
+  const serialStart = performance.now()
+  for (const p of points) {
+    const body = { ...BASE, creditScore: p.creditScore, dscrRatio: p.dscrRatio, loanAmount: String(loanAmountFor(p.ltv)) }
+    serial.push((await invokeHandler(single, { body, headers: noCache })).body)
+  }
+  const measuredSerialMs = performance.now() - serialStart
+
+  const reports: BatchReport[] = []
+  for (const concurrency of levels) {
+    inFlight.peak = 0
+    const oauthBefore = stub.stats.oauthCalls
+    const start = performance.now()
+    const response = await invokeHandler(batch, {
+      body: { base: BASE, grid: GRID, concurrency, timeoutMs: ITEM_TIMEOUT_MS },
+      headers: noCache,
+    })
+    const wallMs = performance.now() - start
+
+    const lines = response.text.trim().split('\n').map(line => JSON.parse(line))
+    const summary = lines[lines.length - 1]?.summary
+    const items = lines.slice(0, -1)
+    const byIndex = new Map(items.map(item => [item.index, item]))
+    const streamOk = response.headers['content-type']?.startsWith('application/x-ndjson') === true &&
+      lines[lines.length - 1]?.done === true && items.length === points.length && byIndex.size === points.length
+
+    const isolationOk = points.every((p, i) => {
+      const item = byIndex.get(i)
+      if (!item || item.point?.creditScore !== p.creditScore || item.point?.ltv !== p.ltv) return false
+      if (expectFail(p)) return item.success === false && /HTTP 500/.test(item.error || '')
+      if (expectTimeout(p)) return item.success === false && item.timedOut === true
+      return item.success === true
+    })
+    const resultsMatch = points.every((_p, i) => {
+      const item = byIndex.get(i)
+      if (!item?.success) return true
+      const data = serial[i]?.data
+      return item.data.rate === data?.rate && item.data.apr === data?.apr && item.data.points === data?.points &&
+        item.data.monthlyPayment === data?.monthlyPayment && item.data.programName === data?.programName &&
+        item.data.totalPrograms === data?.totalPrograms
+    })
+
+    reports.push({
+      concurrency,
+      scenarios: points.length,
+      wallMs: Math.round(wallMs),
+      batchSerialMs: summary?.serialMs ?? 0,
+      measuredSerialMs: Math.round(measuredSerialMs),
+      speedup: Math.round((measuredSerialMs / wallMs) * 10) / 10,
+      peakInFlight: inFlight.peak,
+      oauthCalls: stub.stats.oauthCalls - oauthBefore,
+      failed: summary?.failed ?? -1,
+      timedOut: summary?.timedOut ?? -1,
+      streamOk,
+      isolationOk,
+      resultsMatch,
+    })
+  }
+
+  // Non-streaming form: one document, results in input order
+  const whole = (await invokeHandler(batch, {
+    body: { base: BASE, scenarios: points.slice(0, 6).map(p => ({ creditScore: p.creditScore, dscrRatio: p.dscrRatio, loanAmount: String(loanAmountFor(p.ltv)) })), concurrency: 3 },
+    query: { stream: 'false' },
+    headers: noCache,
+  })).body
+  const wholeOk = whole?.success === true && whole.results.length === 6 && whole.results.every((r: any, i: number) => r.index === i)
+
+  // Time budget: 30 scenarios two at a time against a budget of about four calls
+  const budgetMs = Math.max(300, pricerLatencyMs * 4)
+  process.env.MERIDIANLINK_BATCH_BUDGET_MS = String(budgetMs)
+  const budgetStart = performance.now()
+  const budgeted = await invokeHandler(batch, {
+    body: { base: BASE, scenarios: points.slice(15, 45).map(p => ({ creditScore: p.creditScore, dscrRatio: p.dscrRatio, loanAmount: String(loanAmountFor(p.ltv)) })), concurrency: 2 },
+    headers: noCache,
+  })
+  const budgetWallMs = performance.now() - budgetStart
+  delete process.env.MERIDIANLINK_BATCH_BUDGET_MS
+  const budgetLines = budgeted.text.trim().split('\n').map(line => JSON.parse(line))
+  const budgetSummary = budgetLines[budgetLines.length - 1]?.summary
+  const budgetItems = budgetLines.slice(0, -1)
+  const budgetOk = budgetLines[budgetLines.length - 1]?.done === true && budgetItems.length === 30 &&
+    budgetSummary?.skipped === budgetItems.filter(item => item.skipped).length &&
+    (pricerLatencyMs === 0 || budgetSummary.skipped > 0) && budgetWallMs < budgetMs + 500
+
+  await stub.close()
+
+  console.log(`\nMeridianLink batch pricing (${points.length}-point FICO x LTV x DSCR grid, fixture ${fixtureName})`)
+  console.log('='.repeat(132))
+  console.log(['limit'.padStart(6), 'scenarios'.padStart(10), 'wall ms'.padStart(8), 'sum item ms'.padStart(12), 'serial ms'.padStart(10),
+    'speedup'.padStart(8), 'in flight'.padStart(10), 'oauth'.padStart(6), 'failed'.padStart(7), 'timeouts'.padStart(9), 'stream'.padStart(7),
+    'isolation'.padStart(10), 'results'.padStart(8)].join(' '))
+  const mark = (m: boolean) => (m ? 'ok' : 'DIFF')
+  for (const r of reports) {
+    console.log([String(r.concurrency).padStart(6), String(r.scenarios).padStart(10), String(r.wallMs).padStart(8), String(r.batchSerialMs).padStart(12),
+      String(r.measuredSerialMs).padStart(10), `${r.speedup.toFixed(1)}x`.padStart(8), String(r.peakInFlight).padStart(10), String(r.oauthCalls).padStart(6),
+      String(r.failed).padStart(7), String(r.timedOut).padStart(9), mark(r.streamOk).padStart(7), mark(r.isolationOk).padStart(10),
+      mark(r.resultsMatch).padStart(8)].join(' '))
+  }
+  console.log(`\nserial ms is ${points.length} sequential /api/get-pricing calls; speedup = serial ms / batch wall ms.`)
+  console.log(`non-streaming (?stream=false) response in input order: ${mark(wholeOk)}`)
+  console.log(`time budget (${budgetMs} ms, 30 scenarios): ${budgetSummary?.succeeded ?? 0} priced, ${budgetSummary?.skipped ?? 0} skipped, ` +
+    `summary after ${Math.round(budgetWallMs)} ms: ${mark(budgetOk)}`)
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ reports, wholeOk, budgetOk }, null, 2) + '\n')
+
+  const failures = reports.filter(r => !r.streamOk || !r.isolationOk || !r.resultsMatch || r.peakInFlight > r.concurrency || r.oauthCalls > 1)
+  if (failures.length > 0) console.error(`\nBatch check failed at concurrency: ${failures.map(r => r.concurrency).join(', ')}`)
+  process.exit(failures.length > 0 || !wholeOk || !budgetOk ? 1 : 0)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
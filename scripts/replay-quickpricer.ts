@@ -0,0 +1,288 @@
+/**
+ * replay-quickpricer.ts
+ *
+ * Offline replay suite for the MeridianLink QuickPricer path in api/get-pricing.ts.
+ * For every fixture in the corpus it reports:
+ *   - parse latency (p50/p95/mean over N iterations) of the single-pass parser and of
+ *     the original regex parser it replaced, plus the speedup between them
+ *   - peak memory of a single parse with each parser, measured in an isolated child process
+ *   - output equivalence: the single-pass parse must serialize byte-for-byte like the
+ *     regex parse, and both the parse result and the full handler response (served
+ *     through the local OAuth + QuickPricer.asmx stand-ins) must match
+ *     fixtures/quickpricer/golden.json
+ *   - quote cache: live (MISS) handler latency against a memory-tier HIT and a
+ *     shared-tier HIT served by the local Redis stand-in, and that cached bodies are
+ *     identical to the live one
+ *
+ * Usage:
+ *   npm run replay:quickpricer -- [--fixture a,b] [--iterations 20] [--update-golden]
+ *                                 [--max-parse-p95-ms 250] [--redis-latency-ms 1] [--json report.json]
+ */
+
+import { createHash } from 'node:crypto'
+import { fork } from 'node:child_process'
+import { mkdtempSync, readFileSync, writeFileSync, rmSync, existsSync } from 'node:fs'
+import { tmpdir } from 'node:os'
+import { join, dirname } from 'node:path'
+import { fileURLToPath } from 'node:url'
+import { performance } from 'node:perf_hooks'
+import { loadFixtureCorpus, scenarioToRequestBody, type QuickPricerFixture } from './fixtures/quickpricer.ts'
+import { startMeridianLinkStub } from './stubs/meridianlink.ts'
+import { startRedisStub } from './stubs/redis.ts'
+import { invokeHandler } from './lib/vercel.ts'
+import { parseSOAPResponseRegex } from './lib/quickpricer-regex.ts'
+import { argValue, percentile } from './lib/cli.ts'
+
+const ROOT = join(dirname(fileURLToPath(import.meta.url)), '..')
+const CAPTURED_DIR = join(ROOT, 'fixtures', 'quickpricer')
+const GOLDEN_PATH = join(CAPTURED_DIR, 'golden.json')
+
+interface GoldenEntry {
+  parseSha256: string
+  responseSha256: string
+  programs: number
+  rateOptions: number
+}
+
+interface MemoryReport {
+  heapAllocMB: number
+  peakRssMB: number
+}
+
+type ParserName = 'stream' | 'regex'
+
+interface LatencyReport {
+  p50Ms: number
+  p95Ms: number
+  meanMs: number
+}
+
+interface FixtureReport {
+  fixture: string
+  bytes: number
+  programs: number
+  rateOptions: number
+  parse: LatencyReport
+  regexParse: LatencyReport
+  speedup: number
+  e2eMs: number
+  cacheHitMs: number
+  sharedHitMs: number
+  cacheMatch: boolean
+  memory: MemoryReport | null
+  regexMemory: MemoryReport | null
+  parityMatch: boolean
+  parseMatch: boolean | null
+  responseMatch: boolean | null
+}
+
+// ============================================================================
+// CLI
+// ============================================================================
+
+const sha256 = (text: string) => createHash('sha256').update(text).digest('hex')
+const mb = (bytes: number) => Math.round((bytes / 1024 / 1024) * 100) / 100
+const round2 = (n: number) => Math.round(n * 100) / 100
+
+// ============================================================================
+// CHILD: isolated single-parse memory measurement
+// ============================================================================
+
+async function measureMemoryChild(payloadPath: string, parser: ParserName): Promise<void> {
+  const { parseSOAPResponse, extractQuickPricerResult } = await import('../api/_lib/quickpricer-parser.ts')
+  const parse = parser === 'regex' ? parseSOAPResponseRegex : parseSOAPResponse
+  const resultXml = extractQuickPricerResult(readFileSync(payloadPath, 'utf8'))
+  const gc = (globalThis as { gc?: () => void }).gc
+  gc?.(); gc?.()
+  const before = process.memoryUsage()
+  const result = parse(resultXml)
+  const after = process.memoryUsage()
+  const peakRss = process.resourceUsage().maxRSS * 1024
+  const report: MemoryReport = {
+    heapAllocMB: mb(after.heapUsed - before.heapUsed),
+    peakRssMB: mb(Math.max(0, peakRss - before.rss)),
+  }
+  if (!result) throw new Error('parse returned nothing')
+  process.send?.(report)
+}
+
+function measureMemory(soap: string, parser: ParserName): Promise<MemoryReport | null> {
+  const dir = mkdtempSync(join(tmpdir(), 'qp-replay-'))
+  const payloadPath = join(dir, 'payload.xml')
+  writeFileSync(payloadPath, soap)
+  return new Promise(resolve => {
+    const child = fork(fileURLToPath(import.meta.url), ['--measure-memory', payloadPath, '--parser', parser], {
+      execArgv: [...process.execArgv, '--expose-gc'],
+      stdio: ['ignore', 'inherit', 'inherit', 'ipc'],
+    })
+    let report: MemoryReport | null = null
+    child.on('message', msg => { report = msg as MemoryReport })
+    child.on('exit', () => {
+      rmSync(dir, { recursive: true, force: true })
+      resolve(report)
+    })
+  })
+}
+
+function timeParser(parse: (xml: string) => any, resultXml: string, iterations: number): { latency: LatencyReport; result: any } {
+  for (let w = 0; w < 3; w++) parse(resultXml)
+  const timings: number[] = []
+  let result: any = null
+  for (let i = 0; i < iterations; i++) {
+    const t0 = performance.now()
+    result = parse(resultXml)
+    timings.push(performance.now() - t0)
+  }
+  timings.sort((a, b) => a - b)
+  return {
+    latency: {
+      p50Ms: round2(percentile(timings, 50)),
+      p95Ms: round2(percentile(timings, 95)),
+      meanMs: round2(timings.reduce((a, b) => a + b, 0) / timings.length),
+    },
+    result,
+  }
+}
+
+// ============================================================================
+// MAIN
+// ============================================================================
+
+async function main(): Promise<void> {
+  const iterations = Number(argValue('--iterations')) || 20
+  const only = argValue('--fixture')?.split(',')
+  const updateGolden = process.argv.includes('--update-golden')
+  const maxP95 = Number(argValue('--max-parse-p95-ms')) || 0
+  const jsonOut = argValue('--json')
+
+  const stub = await startMeridianLinkStub()
+  process.env.MERIDIANLINK_PRICER_URL = stub.pricerUrl
+  process.env.MERIDIANLINK_OAUTH_URL = stub.oauthUrl
+  const redis = await startRedisStub({ latencyMs: Number(argValue('--redis-latency-ms') ?? 1) })
+  process.env.QUOTE_CACHE_REDIS_URL = redis.url
+  process.env.MERIDIANLINK_CLIENT_ID ||= 'replay-client'
+  process.env.MERIDIANLINK_CLIENT_SECRET ||= 'replay-secret'
+
+  // Import after the env is pointed at the stand-ins (URLs are read at module load)
+  const { default: handler } = await import('../api/get-pricing.ts')
+  const { clearQuoteCache } = await import('../api/_lib/quote-cache.ts')
+  const { parseSOAPResponse, extractQuickPricerResult } = await import('../api/_lib/quickpricer-parser.ts')
+
+  const golden: Record<string, GoldenEntry> = existsSync(GOLDEN_PATH) ? JSON.parse(readFileSync(GOLDEN_PATH, 'utf8')) : {}
+  const corpus: QuickPricerFixture[] = loadFixtureCorpus(CAPTURED_DIR, only)
+  const reports: FixtureReport[] = []
+
+  for (const fixture of corpus) {
+    const resultXml = extractQuickPricerResult(fixture.soap)
+
+    const stream = timeParser(parseSOAPResponse, resultXml, iterations)
+    const regex = timeParser(parseSOAPResponseRegex, resultXml, iterations)
+    const parsed = stream.result
+    const parseJson = JSON.stringify(parsed)
+
+    // Live path first (fresh caches, so MISS), then the same scenario from each cache tier
+    stub.setFixture(fixture.soap)
+    clearQuoteCache()
+    redis.flush()
+    const requestBody = scenarioToRequestBody(fixture.scenario)
+    const t0 = performance.now()
+    const response = await invokeHandler(handler, { body: requestBody })
+    const e2eMs = performance.now() - t0
+
+    const cached = async (tier: 'memory' | 'shared') => {
+      const timings: number[] = []
+      let match = true
+      for (let i = 0; i < 5; i++) {
+        if (tier === 'shared') clearQuoteCache()
+        const start = performance.now()
+        const hit = await invokeHandler(handler, { body: requestBody })
+        timings.push(performance.now() - start)
+        match &&= hit.headers['x-cache'] === 'HIT' && hit.text === response.text
+      }
+      return { ms: round2(percentile(timings.sort((a, b) => a - b), 50)), match }
+    }
+    const liveCached = response.body?.success === true
+    const memoryHit = liveCached ? await cached('memory') : { ms: 0, match: true }
+    const sharedHit = liveCached ? await cached('shared') : { ms: 0, match: true }
+
+    const memory = await measureMemory(fixture.soap, 'stream')
+    const regexMemory = await measureMemory(fixture.soap, 'regex')
+    const rateOptions = parsed.programs.reduce((n: number, p: any) => n + p.rateOptions.length, 0)
+    const entry: GoldenEntry = {
+      parseSha256: sha256(parseJson),
+      responseSha256: sha256(response.text),
+      programs: parsed.programs.length,
+      rateOptions,
+    }
+    const expected = golden[fixture.name]
+    if (updateGolden) golden[fixture.name] = entry
+
+    reports.push({
+      fixture: fixture.name,
+      bytes: Buffer.byteLength(fixture.soap),
+      programs: entry.programs,
+      rateOptions,
+      parse: stream.latency,
+      regexParse: regex.latency,
+      speedup: round2(regex.latency.p50Ms / Math.max(stream.latency.p50Ms, 0.01)),
+      e2eMs: round2(e2eMs),
+      cacheHitMs: memoryHit.ms,
+      sharedHitMs: sharedHit.ms,
+      cacheMatch: response.headers['x-cache'] === 'MISS' && memoryHit.match && sharedHit.match,
+      memory,
+      regexMemory,
+      parityMatch: parseJson === JSON.stringify(regex.result),
+      parseMatch: expected ? expected.parseSha256 === entry.parseSha256 : null,
+      responseMatch: expected ? expected.responseSha256 === entry.responseSha256 : null,
+    })
+  }
+
+  await stub.close()
+  await redis.close()
+
+  if (updateGolden) {
+    writeFileSync(GOLDEN_PATH, JSON.stringify(golden, null, 2) + '\n')
+    console.log(`Golden manifest updated: ${GOLDEN_PATH}`)
+  }
+
+  console.log('\nQuickPricer replay (single-pass parser vs original regex parser)')
+  console.log('='.repeat(140))
+  console.log(['fixture'.padEnd(26), 'KB'.padStart(6), 'rates'.padStart(6), 'p50 ms'.padStart(8), 'p95 ms'.padStart(8), 'regex p50'.padStart(10),
+    'speedup'.padStart(8), 'e2e ms'.padStart(8), 'heap MB'.padStart(8), 'regex heap'.padStart(11), 'rss MB'.padStart(7), 'regex rss'.padStart(10),
+    'parity'.padStart(7), 'parse'.padStart(6), 'resp'.padStart(6)].join(' '))
+  const mark = (m: boolean | null) => (m === null ? 'new' : m ? 'ok' : 'DIFF')
+  for (const r of reports) {
+    console.log([r.fixture.padEnd(26), String(Math.round(r.bytes / 1024)).padStart(6), String(r.rateOptions).padStart(6),
+      r.parse.p50Ms.toFixed(2).padStart(8), r.parse.p95Ms.toFixed(2).padStart(8), r.regexParse.p50Ms.toFixed(2).padStart(10),
+      `${r.speedup.toFixed(1)}x`.padStart(8), r.e2eMs.toFixed(2).padStart(8),
+      String(r.memory?.heapAllocMB ?? '-').padStart(8), String(r.regexMemory?.heapAllocMB ?? '-').padStart(11),
+      String(r.memory?.peakRssMB ?? '-').padStart(7), String(r.regexMemory?.peakRssMB ?? '-').padStart(10),
+      mark(r.parityMatch).padStart(7), mark(r.parseMatch).padStart(6), mark(r.responseMatch).padStart(6)].join(' '))
+  }
+
+  console.log('\nQuote cache (live MeridianLink stand-in vs cached response)')
+  console.log('='.repeat(84))
+  console.log(['fixture'.padEnd(26), 'live ms'.padStart(9), 'mem hit ms'.padStart(11), 'shared hit ms'.padStart(14),
+    'speedup'.padStart(9), 'cached'.padStart(8)].join(' '))
+  for (const r of reports) {
+    console.log([r.fixture.padEnd(26), r.e2eMs.toFixed(2).padStart(9), r.cacheHitMs.toFixed(2).padStart(11), r.sharedHitMs.toFixed(2).padStart(14),
+      `${(r.e2eMs / Math.max(r.cacheHitMs, 0.01)).toFixed(0)}x`.padStart(9), mark(r.cacheMatch).padStart(8)].join(' '))
+  }
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ iterations, reports }, null, 2) + '\n')
+
+  const mismatches = reports.filter(r => !r.parityMatch || !r.cacheMatch || r.parseMatch === false || r.responseMatch === false)
+  const slow = maxP95 ? reports.filter(r => r.parse.p95Ms > maxP95) : []
+  if (mismatches.length > 0) console.error(`\nOutput differs from golden, the regex parser or the cached copy for: ${mismatches.map(r => r.fixture).join(', ')}`)
+  if (slow.length > 0) console.error(`\nParse p95 over ${maxP95}ms budget for: ${slow.map(r => r.fixture).join(', ')}`)
+  process.exit(!updateGolden && (mismatches.length > 0 || slow.length > 0) ? 1 : 0)
+}
+
+if (process.argv.includes('--measure-memory')) {
+  measureMemoryChild(argValue('--measure-memory') as string, argValue('--parser') as ParserName).then(() => process.exit(0))
+} else {
+  main().catch(err => {
+    console.error(err)
+    process.exit(1)
+  })
+}
@@ -0,0 +1,220 @@
+/**
+ * replay-quote.ts
+ *
+ * Offline replay of the unified streaming endpoint (api/quote.ts) over real HTTP, with
+ * the MeridianLink, LenderPrice and LoanNEX stand-ins answering at different speeds.
+ * Compares what the UI sees with one /api/quote stream against the separate
+ * /api/get-pricing, /api/get-lp-pricing and /api/get-ln-pricing fetches it used to make:
+ *   - when each provider's result becomes usable (ms after submit) and overall wall time
+ *   - connections opened and request bytes sent
+ *   - checks: every provider arrives as its own event as soon as it finishes (ML is not
+ *     held back by LP/LN), results match the single-provider endpoints, the summary
+ *     closes the stream, SSE framing parses, ?providers= narrows the run, an unknown
+ *     provider is a 400 and a failing provider does not affect the others
+ *
+ * Usage:
+ *   npm run replay:quote -- [--ml-latency-ms 300] [--lp-bql-latency-ms 1500] [--ln-bql-time-scale 0.05]
+ *                           [--iterations 3] [--json report.json]
+ */
+
+import { writeFileSync } from 'node:fs'
+import { join, dirname } from 'node:path'
+import { fileURLToPath } from 'node:url'
+import { performance } from 'node:perf_hooks'
+import { loadFixtureCorpus as loadQuickPricer, scenarioToRequestBody } from './fixtures/quickpricer.ts'
+import { loadFixtureCorpus as loadLenderPrice } from './fixtures/lenderprice.ts'
+import { loadFixtureCorpus as loadLoanNex } from './fixtures/loannex.ts'
+import { startMeridianLinkStub } from './stubs/meridianlink.ts'
+import { startLenderPriceStub } from './stubs/lenderprice.ts'
+import { startLoanNexStub } from './stubs/loannex.ts'
+import { serveHandlers } from './lib/vercel.ts'
+import { argValue } from './lib/cli.ts'
+
+const ROOT = join(dirname(fileURLToPath(import.meta.url)), '..')
+const PROVIDERS = ['ml', 'lp', 'ln'] as const
+
+interface RunTiming {
+  firstMs: Record<string, number>
+  wallMs: number
+  connections: number
+  requestBytes: number
+}
+
+const median = (values: number[]) => [...values].sort((a, b) => a - b)[Math.floor((values.length - 1) / 2)]
+
+// POST and hand each NDJSON line to onLine with its arrival time (ms since `start`)
+async function streamLines(url: string, body: string, start: number, onLine: (value: any, atMs: number) => void, headers: Record<string, string> = {}): Promise<Response> {
+  const response = await fetch(url, { method: 'POST', headers: { 'Content-Type': 'application/json', ...headers }, body })
+  if (!response.body) return response
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    buffered += decoder.decode(value, { stream: !done })
+    let newline = buffered.indexOf('\n')
+    while (newline !== -1) {
+      const line = buffered.slice(0, newline).trim()
+      buffered = buffered.slice(newline + 1)
+      if (line) onLine(JSON.parse(line), performance.now() - start)
+      newline = buffered.indexOf('\n')
+    }
+    if (done) break
+  }
+  return response
+}
+
+// Provider results with the per-run timing/diagnostic fields dropped
+function comparable(provider: string, data: any): string {
+  if (!data) return 'null'
+  if (provider === 'ml') return JSON.stringify(data)
+  return JSON.stringify(data.rateOptions)
+}
+
+async function main(): Promise<void> {
+  const iterations = Number(argValue('--iterations') ?? 3)
+  const jsonOut = argValue('--json')
+
+  const ml = await startMeridianLinkStub({ pricerLatencyMs: Number(argValue('--ml-latency-ms') ?? 300), oauthLatencyMs: 100 })
+  const lp = await startLenderPriceStub({ bqlLatencyMs: Number(argValue('--lp-bql-latency-ms') ?? 1500) })
+  const ln = await startLoanNexStub({ bqlTimeScale: Number(argValue('--ln-bql-time-scale') ?? 0.05) })
+
+  const [mlFixture] = loadQuickPricer(join(ROOT, 'fixtures', 'quickpricer'), ['medium-bankstmt-second'])
+  ml.setFixture(mlFixture.soap)
+  lp.setFixture(loadLenderPrice(join(ROOT, 'fixtures', 'lenderprice')).find(f => f.name === 'typical-dscr-investment')!.response)
+  ln.setFixture(loadLoanNex(join(ROOT, 'fixtures', 'loannex')).find(f => f.name === 'grouped-dscr')!.response)
+
+  process.env.MERIDIANLINK_PRICER_URL = ml.pricerUrl
+  process.env.MERIDIANLINK_OAUTH_URL = ml.oauthUrl
+  process.env.MERIDIANLINK_CLIENT_ID ||= 'replay-client'
+  process.env.MERIDIANLINK_CLIENT_SECRET ||= 'replay-secret'
+  process.env.LP_API_URL = lp.apiUrl
+  process.env.LOANNEX_API_URL = ln.apiUrl
+  process.env.BROWSERLESS_TOKEN ||= 'replay-token'
+  process.env.LOANNEX_USER ||= 'replay@example.com'
+  process.env.LOANNEX_PASSWORD ||= 'replay-password'
+  // The browser flows are the slow providers the stream has to not wait on
+  process.env.LP_MODE = 'bql'
+  process.env.LN_MODE = 'bql'
+  process.env.LN_SESSION_POOL_SIZE = '0'
+  delete process.env.QUOTE_CACHE_REDIS_URL
+
+  process.env.BROWSERLESS_URL = lp.browserlessUrl
+  const { default: lpHandler } = await import('../api/get-lp-pricing.ts')
+  process.env.BROWSERLESS_URL = ln.browserlessUrl
+  const { default: lnHandler } = await import('../api/get-ln-pricing.ts')
+  const { default: mlHandler } = await import('../api/get-pricing.ts')
+  const { default: quoteHandler } = await import('../api/quote.ts')
+  const server = await serveHandlers({
+    '/api/get-pricing': mlHandler,
+    '/api/get-lp-pricing': lpHandler,
+    '/api/get-ln-pricing': lnHandler,
+    '/api/quote': quoteHandler,
+  })
+
+  const body = JSON.stringify({ ...scenarioToRequestBody(mlFixture.scenario), lockPeriod: '30' })
+  const noCache = { 'Cache-Control': 'no-cache' }
+
+  // Separate fetches, as the UI used to: one connection and one copy of the body each
+  const separate: RunTiming[] = []
+  const single: Record<string, any> = {}
+  for (let i = 0; i < iterations; i++) {
+    const start = performance.now()
+    const firstMs: Record<string, number> = {}
+    await Promise.all([['ml', '/api/get-pricing'], ['lp', '/api/get-lp-pricing'], ['ln', '/api/get-ln-pricing']].map(async ([provider, path]) => {
+      const response = await fetch(`${server.url}${path}`, { method: 'POST', headers: { 'Content-Type': 'application/json', ...noCache, Connection: 'close' }, body })
+      single[provider] = (await response.json()).data
+      firstMs[provider] = performance.now() - start
+    }))
+    separate.push({ firstMs, wallMs: performance.now() - start, connections: 3, requestBytes: body.length * 3 })
+  }
+
+  // Unified stream
+  const unified: RunTiming[] = []
+  const events: Record<string, any> = {}
+  let summary: any = null
+  let eventOrderOk = true
+  for (let i = 0; i < iterations; i++) {
+    const start = performance.now()
+    const firstMs: Record<string, number> = {}
+    summary = null
+    await streamLines(`${server.url}/api/quote`, body, start, (event, atMs) => {
+      if (event.done) { summary = event.summary; return }
+      if (firstMs[event.provider] !== undefined) eventOrderOk = false
+      firstMs[event.provider] = atMs
+      events[event.provider] = event
+    }, { ...noCache, Connection: 'close' })
+    unified.push({ firstMs, wallMs: performance.now() - start, connections: 1, requestBytes: body.length })
+  }
+
+  // ML must land well before the browser flows, not when the whole quote finishes
+  const streamed = unified.every(u => u.firstMs.ml < u.wallMs / 2)
+  const resultsMatch = PROVIDERS.every(p => events[p]?.success === true && comparable(p, events[p].data) === comparable(p, single[p]))
+  const summaryOk = summary?.succeeded === 3 && PROVIDERS.every(p => summary.providers?.[p]?.success === true)
+
+  // SSE framing
+  const sseResponse = await fetch(`${server.url}/api/quote?providers=ml`, { method: 'POST', headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' }, body })
+  const sseText = await sseResponse.text()
+  const sseEvents = sseText.split('\n\n').filter(f => f.startsWith('event:')).map(f => {
+    const [eventLine, dataLine] = f.split('\n')
+    return { event: eventLine.slice(7), data: JSON.parse(dataLine.slice(6)) }
+  })
+  const sseOk = sseResponse.headers.get('content-type')?.startsWith('text/event-stream') === true &&
+    sseEvents.length === 2 && sseEvents[0].event === 'quote' && sseEvents[0].data.provider === 'ml' && sseEvents[1].event === 'done'
+
+  // ?providers= narrows the run; unknown providers are rejected
+  const narrowed: any[] = []
+  await streamLines(`${server.url}/api/quote?providers=lp`, body, performance.now(), event => narrowed.push(event))
+  const narrowOk = narrowed.length === 2 && narrowed[0].provider === 'lp' && narrowed[1].done === true
+  const badProvider = await fetch(`${server.url}/api/quote?providers=ml,xx`, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body })
+  const badOk = badProvider.status === 400
+
+  // A failing provider is reported on its own event and the rest still succeed
+  ml.setFault(() => ({ status: 500 }))
+  const isolated: Record<string, any> = {}
+  await streamLines(`${server.url}/api/quote?providers=ml,ln`, body, performance.now(), event => { isolated[event.provider || 'done'] = event }, noCache)
+  ml.setFault(null)
+  const isolationOk = isolated.ml?.success === false && /HTTP 500/.test(isolated.ml?.error || '') && isolated.ln?.success === true &&
+    isolated.done?.summary?.failed === 1
+
+  await server.close()
+  await Promise.all([ml.close(), lp.close(), ln.close()])
+
+  const row = (label: string, runs: RunTiming[]) => [
+    label.padEnd(22),
+    ...PROVIDERS.map(p => String(Math.round(median(runs.map(r => r.firstMs[p])))).padStart(8)),
+    String(Math.round(median(runs.map(r => r.wallMs)))).padStart(8),
+    String(runs[0].connections).padStart(12),
+    String(runs[0].requestBytes).padStart(14),
+  ].join(' ')
+
+  console.log(`\nUnified quote stream vs separate provider fetches (median of ${iterations}, ms after submit)`)
+  console.log('='.repeat(96))
+  console.log(['flow'.padEnd(22), 'ML'.padStart(8), 'LP'.padStart(8), 'LN'.padStart(8), 'all'.padStart(8), 'connections'.padStart(12), 'request bytes'.padStart(14)].join(' '))
+  console.log(row('separate endpoints', separate))
+  console.log(row('/api/quote (NDJSON)', unified))
+
+  const mark = (ok: boolean) => (ok ? 'ok' : 'DIFF')
+  const checks: Record<string, boolean> = {
+    'each provider streamed as it lands': streamed && eventOrderOk,
+    'results match single endpoints': resultsMatch,
+    'summary event closes the stream': summaryOk,
+    'SSE framing': sseOk,
+    '?providers= narrows the run': narrowOk,
+    'unknown provider -> 400': badOk,
+    'failing provider isolated': isolationOk,
+  }
+  console.log('')
+  for (const [name, ok] of Object.entries(checks)) console.log(`${name.padEnd(36)} ${mark(ok)}`)
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ separate, unified, summary, checks }, null, 2) + '\n')
+
+  const failed = Object.entries(checks).filter(([, ok]) => !ok).map(([name]) => name)
+  if (failed.length > 0) console.error(`\nQuote check failed: ${failed.join(', ')}`)
+  process.exit(failed.length > 0 ? 1 : 0)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
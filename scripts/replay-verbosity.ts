@@ -0,0 +1,216 @@
+/**
+ * replay-verbosity.ts
+ *
+ * Offline measurement of response shaping (api/_lib/verbosity.ts) on get-pricing,
+ * get-lp-pricing and get-ln-pricing, served over HTTP in front of the local stand-ins.
+ * For each fixture and verbosity level it reports:
+ *   - response bytes as JSON, and on the wire with gzip and brotli
+ *   - client parse time (JSON.parse p50 over N iterations)
+ *   - reduction of minimal vs debug (the previous, only, response)
+ * and checks that minimal keeps every field the UI reads with the same values as the
+ * debug body, that ?fields= projects `data`, that compressed bodies decode to the
+ * same JSON (per-run timings aside), and that an encoding refused with q=0 is not used.
+ *
+ * Usage:
+ *   npm run replay:verbosity -- [--iterations 50] [--json report.json]
+ */
+
+import { request } from 'node:http'
+import { writeFileSync } from 'node:fs'
+import { join, dirname } from 'node:path'
+import { fileURLToPath } from 'node:url'
+import { performance } from 'node:perf_hooks'
+import { brotliDecompressSync, gunzipSync } from 'node:zlib'
+import { loadFixtureCorpus as loadQuickPricer, scenarioToRequestBody } from './fixtures/quickpricer.ts'
+import { loadFixtureCorpus as loadLenderPrice } from './fixtures/lenderprice.ts'
+import { loadFixtureCorpus as loadLoanNex } from './fixtures/loannex.ts'
+import { startMeridianLinkStub } from './stubs/meridianlink.ts'
+import { startLenderPriceStub } from './stubs/lenderprice.ts'
+import { startLoanNexStub } from './stubs/loannex.ts'
+import { serveHandlers } from './lib/vercel.ts'
+import { argValue } from './lib/cli.ts'
+
+const ROOT = join(dirname(fileURLToPath(import.meta.url)), '..')
+const LEVELS = ['debug', 'standard', 'minimal'] as const
+
+// Fields the UI reads (sanitizePricingResult for ML, the LP/LN rate tables)
+const UI_FIELDS: Record<string, { data: string[]; option: string[] }> = {
+  'get-pricing': { data: ['rate', 'apr', 'monthlyPayment', 'points', 'ltvRatio', 'totalPrograms', 'programs'], option: ['rate', 'points', 'apr', 'description', 'payment', 'adjustments'] },
+  'get-lp-pricing': { data: ['rateOptions'], option: ['rate', 'price', 'payment', 'program', 'totalAdjustments'] },
+  'get-ln-pricing': { data: ['rateOptions'], option: ['rate', 'price', 'payment', 'program', 'investor'] },
+}
+
+interface LevelReport {
+  endpoint: string
+  fixture: string
+  verbosity: string
+  jsonBytes: number
+  gzipBytes: number
+  brBytes: number
+  parseP50Ms: number
+}
+
+// Raw response bytes (fetch would transparently decompress)
+function post(url: string, body: string, encoding: string): Promise<{ headers: Record<string, any>; bytes: Buffer }> {
+  return new Promise((resolve, reject) => {
+    const req = request(url, { method: 'POST', headers: { 'Content-Type': 'application/json', 'Accept-Encoding': encoding, 'Cache-Control': 'no-cache' } }, res => {
+      const chunks: Buffer[] = []
+      res.on('data', c => chunks.push(c))
+      res.on('end', () => resolve({ headers: res.headers, bytes: Buffer.concat(chunks) }))
+    })
+    req.on('error', reject)
+    req.end(body)
+  })
+}
+
+function parseP50(text: string, iterations: number): number {
+  const times: number[] = []
+  for (let i = 0; i < iterations; i++) {
+    const start = performance.now()
+    JSON.parse(text)
+    times.push(performance.now() - start)
+  }
+  times.sort((a, b) => a - b)
+  return times[Math.floor(times.length / 2)]
+}
+
+// Per-run timing and session fields differ between otherwise identical requests
+const VOLATILE = /^(ms|\w*Ms|timings|session|uses)$/
+const stable = (text: string) => JSON.stringify(JSON.parse(text), (key, value) => (VOLATILE.test(key) ? undefined : value))
+
+// Every value in `small` is present and equal in `big`
+function isSubset(small: any, big: any): boolean {
+  if (small === null || typeof small !== 'object') return small === big
+  if (big === null || typeof big !== 'object') return false
+  if (Array.isArray(small)) return Array.isArray(big) && small.length === big.length && small.every((v, i) => isSubset(v, big[i]))
+  return Object.keys(small).every(k => isSubset(small[k], big[k]))
+}
+
+function keepsUiFields(endpoint: string, minimal: any, debug: any): boolean {
+  const { data, option } = UI_FIELDS[endpoint]
+  if (!data.every(k => k in minimal.data === k in debug.data)) return false
+  const options = (d: any) => endpoint === 'get-pricing' ? (d.programs || []).flatMap((p: any) => p.rateOptions || []) : d.rateOptions || []
+  const debugOptions = options(debug.data)
+  return options(minimal.data).every((o: any, i: number) => option.every(k => (k in o) === (k in debugOptions[i])))
+}
+
+async function main(): Promise<void> {
+  const iterations = Number(argValue('--iterations') ?? 50)
+  const jsonOut = argValue('--json')
+
+  const ml = await startMeridianLinkStub()
+  const lp = await startLenderPriceStub()
+  const ln = await startLoanNexStub()
+  process.env.MERIDIANLINK_PRICER_URL = ml.pricerUrl
+  process.env.MERIDIANLINK_OAUTH_URL = ml.oauthUrl
+  process.env.MERIDIANLINK_CLIENT_ID ||= 'replay-client'
+  process.env.MERIDIANLINK_CLIENT_SECRET ||= 'replay-secret'
+  process.env.LP_API_URL = lp.apiUrl
+  process.env.LOANNEX_API_URL = ln.apiUrl
+  process.env.BROWSERLESS_TOKEN ||= 'replay-token'
+  process.env.LOANNEX_USER ||= 'replay@example.com'
+  process.env.LOANNEX_PASSWORD ||= 'replay-password'
+  // The Browserless paths carry the debug payloads (field inventories, page text)
+  process.env.LP_MODE = 'bql'
+  process.env.LN_MODE = 'bql'
+  process.env.LN_SESSION_POOL_SIZE = '0'
+  delete process.env.QUOTE_CACHE_REDIS_URL
+  delete process.env.PRICING_VERBOSITY
+
+  process.env.BROWSERLESS_URL = lp.browserlessUrl
+  const { default: lpHandler } = await import('../api/get-lp-pricing.ts')
+  process.env.BROWSERLESS_URL = ln.browserlessUrl
+  const { default: lnHandler } = await import('../api/get-ln-pricing.ts')
+  const { default: mlHandler } = await import('../api/get-pricing.ts')
+  const server = await serveHandlers({ '/api/get-pricing': mlHandler, '/api/get-lp-pricing': lpHandler, '/api/get-ln-pricing': lnHandler })
+
+  const cases: { endpoint: string; fixture: string; select: () => void; body: string }[] = [
+    ...loadQuickPricer(join(ROOT, 'fixtures', 'quickpricer')).map(f => ({
+      endpoint: 'get-pricing', fixture: f.name, select: () => ml.setFixture(f.soap), body: JSON.stringify(scenarioToRequestBody(f.scenario)),
+    })),
+    ...loadLenderPrice(join(ROOT, 'fixtures', 'lenderprice')).filter(f => !f.name.startsWith('edge')).map(f => ({
+      endpoint: 'get-lp-pricing', fixture: f.name, select: () => lp.setFixture(f.response), body: JSON.stringify(scenarioToRequestBody(f.scenario)),
+    })),
+    ...loadLoanNex(join(ROOT, 'fixtures', 'loannex')).map(f => ({
+      endpoint: 'get-ln-pricing', fixture: f.name, select: () => ln.setFixture(f.response), body: JSON.stringify(scenarioToRequestBody(f.scenario)),
+    })),
+  ]
+
+  const reports: LevelReport[] = []
+  const checks: Record<string, boolean> = {
+    'minimal keeps UI fields, same values': true,
+    'standard/minimal subset of debug': true,
+    'fields= projects data': true,
+    'gzip/br decode to same JSON': true,
+    'q=0 encodings not used': true,
+  }
+  for (const c of cases) {
+    c.select()
+    const bodies: Record<string, string> = {}
+    for (const verbosity of LEVELS) {
+      const url = `${server.url}/api/${c.endpoint}?verbosity=${verbosity}`
+      const plain = await post(url, c.body, 'identity')
+      const gz = await post(url, c.body, 'gzip')
+      const br = await post(url, c.body, 'br')
+      const text = plain.bytes.toString('utf8')
+      bodies[verbosity] = text
+      const gzText = gz.headers['content-encoding'] === 'gzip' ? gunzipSync(gz.bytes).toString('utf8') : gz.bytes.toString('utf8')
+      const brText = br.headers['content-encoding'] === 'br' ? brotliDecompressSync(br.bytes).toString('utf8') : br.bytes.toString('utf8')
+      if (stable(gzText) !== stable(text) || stable(brText) !== stable(text)) checks['gzip/br decode to same JSON'] = false
+      reports.push({
+        endpoint: c.endpoint, fixture: c.fixture, verbosity,
+        jsonBytes: plain.bytes.length, gzipBytes: gz.bytes.length, brBytes: br.bytes.length,
+        parseP50Ms: parseP50(text, iterations),
+      })
+    }
+    const debug = JSON.parse(stable(bodies.debug))
+    const minimal = JSON.parse(stable(bodies.minimal))
+    if (!debug.success || !keepsUiFields(c.endpoint, minimal, debug)) checks['minimal keeps UI fields, same values'] = false
+    if (!isSubset(minimal, debug) || !isSubset(JSON.parse(stable(bodies.standard)), debug)) checks['standard/minimal subset of debug'] = false
+
+    // Accept-Encoding → the Content-Encoding expected back
+    const negotiated: [string, string | undefined][] = [['br;q=0, gzip', 'gzip'], ['gzip;q=0', undefined], ['*;q=0.5, br;q=0', 'gzip'], ['br;q=0.5, gzip', 'gzip'], ['br, gzip;q=0', 'br']]
+    for (const [accept, expected] of negotiated) {
+      const res = await post(`${server.url}/api/${c.endpoint}?verbosity=debug`, c.body, accept)
+      if (res.headers['content-encoding'] !== expected) checks['q=0 encodings not used'] = false
+    }
+
+    const projected = JSON.parse((await post(`${server.url}/api/${c.endpoint}?verbosity=debug&fields=rateOptions.rate,rate,totalRates`, c.body, 'identity')).bytes.toString('utf8'))
+    const allowed = ['rateOptions', 'rate', 'totalRates']
+    if (!projected.success || !Object.keys(projected.data).every(k => allowed.includes(k)) ||
+      (projected.data.rateOptions || []).some((o: any) => Object.keys(o).join() !== 'rate')) checks['fields= projects data'] = false
+  }
+
+  await server.close()
+  await Promise.all([ml.close(), lp.close(), ln.close()])
+
+  console.log(`\nResponse size and client parse time by verbosity (parse p50 of ${iterations})`)
+  console.log('='.repeat(118))
+  console.log(['endpoint'.padEnd(15), 'fixture'.padEnd(26), 'verbosity'.padEnd(9), 'json B'.padStart(9), 'gzip B'.padStart(8), 'br B'.padStart(8),
+    'parse ms'.padStart(9), 'json vs debug'.padStart(14), 'wire (br) vs debug json'.padStart(24)].join(' '))
+  for (const r of reports) {
+    const base = reports.find(b => b.endpoint === r.endpoint && b.fixture === r.fixture && b.verbosity === 'debug') as LevelReport
+    const pct = (n: number) => `${(100 * (1 - n / base.jsonBytes)).toFixed(1)}%`
+    console.log([r.endpoint.padEnd(15), r.fixture.padEnd(26), r.verbosity.padEnd(9), String(r.jsonBytes).padStart(9), String(r.gzipBytes).padStart(8),
+      String(r.brBytes).padStart(8), r.parseP50Ms.toFixed(3).padStart(9), (r.verbosity === 'debug' ? '-' : `-${pct(r.jsonBytes)}`).padStart(14),
+      `-${pct(r.brBytes)}`.padStart(24)].join(' '))
+  }
+
+  const sum = (verbosity: string, key: 'jsonBytes' | 'brBytes' | 'parseP50Ms') =>
+    reports.filter(r => r.verbosity === verbosity).reduce((s, r) => s + r[key], 0)
+  console.log(`\nAll fixtures: debug ${sum('debug', 'jsonBytes')} B JSON -> minimal ${sum('minimal', 'jsonBytes')} B JSON / ${sum('minimal', 'brBytes')} B br; ` +
+    `parse ${sum('debug', 'parseP50Ms').toFixed(2)} ms -> ${sum('minimal', 'parseP50Ms').toFixed(2)} ms`)
+  console.log('')
+  for (const [name, ok] of Object.entries(checks)) console.log(`${name.padEnd(40)} ${ok ? 'ok' : 'DIFF'}`)
+
+  if (jsonOut) writeFileSync(jsonOut, JSON.stringify({ reports, checks }, null, 2) + '\n')
+
+  const failed = Object.entries(checks).filter(([, ok]) => !ok).map(([name]) => name)
+  if (failed.length > 0) console.error(`\nVerbosity check failed: ${failed.join(', ')}`)
+  process.exit(failed.length > 0 ? 1 : 0)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
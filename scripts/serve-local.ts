@@ -0,0 +1,110 @@
+/**
+ * serve-local.ts
+ *
+ * Runs the pricing handlers over HTTP against the local stand-ins, fully offline:
+ *   /api/get-pricing, /api/get-pricing-batch  → MeridianLink OAuth + QuickPricer.asmx stub
+ *   /api/get-lp-pricing                       → LenderPrice API + Browserless stub
+ *   /api/get-ln-pricing                       → LoanNEX API + Browserless stub
+ *   /api/quote                                → all three, streamed
+ *   /api/_stats                               → the handlers' in-process counters (coalescing,
+ *                                               quote cache, OAuth, LN sessions, LP pages,
+ *                                               MeridianLink connections) as JSON
+ *
+ * Prints `READY <url>` once listening and runs until SIGINT/SIGTERM. Used by
+ * scripts/loadtest.py; also handy for pointing the UI's dev proxy at.
+ *
+ * Usage:
+ *   npx --yes tsx@4.21.0 scripts/serve-local.ts [--port 0] [--ml-fixture medium-bankstmt-second]
+ *       [--lp-fixture typical-dscr-investment] [--ln-fixture grouped-dscr]
+ *       [--ml-latency-ms 300] [--lp-latency-ms 250] [--ln-latency-ms 200] [--bql-time-scale 0.01]
+ */
+
+import { join, dirname } from 'node:path'
+import { fileURLToPath } from 'node:url'
+import { loadFixtureCorpus as loadQuickPricer } from './fixtures/quickpricer.ts'
+import { loadFixtureCorpus as loadLenderPrice } from './fixtures/lenderprice.ts'
+import { loadFixtureCorpus as loadLoanNex } from './fixtures/loannex.ts'
+import { startMeridianLinkStub } from './stubs/meridianlink.ts'
+import { startLenderPriceStub } from './stubs/lenderprice.ts'
+import { startLoanNexStub } from './stubs/loannex.ts'
+import { serveHandlers } from './lib/vercel.ts'
+import { argValue } from './lib/cli.ts'
+
+const ROOT = join(dirname(fileURLToPath(import.meta.url)), '..')
+
+function pick<T extends { name: string }>(corpus: T[], name: string): T {
+  const fixture = corpus.find(f => f.name === name)
+  if (!fixture) throw new Error(`Unknown fixture ${name} (have: ${corpus.map(f => f.name).join(', ')})`)
+  return fixture
+}
+
+async function main(): Promise<void> {
+  const ml = await startMeridianLinkStub({ pricerLatencyMs: Number(argValue('--ml-latency-ms') ?? 300) })
+  const lp = await startLenderPriceStub({ searchLatencyMs: Number(argValue('--lp-latency-ms') ?? 250) })
+  const ln = await startLoanNexStub({
+    apiLatencyMs: Number(argValue('--ln-latency-ms') ?? 200),
+    bqlTimeScale: Number(argValue('--bql-time-scale') ?? 0.01),
+  })
+
+  ml.setFixture(pick(loadQuickPricer(join(ROOT, 'fixtures', 'quickpricer')), argValue('--ml-fixture') || 'medium-bankstmt-second').soap)
+  lp.setFixture(pick(loadLenderPrice(join(ROOT, 'fixtures', 'lenderprice')), argValue('--lp-fixture') || 'typical-dscr-investment').response)
+  ln.setFixture(pick(loadLoanNex(join(ROOT, 'fixtures', 'loannex')), argValue('--ln-fixture') || 'grouped-dscr').response)
+
+  process.env.MERIDIANLINK_PRICER_URL = ml.pricerUrl
+  process.env.MERIDIANLINK_OAUTH_URL = ml.oauthUrl
+  process.env.MERIDIANLINK_CLIENT_ID ||= 'local-client'
+  process.env.MERIDIANLINK_CLIENT_SECRET ||= 'local-secret'
+  process.env.LP_API_URL = lp.apiUrl
+  process.env.LOANNEX_API_URL = ln.apiUrl
+  process.env.BROWSERLESS_TOKEN ||= 'local-token'
+  process.env.LOANNEX_USER ||= 'local@example.com'
+  process.env.LOANNEX_PASSWORD ||= 'local-password'
+  delete process.env.QUOTE_CACHE_REDIS_URL
+
+  // Import after the env is pointed at the stand-ins (URLs are read at module load).
+  // LP and LN each talk to their own Browserless stand-in.
+  process.env.BROWSERLESS_URL = lp.browserlessUrl
+  const { default: lpHandler } = await import('../api/get-lp-pricing.ts')
+  process.env.BROWSERLESS_URL = ln.browserlessUrl
+  const { default: lnHandler } = await import('../api/get-ln-pricing.ts')
+  const { default: pricingHandler } = await import('../api/get-pricing.ts')
+  const { default: batchHandler } = await import('../api/get-pricing-batch.ts')
+  const { default: quoteHandler } = await import('../api/quote.ts')
+  const { coalesceStats } = await import('../api/_lib/single-flight.ts')
+  const { quoteCacheStats } = await import('../api/_lib/quote-cache.ts')
+  const { oauthStats } = await import('../api/_lib/meridianlink.ts')
+  const { lnSessionStats } = await import('../api/_lib/ln-session-pool.ts')
+  const { poolStats } = await import('../api/_lib/http-pool.ts')
+  const { lpPageStats } = await import('../api/_lib/lp-page-pool.ts')
+
+  const server = await serveHandlers({
+    '/api/get-pricing': pricingHandler,
+    '/api/get-pricing-batch': batchHandler,
+    '/api/get-lp-pricing': lpHandler,
+    '/api/get-ln-pricing': lnHandler,
+    '/api/quote': quoteHandler,
+    '/api/_stats': (_req, res) => res.status(200).json({
+      coalesce: coalesceStats,
+      quoteCache: quoteCacheStats,
+      oauth: oauthStats,
+      lnSessions: lnSessionStats,
+      lpPages: lpPageStats,
+      connections: poolStats,
+    }),
+  }, Number(argValue('--port') ?? 0))
+
+  console.log(`READY ${server.url}`)
+
+  const shutdown = async () => {
+    await server.close()
+    await Promise.all([ml.close(), lp.close(), ln.close()])
+    process.exit(0)
+  }
+  process.on('SIGINT', shutdown)
+  process.on('SIGTERM', shutdown)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
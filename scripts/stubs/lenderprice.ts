@@ -0,0 +1,297 @@
+/**
+ * lenderprice.ts
+ *
+ * Local stand-in for both LenderPrice paths:
+ *   - api.digitallending.com pricing/lock-days and pricing/search, replaying the
+ *     selected search response
+ *   - Browserless /chromium/bql, answering the Flex scrape with the rows that the
+ *     same response renders as in the Flex results table
+ *
+ * The scrape's own fixed waits — sleeps, plus the quiet window of every settle() —
+ * are summed from the submitted evaluate script and reported as `scrapeSleepFloorMs`
+ * (optionally actually waited with simulateScrapeSleeps). Readiness waits end as soon
+ * as the page is ready, so they add nothing on a page that is ready at once.
+ *
+ * A mutation ending in `keep: reconnect` gets a one-shot reconnect endpoint for the
+ * "open" Flex page; WarmScrape and PageHealth mutations posted there are answered
+ * without the navigation cost (navigationMs) a cold ScrapeRates pays. A CloseBrowser
+ * mutation there just ends the page; openPages() counts the pages still kept.
+ *
+ * A multi-variant scrape's `variantN: evaluate` steps are each answered with the rows
+ * again, after researchMs. The lock period a step sets (setLockDays(45)) lowers every
+ * price by 0.125 per 15 days over 30, so a caller can tell the variants apart. The
+ * scrape deadline the first step sets is kept against the stand-in's own clock: a
+ * variant step that would start with less than its minimum left answers
+ * `scrape_budget_exhausted`, as the page would.
+ *
+ * A script that captures the pricing/search response (BROWSERLESS_CAPTURE=network) gets
+ * the whole selected response back as `captured`, the way the page received it; one that
+ * does not gets the table rows.
+ */
+
+import { createServer, type IncomingMessage, type ServerResponse } from 'node:http'
+import type { AddressInfo } from 'node:net'
+
+export interface LenderPriceStubOptions {
+  port?: number
+  searchLatencyMs?: number
+  lockDaysLatencyMs?: number
+  bqlLatencyMs?: number
+  simulateScrapeSleeps?: boolean
+  lockDays?: number[]
+  // Modeled goto + Angular boot time of a cold ScrapeRates
+  navigationMs?: number
+  // Modeled time of one variant's re-search in an already filled page
+  researchMs?: number
+}
+
+export interface LenderPriceStub {
+  baseUrl: string
+  apiUrl: string
+  browserlessUrl: string
+  setFixture(response: unknown): void
+  failSearch(status: number | null): void
+  lastSearchPayload: () => any
+  stats: {
+    lockDayCalls: number; searchCalls: number; bqlCalls: number; bytesServed: number; scrapeSleepFloorMs: number
+    coldScrapes: number; warmScrapes: number; healthChecks: number; variantSearches: number; closedPages: number
+  }
+  openPages(): number
+  // Forget every kept page, as if Browserless had closed them
+  dropPages(): void
+  close(): Promise<void>
+}
+
+const sleep = (ms: number) => new Promise(r => setTimeout(r, ms))
+
+function readBody(req: IncomingMessage): Promise<string> {
+  return new Promise((resolve, reject) => {
+    const chunks: Buffer[] = []
+    req.on('data', c => chunks.push(c))
+    req.on('end', () => resolve(Buffer.concat(chunks).toString('utf8')))
+    req.on('error', reject)
+  })
+}
+
+const money = (n: number) => `$${n.toLocaleString('en-US', { minimumFractionDigits: 2, maximumFractionDigits: 2 })}`
+
+function collectLeafs(node: any, out: any[]): any[] {
+  if (!node) return out
+  for (const leaf of node.leafs || []) out.push(leaf)
+  for (const child of node.childs || []) collectLeafs(child, out)
+  return out
+}
+
+// What the scrape pulls out of the Flex results table for this response: one <tr> per
+// eligible leaf, cell text formatted the way the UI renders it, capped at the 50 <tr>
+// elements the scrape reads (two of which are header rows)
+export function renderScrapeRows(response: any): any[] {
+  const results = response?.results || {}
+  return collectLeafs(results.qualifiedQMData, [])
+    .concat(collectLeafs(results.qualifiedNonQMData, []))
+    .filter(leaf => !leaf.disqualified && !leaf.expired)
+    .slice(0, 48)
+    .map(leaf => ({
+      rate: Number(leaf.rate),
+      lender: leaf.companyName,
+      price: (100 - Number(leaf.adjustedPoints)).toFixed(3),
+      payment: money(leaf.monthlyPayment?.monthlyPI || 0),
+      costToBorrower: money(leaf.finalClosingCost || 0),
+      lenderFee: money(leaf.totalLenderFees || 0),
+      program: leaf.programName,
+      priceAdj: Number(leaf.adjustmentPoints).toFixed(3),
+    }))
+}
+
+// The evaluate steps of a mutation, by alias
+function evaluateSteps(query: string): Map<string, string> {
+  const steps = new Map<string, string>()
+  for (const m of query.matchAll(/^\s*(\w+): evaluate\(content: ("(?:[^"\\]|\\.)*")/gm)) steps.set(m[1], JSON.parse(m[2]))
+  return steps
+}
+
+// Price shift for the lock period the script selects
+function lockShift(script: string): number {
+  const days = Number(script.match(/setLockDays\((\d+)\)/)?.[1] ?? 30)
+  return (Math.max(0, days - 30) / 15) * 0.125
+}
+
+// Rows as priced for the lock period the script selects
+function lockPriced(rows: any[], script: string): any[] {
+  const shift = lockShift(script)
+  return shift ? rows.map(r => ({ ...r, price: (Number(r.price) - shift).toFixed(3) })) : rows
+}
+
+// The search response as priced for that lock period (Flex shows 100 - adjustedPoints)
+function lockPricedResponse(response: any, script: string): any {
+  const shift = lockShift(script)
+  if (!shift) return response
+  const copy = JSON.parse(JSON.stringify(response))
+  const results = copy?.results || {}
+  for (const leaf of collectLeafs(results.qualifiedQMData, []).concat(collectLeafs(results.qualifiedNonQMData, []))) {
+    leaf.adjustedPoints = Number(leaf.adjustedPoints) + shift
+  }
+  return copy
+}
+
+// The evaluate script's diag object at its real size: the Flex form's field inventory
+// before and after filling (~70 controls), the page text excerpt and sample table rows
+export function representativeDiag(rows: any[]): Record<string, unknown> {
+  const selects = Array.from({ length: 30 }, (_, i) => ({
+    tag: 'SELECT', id: `mat-select-${i}`, label: `Pricing option ${i}`.substring(0, 40), value: String(i % 4),
+    options: Array.from({ length: 10 }, (_, j) => `Option ${j} for field ${i}`),
+  }))
+  const inputs = Array.from({ length: 40 }, (_, i) => ({
+    tag: 'INPUT', id: `mat-input-${i}`, type: i % 5 === 0 ? 'checkbox' : 'text', label: `Loan detail ${i}`, value: String(100000 + i * 2500),
+  }))
+  return {
+    steps: Array.from({ length: 24 }, (_, i) => `step_${i}: ok (${i * 37}ms)`),
+    fieldResults: Object.fromEntries(inputs.slice(0, 25).map(f => [f.id, { tag: 'INPUT', found: true }])),
+    timings: { form_ready: 640, fields_set: 910, search_ready: 960, search_clicked: 980, results: 2900, rows_settled: 3050, extracted: 3080 },
+    formFields: [...selects, ...inputs],
+    formFieldsAfter: [...selects, ...inputs, ...inputs.slice(0, 4).map(f => ({ ...f, id: `${f.id}-prepay` }))],
+    docTypeOptions: ['Full Doc', 'Bank Statement', 'DSCR', 'Asset Utilization', 'P&L Only', '1099', 'WVOE'],
+    fullPageText: 'Rate Price Payment Adjustments Program Lender '.repeat(50).substring(0, 2000),
+    colHeaders: ['Rate', 'Price', 'Payment', 'Adjustments', 'Program', 'Lender', 'Cost', 'Fee'],
+    debugRows: rows.slice(0, 3).map((r, i) => (i === 0 ? { cellCount: 8, allCells: Object.values(r).map(String) } : { cellCount: 8, cell0: String(r.rate) })),
+  }
+}
+
+export async function startLenderPriceStub(options: LenderPriceStubOptions = {}): Promise<LenderPriceStub> {
+  let fixture: unknown = null
+  let fixtureJson = 'null'
+  let searchFailure: number | null = null
+  let lastPayload: any = null
+  const stats = { lockDayCalls: 0, searchCalls: 0, bqlCalls: 0, bytesServed: 0, scrapeSleepFloorMs: 0, coldScrapes: 0, warmScrapes: 0, healthChecks: 0, variantSearches: 0, closedPages: 0 }
+  // Reconnect endpoint ids of the Flex pages kept open
+  const openPages = new Set<string>()
+  let pageSeq = 0
+  let baseUrl = ''
+
+  const send = (res: ServerResponse, status: number, body: string) => {
+    const payload = Buffer.from(body, 'utf8')
+    stats.bytesServed += payload.length
+    res.writeHead(status, { 'Content-Type': 'application/json', 'Content-Length': payload.length })
+    res.end(payload)
+  }
+
+  const server = createServer(async (req: IncomingMessage, res: ServerResponse) => {
+    const body = await readBody(req)
+    const [path, query = ''] = (req.url || '').split('?')
+    const params = new URLSearchParams(query)
+
+    if (req.method === 'GET' && path === '/rest/v1/lp-ppe-integration/public/pricing/lock-days') {
+      stats.lockDayCalls++
+      if (options.lockDaysLatencyMs) await sleep(options.lockDaysLatencyMs)
+      if (params.get('code') !== 'Oaktree' || !params.get('company')) return send(res, 400, '{"error":"missing code/company"}')
+      return send(res, 200, JSON.stringify(options.lockDays || [30, 45]))
+    }
+
+    if (req.method === 'POST' && path === '/rest/v1/lp-ppe-integration/public/pricing/search') {
+      stats.searchCalls++
+      if (options.searchLatencyMs) await sleep(options.searchLatencyMs)
+      if (searchFailure) return send(res, searchFailure, '{"error":"unavailable"}')
+      try {
+        lastPayload = JSON.parse(body)
+      } catch {
+        return send(res, 400, '{"error":"invalid json"}')
+      }
+      const missing = ['criteria', 'property', 'dynamicPropertiesMap', 'groupConfig', 'dayLocksCriteria']
+        .filter(key => !lastPayload || lastPayload[key] === undefined)
+      if (missing.length > 0 || !params.get('company')) {
+        return send(res, 400, JSON.stringify({ error: `missing ${missing.join(', ') || 'company'}` }))
+      }
+      return send(res, 200, fixtureJson)
+    }
+
+    if (req.method === 'POST' && path.startsWith('/chromium/bql')) {
+      stats.bqlCalls++
+      if (!params.get('token')) return send(res, 401, '{"error":"token required"}')
+      // A reconnect endpoint works once, for a page that is still open
+      const reconnectId = path.match(/^\/chromium\/bql\/reconnect\/(\w+)$/)?.[1]
+      if (reconnectId) {
+        if (!openPages.delete(reconnectId)) return send(res, 404, '{"error":"session not found"}')
+      } else if (path !== '/chromium/bql') {
+        return send(res, 404, '{"error":"not found"}')
+      }
+      const query = JSON.parse(body).query || ''
+      const data: Record<string, any> = {}
+      const started = Date.now()
+
+      if (/^\s*closed: evaluate/m.test(query)) {
+        stats.closedPages++
+        data.closed = { value: 'true' }
+      } else if (/^\s*check: evaluate/m.test(query)) {
+        stats.healthChecks++
+        data.check = { value: JSON.stringify({ ok: true }) }
+      } else {
+        // Every fixed wait in the evaluate script runs once even when the page is ready at once
+        const floor = [...query.matchAll(/(?:sleep|settle)\((\d+)[,)]/g)].reduce((sum, m) => sum + Number(m[1]), 0)
+        stats.scrapeSleepFloorMs = floor
+        if (reconnectId) stats.warmScrapes++
+        else stats.coldScrapes++
+        if (options.bqlLatencyMs) await sleep(options.bqlLatencyMs)
+        if (!reconnectId && options.navigationMs) await sleep(options.navigationMs)
+        if (options.simulateScrapeSleeps) await sleep(floor)
+        const rendered = renderScrapeRows(fixture)
+        let deadline = Infinity
+        for (const [alias, script] of evaluateSteps(query)) {
+          if (alias !== 'results' && !/^variant\d+$/.test(alias)) continue
+          const budget = script.match(/__lpDeadline = t0(?: - performance\.now\(\))? \+ (\d+);/)
+          const reserve = Number(script.match(/__lpDeadline \|\| Infinity\) - (\d+)/)?.[1] ?? 0)
+          if (budget) deadline = started + Number(budget[1]) - reserve
+          const minMs = Number(script.match(/if \(within\((\d+)\) < \1\)/)?.[1] ?? 0)
+          if (alias !== 'results' && deadline - Date.now() < minMs) {
+            data[alias] = { value: JSON.stringify({ error: 'scrape_budget_exhausted', diag: { steps: [], timings: {} } }) }
+            continue
+          }
+          if (alias !== 'results') {
+            stats.variantSearches++
+            if (options.researchMs) await sleep(options.researchMs)
+          }
+          if (/captureResponses\('pricing\/search'\)/.test(script)) {
+            // The script returns as soon as the response lands, before any rows settle or are read
+            const timings = { form_ready: 640, fields_set: 910, search_ready: 960, search_clicked: 980, results: 2900, captured: 2900 }
+            data[alias] = { value: JSON.stringify({ captured: lockPricedResponse(fixture, script), diag: { ...representativeDiag(rendered), timings } }) }
+            continue
+          }
+          const rows = lockPriced(rendered, script)
+          data[alias] = { value: JSON.stringify({ rateCount: rows.length, eligibleQM: 0, eligibleNonQM: rows.length, rates: rows, diag: representativeDiag(rows) }) }
+        }
+      }
+
+      if (/^\s*keep: reconnect/m.test(query)) {
+        const id = String(++pageSeq)
+        openPages.add(id)
+        data.keep = { browserQLEndpoint: `${baseUrl}/chromium/bql/reconnect/${id}` }
+      }
+      return send(res, 200, JSON.stringify({ data }))
+    }
+
+    res.writeHead(404)
+    res.end()
+  })
+
+  await new Promise<void>(resolve => server.listen(options.port ?? 0, '127.0.0.1', resolve))
+  const { port } = server.address() as AddressInfo
+  baseUrl = `http://127.0.0.1:${port}`
+
+  return {
+    baseUrl,
+    apiUrl: baseUrl,
+    browserlessUrl: `${baseUrl}/chromium/bql`,
+    setFixture: (response: unknown) => {
+      fixture = response
+      fixtureJson = JSON.stringify(response)
+    },
+    failSearch: (status: number | null) => { searchFailure = status },
+    lastSearchPayload: () => lastPayload,
+    stats,
+    openPages: () => openPages.size,
+    dropPages: () => openPages.clear(),
+    close: () => new Promise<void>(resolve => {
+      server.closeAllConnections()
+      server.close(() => resolve())
+    }),
+  }
+}
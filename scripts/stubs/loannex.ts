@@ -0,0 +1,317 @@
+/**
+ * loannex.ts
+ *
+ * Local stand-in for both LoanNEX paths:
+ *   - nexapi.loannex.com: login, users/{id}/exception-buyers and
+ *     loans/apps/{id}/quick-prices (201), replaying the selected response
+ *   - Browserless /chromium/bql, answering the FillAndPrice mutation with the table
+ *     rows that the same response renders as on the Quick Pricer page, or with the
+ *     response itself when the price script captures quick-prices
+ *
+ * The fixed waits in the non-fill steps of the mutation (login, waitForNav,
+ * and navToIframe) are summed and reported as `scrapeSleepFloorMs`.
+ * With setLockDeskEvery(n), every nth full login lands on Lock Desk: its price pass
+ * answers needsNextStep and a RetryPrice mutation on the kept browser prices it.
+ *
+ * Browser sessions: a full login hands out a nex-app tokenKey URL (and, when the
+ * mutation ends in `reconnect`, an endpoint for the still-open browser). A WarmPrice
+ * mutation with a live tokenKey is priced directly; a revoked one lands on the login
+ * form and comes back as `session_expired`. A CloseBrowser mutation on a reconnect endpoint
+ * ends that browser (`closedBrowsers`); `openBrowsers()` counts the endpoints still
+ * waiting for a reconnect. With `bqlTimeScale` set, each mutation
+ * sleeps for its modeled duration (browser launch, page loads, fixed waits and
+ * fill/scrape passes) times the scale.
+ */
+
+import { createServer, type IncomingMessage, type ServerResponse } from 'node:http'
+import type { AddressInfo } from 'node:net'
+
+export interface LoanNexStubOptions {
+  port?: number
+  loginLatencyMs?: number
+  apiLatencyMs?: number
+  tokenTtlSeconds?: number
+  userId?: string
+  // Modeled Browserless step costs, slept for `bqlTimeScale` x (0 disables)
+  bqlTimeScale?: number
+  browserLaunchMs?: number
+  gotoMs?: number
+  fillMs?: number
+}
+
+export interface LoanNexStub {
+  baseUrl: string
+  apiUrl: string
+  browserlessUrl: string
+  userId: string
+  setFixture(response: unknown): void
+  failQuickPrices(status: number | null): void
+  failLogins(status: number | null): void
+  revokeTokens(): void
+  expireBrowserSessions(): void
+  setBqlTimeScale(scale: number): void
+  setLockDeskEvery(n: number): void
+  openBrowsers(): number
+  lastQuickPriceRequest: () => any
+  stats: LoanNexStubStats
+  close(): Promise<void>
+}
+
+export interface LoanNexStubStats {
+  logins: number
+  exceptionBuyerCalls: number
+  quickPriceCalls: number
+  unauthorized: number
+  bqlCalls: number
+  scrapeSleepFloorMs: number
+  browserLogins: number
+  warmPrices: number
+  reconnects: number
+  healthChecks: number
+  expiredSessions: number
+  lockDeskLandings: number
+  retries: number
+  closedBrowsers: number
+  modeledBqlMs: number
+}
+
+const sleep = (ms: number) => new Promise(r => setTimeout(r, ms))
+
+function readBody(req: IncomingMessage): Promise<string> {
+  return new Promise((resolve, reject) => {
+    const chunks: Buffer[] = []
+    req.on('data', c => chunks.push(c))
+    req.on('end', () => resolve(Buffer.concat(chunks).toString('utf8')))
+    req.on('error', reject)
+  })
+}
+
+const money = (n: number) => n.toLocaleString('en-US', { minimumFractionDigits: 2, maximumFractionDigits: 2 })
+
+// Flatten the (flat or grouped) response the way the Quick Pricer table lists it
+function flattenRows(node: any, context: Record<string, any>, out: any[]): void {
+  if (Array.isArray(node)) {
+    for (const item of node) flattenRows(item, context, out)
+    return
+  }
+  if (!node || typeof node !== 'object') return
+  const scope = { ...context }
+  for (const [key, value] of Object.entries(node)) {
+    if (value === null || typeof value !== 'object') scope[key] = value
+  }
+  if (node.noteRate !== undefined) {
+    out.push(scope)
+    return
+  }
+  for (const value of Object.values(node)) {
+    if (Array.isArray(value)) flattenRows(value, scope, out)
+  }
+}
+
+// Rows as the scrape reads them: header-keyed cell text, first 49 body rows
+export function renderScrapeRows(response: any): Record<string, string>[] {
+  const rows: any[] = []
+  flattenRows(response?.quickPrices ?? response, {}, rows)
+  return rows.slice(0, 49).map(r => ({
+    'Rate  Lock Period': `${Number(r.noteRate).toFixed(3)}%  ${r.lockPeriod} Days`,
+    'Price': `${Number(r.price).toFixed(3)}  $${money(Math.abs(r.cost))}`,
+    'Product': r.productName,
+    'Investor': r.investorName,
+    'Pmt': `$${money(r.principalAndInterest)}`,
+  }))
+}
+
+// Waits in the mutation steps that always run, outside the fill/scrape scripts
+function sleepFloor(query: string): number {
+  let total = 0
+  for (const m of query.matchAll(/^\s*(\w+): evaluate\(content: ("(?:[^"\\]|\\.)*")/gm)) {
+    if (m[1] === 'price' || m[1] === 'retryPrice') continue
+    if (m[1] === 'check') continue
+    const script: string = JSON.parse(m[2])
+    for (const wait of script.matchAll(/(?:sleep\(|setTimeout\(r, )(\d+)\)/g)) total += Number(wait[1])
+  }
+  for (const m of query.matchAll(/waitForTimeout\(time: (\d+)\)/g)) total += Number(m[1])
+  return total
+}
+
+export async function startLoanNexStub(options: LoanNexStubOptions = {}): Promise<LoanNexStub> {
+  const userId = options.userId || '3d444bbc-4395-ef11-8474-000d3a3f21ad'
+  let fixture: unknown = null
+  let fixtureJson = 'null'
+  let quickPriceFailure: number | null = null
+  let loginFailure: number | null = null
+  let lastRequest: any = null
+  let tokenSeq = 0
+  const validTokens = new Set<string>()
+  const stats: LoanNexStubStats = {
+    logins: 0, exceptionBuyerCalls: 0, quickPriceCalls: 0, unauthorized: 0, bqlCalls: 0, scrapeSleepFloorMs: 0,
+    browserLogins: 0, warmPrices: 0, reconnects: 0, healthChecks: 0, expiredSessions: 0, lockDeskLandings: 0, retries: 0, closedBrowsers: 0, modeledBqlMs: 0,
+  }
+  let lockDeskEvery = 0
+  // tokenKey → live; reconnect endpoint id → the tokenKey its browser is signed in with
+  const tokenKeys = new Set<string>()
+  const endpoints = new Map<string, string>()
+  let sessionSeq = 0
+  let baseUrl = ''
+  const cost = {
+    launch: options.browserLaunchMs ?? 1000,
+    goto: options.gotoMs ?? 1500,
+    fill: options.fillMs ?? 4000,
+  }
+
+  const send = (res: ServerResponse, status: number, body: string) => {
+    res.writeHead(status, { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(body) })
+    res.end(body)
+  }
+  const authorized = (req: IncomingMessage) => {
+    const token = (req.headers.authorization || '').replace(/^Bearer /, '')
+    if (validTokens.has(token)) return true
+    stats.unauthorized++
+    return false
+  }
+
+  const server = createServer(async (req: IncomingMessage, res: ServerResponse) => {
+    const body = await readBody(req)
+    const [path, query = ''] = (req.url || '').split('?')
+
+    if (req.method === 'POST' && path === '/auth/login') {
+      stats.logins++
+      if (options.loginLatencyMs) await sleep(options.loginLatencyMs)
+      if (loginFailure) return send(res, loginFailure, '{"error":"unavailable"}')
+      const creds = JSON.parse(body || '{}')
+      if (!creds.userName || !creds.password) return send(res, 401, '{"error":"invalid credentials"}')
+      const token = `stub-session-${++tokenSeq}`
+      validTokens.add(token)
+      return send(res, 200, JSON.stringify({ token, userId, expiresIn: options.tokenTtlSeconds ?? 3600 }))
+    }
+
+    if (req.method === 'GET' && path === `/users/${userId}/exception-buyers`) {
+      stats.exceptionBuyerCalls++
+      if (options.apiLatencyMs) await sleep(options.apiLatencyMs)
+      if (!authorized(req)) return send(res, 401, '{"error":"unauthorized"}')
+      return send(res, 200, JSON.stringify([{ id: 'eb-1', name: 'Verus' }, { id: 'eb-2', name: 'Deephaven' }]))
+    }
+
+    if (req.method === 'POST' && path === `/loans/apps/${userId}/quick-prices`) {
+      stats.quickPriceCalls++
+      if (options.apiLatencyMs) await sleep(options.apiLatencyMs)
+      if (!authorized(req)) return send(res, 401, '{"error":"unauthorized"}')
+      if (quickPriceFailure) return send(res, quickPriceFailure, '{"error":"unavailable"}')
+      lastRequest = JSON.parse(body)
+      if (!lastRequest.firstLienAmount || !lastRequest.fico) return send(res, 400, '{"error":"missing loan fields"}')
+      return send(res, 201, fixtureJson)
+    }
+
+    if (req.method === 'POST' && path.startsWith('/chromium/bql')) {
+      stats.bqlCalls++
+      if (!new URLSearchParams(query).get('token')) return send(res, 401, '{"error":"token required"}')
+      const mutation: string = JSON.parse(body).query || ''
+
+      // Reconnects resume a kept browser once; an unknown or used endpoint is gone
+      let browserKey: string | null = null
+      const reconnectId = path.match(/^\/chromium\/bql\/reconnect\/(\w+)$/)?.[1]
+      if (reconnectId) {
+        browserKey = endpoints.get(reconnectId) ?? null
+        endpoints.delete(reconnectId)
+        if (browserKey === null) return send(res, 404, '{"error":"session not found"}')
+        stats.reconnects++
+      } else if (path !== '/chromium/bql') {
+        return send(res, 404, '{"error":"not found"}')
+      }
+
+      const data: Record<string, any> = {}
+      // A price script that hooks quick-prices gets the response itself, otherwise the table rows
+      const priced = /captureResponses\('quick-prices'\)/.test(mutation)
+        ? JSON.stringify({ success: true, captured: fixture, diag: { stub: true } })
+        : JSON.stringify({ success: true, rates: renderScrapeRows(fixture), diag: { stub: true } })
+      const gotos = (mutation.match(/: goto\(/g) || []).length
+      let fills = 0
+
+      if (/^\s*loginPage: goto/m.test(mutation)) {
+        // FillAndPrice: full login, then the price pass (Lock Desk needs a RetryPrice)
+        stats.browserLogins++
+        stats.scrapeSleepFloorMs = sleepFloor(mutation)
+        browserKey = `tk-${++sessionSeq}`
+        tokenKeys.add(browserKey)
+        fills = 1
+        data.navToIframe = { value: JSON.stringify({ ok: true, src: `https://web.loannex.com/nex-app?tokenKey=${browserKey}` }) }
+        const lockDesk = lockDeskEvery > 0 && stats.browserLogins % lockDeskEvery === 0
+        if (lockDesk) stats.lockDeskLandings++
+        data.price = { value: lockDesk ? JSON.stringify({ success: true, needsNextStep: true, rates: [], diag: { stub: true } }) : priced }
+      } else if (/^\s*retryPrice: evaluate/m.test(mutation)) {
+        // RetryPrice: the kept browser, now on a freshly loaded Quick Pricer form
+        stats.retries++
+        const alive = !!browserKey && tokenKeys.has(browserKey)
+        fills = alive ? 1 : 0
+        data.retryPrice = { value: alive ? priced : JSON.stringify({ success: false, error: 'session_expired', rates: [], diag: { stub: true } }) }
+      } else if (/^\s*qp: goto/m.test(mutation)) {
+        // WarmPrice: straight to the pooled tokenKey URL
+        browserKey = mutation.match(/tokenKey=([\w-]+)/)?.[1] ?? null
+        if (browserKey && tokenKeys.has(browserKey)) {
+          stats.warmPrices++
+          fills = 1
+          data.price = { value: priced }
+        } else {
+          stats.expiredSessions++
+          data.price = { value: JSON.stringify({ success: false, error: 'session_expired', rates: [], diag: { stub: true } }) }
+          browserKey = null
+        }
+      } else if (/^\s*check: evaluate/m.test(mutation)) {
+        stats.healthChecks++
+        const ok = !!browserKey && tokenKeys.has(browserKey)
+        data.check = { value: JSON.stringify({ ok }) }
+        if (!ok) browserKey = null
+      } else if (/^\s*closed: evaluate/m.test(mutation)) {
+        stats.closedBrowsers++
+        data.closed = { value: true }
+      }
+
+      if (browserKey && /^\s*keep: reconnect/m.test(mutation)) {
+        const id = String(++sessionSeq)
+        endpoints.set(id, browserKey)
+        data.keep = { browserQLEndpoint: `${baseUrl}/chromium/bql/reconnect/${id}` }
+      }
+
+      // An expired session is noticed on the fill script's first 1s poll
+      const modeled = (reconnectId ? 0 : cost.launch) + gotos * cost.goto + sleepFloor(mutation) + fills * cost.fill +
+        ((data.price || data.retryPrice) && fills === 0 ? 1000 : 0)
+      stats.modeledBqlMs += modeled
+      if (options.bqlTimeScale) await sleep(modeled * options.bqlTimeScale)
+      return send(res, 200, JSON.stringify({ data }))
+    }
+
+    res.writeHead(404)
+    res.end()
+  })
+
+  await new Promise<void>(resolve => server.listen(options.port ?? 0, '127.0.0.1', resolve))
+  const { port } = server.address() as AddressInfo
+  baseUrl = `http://127.0.0.1:${port}`
+
+  return {
+    baseUrl,
+    apiUrl: baseUrl,
+    browserlessUrl: `${baseUrl}/chromium/bql`,
+    userId,
+    setFixture: (response: unknown) => {
+      fixture = response
+      fixtureJson = JSON.stringify(response)
+    },
+    failQuickPrices: (status: number | null) => { quickPriceFailure = status },
+    failLogins: (status: number | null) => { loginFailure = status },
+    revokeTokens: () => validTokens.clear(),
+    setBqlTimeScale: (scale: number) => { options.bqlTimeScale = scale },
+    setLockDeskEvery: (n: number) => { lockDeskEvery = n },
+    openBrowsers: () => endpoints.size,
+    expireBrowserSessions: () => {
+      tokenKeys.clear()
+      endpoints.clear()
+    },
+    lastQuickPriceRequest: () => lastRequest,
+    stats,
+    close: () => new Promise<void>(resolve => {
+      server.closeAllConnections()
+      server.close(() => resolve())
+    }),
+  }
+}
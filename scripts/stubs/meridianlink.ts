@@ -0,0 +1,141 @@
+/**
+ * meridianlink.ts
+ *
+ * Local stand-in for secure.mortgage.meridianlink.com/oauth/token and
+ * webservices.mortgage.meridianlink.com/los/webservice/QuickPricer.asmx.
+ * Serves whatever SOAP fixture is currently selected, with optional injected latency.
+ * setFault() can fail or delay individual requests by inspecting the SOAP body, or cut
+ * the response off halfway through its body (`truncate`: reset the connection, or stall);
+ * setOAuthFault() does the same for every token request. With `tls` it serves HTTPS
+ * (for measuring handshakes), and it gzips the SOAP response when the client asks.
+ */
+
+import { createServer, type IncomingMessage, type ServerResponse } from 'node:http'
+import { createServer as createTlsServer } from 'node:https'
+import type { AddressInfo } from 'node:net'
+import { gzipSync } from 'node:zlib'
+
+export interface MeridianLinkStubOptions {
+  port?: number
+  pricerLatencyMs?: number
+  oauthLatencyMs?: number
+  tokenTtlSeconds?: number
+  // PEM key and certificate to serve HTTPS with
+  tls?: { key: string; cert: string }
+}
+
+// Per-request fault: an HTTP status to answer with and/or extra delay before answering,
+// or a 200 whose body stops halfway
+export type MeridianLinkFault = (soapBody: string) => { status?: number; delayMs?: number; truncate?: 'reset' | 'stall' } | null
+
+export interface MeridianLinkStub {
+  baseUrl: string
+  oauthUrl: string
+  pricerUrl: string
+  setFixture(soap: string): void
+  setFault(fault: MeridianLinkFault | null): void
+  setOAuthFault(fault: { status?: number; delayMs?: number } | null): void
+  stats: { oauthCalls: number; pricerCalls: number; bytesServed: number; connections: number; tlsHandshakes: number }
+  close(): Promise<void>
+}
+
+const sleep = (ms: number) => new Promise(r => setTimeout(r, ms))
+
+function readBody(req: IncomingMessage): Promise<string> {
+  return new Promise((resolve, reject) => {
+    const chunks: Buffer[] = []
+    req.on('data', c => chunks.push(c))
+    req.on('end', () => resolve(Buffer.concat(chunks).toString('utf8')))
+    req.on('error', reject)
+  })
+}
+
+export async function startMeridianLinkStub(options: MeridianLinkStubOptions = {}): Promise<MeridianLinkStub> {
+  let fixture = ''
+  let tokenSeq = 0
+  let fault: MeridianLinkFault | null = null
+  let oauthFault: { status?: number; delayMs?: number } | null = null
+  const stats = { oauthCalls: 0, pricerCalls: 0, bytesServed: 0, connections: 0, tlsHandshakes: 0 }
+
+  const handle = async (req: IncomingMessage, res: ServerResponse) => {
+    const body = await readBody(req)
+    const path = (req.url || '').split('?')[0]
+
+    if (req.method === 'POST' && path === '/oauth/token') {
+      stats.oauthCalls++
+      if (options.oauthLatencyMs) await sleep(options.oauthLatencyMs)
+      if (oauthFault?.delayMs) await sleep(oauthFault.delayMs)
+      if (oauthFault?.status) {
+        res.writeHead(oauthFault.status, { 'Content-Type': 'application/json' })
+        return res.end(JSON.stringify({ error: 'injected' }))
+      }
+      const params = new URLSearchParams(body)
+      if (params.get('grant_type') !== 'client_credentials') {
+        res.writeHead(400, { 'Content-Type': 'application/json' })
+        return res.end(JSON.stringify({ error: 'unsupported_grant_type' }))
+      }
+      res.writeHead(200, { 'Content-Type': 'application/json' })
+      return res.end(JSON.stringify({
+        access_token: `stub-token-${++tokenSeq}`,
+        token_type: 'Bearer',
+        expires_in: options.tokenTtlSeconds ?? 3600,
+      }))
+    }
+
+    if (req.method === 'POST' && path === '/los/webservice/QuickPricer.asmx') {
+      stats.pricerCalls++
+      if (options.pricerLatencyMs) await sleep(options.pricerLatencyMs)
+      const injected = fault?.(body)
+      if (injected?.delayMs) await sleep(injected.delayMs)
+      if (res.destroyed) return
+      if (injected?.status) {
+        res.writeHead(injected.status, { 'Content-Type': 'text/xml; charset=utf-8' })
+        return res.end('<soap:Fault>injected</soap:Fault>')
+      }
+      if (!body.includes('RunQuickPricerV2') || !body.includes('Bearer stub-token-')) {
+        res.writeHead(500, { 'Content-Type': 'text/xml; charset=utf-8' })
+        return res.end('<soap:Fault>bad request</soap:Fault>')
+      }
+      const gzip = /\bgzip\b/.test(String(req.headers['accept-encoding'] || ''))
+      const payload = gzip ? gzipSync(fixture) : Buffer.from(fixture, 'utf8')
+      stats.bytesServed += payload.length
+      res.writeHead(200, {
+        'Content-Type': 'text/xml; charset=utf-8',
+        'Content-Length': payload.length,
+        ...(gzip ? { 'Content-Encoding': 'gzip' } : {}),
+      })
+      if (injected?.truncate) {
+        // Half the body, then the connection drops or the rest never comes
+        res.write(payload.subarray(0, payload.length >> 1))
+        if (injected.truncate === 'reset') res.destroy()
+        return
+      }
+      return res.end(payload)
+    }
+
+    res.writeHead(404)
+    res.end()
+  }
+
+  const server = options.tls ? createTlsServer(options.tls, handle) : createServer(handle)
+  server.on('connection', () => { stats.connections++ })
+  server.on('secureConnection', () => { stats.tlsHandshakes++ })
+
+  await new Promise<void>(resolve => server.listen(options.port ?? 0, '127.0.0.1', resolve))
+  const { port } = server.address() as AddressInfo
+  const baseUrl = `${options.tls ? 'https' : 'http'}://127.0.0.1:${port}`
+
+  return {
+    baseUrl,
+    oauthUrl: `${baseUrl}/oauth/token`,
+    pricerUrl: `${baseUrl}/los/webservice/QuickPricer.asmx`,
+    setFixture: (soap: string) => { fixture = soap },
+    setFault: (next: MeridianLinkFault | null) => { fault = next },
+    setOAuthFault: next => { oauthFault = next },
+    stats,
+    close: () => new Promise<void>(resolve => {
+      server.closeAllConnections()
+      server.close(() => resolve())
+    }),
+  }
+}
@@ -0,0 +1,198 @@
+/**
+ * redis.ts
+ *
+ * In-process stand-in for a Redis-protocol server, enough for the shared cache tiers:
+ * PING, AUTH, SELECT, GET, SET (EX/PX/NX/XX), DEL, INCR, PEXPIRE, PTTL, FLUSHALL.
+ * Optional per-command latency simulates a network hop to a managed Redis.
+ */
+
+import { createServer, type Socket } from 'node:net'
+import type { AddressInfo } from 'node:net'
+
+export interface RedisStubOptions {
+  port?: number
+  latencyMs?: number
+}
+
+export interface RedisStub {
+  url: string
+  stats: { commands: number; hits: number; misses: number; sets: number }
+  flush(): void
+  close(): Promise<void>
+}
+
+interface Entry {
+  value: string
+  expiresAt: number
+}
+
+// Parse complete RESP arrays out of `buf`; returns the commands and the bytes consumed
+function parseCommands(buf: Buffer): { commands: string[][]; consumed: number } {
+  const commands: string[][] = []
+  let offset = 0
+  outer: while (offset < buf.length) {
+    if (buf[offset] !== 0x2a) { // '*'
+      // Inline command (e.g. `PING\r\n` from redis-cli / nc)
+      const end = buf.indexOf('\r\n', offset)
+      if (end === -1) break
+      commands.push(buf.toString('utf8', offset, end).trim().split(/\s+/))
+      offset = end + 2
+      continue
+    }
+    const headerEnd = buf.indexOf('\r\n', offset)
+    if (headerEnd === -1) break
+    const count = Number(buf.toString('utf8', offset + 1, headerEnd))
+    let pos = headerEnd + 2
+    const args: string[] = []
+    for (let i = 0; i < count; i++) {
+      const lenEnd = buf.indexOf('\r\n', pos)
+      if (lenEnd === -1) break outer
+      const length = Number(buf.toString('utf8', pos + 1, lenEnd))
+      const start = lenEnd + 2
+      if (buf.length < start + length + 2) break outer
+      args.push(buf.toString('utf8', start, start + length))
+      pos = start + length + 2
+    }
+    commands.push(args)
+    offset = pos
+  }
+  return { commands, consumed: offset }
+}
+
+// Lower bound on the size of the command starting at the front of the buffer: the
+// header plus every argument whose length line has arrived in the first chunk
+function pendingLength(first: Buffer, buffered: number): number {
+  if (first[0] !== 0x2a) return 0
+  let pos = first.indexOf('\r\n')
+  if (pos === -1) return 0
+  const count = Number(first.toString('utf8', 1, pos))
+  pos += 2
+  for (let i = 0; i < count; i++) {
+    const lenEnd = first.indexOf('\r\n', pos)
+    if (lenEnd === -1) return 0
+    pos = lenEnd + 2 + Number(first.toString('utf8', pos + 1, lenEnd)) + 2
+    if (pos > first.length) return pos > buffered ? pos : 0
+  }
+  return 0
+}
+
+const bulk = (value: string | null) => value === null ? '$-1\r\n' : `$${Buffer.byteLength(value)}\r\n${value}\r\n`
+const sleep = (ms: number) => new Promise(r => setTimeout(r, ms))
+
+export async function startRedisStub(options: RedisStubOptions = {}): Promise<RedisStub> {
+  const data = new Map<string, Entry>()
+  const stats = { commands: 0, hits: 0, misses: 0, sets: 0 }
+  const sockets = new Set<Socket>()
+
+  const live = (key: string): Entry | undefined => {
+    const entry = data.get(key)
+    if (entry && entry.expiresAt && entry.expiresAt <= Date.now()) {
+      data.delete(key)
+      return undefined
+    }
+    return entry
+  }
+
+  const execute = (args: string[]): string => {
+    stats.commands++
+    const [name, ...rest] = args
+    switch ((name || '').toUpperCase()) {
+      case 'PING':
+        return '+PONG\r\n'
+      case 'AUTH':
+      case 'SELECT':
+        return '+OK\r\n'
+      case 'GET': {
+        const entry = live(rest[0])
+        if (entry) stats.hits++
+        else stats.misses++
+        return bulk(entry ? entry.value : null)
+      }
+      case 'SET': {
+        const [key, value, ...flags] = rest
+        let expiresAt = 0
+        let nx = false
+        let xx = false
+        for (let i = 0; i < flags.length; i++) {
+          const flag = flags[i].toUpperCase()
+          if (flag === 'EX') expiresAt = Date.now() + Number(flags[++i]) * 1000
+          else if (flag === 'PX') expiresAt = Date.now() + Number(flags[++i])
+          else if (flag === 'NX') nx = true
+          else if (flag === 'XX') xx = true
+        }
+        const exists = live(key) !== undefined
+        if ((nx && exists) || (xx && !exists)) return '$-1\r\n'
+        data.set(key, { value, expiresAt })
+        stats.sets++
+        return '+OK\r\n'
+      }
+      case 'DEL': {
+        let removed = 0
+        for (const key of rest) if (live(key) && data.delete(key)) removed++
+        return `:${removed}\r\n`
+      }
+      case 'INCR': {
+        const entry = live(rest[0])
+        const value = (Number(entry?.value) || 0) + 1
+        data.set(rest[0], { value: String(value), expiresAt: entry?.expiresAt || 0 })
+        return `:${value}\r\n`
+      }
+      case 'PEXPIRE': {
+        const entry = live(rest[0])
+        if (!entry) return ':0\r\n'
+        entry.expiresAt = Date.now() + Number(rest[1])
+        return ':1\r\n'
+      }
+      case 'PTTL': {
+        const entry = live(rest[0])
+        if (!entry) return ':-2\r\n'
+        return `:${entry.expiresAt ? entry.expiresAt - Date.now() : -1}\r\n`
+      }
+      case 'FLUSHALL':
+        data.clear()
+        return '+OK\r\n'
+      default:
+        return `-ERR unknown command '${name}'\r\n`
+    }
+  }
+
+  const server = createServer(socket => {
+    sockets.add(socket)
+    let chunks: Buffer[] = []
+    let buffered = 0
+    // Replies must go out in command order even with injected latency
+    let chain = Promise.resolve()
+    socket.on('data', chunk => {
+      chunks.push(chunk)
+      buffered += chunk.length
+      // A large SET arrives over many reads; wait until its declared length is in
+      if (buffered < pendingLength(chunks[0], buffered)) return
+      const buffer = chunks.length === 1 ? chunks[0] : Buffer.concat(chunks, buffered)
+      const { commands, consumed } = parseCommands(buffer)
+      const rest = buffer.subarray(consumed)
+      chunks = rest.length ? [rest] : []
+      buffered = rest.length
+      for (const args of commands) {
+        chain = chain.then(async () => {
+          if (options.latencyMs) await sleep(options.latencyMs)
+          if (!socket.destroyed) socket.write(execute(args))
+        })
+      }
+    })
+    socket.on('close', () => sockets.delete(socket))
+    socket.on('error', () => sockets.delete(socket))
+  })
+
+  await new Promise<void>(resolve => server.listen(options.port ?? 0, '127.0.0.1', resolve))
+  const { port } = server.address() as AddressInfo
+
+  return {
+    url: `redis://127.0.0.1:${port}`,
+    stats,
+    flush: () => data.clear(),
+    close: () => new Promise<void>(resolve => {
+      for (const socket of sockets) socket.destroy()
+      server.close(() => resolve())
+    }),
+  }
+}
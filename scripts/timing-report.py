@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Per-stage latency percentiles from the pricing handlers' timing log lines.
+
+Each handler logs one JSON line per request (api/_lib/timing.ts):
+
+  {"timing":"get-pricing","totalMs":812.4,"stages":{"oauth":0.1,"ml-network":790.2},"status":200}
+
+This reads those lines from log files (or stdin), skips everything else the functions
+print, and reports for each route and stage how many requests recorded it and its
+p50/p95/p99/max in ms. "share" is the stage's part of the route's summed total time,
+which is where to look first. Lines may carry a log prefix (a timestamp, a Vercel
+request id...); the JSON object is found from the first '{"timing"'. Standard library
+only.
+
+Usage:
+  python3 scripts/timing-report.py [LOG ...] [--route get-pricing] [--stage oauth] [--json report.json]
+  vercel logs <deployment> | python3 scripts/timing-report.py
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+
+MARKER = '{"timing"'
+
+
+# ================= Parsing =================
+
+def timing_records(lines):
+    """The timing objects in lines; anything else is ignored."""
+    for line in lines:
+        at = line.find(MARKER)
+        if at < 0:
+            continue
+        try:
+            record = json.loads(line[at:].strip())
+        except ValueError:
+            continue
+        if isinstance(record, dict) and isinstance(record.get("stages"), dict):
+            yield record
+
+
+def read_lines(paths):
+    if not paths:
+        yield from sys.stdin
+        return
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            yield from f
+
+
+# ================= Aggregation =================
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, -(-p * len(sorted_values) // 100) - 1))
+    return sorted_values[int(idx)]
+
+
+def distribution(values):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50Ms": percentile(values, 50),
+        "p95Ms": percentile(values, 95),
+        "p99Ms": percentile(values, 99),
+        "maxMs": values[-1] if values else 0.0,
+        "sumMs": sum(values),
+    }
+
+
+def aggregate(records, route=None, stage=None):
+    totals = defaultdict(list)
+    stages = defaultdict(lambda: defaultdict(list))
+    statuses = defaultdict(lambda: defaultdict(int))
+    for record in records:
+        name = str(record.get("timing"))
+        if route and name != route:
+            continue
+        totals[name].append(float(record.get("totalMs", 0)))
+        statuses[name][str(record.get("status", "?"))] += 1
+        for key, ms in record["stages"].items():
+            if stage and key != stage and not key.startswith(stage + "."):
+                continue
+            if isinstance(ms, (int, float)):
+                stages[name][key].append(float(ms))
+
+    report = {}
+    for name, values in totals.items():
+        total = distribution(values)
+        rows = {key: distribution(ms) for key, ms in stages[name].items()}
+        for row in rows.values():
+            row["share"] = row["sumMs"] / total["sumMs"] if total["sumMs"] else 0.0
+        report[name] = {
+            "requests": total["count"],
+            "statuses": dict(statuses[name]),
+            "total": total,
+            # Largest share of the route's time first
+            "stages": dict(sorted(rows.items(), key=lambda kv: -kv[1]["sumMs"])),
+        }
+    return report
+
+
+# ================= Reporting =================
+
+def print_report(report):
+    if not report:
+        print("no timing lines found")
+        return
+    for name, route in sorted(report.items()):
+        statuses = ", ".join(f"{status}: {n}" for status, n in sorted(route["statuses"].items()))
+        print(f"\n{name}  ({route['requests']} requests; {statuses})")
+        print(f"  {'stage':<28} {'n':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'share':>6}")
+        for key, row in route["stages"].items():
+            print(f"  {key:<28} {row['count']:>6} {row['p50Ms']:>9.1f} {row['p95Ms']:>9.1f} "
+                  f"{row['p99Ms']:>9.1f} {row['maxMs']:>9.1f} {row['share']:>6.0%}")
+        total = route["total"]
+        print(f"  {'total':<28} {total['count']:>6} {total['p50Ms']:>9.1f} {total['p95Ms']:>9.1f} "
+              f"{total['p99Ms']:>9.1f} {total['maxMs']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("logs", nargs="*", help="log files (default: stdin)")
+    parser.add_argument("--route", help="only this handler, e.g. get-pricing")
+    parser.add_argument("--stage", help="only this stage (and its sub-stages, e.g. page)")
+    parser.add_argument("--json", help="write the full report here")
+    args = parser.parse_args()
+
+    report = aggregate(timing_records(read_lines(args.logs)), args.route, args.stage)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ import { Label } from '@/components/ui/label'
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card'
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select'
 import { formatCurrency, formatPercent } from '@/lib/utils'
-import { validateFormBeforeSubmit } from '@/lib/PricingLogic'
+import { validateFormBeforeSubmit, getTargetPricing, buildPPPIndex, decodeColumnarRateOptions, filterRateOptionsByPrice as filterByPrice, type TargetPricingOption } from '@/lib/PricingLogic'
 
 interface LoanData {
   // Loan Information
@@ -93,6 +93,8 @@ interface RateOption {
   cashToClose?: number
   status?: string
   adjustments?: Adjustment[]
+  pppMonths?: number
+  hasPPP?: boolean
 }
 
 interface Program {
@@ -121,6 +123,10 @@ interface PricingResult {
   apiError?: string
   totalPrograms?: number
   filterApplied?: string
+  // Program indices per PPP term in months ('none' when no term is named)
+  pppIndex?: Record<string, number[]>
+  // Re-priced in-process from learned LLPAs; the live result replaces it
+  indicative?: boolean
   debug?: {
     rawProgramsFound: number
     rawRateOptionsFound: number
@@ -167,12 +173,56 @@ const safeNumber = (value: unknown, fallback: number = 0): number => {
   return fallback
 }
 
+// Read an NDJSON response body, handing each parsed line to onLine as soon as it arrives
+const readNdjson = async (body: ReadableStream<Uint8Array>, onLine: (value: any) => void) => {
+  const reader = body.getReader()
+  const decoder = new TextDecoder()
+  let buffered = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    buffered += decoder.decode(value, { stream: !done })
+    let newline = buffered.indexOf('\n')
+    while (newline !== -1) {
+      const line = buffered.slice(0, newline).trim()
+      buffered = buffered.slice(newline + 1)
+      if (line) onLine(JSON.parse(line))
+      newline = buffered.indexOf('\n')
+    }
+    if (done) break
+  }
+  if (buffered.trim()) onLine(JSON.parse(buffered))
+}
+
 // Sanitize and validate pricing result from API
 const sanitizePricingResult = (data: unknown): PricingResult | null => {
   if (!data || typeof data !== 'object') return null
 
   const raw = data as Record<string, unknown>
 
+  const sanitizeAdjustments = (list: unknown[]): Adjustment[] => list.map((adj: any) => ({
+    description: String(adj.description || ''),
+    amount: safeNumber(adj.amount),
+    rateAdj: safeNumber(adj.rateAdj)
+  }))
+
+  // ?adjustments=table responses list each LLPA template's adjustments once and rate
+  // options name theirs by adjustmentsRef: sanitize each entry once and share the array
+  const adjustmentTable: Record<string, Adjustment[]> = {}
+  if (raw.adjustmentTable && typeof raw.adjustmentTable === 'object') {
+    for (const [id, list] of Object.entries(raw.adjustmentTable as Record<string, unknown>)) {
+      if (Array.isArray(list)) adjustmentTable[id] = sanitizeAdjustments(list)
+    }
+  }
+
+  // ?encoding=columnar responses carry each program's rate options as columns: the price
+  // filter runs over the decoded columns and only options the UI shows (99.000-101.000)
+  // become row objects
+  const rateOptionRows = (rateOptions: unknown): any[] => {
+    if (Array.isArray(rateOptions)) return rateOptions
+    const columns = decodeColumnarRateOptions(rateOptions)
+    return columns ? filterByPrice(columns).toArray() : []
+  }
+
   // Sanitize programs array
   let programs: Program[] | undefined
   if (Array.isArray(raw.programs)) {
@@ -182,25 +232,32 @@ const sanitizePricingResult = (data: unknown): PricingResult | null => {
         name: String(p.name || 'Unknown Program'),
         parRate: safeNumber(p.parRate),
         parPoints: safeNumber(p.parPoints),
-        rateOptions: Array.isArray(p.rateOptions)
-          ? p.rateOptions
-              .filter((o): o is Record<string, unknown> => o && typeof o === 'object')
-              .map(o => ({
-                rate: safeNumber(o.rate),
-                points: safeNumber(o.points),
-                apr: safeNumber(o.apr),
-                description: String(o.description || ''),
-                payment: safeNumber(o.payment),
-                adjustments: Array.isArray(o.adjustments) ? o.adjustments.map((adj: any) => ({
-                  description: String(adj.description || ''),
-                  amount: safeNumber(adj.amount),
-                  rateAdj: safeNumber(adj.rateAdj)
-                })) : []
-              }))
-          : []
+        rateOptions: rateOptionRows(p.rateOptions)
+          .filter((o): o is Record<string, unknown> => o && typeof o === 'object')
+          .map(o => ({
+            rate: safeNumber(o.rate),
+            points: safeNumber(o.points),
+            apr: safeNumber(o.apr),
+            description: String(o.description || ''),
+            payment: safeNumber(o.payment),
+            price: o.price === undefined ? undefined : safeNumber(o.price),
+            pppMonths: typeof o.pppMonths === 'number' ? o.pppMonths : undefined,
+            hasPPP: o.hasPPP === true,
+            adjustments: Array.isArray(o.adjustments)
+              ? sanitizeAdjustments(o.adjustments)
+              : (typeof o.adjustmentsRef === 'string' && adjustmentTable[o.adjustmentsRef]) || []
+          }))
       }))
   }
 
+  // The API's PPP-term index holds program positions, so it only applies when every
+  // program survived sanitizing; otherwise it is rebuilt from the descriptions
+  const pppIndex = programs && raw.pppIndex && typeof raw.pppIndex === 'object' &&
+    Array.isArray(raw.programs) && programs.length === raw.programs.length &&
+    Object.values(raw.pppIndex).every(list => Array.isArray(list) && list.every(p => Number.isInteger(p)))
+    ? raw.pppIndex as Record<string, number[]>
+    : programs && buildPPPIndex(programs)
+
   return {
     rate: safeNumber(raw.rate, 0),
     apr: safeNumber(raw.apr, 0),
@@ -212,7 +269,8 @@ const sanitizePricingResult = (data: unknown): PricingResult | null => {
     programs,
     apiError: typeof raw.apiError === 'string' ? raw.apiError : undefined,
     totalPrograms: typeof raw.totalPrograms === 'number' ? raw.totalPrograms : undefined,
-    filterApplied: typeof raw.filterApplied === 'string' ? raw.filterApplied : undefined
+    filterApplied: typeof raw.filterApplied === 'string' ? raw.filterApplied : undefined,
+    pppIndex: pppIndex || undefined
   }
 }
 
@@ -496,34 +554,14 @@ export default function App() {
       dscrValue: isDSCR ? calculatedDSCR.ratio : undefined
     }
 
-    // Fire ML + LP in PARALLEL (LP takes ~20-30s via headless browser)
-    const bodyJson = JSON.stringify(requestBody)
-
-    // LP fires immediately — no waiting for ML
-    fetch('/api/get-lp-pricing', {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: bodyJson,
-    })
-      .then(r => r.json())
-      .then(lpData => {
-        console.log('[LP] rates:', lpData.data?.rateOptions?.length || 0)
-        if (lpData.success && lpData.data) {
-          setLpResult(lpData.data)
-        } else {
-          setLpResult({ rateOptions: [], error: lpData.error || 'No rates returned' })
-        }
-      })
-      .catch(err => {
-        console.error('[LP] Error:', err)
-        setLpResult({ rateOptions: [], error: 'LP pricing unavailable' })
-      })
-      .finally(() => setLpLoading(false))
-
-    // ML fires in parallel (skip for 5+ units — ML doesn't support them)
+    // ML + LP in ONE streamed request: /api/quote starts both server-side and sends each
+    // provider's result as its own NDJSON line the moment it lands, so ML (~2s) renders
+    // while LP (~20-30s via headless browser) is still running
     const is5PlusUnits = formData.propertyType === '5-9unit'
+    let mlPending = !is5PlusUnits
+    let lpPending = true
     if (is5PlusUnits) {
-      // Set minimal result so LP/LN sections still render
+      // ML doesn't support 5+ units: set minimal result so LP/LN sections still render
       setResult({
         programs: [],
         totalPrograms: 0,
@@ -531,31 +569,59 @@ export default function App() {
         mlSkipped: true,
       } as any)
       setIsLoading(false)
-    } else {
-      try {
-        const mlResponse = await fetch('/api/get-pricing', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: bodyJson,
-        })
-        const mlData = await mlResponse.json()
-
-        if (mlData.success) {
-          const sanitizedResult = sanitizePricingResult(mlData.data)
+    }
+
+    const applyQuote = (event: any) => {
+      if (event.provider === 'lp') {
+        lpPending = false
+        console.log('[LP] rates:', event.data?.rateOptions?.length || 0)
+        if (event.success && event.data) {
+          setLpResult(event.data)
+        } else {
+          setLpResult({ rateOptions: [], error: event.error || 'No rates returned' })
+        }
+        setLpLoading(false)
+      } else if (event.provider === 'ml' && event.indicative) {
+        // What-if re-priced from learned LLPAs: show it while MeridianLink confirms
+        const sanitizedResult = event.success ? sanitizePricingResult(event.data) : null
+        if (sanitizedResult && mlPending) setResult({ ...sanitizedResult, indicative: true })
+      } else if (event.provider === 'ml') {
+        mlPending = false
+        if (event.success) {
+          const sanitizedResult = sanitizePricingResult(event.data)
           if (sanitizedResult) {
             setResult(sanitizedResult)
           } else {
+            setResult(null)
             setError('Invalid pricing response from server')
           }
         } else {
-          setError(mlData.error || 'Pricing request failed')
+          setResult(null)
+          setError(event.error || 'Pricing request failed')
         }
-      } catch (err) {
-        setError(err instanceof Error ? err.message : 'Failed to get pricing')
-      } finally {
         setIsLoading(false)
       }
     }
+
+    try {
+      const response = await fetch(`/api/quote?providers=${is5PlusUnits ? 'lp' : 'ml,lp'}&adjustments=table&encoding=columnar`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(requestBody),
+      })
+      if (!response.ok || !response.body) throw new Error(`Quote request failed: HTTP ${response.status}`)
+      await readNdjson(response.body, applyQuote)
+    } catch (err) {
+      console.error('[quote] Error:', err)
+      if (mlPending) {
+        setResult(null)
+        setError(err instanceof Error ? err.message : 'Failed to get pricing')
+      }
+      if (lpPending) setLpResult({ rateOptions: [], error: 'LP pricing unavailable' })
+    } finally {
+      setIsLoading(false)
+      setLpLoading(false)
+    }
   }
 
   // ================= Loannex PIN + Pricing =================
@@ -620,115 +686,10 @@ export default function App() {
     })
   }
 
-  // Type for target pricing option
-  type TargetPricingOption = {
-    rate: number
-    points: number
-    apr: number
-    price: number
-    payment: number
-    programName: string
-    adjustments: Adjustment[]
-  }
-
   // Find the TARGET PRICING - Always prefer 5YR PPP (60MO) for DSCR/Investment (best rates)
-  const getTargetPricing = (): TargetPricingOption | null => {
-    if (!result?.programs || !Array.isArray(result.programs)) return null
-
-    // CRITICAL: PPP is ONLY allowed for Investment properties
-    const isPPPAllowed = formData.occupancyType === 'investment'
-    let targetOption: TargetPricingOption | null = null
-    let closestDistance = Infinity
-
-    // Helper to check if program has PPP (but 0MO PPP or 0 YR PPP means NO prepay, so allow those)
-    const hasPPPInName = (text: string): boolean => {
-      const upper = text.toUpperCase()
-      // 0MO PPP or 0 YR PPP means NO prepayment penalty - these are OK for all property types
-      if (upper.includes('0MO PPP') || upper.includes('0 YR PPP') || upper.includes('0YR PPP')) {
-        return false
-      }
-      return upper.includes(' PPP') || upper.includes('YR PPP') || /\d\s*YR\s*PPP/i.test(upper)
-    }
-
-    result.programs.forEach(program => {
-      if (!program || !Array.isArray(program.rateOptions)) return
-      const programName = program.name || 'Unknown'
-
-      program.rateOptions.forEach(opt => {
-        if (!opt) return
-        const desc = (opt.description || programName).toUpperCase()
-        const hasPPP = hasPPPInName(desc)
-
-        // For Primary/Secondary homes: SKIP any PPP programs entirely
-        if (!isPPPAllowed && hasPPP) return
-
-        // For Investment properties: match 5YR/60MO PPP (best rates for DSCR)
-        if (isPPPAllowed) {
-          const matchesPPP = desc.includes('5 YR PPP') || desc.includes('5YR PPP') || desc.includes('60MO PPP')
-          if (!matchesPPP) return
-        }
-
-        const points = safeNumber(opt.points)
-        const price = 100 - points
-
-        // Only consider prices within range
-        if (price >= 99.0 && price <= 101.0) {
-          const distance = Math.abs(price - 100)
-          if (distance < closestDistance) {
-            closestDistance = distance
-            targetOption = {
-              rate: safeNumber(opt.rate),
-              points: points,
-              apr: safeNumber(opt.apr),
-              price: price,
-              payment: safeNumber(opt.payment),
-              programName: opt.description || programName,
-              adjustments: opt.adjustments || []
-            }
-          }
-        }
-      })
-    })
-
-    // Fallback: if no match found, find closest to price 100 (still respecting PPP rules)
-    if (!targetOption) {
-      result.programs.forEach(program => {
-        if (!program || !Array.isArray(program.rateOptions)) return
-        const programName = program.name || 'Unknown'
-
-        program.rateOptions.forEach(opt => {
-          if (!opt) return
-          const desc = (opt.description || programName).toUpperCase()
-          const hasPPP = hasPPPInName(desc)
-
-          // Still skip PPP programs for Primary/Secondary in fallback
-          if (!isPPPAllowed && hasPPP) return
-
-          const points = safeNumber(opt.points)
-          const price = 100 - points
-          if (price >= 99.0 && price <= 101.0) {
-            const distance = Math.abs(price - 100)
-            if (distance < closestDistance) {
-              closestDistance = distance
-              targetOption = {
-                rate: safeNumber(opt.rate),
-                points: points,
-                apr: safeNumber(opt.apr),
-                price: price,
-                payment: safeNumber(opt.payment),
-                programName: opt.description || programName,
-                adjustments: opt.adjustments || []
-              }
-            }
-          }
-        })
-      })
-    }
-
-    return targetOption
-  }
-
-  const targetPricing: TargetPricingOption | null = result ? getTargetPricing() : null
+  const targetPricing: TargetPricingOption | null = result
+    ? getTargetPricing(result.programs, formData.occupancyType, '5year', undefined, result.pppIndex)
+    : null
 
   return (
     <div className="min-h-screen bg-gray-50">
@@ -1338,9 +1299,15 @@ export default function App() {
                         <CheckCircle2 className="w-5 h-5 text-green-600" />Pricing Result
                       </CardTitle>
                       <div className="flex items-center gap-2">
-                        <div className="flex items-center gap-1.5 text-xs text-green-600 bg-green-50 px-2 py-1 rounded-md">
-                          <CheckCircle2 className="w-3 h-3" />Live Pricing
-                        </div>
+                        {result.indicative ? (
+                          <div className="flex items-center gap-1.5 text-xs text-amber-600 bg-amber-50 px-2 py-1 rounded-md">
+                            <Loader2 className="w-3 h-3 animate-spin" />Indicative — confirming
+                          </div>
+                        ) : (
+                          <div className="flex items-center gap-1.5 text-xs text-green-600 bg-green-50 px-2 py-1 rounded-md">
+                            <CheckCircle2 className="w-3 h-3" />Live Pricing
+                          </div>
+                        )}
                         {result.apiError && (
                           <div className="flex items-center gap-1.5 text-xs text-red-600 bg-red-50 px-2 py-1 rounded-md">
                             <AlertCircle className="w-3 h-3" />API Error
@@ -5,6 +5,8 @@
  * Contains all pricing calculations, filters, and state management
  */
 
+import { indexedDbHistoryBackend } from './pricingHistoryDb'
+
 // ============================================================================
 // TYPE DEFINITIONS
 // ============================================================================
@@ -40,6 +42,14 @@ export interface RateOption {
   cashToClose?: number
   status?: string
   adjustments?: Adjustment[]
+  // ?adjustments=table responses: key into PricingResult.adjustmentTable
+  adjustmentsRef?: string
+  // Classification fields the API emits (set only when true / named)
+  pppMonths?: number
+  hasPPP?: boolean
+  isDSCR?: boolean
+  isBankStatement?: boolean
+  isCashout?: boolean
 }
 
 export interface Program {
@@ -65,6 +75,10 @@ export interface PricingResult {
   ltvRatio: number
   source?: string
   programs?: Program[]
+  // ?adjustments=table responses: adjustments by LLPA template ID
+  adjustmentTable?: Record<string, Adjustment[]>
+  // Program indices per PPP term in months ('none' when no term is named)
+  pppIndex?: Record<string, number[]>
   apiError?: string
   totalPrograms?: number
   filterApplied?: string
@@ -113,10 +127,93 @@ export interface PricingMemoryEntry {
 // ============================================================================
 // PRICING MEMORY STORE
 // ============================================================================
+// Pricing history, newest first. Entries are indexed by id and by a similarity bucket
+// (occupancy, purpose, LTV / FICO / loan-amount bands) so findSimilar only visits the
+// bands a query's tolerance can reach, and stats come from running totals. A
+// PricingHistoryBackend (IndexedDB in the browser, see pricingHistoryDb.ts; SQLite on
+// the server, see api/_lib/pricing-history-sqlite.ts) makes the history persistent.
+
+export interface PricingHistoryBackend {
+  // Up to `limit` most recent entries, oldest first
+  load(limit: number): Promise<PricingMemoryEntry[]>
+  put(entry: PricingMemoryEntry): Promise<void>
+  delete(ids: string[]): Promise<void>
+  clear(): Promise<void>
+}
+
+export interface PricingMemoryOptions {
+  maxEntries?: number
+  backend?: PricingHistoryBackend
+}
+
+// Band widths: LTV 5 points, FICO 20 points, loan amount 10% steps
+const LTV_BAND = 5
+const FICO_BAND = 20
+const AMOUNT_BAND = Math.log(1.1)
 
-class PricingMemoryStore {
-  private entries: PricingMemoryEntry[] = []
-  private maxEntries: number = 100
+const ltvBand = (ltv: number) => Math.floor(ltv / LTV_BAND)
+const ficoBand = (score: number) => Math.floor(score / FICO_BAND)
+const amountBand = (amount: number) => (amount > 0 ? Math.floor(Math.log(amount) / AMOUNT_BAND) : 0)
+
+const groupKey = (s: LoanScenario) => `${s.occupancyType}|${s.loanPurpose}`
+const bandKey = (ltv: number, fico: number, amount: number) => `${ltv}|${fico}|${amount}`
+
+// Bands covering value * (1 ± tolerance)
+const bandRange = (value: number, tolerance: number, band: (v: number) => number): [number, number] => {
+  const a = band(value * (1 - tolerance))
+  const b = band(value * (1 + tolerance))
+  return a <= b ? [a, b] : [b, a]
+}
+
+const isSuccessful = (entry: PricingMemoryEntry) => !!entry.result && !entry.result.apiError
+
+export class PricingMemoryStore {
+  private maxEntries: number
+  private backend: PricingHistoryBackend | null = null
+  // Oldest first from `head`; evicted slots are compacted away periodically
+  private order: PricingMemoryEntry[] = []
+  private head = 0
+  private byId = new Map<string, PricingMemoryEntry>()
+  // occupancy|purpose -> band key -> entries
+  private buckets = new Map<string, Map<string, Set<PricingMemoryEntry>>>()
+  private seq = new WeakMap<PricingMemoryEntry, number>()
+  private nextSeq = 0
+  private totals = { duration: 0, successful: 0, successfulRate: 0 }
+  // Backend writes, applied in order
+  private writes: Promise<void> = Promise.resolve()
+
+  constructor(options: PricingMemoryOptions = {}) {
+    this.maxEntries = options.maxEntries ?? 10000
+    if (options.backend) {
+      this.attach(options.backend).catch(error => console.warn('[pricingMemory] history load failed:', error))
+    }
+  }
+
+  /**
+   * Persist to `backend`, loading the history it already holds (older than anything
+   * added since)
+   */
+  async attach(backend: PricingHistoryBackend): Promise<void> {
+    this.backend = backend
+    const stored = await backend.load(this.maxEntries)
+    const added = this.order.slice(this.head)
+    const addedIds = new Set(added.map(entry => entry.id))
+    this.reset()
+    for (const entry of stored) {
+      if (!this.byId.has(entry.id) && !addedIds.has(entry.id)) {
+        this.insert({ ...entry, timestamp: new Date(entry.timestamp) })
+      }
+    }
+    for (const entry of added) this.insert(entry)
+    this.trim()
+  }
+
+  /**
+   * Resolves once every backend write so far has landed
+   */
+  flush(): Promise<void> {
+    return this.writes
+  }
 
   /**
    * Add a new pricing entry to memory
@@ -133,12 +230,9 @@ class PricingMemoryStore {
       duration
     }
 
-    this.entries.unshift(entry)
-
-    // Trim to max entries
-    if (this.entries.length > this.maxEntries) {
-      this.entries = this.entries.slice(0, this.maxEntries)
-    }
+    this.insert(entry)
+    this.persist(backend => backend.put(entry))
+    this.trim()
 
     return id
   }
@@ -147,39 +241,63 @@ class PricingMemoryStore {
    * Get all pricing history entries
    */
   getAll(): PricingMemoryEntry[] {
-    return [...this.entries]
+    return this.order.slice(this.head).reverse()
   }
 
   /**
    * Get entry by ID
    */
   getById(id: string): PricingMemoryEntry | undefined {
-    return this.entries.find(e => e.id === id)
+    return this.byId.get(id)
   }
 
   /**
    * Get recent entries (last N)
    */
   getRecent(count: number = 10): PricingMemoryEntry[] {
-    return this.entries.slice(0, count)
+    const from = Math.max(this.head, this.order.length - count)
+    return this.order.slice(from).reverse()
   }
 
   /**
    * Find similar scenarios in history
    */
   findSimilar(scenario: LoanScenario, tolerance: number = 0.1): PricingMemoryEntry[] {
-    return this.entries.filter(entry => {
-      const s = entry.scenario
-      const ltvDiff = Math.abs(s.ltv - scenario.ltv) / scenario.ltv
-      const scoreDiff = Math.abs(s.creditScore - scenario.creditScore) / scenario.creditScore
-      const amountDiff = Math.abs(s.loanAmount - scenario.loanAmount) / scenario.loanAmount
-
-      return ltvDiff <= tolerance &&
-             scoreDiff <= tolerance &&
-             amountDiff <= tolerance &&
-             s.occupancyType === scenario.occupancyType &&
-             s.loanPurpose === scenario.loanPurpose
-    })
+    const group = this.buckets.get(groupKey(scenario))
+    if (!group) return []
+
+    const [ltvLo, ltvHi] = bandRange(scenario.ltv, tolerance, ltvBand)
+    const [ficoLo, ficoHi] = bandRange(scenario.creditScore, tolerance, ficoBand)
+    const [amountLo, amountHi] = bandRange(scenario.loanAmount, tolerance, amountBand)
+    const cells = (ltvHi - ltvLo + 1) * (ficoHi - ficoLo + 1) * (amountHi - amountLo + 1)
+
+    const candidates: PricingMemoryEntry[] = []
+    if (!Number.isFinite(cells) || cells > group.size) {
+      // Wide tolerance: every band of the group is in reach anyway
+      for (const cell of group.values()) candidates.push(...cell)
+    } else {
+      for (let l = ltvLo; l <= ltvHi; l++) {
+        for (let f = ficoLo; f <= ficoHi; f++) {
+          for (let a = amountLo; a <= amountHi; a++) {
+            const cell = group.get(bandKey(l, f, a))
+            if (cell) candidates.push(...cell)
+          }
+        }
+      }
+    }
+
+    return candidates
+      .filter(entry => {
+        const s = entry.scenario
+        const ltvDiff = Math.abs(s.ltv - scenario.ltv) / scenario.ltv
+        const scoreDiff = Math.abs(s.creditScore - scenario.creditScore) / scenario.creditScore
+        const amountDiff = Math.abs(s.loanAmount - scenario.loanAmount) / scenario.loanAmount
+
+        return ltvDiff <= tolerance &&
+               scoreDiff <= tolerance &&
+               amountDiff <= tolerance
+      })
+      .sort((a, b) => (this.seq.get(b) ?? 0) - (this.seq.get(a) ?? 0))
   }
 
   /**
@@ -191,20 +309,17 @@ class PricingMemoryStore {
     avgRate: number
     successRate: number
   } {
-    const successful = this.entries.filter(e => e.result && !e.result.apiError)
-    const avgDuration = this.entries.length > 0
-      ? this.entries.reduce((sum, e) => sum + e.duration, 0) / this.entries.length
-      : 0
-    const avgRate = successful.length > 0
-      ? successful.reduce((sum, e) => sum + (e.targetPricing?.rate || 0), 0) / successful.length
-      : 0
+    const total = this.byId.size
+    const { duration, successful, successfulRate } = this.totals
+    const avgDuration = total > 0 ? duration / total : 0
+    const avgRate = successful > 0 ? successfulRate / successful : 0
 
     return {
-      totalQueries: this.entries.length,
+      totalQueries: total,
       avgDuration: Math.round(avgDuration),
       avgRate: Math.round(avgRate * 1000) / 1000,
-      successRate: this.entries.length > 0
-        ? Math.round((successful.length / this.entries.length) * 100)
+      successRate: total > 0
+        ? Math.round((successful / total) * 100)
         : 0
     }
   }
@@ -213,19 +328,91 @@ class PricingMemoryStore {
    * Clear all entries
    */
   clear(): void {
-    this.entries = []
+    this.reset()
+    this.persist(backend => backend.clear())
   }
 
   /**
    * Export to JSON
    */
   export(): string {
-    return JSON.stringify(this.entries, null, 2)
+    return JSON.stringify(this.getAll(), null, 2)
+  }
+
+  private insert(entry: PricingMemoryEntry): void {
+    const s = entry.scenario
+    this.order.push(entry)
+    this.byId.set(entry.id, entry)
+    this.seq.set(entry, this.nextSeq++)
+
+    const key = groupKey(s)
+    let group = this.buckets.get(key)
+    if (!group) this.buckets.set(key, group = new Map())
+    const cellKey = bandKey(ltvBand(s.ltv), ficoBand(s.creditScore), amountBand(s.loanAmount))
+    let cell = group.get(cellKey)
+    if (!cell) group.set(cellKey, cell = new Set())
+    cell.add(entry)
+
+    this.totals.duration += entry.duration
+    if (isSuccessful(entry)) {
+      this.totals.successful++
+      this.totals.successfulRate += entry.targetPricing?.rate || 0
+    }
+  }
+
+  // Evict the oldest entries past maxEntries
+  private trim(): void {
+    const evicted: string[] = []
+    while (this.byId.size > this.maxEntries) {
+      const entry = this.order[this.head++]
+      evicted.push(entry.id)
+      this.remove(entry)
+    }
+    if (this.head > 1024 && this.head * 2 > this.order.length) {
+      this.order = this.order.slice(this.head)
+      this.head = 0
+    }
+    if (evicted.length > 0) this.persist(backend => backend.delete(evicted))
+  }
+
+  private remove(entry: PricingMemoryEntry): void {
+    const s = entry.scenario
+    this.byId.delete(entry.id)
+    const group = this.buckets.get(groupKey(s))
+    const cellKey = bandKey(ltvBand(s.ltv), ficoBand(s.creditScore), amountBand(s.loanAmount))
+    const cell = group?.get(cellKey)
+    cell?.delete(entry)
+    if (cell && cell.size === 0) group!.delete(cellKey)
+    if (group && group.size === 0) this.buckets.delete(groupKey(s))
+
+    this.totals.duration -= entry.duration
+    if (isSuccessful(entry)) {
+      this.totals.successful--
+      this.totals.successfulRate -= entry.targetPricing?.rate || 0
+    }
+  }
+
+  private reset(): void {
+    this.order = []
+    this.head = 0
+    this.byId.clear()
+    this.buckets.clear()
+    this.totals = { duration: 0, successful: 0, successfulRate: 0 }
+  }
+
+  private persist(write: (backend: PricingHistoryBackend) => Promise<void>): void {
+    const backend = this.backend
+    if (!backend) return
+    this.writes = this.writes
+      .then(() => write(backend))
+      .catch(error => console.warn('[pricingMemory] history write failed:', error))
   }
 }
 
-// Singleton instance
-export const pricingMemory = new PricingMemoryStore()
+// Singleton instance, kept in IndexedDB when the browser has it
+export const pricingMemory = new PricingMemoryStore(
+  typeof indexedDB !== 'undefined' ? { backend: indexedDbHistoryBackend() } : {}
+)
 
 // ============================================================================
 // UTILITY FUNCTIONS
@@ -339,6 +526,53 @@ export const hasPPPInName = (text: string): boolean => {
   return upper.includes(' PPP') || upper.includes('YR PPP') || /\d\s*YR\s*PPP/i.test(upper)
 }
 
+/**
+ * PPP term in months named in a description ("5 YR PPP" and "60MO PPP" are 60, "0MO PPP"
+ * is 0), undefined when none is named
+ */
+export const getPPPMonths = (text: string): number | undefined => {
+  const term = /(\d+)\s*(YR|MO)S?\s*PPP/i.exec(text)
+  return term ? Number(term[1]) * (term[2].toUpperCase() === 'YR' ? 12 : 1) : undefined
+}
+
+/**
+ * Program indices per PPP term, like the API's pppIndex, for results that don't carry
+ * one. Classifies each distinct description once and sets the rate options' pppMonths,
+ * hasPPP and price on the way (columnar programs keep theirs with their columns).
+ */
+export const buildPPPIndex = (programs: (Program | ColumnarProgram)[]): Record<string, number[]> => {
+  const classes = new Map<string, { pppMonths?: number; hasPPP: boolean }>()
+  const index: Record<string, number[]> = {}
+  const list = (term: string, p: number) => {
+    const listed = (index[term] ||= [])
+    if (listed[listed.length - 1] !== p) listed.push(p)
+  }
+  programs.forEach((program, p) => {
+    if (!program) return
+    if (program.rateOptions instanceof ColumnarRateOptions) {
+      for (const months of new Set(program.rateOptions.pppTerms(program.name).months)) {
+        list(isNaN(months) ? 'none' : String(months), p)
+      }
+      return
+    }
+    if (!Array.isArray(program.rateOptions)) return
+    program.rateOptions.forEach(opt => {
+      if (!opt) return
+      const desc = opt.description || program.name || 'Unknown'
+      let cls = classes.get(desc)
+      if (!cls) {
+        cls = { pppMonths: getPPPMonths(desc), hasPPP: hasPPPInName(desc) }
+        classes.set(desc, cls)
+      }
+      opt.price = 100 - safeNumber(opt.points)
+      opt.pppMonths = cls.pppMonths
+      opt.hasPPP = cls.hasPPP
+      list(cls.pppMonths === undefined ? 'none' : String(cls.pppMonths), p)
+    })
+  })
+  return index
+}
+
 /**
  * Check if PPP is allowed based on occupancy type
  */
@@ -346,6 +580,162 @@ export const isPPPAllowed = (occupancyType: string): boolean => {
   return occupancyType === 'investment'
 }
 
+// ============================================================================
+// COLUMNAR RATE OPTIONS
+// ============================================================================
+// ?encoding=columnar responses send each program's rate options as parallel columns
+// (api/_lib/columnar.ts). The numeric columns the filters read are decoded on first use
+// into Float64Arrays (NaN where a row has no value), the PPP terms into typed arrays per
+// row, classifying each dictionary entry once. filterRateOptionsByPrice, sortRateOptions
+// and getTargetPricing work on those and return views (Int32Array row selections sharing
+// the columns); row objects are only built, by at() / toArray(), for the options shown.
+
+type EncodedColumn = unknown[] | { dict: string[]; codes: number[] } | { flags: number[] }
+
+interface ColumnarData {
+  length: number
+  columns: Record<string, EncodedColumn>
+  numbers: Map<string, Float64Array | undefined>
+  // PPP term per row (NaN when none named) and penalty flag, built on first use
+  ppp?: { months: Float64Array; hasPPP: Uint8Array }
+}
+
+export type ColumnarProgram = Omit<Program, 'rateOptions'> & { rateOptions: ColumnarRateOptions }
+
+const isEncodedColumn = (column: unknown, length: number): column is EncodedColumn => {
+  if (Array.isArray(column)) return column.length === length
+  if (!column || typeof column !== 'object') return false
+  const { dict, codes, flags } = column as { dict?: unknown; codes?: unknown; flags?: unknown }
+  if (Array.isArray(dict)) return Array.isArray(codes) && codes.length === length
+  return Array.isArray(flags) && flags.length === length
+}
+
+export class ColumnarRateOptions {
+  readonly length: number
+  private readonly data: ColumnarData
+  // Column rows of this view, in order; null for every row as sent
+  private readonly rows: Int32Array | null
+
+  constructor(data: ColumnarData, rows: Int32Array | null = null) {
+    this.data = data
+    this.rows = rows
+    this.length = rows ? rows.length : data.length
+  }
+
+  // Column row of the i-th option of this view
+  row(i: number): number {
+    return this.rows ? this.rows[i] : i
+  }
+
+  // Numeric column, indexed by column row; undefined when the response has none
+  numbers(field: string): Float64Array | undefined {
+    const { length, columns, numbers } = this.data
+    if (numbers.has(field)) return numbers.get(field)
+    const column = columns[field]
+    let values: Float64Array | undefined
+    if (Array.isArray(column)) {
+      values = new Float64Array(length)
+      for (let row = 0; row < length; row++) {
+        const value = column[row]
+        if (typeof value === 'number') values[row] = value
+        else if (value === null) values[row] = NaN
+        else {
+          values = undefined
+          break
+        }
+      }
+    }
+    numbers.set(field, values)
+    return values
+  }
+
+  // View of the options whose column row passes `keep`, in this view's order
+  where(keep: (row: number) => boolean): ColumnarRateOptions {
+    const rows: number[] = []
+    for (let i = 0; i < this.length; i++) {
+      const row = this.row(i)
+      if (keep(row)) rows.push(row)
+    }
+    return new ColumnarRateOptions(this.data, Int32Array.from(rows))
+  }
+
+  // View sorted by `compare` over column rows (stable)
+  orderBy(compare: (a: number, b: number) => number): ColumnarRateOptions {
+    const rows = this.rows ? this.rows.slice() : Int32Array.from({ length: this.length }, (_, i) => i)
+    return new ColumnarRateOptions(this.data, rows.sort(compare))
+  }
+
+  /**
+   * PPP term (months) and penalty flag per column row: the API's pppMonths / hasPPP
+   * columns when it sent them, else each distinct description classified once
+   * (`programName` standing in for rows without one)
+   */
+  pppTerms(programName: string): { months: Float64Array; hasPPP: Uint8Array } {
+    if (this.data.ppp) return this.data.ppp
+    const { length, columns } = this.data
+    const months = new Float64Array(length).fill(NaN)
+    const hasPPP = new Uint8Array(length)
+    const flagColumn = columns.hasPPP
+    if (columns.pppMonths || flagColumn) {
+      const monthsColumn = this.numbers('pppMonths')
+      if (monthsColumn) months.set(monthsColumn)
+      if (flagColumn && 'flags' in flagColumn) {
+        for (let row = 0; row < length; row++) hasPPP[row] = flagColumn.flags[row] === 1 ? 1 : 0
+      }
+    } else {
+      const description = columns.description
+      const dict = description && 'dict' in description ? description : null
+      const byCode = new Map<number, [number, number]>()
+      for (let row = 0; row < length; row++) {
+        const code = dict ? dict.codes[row] : -1
+        let cls = byCode.get(code)
+        if (!cls) {
+          const text = (dict && dict.dict[code]) || programName || 'Unknown'
+          cls = [getPPPMonths(text) ?? NaN, hasPPPInName(text) ? 1 : 0]
+          byCode.set(code, cls)
+        }
+        months[row] = cls[0]
+        hasPPP[row] = cls[1]
+      }
+    }
+    this.data.ppp = { months, hasPPP }
+    return this.data.ppp
+  }
+
+  // The i-th option of this view as a row object
+  at(i: number): RateOption {
+    const row = this.row(i)
+    const option: Record<string, unknown> = {}
+    for (const [field, column] of Object.entries(this.data.columns)) {
+      let value: unknown
+      if (Array.isArray(column)) value = column[row]
+      else if ('dict' in column) value = column.dict[column.codes[row]]
+      else value = column.flags[row] === -1 ? undefined : column.flags[row] === 1
+      if (value !== undefined && value !== null) option[field] = value
+    }
+    return option as unknown as RateOption
+  }
+
+  toArray(): RateOption[] {
+    return Array.from({ length: this.length }, (_, i) => this.at(i))
+  }
+}
+
+/**
+ * Decode one program's rateOptions from an ?encoding=columnar response; null when the
+ * value is not a columnar table (e.g. the default rows encoding)
+ */
+export const decodeColumnarRateOptions = (encoded: unknown): ColumnarRateOptions | null => {
+  if (!encoded || typeof encoded !== 'object' || Array.isArray(encoded)) return null
+  const { length, columns } = encoded as { length?: unknown; columns?: unknown }
+  if (typeof length !== 'number' || !columns || typeof columns !== 'object') return null
+  const valid: Record<string, EncodedColumn> = {}
+  for (const [field, column] of Object.entries(columns)) {
+    if (isEncodedColumn(column, length)) valid[field] = column
+  }
+  return new ColumnarRateOptions({ length, columns: valid, numbers: new Map() })
+}
+
 // ============================================================================
 // PRICING FILTERS
 // ============================================================================
@@ -353,15 +743,22 @@ export const isPPPAllowed = (occupancyType: string): boolean => {
 /**
  * Filter rate options by price range (99.000 to 101.000)
  */
-export const filterRateOptionsByPrice = (
-  rateOptions: RateOption[],
+export const filterRateOptionsByPrice = <T extends RateOption[] | ColumnarRateOptions>(
+  rateOptions: T,
   minPrice: number = 99.0,
   maxPrice: number = 101.0
-): RateOption[] => {
-  return rateOptions.filter(opt => {
+): T => {
+  if (rateOptions instanceof ColumnarRateOptions) {
+    const points = rateOptions.numbers('points')
+    return rateOptions.where(row => {
+      const price = 100 - (points?.[row] || 0)
+      return price >= minPrice && price <= maxPrice
+    }) as T
+  }
+  return (rateOptions as RateOption[]).filter(opt => {
     const price = 100 - safeNumber(opt.points)
     return price >= minPrice && price <= maxPrice
-  })
+  }) as T
 }
 
 /**
@@ -394,11 +791,16 @@ export const filterProgramsByOccupancy = (
 /**
  * Sort rate options by rate (lowest first) or by price (closest to par)
  */
-export const sortRateOptions = (
-  rateOptions: RateOption[],
+export const sortRateOptions = <T extends RateOption[] | ColumnarRateOptions>(
+  rateOptions: T,
   sortBy: 'rate' | 'price' = 'rate'
-): RateOption[] => {
-  return [...rateOptions].sort((a, b) => {
+): T => {
+  if (rateOptions instanceof ColumnarRateOptions) {
+    const key = rateOptions.numbers(sortBy === 'rate' ? 'rate' : 'points')
+    const value = (row: number) => (sortBy === 'rate' ? key?.[row] || 0 : Math.abs(100 - (key?.[row] || 0) - 100))
+    return rateOptions.orderBy((a, b) => value(a) - value(b)) as T
+  }
+  return [...(rateOptions as RateOption[])].sort((a, b) => {
     if (sortBy === 'rate') {
       return safeNumber(a.rate) - safeNumber(b.rate)
     } else {
@@ -406,7 +808,40 @@ export const sortRateOptions = (
       const priceB = Math.abs(100 - safeNumber(b.points) - 100)
       return priceA - priceB
     }
-  })
+  }) as T
+}
+
+// ============================================================================
+// ADJUSTMENT TABLE
+// ============================================================================
+
+/**
+ * Adjustments of a rate option: its own, or its adjustmentsRef entry in the result's
+ * adjustment table (?adjustments=table responses)
+ */
+export const resolveAdjustments = (
+  opt: RateOption,
+  adjustmentTable?: Record<string, Adjustment[]>
+): Adjustment[] => {
+  if (opt.adjustments) return opt.adjustments
+  return (opt.adjustmentsRef && adjustmentTable?.[opt.adjustmentsRef]) || []
+}
+
+/**
+ * Give every rate option of a table-format result its `adjustments` back. Options on the
+ * same template share one array, so the expanded result stays as small as the table.
+ */
+export const expandAdjustmentTable = (result: PricingResult): PricingResult => {
+  if (!result.adjustmentTable || !result.programs) return result
+  const table = result.adjustmentTable
+  return {
+    ...result,
+    adjustmentTable: undefined,
+    programs: result.programs.map(program => ({
+      ...program,
+      rateOptions: (program.rateOptions || []).map(opt => ({ ...opt, adjustments: resolveAdjustments(opt, table) }))
+    }))
+  }
 }
 
 // ============================================================================
@@ -414,98 +849,84 @@ export const sortRateOptions = (
 // ============================================================================
 
 /**
- * Find the TARGET PRICING based on user's PPP selection (Investment only) or best non-PPP program
+ * Find the TARGET PRICING based on user's PPP selection (Investment only) or best non-PPP program.
+ * Reads the rate options' classification fields and the PPP-term index (the API's, or
+ * built here once), so an investment target only looks at programs on the selected term.
  */
 export const getTargetPricing = (
-  programs: Program[] | undefined,
+  programs: (Program | ColumnarProgram)[] | undefined,
   occupancyType: string,
-  prepayPeriod: string
+  prepayPeriod: string,
+  adjustmentTable?: Record<string, Adjustment[]>,
+  pppIndex?: Record<string, number[]>
 ): TargetPricingOption | null => {
   if (!programs || !Array.isArray(programs)) return null
 
-  const pppAllowed = isPPPAllowed(occupancyType)
-  const selectedPPP = pppAllowed ? getPPPPattern(prepayPeriod) : ''
-  let targetOption: TargetPricingOption | null = null
-  let closestDistance = Infinity
-
-  // First pass: find exact PPP match (for investment) or best non-PPP
-  programs.forEach(program => {
-    if (!program || !Array.isArray(program.rateOptions)) return
-    const programName = program.name || 'Unknown'
-
-    program.rateOptions.forEach(opt => {
-      if (!opt) return
-      const desc = (opt.description || programName).toUpperCase()
-      const hasPPP = hasPPPInName(desc)
-
-      // For Primary/Secondary homes: SKIP any PPP programs entirely
-      if (!pppAllowed && hasPPP) return
-
-      // For Investment properties: match the user's selected PPP
-      if (pppAllowed) {
-        const matchesPPP = desc.includes(selectedPPP.toUpperCase()) ||
-                          desc.includes(selectedPPP.replace(' YR ', 'YR ').toUpperCase())
-        if (!matchesPPP) return
+  const index = pppIndex ?? buildPPPIndex(programs)
+  const allPrograms = programs.map((_, p) => p)
+
+  // Closest to par within 99.000-101.000 among the listed programs' options on an
+  // accepted PPP term; the first one found wins a tie
+  const closestToPar = (programIdx: number[], accept: (pppMonths: number | undefined, hasPPP: boolean) => boolean): TargetPricingOption | null => {
+    let target: RateOption | null = null
+    let targetProgram = ''
+    let closestDistance = Infinity
+    for (const p of programIdx) {
+      const program = programs[p]
+      if (!program) continue
+      const options = program.rateOptions
+      if (options instanceof ColumnarRateOptions) {
+        const points = options.numbers('points')
+        const prices = options.numbers('price')
+        const ppp = options.pppTerms(program.name)
+        for (let i = 0; i < options.length; i++) {
+          const row = options.row(i)
+          if (!accept(isNaN(ppp.months[row]) ? undefined : ppp.months[row], ppp.hasPPP[row] === 1)) continue
+          const price = prices && !isNaN(prices[row]) ? prices[row] : 100 - (points?.[row] || 0)
+          if (price < 99.0 || price > 101.0) continue
+          const distance = Math.abs(price - 100)
+          if (distance < closestDistance) {
+            closestDistance = distance
+            target = options.at(i)
+            targetProgram = program.name || 'Unknown'
+          }
+        }
+        continue
       }
-
-      const points = safeNumber(opt.points)
-      const price = 100 - points
-
-      // Only consider prices within range
-      if (price >= 99.0 && price <= 101.0) {
+      if (!Array.isArray(options)) continue
+      for (const opt of options) {
+        if (!opt || !accept(opt.pppMonths, !!opt.hasPPP)) continue
+        const price = opt.price ?? 100 - safeNumber(opt.points)
+        if (price < 99.0 || price > 101.0) continue
         const distance = Math.abs(price - 100)
         if (distance < closestDistance) {
           closestDistance = distance
-          targetOption = {
-            rate: safeNumber(opt.rate),
-            points: points,
-            apr: safeNumber(opt.apr),
-            price: price,
-            payment: safeNumber(opt.payment),
-            programName: opt.description || programName,
-            adjustments: opt.adjustments || []
-          }
+          target = opt
+          targetProgram = program.name || 'Unknown'
         }
       }
-    })
-  })
-
-  // Fallback: if no match found, find closest to price 100 (still respecting PPP rules)
-  if (!targetOption) {
-    programs.forEach(program => {
-      if (!program || !Array.isArray(program.rateOptions)) return
-      const programName = program.name || 'Unknown'
-
-      program.rateOptions.forEach(opt => {
-        if (!opt) return
-        const desc = (opt.description || programName).toUpperCase()
-        const hasPPP = hasPPPInName(desc)
-
-        // Still skip PPP programs for Primary/Secondary in fallback
-        if (!pppAllowed && hasPPP) return
-
-        const points = safeNumber(opt.points)
-        const price = 100 - points
-        if (price >= 99.0 && price <= 101.0) {
-          const distance = Math.abs(price - 100)
-          if (distance < closestDistance) {
-            closestDistance = distance
-            targetOption = {
-              rate: safeNumber(opt.rate),
-              points: points,
-              apr: safeNumber(opt.apr),
-              price: price,
-              payment: safeNumber(opt.payment),
-              programName: opt.description || programName,
-              adjustments: opt.adjustments || []
-            }
-          }
-        }
-      })
-    })
+    }
+    if (!target) return null
+    const points = safeNumber(target.points)
+    return {
+      rate: safeNumber(target.rate),
+      points: points,
+      apr: safeNumber(target.apr),
+      price: 100 - points,
+      payment: safeNumber(target.payment),
+      programName: target.description || targetProgram,
+      adjustments: resolveAdjustments(target, adjustmentTable)
+    }
   }
 
-  return targetOption
+  // For Primary/Secondary homes: SKIP any PPP programs entirely
+  if (!isPPPAllowed(occupancyType)) return closestToPar(allPrograms, (_, hasPPP) => !hasPPP)
+
+  // For Investment properties: match the user's selected PPP term, else (fallback) the
+  // closest to price 100 on any term
+  const months = getPPPMonths(getPPPPattern(prepayPeriod))
+  return closestToPar(index[String(months)] || [], pppMonths => pppMonths === months)
+    ?? closestToPar(allPrograms, () => true)
 }
 
 /**
@@ -676,11 +1097,16 @@ export default {
   formatPrice,
   getPPPPattern,
   hasPPPInName,
+  getPPPMonths,
+  buildPPPIndex,
   isPPPAllowed,
   filterRateOptionsByPrice,
   filterProgramsByOccupancy,
+  decodeColumnarRateOptions,
   sortRateOptions,
   getTargetPricing,
+  resolveAdjustments,
+  expandAdjustmentTable,
   calculateTotalAdjustments,
   findBestRate,
   findClosestToPar,
@@ -0,0 +1,66 @@
+/**
+ * pricingHistoryDb.ts
+ *
+ * IndexedDB persistence for the pricing history (PricingMemoryStore in PricingLogic.ts).
+ * Entries are stored by id with a timestamp index, so the store can reload its most
+ * recent entries on startup and evict by id.
+ */
+
+import type { PricingHistoryBackend, PricingMemoryEntry } from './PricingLogic'
+
+const DB_NAME = 'openprice-history'
+const STORE = 'entries'
+
+const done = <T>(request: IDBRequest<T>): Promise<T> =>
+  new Promise((resolve, reject) => {
+    request.onsuccess = () => resolve(request.result)
+    request.onerror = () => reject(request.error)
+  })
+
+const committed = (tx: IDBTransaction): Promise<void> =>
+  new Promise((resolve, reject) => {
+    tx.oncomplete = () => resolve()
+    tx.onerror = () => reject(tx.error)
+    tx.onabort = () => reject(tx.error)
+  })
+
+function openDb(name: string): Promise<IDBDatabase> {
+  const request = indexedDB.open(name, 1)
+  request.onupgradeneeded = () => {
+    const store = request.result.createObjectStore(STORE, { keyPath: 'id' })
+    store.createIndex('timestamp', 'timestamp')
+  }
+  return done(request)
+}
+
+export function indexedDbHistoryBackend(name: string = DB_NAME): PricingHistoryBackend {
+  let db: Promise<IDBDatabase> | null = null
+  const database = () => (db ||= openDb(name))
+
+  const write = async (run: (store: IDBObjectStore) => void): Promise<void> => {
+    const tx = (await database()).transaction(STORE, 'readwrite')
+    run(tx.objectStore(STORE))
+    return committed(tx)
+  }
+
+  return {
+    async load(limit: number): Promise<PricingMemoryEntry[]> {
+      const tx = (await database()).transaction(STORE, 'readonly')
+      const entries: PricingMemoryEntry[] = []
+      const cursor = tx.objectStore(STORE).index('timestamp').openCursor(null, 'prev')
+      await new Promise<void>((resolve, reject) => {
+        cursor.onerror = () => reject(cursor.error)
+        cursor.onsuccess = () => {
+          const current = cursor.result
+          if (!current || entries.length >= limit) return resolve()
+          entries.push(current.value)
+          current.continue()
+        }
+      })
+      return entries.reverse()
+    },
+    put: entry => write(store => { store.put(entry) }),
+    delete: ids => write(store => { for (const id of ids) store.delete(id) }),
+    clear: () => write(store => { store.clear() }),
+  }
+}